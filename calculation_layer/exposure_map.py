@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+做市商曝險地圖 (Dealer Exposure Map)
+
+功能:
+1. 以 OI 加權計算整條期權鏈每個 行使價 × 到期日 的 Gamma / Vanna / Charm 曝險
+2. 輸出曝險曲面與關鍵價位（零 Gamma 翻轉點、最大 Vanna 行使價、Call/Put Gamma 牆）
+3. 按快照緩存，Module 31、報告生成器與 Web UI 共用同一次計算
+
+符號約定（與 Module 31 GEX 一致）:
+- 假設做市商持有客戶賣出的 Call（正曝險）、賣給客戶的 Put（負曝險）
+- Gamma 曝險 = Γ × OI × 100 × S            （股價變動 $1 時做市商 Delta 美元變化）
+- Vanna 曝險 = Vanna × OI × 100 × S        （IV 變動 1 個百分點時的 Delta 美元變化）
+- Charm 曝險 = Charm × OI × 100 × S        （每過一天的 Delta 美元變化）
+
+Greeks 由 GreeksCalculator.calculate_greeks_batch 向量化計算。
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from calculation_layer.module16_greeks import GreeksCalculator
+
+logger = logging.getLogger(__name__)
+
+CONTRACT_MULTIPLIER = 100
+
+
+@dataclass
+class DealerExposureMap:
+    """整條期權鏈的做市商曝險地圖"""
+    ticker: str
+    snapshot_key: str
+    spot: float
+    gamma_surface: pd.DataFrame = field(default_factory=pd.DataFrame)  # index=strike, columns=expiration
+    vanna_surface: pd.DataFrame = field(default_factory=pd.DataFrame)
+    charm_surface: pd.DataFrame = field(default_factory=pd.DataFrame)
+    total_gamma: float = 0.0
+    total_vanna: float = 0.0
+    total_charm: float = 0.0
+    zero_gamma_level: Optional[float] = None
+    max_vanna_strike: Optional[float] = None
+    call_wall: Optional[float] = None     # 正 Gamma 曝險最大的行使價
+    put_wall: Optional[float] = None      # 負 Gamma 曝險最大的行使價
+    gamma_profile: List[Dict[str, float]] = field(default_factory=list)  # [{'spot', 'gamma'}]
+    contracts: int = 0
+    calculation_date: str = ""
+
+    def by_strike(self) -> pd.DataFrame:
+        """按行使價匯總（所有到期日相加）"""
+        return pd.DataFrame({
+            'gamma': self.gamma_surface.sum(axis=1),
+            'vanna': self.vanna_surface.sum(axis=1),
+            'charm': self.charm_surface.sum(axis=1),
+        })
+
+    def to_dict(self) -> Dict[str, Any]:
+        strike_table = self.by_strike()
+
+        def _surface(surface: pd.DataFrame) -> Dict[str, Any]:
+            return {
+                'strikes': [round(float(k), 2) for k in surface.index],
+                'expirations': [str(c) for c in surface.columns],
+                'values': np.round(surface.to_numpy(), 0).tolist(),
+            }
+
+        def _level(value: Optional[float]) -> Optional[float]:
+            return round(value, 2) if value is not None else None
+
+        return {
+            'ticker': self.ticker,
+            'snapshot_key': self.snapshot_key,
+            'spot': round(self.spot, 2),
+            'total_gamma': round(self.total_gamma, 0),
+            'total_vanna': round(self.total_vanna, 0),
+            'total_charm': round(self.total_charm, 0),
+            'key_levels': {
+                'zero_gamma': _level(self.zero_gamma_level),
+                'max_vanna_strike': _level(self.max_vanna_strike),
+                'call_wall': _level(self.call_wall),
+                'put_wall': _level(self.put_wall),
+            },
+            'by_strike': [
+                {
+                    'strike': round(float(k), 2),
+                    'gamma': round(float(row['gamma']), 0),
+                    'vanna': round(float(row['vanna']), 0),
+                    'charm': round(float(row['charm']), 0),
+                }
+                for k, row in strike_table.iterrows()
+            ],
+            'gamma_surface': _surface(self.gamma_surface),
+            'vanna_surface': _surface(self.vanna_surface),
+            'charm_surface': _surface(self.charm_surface),
+            'gamma_profile': self.gamma_profile,
+            'contracts': self.contracts,
+            'calculation_date': self.calculation_date,
+        }
+
+
+class DealerExposureCalculator:
+    """
+    做市商曝險地圖計算器
+
+    使用示例:
+    >>> calc = DealerExposureCalculator()
+    >>> exposure = calc.get_exposure_map('SPY', chains, spot=500.0)
+    >>> exposure.zero_gamma_level
+    """
+
+    DEFAULT_IV = 0.30
+    PROFILE_RANGE = (0.80, 1.20)   # 零 Gamma 掃描範圍（相對股價）
+    PROFILE_STEPS = 81
+    CACHE_SIZE = 32
+
+    # 模塊級共享緩存：同一快照只計算一次
+    _cache: "OrderedDict[str, DealerExposureMap]" = OrderedDict()
+    _cache_lock = threading.Lock()
+    _cache_hits = 0
+    _cache_misses = 0
+
+    def __init__(self, risk_free_rate: float = 0.045, dividend_yield: float = 0.0):
+        self.risk_free_rate = risk_free_rate
+        self.dividend_yield = dividend_yield
+
+    # ---------- 輸入整理 ----------
+
+    @staticmethod
+    def chains_to_frame(chains: Dict[str, Dict[str, Any]]) -> pd.DataFrame:
+        """
+        把 {expiration: {'calls': ..., 'puts': ...}} 轉換為長表
+
+        返回列: strike, expiration, option_type, open_interest, iv
+        """
+        parts = []
+        for expiration, chain in (chains or {}).items():
+            for side, option_type in (('calls', 'call'), ('puts', 'put')):
+                data = chain.get(side) if chain else None
+                if data is None or len(data) == 0:
+                    continue
+                df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+                if 'strike' not in df.columns:
+                    continue
+                parts.append(pd.DataFrame({
+                    'strike': pd.to_numeric(df['strike'], errors='coerce').to_numpy(),
+                    'expiration': str(expiration)[:10],
+                    'option_type': option_type,
+                    'open_interest': pd.to_numeric(df.get('openInterest', 0), errors='coerce'),
+                    'iv': pd.to_numeric(df.get('impliedVolatility', np.nan), errors='coerce'),
+                }))
+        if not parts:
+            return pd.DataFrame(columns=['strike', 'expiration', 'option_type', 'open_interest', 'iv'])
+        return pd.concat(parts, ignore_index=True)
+
+    @staticmethod
+    def snapshot_key(ticker: str, frame: pd.DataFrame, spot: float) -> str:
+        """以鏈內容（行使價/OI/IV）與股價生成快照鍵"""
+        digest = hashlib.sha1()
+        digest.update(f"{ticker}|{spot:.4f}".encode())
+        for column in ('strike', 'open_interest', 'iv'):
+            digest.update(np.ascontiguousarray(frame[column].to_numpy(dtype=float)).tobytes())
+        digest.update('|'.join(frame['expiration'].astype(str)).encode())
+        digest.update('|'.join(frame['option_type'].astype(str)).encode())
+        return f"{ticker}:{digest.hexdigest()[:16]}"
+
+    # ---------- 緩存 ----------
+
+    def get_exposure_map(
+        self,
+        ticker: str,
+        chains: Dict[str, Dict[str, Any]],
+        spot: float,
+        snapshot_id: Optional[str] = None,
+        as_of: Optional[datetime] = None
+    ) -> Optional[DealerExposureMap]:
+        """
+        獲取曝險地圖（命中快照緩存則直接返回）
+
+        參數:
+            ticker: 股票代碼
+            chains: {expiration: {'calls': DataFrame/list, 'puts': DataFrame/list}}
+            spot: 當前股價
+            snapshot_id: 調用方提供的快照標識（如抓取時間戳）；None 時按內容哈希
+            as_of: 計算日期（默認現在）
+        """
+        frame = self.chains_to_frame(chains)
+        key = f"{ticker}:{snapshot_id}" if snapshot_id else self.snapshot_key(ticker, frame, spot)
+
+        cls = type(self)
+        with cls._cache_lock:
+            cached = cls._cache.get(key)
+            if cached is not None:
+                cls._cache.move_to_end(key)
+                cls._cache_hits += 1
+                logger.debug(f"曝險地圖緩存命中: {key}")
+                return cached
+            cls._cache_misses += 1
+
+        exposure = self.build(ticker, frame, spot, key, as_of)
+        if exposure is None:
+            return None
+
+        with cls._cache_lock:
+            cls._cache[key] = exposure
+            while len(cls._cache) > cls.CACHE_SIZE:
+                cls._cache.popitem(last=False)
+        return exposure
+
+    @classmethod
+    def get_cached(cls, snapshot_key: str) -> Optional[DealerExposureMap]:
+        """按快照鍵讀取已計算的曝險地圖（供報告/Web 層使用）"""
+        with cls._cache_lock:
+            return cls._cache.get(snapshot_key)
+
+    @classmethod
+    def get_cache_stats(cls) -> Dict[str, int]:
+        with cls._cache_lock:
+            return {
+                'hits': cls._cache_hits,
+                'misses': cls._cache_misses,
+                'size': len(cls._cache),
+                'maxsize': cls.CACHE_SIZE,
+            }
+
+    @classmethod
+    def clear_cache(cls):
+        with cls._cache_lock:
+            cls._cache.clear()
+            cls._cache_hits = 0
+            cls._cache_misses = 0
+
+    # ---------- 計算 ----------
+
+    def build(
+        self,
+        ticker: str,
+        frame: pd.DataFrame,
+        spot: float,
+        snapshot_key: str = "",
+        as_of: Optional[datetime] = None
+    ) -> Optional[DealerExposureMap]:
+        """在長表上向量化計算曝險曲面與關鍵價位"""
+        try:
+            if frame is None or frame.empty or not spot or spot <= 0:
+                logger.warning(f"! {ticker} 曝險地圖跳過: 期權鏈為空或股價無效")
+                return None
+
+            as_of = as_of or datetime.now()
+            expiry_dates = pd.to_datetime(frame['expiration'], errors='coerce')
+            days = (expiry_dates - pd.Timestamp(as_of.date())).dt.days.to_numpy(dtype=float)
+            # 當日到期按 1 天計，避免 T = 0 時 Gamma 歸零
+            t = np.maximum(np.nan_to_num(days, nan=0.0), 1.0) / 365.0
+
+            iv = frame['iv'].to_numpy(dtype=float)
+            iv = np.where(iv > 5.0, iv / 100.0, iv)   # 百分比 -> 小數
+            iv = np.where(np.isfinite(iv) & (iv > 0), iv, self.DEFAULT_IV)
+
+            strikes = frame['strike'].to_numpy(dtype=float)
+            oi = np.nan_to_num(frame['open_interest'].to_numpy(dtype=float))
+            is_call = (frame['option_type'] == 'call').to_numpy()
+            keep = np.isfinite(strikes) & (strikes > 0) & (oi > 0) & np.isfinite(days) & (days >= 0)
+            if not keep.any():
+                logger.warning(f"! {ticker} 曝險地圖跳過: 無有效 OI 數據")
+                return None
+
+            strikes, oi, is_call, t, iv = strikes[keep], oi[keep], is_call[keep], t[keep], iv[keep]
+            expirations = frame['expiration'].to_numpy()[keep]
+            sign = np.where(is_call, 1.0, -1.0)
+
+            greeks = GreeksCalculator.calculate_greeks_batch(
+                spot, strikes, self.risk_free_rate, t, iv, is_call, self.dividend_yield
+            )
+            notional = sign * oi * CONTRACT_MULTIPLIER * spot
+            exposures = pd.DataFrame({
+                'strike': strikes,
+                'expiration': expirations,
+                'gamma': greeks['gamma'] * notional,
+                'vanna': greeks['vanna'] * notional,
+                'charm': greeks['charm'] * notional,
+            })
+            grouped = exposures.groupby(['strike', 'expiration'], sort=True)[['gamma', 'vanna', 'charm']].sum()
+
+            exposure = DealerExposureMap(
+                ticker=ticker,
+                snapshot_key=snapshot_key,
+                spot=float(spot),
+                gamma_surface=grouped['gamma'].unstack(fill_value=0.0),
+                vanna_surface=grouped['vanna'].unstack(fill_value=0.0),
+                charm_surface=grouped['charm'].unstack(fill_value=0.0),
+                total_gamma=float(exposures['gamma'].sum()),
+                total_vanna=float(exposures['vanna'].sum()),
+                total_charm=float(exposures['charm'].sum()),
+                contracts=int(keep.sum()),
+                calculation_date=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            )
+
+            strike_table = exposure.by_strike()
+            gamma_by_strike = strike_table['gamma']
+            if (gamma_by_strike > 0).any():
+                exposure.call_wall = float(gamma_by_strike.idxmax())
+            if (gamma_by_strike < 0).any():
+                exposure.put_wall = float(gamma_by_strike.idxmin())
+            vanna_by_strike = strike_table['vanna'].abs()
+            if (vanna_by_strike > 0).any():
+                exposure.max_vanna_strike = float(vanna_by_strike.idxmax())
+
+            exposure.zero_gamma_level, exposure.gamma_profile = self._zero_gamma(
+                spot, strikes, t, iv, is_call, oi, sign
+            )
+
+            logger.info(
+                f"* {ticker} 曝險地圖: {exposure.contracts} 個合約, "
+                f"GEX ${exposure.total_gamma/1e6:.1f}M, 零 Gamma "
+                f"{'$%.2f' % exposure.zero_gamma_level if exposure.zero_gamma_level else 'N/A'}"
+            )
+            return exposure
+
+        except Exception as e:
+            logger.error(f"x {ticker} 曝險地圖計算失敗: {e}")
+            return None
+
+    def _zero_gamma(self, spot, strikes, t, iv, is_call, oi, sign):
+        """
+        在股價網格上重算總 Gamma 曝險，尋找符號翻轉點（線性插值）
+
+        網格 × 合約 的二維數組一次性計算，無 Python 迴圈。
+        """
+        grid = np.linspace(spot * self.PROFILE_RANGE[0], spot * self.PROFILE_RANGE[1], self.PROFILE_STEPS)
+        greeks = GreeksCalculator.calculate_greeks_batch(
+            grid[:, None], strikes[None, :], self.risk_free_rate,
+            t[None, :], iv[None, :], is_call[None, :], self.dividend_yield
+        )
+        profile = (greeks['gamma'] * (sign * oi * CONTRACT_MULTIPLIER)[None, :] * grid[:, None]).sum(axis=1)
+        profile_points = [
+            {'spot': round(float(s), 2), 'gamma': round(float(g), 0)}
+            for s, g in zip(grid, profile)
+        ]
+
+        crossings = np.where(np.diff(np.sign(profile)) != 0)[0]
+        if len(crossings) == 0:
+            return None, profile_points
+
+        # 取最接近當前股價的翻轉點
+        idx = crossings[np.argmin(np.abs(grid[crossings] - spot))]
+        g0, g1 = profile[idx], profile[idx + 1]
+        s0, s1 = grid[idx], grid[idx + 1]
+        level = s0 - g0 * (s1 - s0) / (g1 - g0) if g1 != g0 else s0
+        return float(level), profile_points
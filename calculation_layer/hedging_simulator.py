@@ -0,0 +1,264 @@
+# calculation_layer/hedging_simulator.py
+"""
+動態 Delta 對沖模擬器（基於模塊6 對沖量計算）
+
+功能:
+- 在歷史或模擬價格路徑上回放 Delta 對沖
+- 支持不同再平衡頻率（每 N 步）與 Delta 區間（band）再平衡規則
+- 計入每股佣金與基點滑點
+- 輸出對沖損益、交易成本、滑點及對沖誤差方差
+- 同時向量化多條路徑 × 多個對沖策略（只對時間步迴圈）
+
+原理:
+─────────────────────────────────────
+賣出期權收取 BS 理論價（隱含波動率），持有 Δ × 乘數 × 張數 股正股對沖，
+每個再平衡時點把持股調整到目標 Delta；到期時結算期權內在價值。
+現金按無風險利率計息，持有 / 做空的正股每步收取 / 支付股息 (持股 × 股價 × q × dt)。
+對沖誤差 = 期末 (現金 + 股票市值 - 期權負債)
+連續對沖且實現波動率 = 隱含波動率時，誤差期望為 0；
+離散再平衡使誤差方差上升，交易成本使均值下降 —— 兩者的權衡決定對沖頻率。
+─────────────────────────────────────
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+from calculation_layer.module6_hedge_quantity import HedgeQuantityCalculator
+from calculation_layer.module16_greeks import GreeksCalculator
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HedgePolicy:
+    """對沖再平衡規則"""
+    name: str
+    rebalance_every: int = 1     # 每 N 個時間步檢查一次
+    delta_band: float = 0.0      # 每張合約 Delta 偏離超過此值才交易（0 = 每次檢查都交易）
+
+
+@dataclass
+class HedgeSimulationResult:
+    """單個對沖策略在所有路徑上的統計"""
+    policy: str
+    rebalance_every: int
+    delta_band: float
+    mean_pnl: float
+    std_pnl: float
+    hedging_error_variance: float
+    mean_transaction_cost: float
+    mean_slippage: float
+    mean_trades: float
+    worst_pnl: float
+    n_paths: int
+
+    def to_dict(self) -> Dict:
+        return {
+            'policy': self.policy,
+            'rebalance_every': self.rebalance_every,
+            'delta_band': self.delta_band,
+            'mean_pnl': round(self.mean_pnl, 2),
+            'std_pnl': round(self.std_pnl, 2),
+            'hedging_error_variance': round(self.hedging_error_variance, 2),
+            'mean_transaction_cost': round(self.mean_transaction_cost, 2),
+            'mean_slippage': round(self.mean_slippage, 2),
+            'mean_trades': round(self.mean_trades, 1),
+            'worst_pnl': round(self.worst_pnl, 2),
+            'n_paths': self.n_paths
+        }
+
+
+class DeltaHedgingSimulator:
+    """
+    動態 Delta 對沖模擬器
+
+    使用示例:
+    >>> sim = DeltaHedgingSimulator()
+    >>> paths = sim.simulate_gbm_paths(100, 0.25, 30/365, n_steps=30, n_paths=5000, seed=1)
+    >>> results = sim.simulate(paths, strike=100, time_to_expiration=30/365,
+    ...                        implied_volatility=0.25, option_type='put',
+    ...                        policies=[HedgePolicy('daily', 1), HedgePolicy('band', 1, 0.1)])
+    """
+
+    OPTION_MULTIPLIER = HedgeQuantityCalculator.OPTION_MULTIPLIER
+
+    def __init__(self, risk_free_rate: float = 0.045, dividend_yield: float = 0.0):
+        self.risk_free_rate = risk_free_rate
+        self.dividend_yield = dividend_yield
+        logger.info("* 動態 Delta 對沖模擬器已初始化")
+
+    @staticmethod
+    def simulate_gbm_paths(
+        stock_price: float,
+        volatility: float,
+        time_to_expiration: float,
+        n_steps: int,
+        n_paths: int,
+        drift: float = 0.0,
+        seed: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        生成幾何布朗運動價格路徑
+
+        返回:
+            np.ndarray: 形狀 (n_paths, n_steps + 1)，第 0 列為起始股價
+        """
+        rng = np.random.default_rng(seed)
+        dt = time_to_expiration / n_steps
+        shocks = rng.standard_normal((n_paths, n_steps))
+        log_returns = (drift - 0.5 * volatility ** 2) * dt + volatility * np.sqrt(dt) * shocks
+        paths = np.empty((n_paths, n_steps + 1))
+        paths[:, 0] = stock_price
+        paths[:, 1:] = stock_price * np.exp(np.cumsum(log_returns, axis=1))
+        return paths
+
+    def _bs_price(self, spot, strike, t, sigma, is_call):
+        """向量化歐式 BS 價格（用於期初期權金）"""
+        sqrt_t = np.sqrt(t)
+        d1 = (np.log(spot / strike) + (self.risk_free_rate - self.dividend_yield + 0.5 * sigma ** 2) * t) / (sigma * sqrt_t)
+        d2 = d1 - sigma * sqrt_t
+        disc_s = spot * np.exp(-self.dividend_yield * t)
+        disc_k = strike * np.exp(-self.risk_free_rate * t)
+        if is_call:
+            return disc_s * norm.cdf(d1) - disc_k * norm.cdf(d2)
+        return disc_k * norm.cdf(-d2) - disc_s * norm.cdf(-d1)
+
+    def simulate(
+        self,
+        price_paths,
+        strike: float,
+        time_to_expiration: float,
+        implied_volatility: float,
+        option_type: str = 'put',
+        policies: Optional[Sequence[HedgePolicy]] = None,
+        contracts: int = 1,
+        short_option: bool = True,
+        commission_per_share: float = 0.005,
+        slippage_bps: float = 2.0
+    ) -> List[HedgeSimulationResult]:
+        """
+        在價格路徑上回放多個對沖策略
+
+        參數:
+            price_paths: 價格路徑，1 維（單條歷史路徑）或 2 維 (n_paths, n_steps + 1)
+            strike: 行使價
+            time_to_expiration: 路徑覆蓋的到期時間（年），時間步長 = T / n_steps
+            implied_volatility: 用於定價與計算 Delta 的隱含波動率（小數）
+            option_type: 'call' 或 'put'
+            policies: 對沖策略列表（默認每步對沖）
+            contracts: 期權張數
+            short_option: True 表示賣出期權（做空 Gamma）
+            commission_per_share: 每股佣金（美元）
+            slippage_bps: 每筆交易滑點（基點，按成交金額）
+
+        返回:
+            List[HedgeSimulationResult]: 與 policies 順序一致
+        """
+        paths = np.atleast_2d(np.asarray(price_paths, dtype=float))
+        n_paths, n_points = paths.shape
+        n_steps = n_points - 1
+        if n_steps < 1:
+            raise ValueError("價格路徑至少需要兩個時間點")
+        if time_to_expiration <= 0 or implied_volatility <= 0:
+            raise ValueError("到期時間與隱含波動率必須大於0")
+
+        policies = list(policies or [HedgePolicy('every_step', 1, 0.0)])
+        n_policies = len(policies)
+        is_call = option_type.lower() == 'call'
+        dt = time_to_expiration / n_steps
+        shares_per_unit = self.OPTION_MULTIPLIER * contracts
+        side = -1.0 if short_option else 1.0   # 期權持倉方向
+
+        logger.info(
+            f"開始對沖模擬: {n_paths} 條路徑 × {n_policies} 個策略, {n_steps} 步, "
+            f"{'賣出' if short_option else '買入'} {contracts} 張 {option_type.upper()} K={strike}"
+        )
+
+        # Delta 只取決於路徑與時間，與策略無關：一次性計算 (n_paths, n_steps)
+        remaining = time_to_expiration - dt * np.arange(n_steps)
+        deltas = GreeksCalculator.calculate_greeks_batch(
+            paths[:, :-1], strike, self.risk_free_rate,
+            remaining[None, :], implied_volatility, is_call, self.dividend_yield
+        )['delta']
+        # 對沖股數 = -持倉方向 × Delta × 乘數 × 張數
+        target_shares = -side * deltas * shares_per_unit
+
+        rebalance_every = np.array([max(1, p.rebalance_every) for p in policies])[:, None]
+        band_shares = np.array([max(0.0, p.delta_band) for p in policies])[:, None] * shares_per_unit
+
+        premium = self._bs_price(paths[:, 0], strike, time_to_expiration, implied_volatility, is_call)
+        premium_cash = -side * premium * shares_per_unit  # 賣出收取期權金
+
+        holdings = np.zeros((n_policies, n_paths))
+        cash = np.tile(premium_cash, (n_policies, 1))
+        commissions = np.zeros((n_policies, n_paths))
+        slippage = np.zeros((n_policies, n_paths))
+        trades = np.zeros((n_policies, n_paths))
+        growth = np.exp(self.risk_free_rate * dt)
+
+        for step in range(n_steps):
+            spot = paths[:, step][None, :]
+            target = target_shares[:, step][None, :]
+            gap = target - holdings
+            if step == 0:
+                # 建倉：所有策略都按初始 Delta 完整對沖
+                trade = gap
+            else:
+                scheduled = step % rebalance_every == 0
+                trade = np.where(scheduled & (np.abs(gap) > band_shares), gap, 0.0)
+
+            traded = trade != 0
+            commission = np.abs(trade) * commission_per_share
+            slip = np.abs(trade) * spot * slippage_bps / 10000.0
+            cash -= trade * spot + commission + slip
+            holdings += trade
+            commissions += commission
+            slippage += slip
+            trades += traded
+
+            # 股息：持股收取、做空支付
+            cash += holdings * spot * self.dividend_yield * dt
+            cash *= growth
+
+        final_spot = paths[:, -1][None, :]
+        payoff = np.maximum(final_spot - strike, 0.0) if is_call else np.maximum(strike - final_spot, 0.0)
+        option_value = side * payoff * shares_per_unit
+        pnl = cash + holdings * final_spot + option_value
+
+        # 期權按隱含波動率公平定價，對沖誤差即期末 P&L 本身
+        results = []
+        for i, policy in enumerate(policies):
+            results.append(HedgeSimulationResult(
+                policy=policy.name,
+                rebalance_every=int(rebalance_every[i, 0]),
+                delta_band=float(policy.delta_band),
+                mean_pnl=float(pnl[i].mean()),
+                std_pnl=float(pnl[i].std()),
+                hedging_error_variance=float(pnl[i].var()),
+                mean_transaction_cost=float(commissions[i].mean()),
+                mean_slippage=float(slippage[i].mean()),
+                mean_trades=float(trades[i].mean()),
+                worst_pnl=float(pnl[i].min()),
+                n_paths=n_paths
+            ))
+
+        for r in results:
+            logger.info(
+                f"  {r.policy}: 平均損益 ${r.mean_pnl:.2f}, 標準差 ${r.std_pnl:.2f}, "
+                f"成本 ${r.mean_transaction_cost + r.mean_slippage:.2f}, 平均交易 {r.mean_trades:.1f} 次"
+            )
+        logger.info("* 對沖模擬完成")
+        return results
+
+    @staticmethod
+    def to_frame(results: Sequence[HedgeSimulationResult]) -> pd.DataFrame:
+        """把模擬結果轉換為比較表（按對沖誤差標準差排序）"""
+        table = pd.DataFrame([r.to_dict() for r in results])
+        if table.empty:
+            return table
+        return table.sort_values('std_pnl').reset_index(drop=True)
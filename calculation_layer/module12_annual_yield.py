@@ -1,8 +1,12 @@
 from dataclasses import dataclass
-from typing import Dict
+from typing import Dict, Iterable, Optional
 from datetime import datetime
 import logging
 
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -117,4 +121,244 @@ class AnnualYieldCalculator:
             return False
         
         logger.info("* 輸入參數驗證通過")
-        return True
\ No newline at end of file
+        return True
+
+
+class IncomeYieldMatrixScreener:
+    """
+    行使價 × 到期日 收益率矩陣篩選器（AnnualYieldCalculator 的批量版本）
+    
+    對一個或多個股票的整條期權鏈，以數組一次性計算:
+    - 年化收益率（期權金 / 持倉成本，與第十二課公式一致）
+    - 保證金年化收益率（Reg T 保證金估算，與 Module 29 一致）
+    - 獲利概率 PoP（對數正態：P(S_T > 盈虧平衡點)）
+    - 盈虧平衡點距離（%）
+    
+    策略:
+    - short_put:    持倉成本 = 行使價（現金擔保），盈虧平衡 = K - 期權金
+    - covered_call: 持倉成本 = 股價，盈虧平衡 = S - 期權金
+    
+    期權金使用 Bid（賣方保守成交價），流動性不足的合約以布爾掩碼過濾。
+    """
+    
+    STRATEGIES = ('short_put', 'covered_call')
+    
+    # 流動性閾值（與 Module 22 三不買原則一致，Volume 或 OI 其一達標）
+    MIN_VOLUME = 10
+    MIN_OPEN_INTEREST = 100
+    MAX_BID_ASK_SPREAD_PCT = 10.0
+    
+    # Reg T 保證金參數
+    NAKED_MARGIN_PCT = 0.20
+    NAKED_MARGIN_FLOOR_PCT = 0.10
+    STOCK_MARGIN_PCT = 0.50
+    
+    OUTPUT_COLUMNS = [
+        'rank', 'ticker', 'strategy', 'expiration', 'dte', 'strike', 'stock_price',
+        'premium', 'annualized_yield', 'yield_on_margin', 'pop', 'breakeven',
+        'breakeven_distance_pct', 'iv', 'volume', 'open_interest', 'bid_ask_spread_pct'
+    ]
+    
+    def __init__(self, risk_free_rate: float = 0.045):
+        self.risk_free_rate = risk_free_rate
+        logger.info("* 收益率矩陣篩選器已初始化")
+    
+    def screen_chain(
+        self,
+        ticker: str,
+        stock_price: float,
+        chains: Dict[str, Dict[str, pd.DataFrame]],
+        strategies: Iterable[str] = STRATEGIES,
+        otm_only: bool = True,
+        as_of: Optional[datetime] = None
+    ) -> pd.DataFrame:
+        """
+        計算單個股票所有 行使價 × 到期日 的收益率矩陣
+        
+        參數:
+            ticker: 股票代碼
+            stock_price: 當前股價
+            chains: {expiration(YYYY-MM-DD): {'calls': DataFrame, 'puts': DataFrame}}
+                    （即 DataFetcher.get_option_chain 的返回值，按到期日組織）
+            strategies: 要計算的策略
+            otm_only: 只保留價外合約（Short Put: K <= S；Covered Call: K >= S）
+            as_of: 計算日期（默認現在）
+        
+        返回:
+            DataFrame: 通過流動性掩碼的合約，按年化收益率排序
+        """
+        frame = self._build_frame(ticker, stock_price, chains, strategies, as_of)
+        if frame.empty:
+            logger.warning(f"! {ticker} 收益率矩陣為空")
+            return pd.DataFrame(columns=self.OUTPUT_COLUMNS)
+        
+        table = self._compute(frame, otm_only)
+        logger.info(f"* {ticker} 收益率矩陣: {len(frame)} 個合約 -> {len(table)} 個通過篩選")
+        return self._rank(table)
+    
+    def screen_watchlist(
+        self,
+        watchlist: Dict[str, Dict],
+        strategies: Iterable[str] = STRATEGIES,
+        otm_only: bool = True,
+        top_n: Optional[int] = None,
+        as_of: Optional[datetime] = None
+    ) -> pd.DataFrame:
+        """
+        對整個觀察清單一次性計算收益率矩陣並統一排名
+        
+        參數:
+            watchlist: {ticker: {'stock_price': float, 'chains': {expiration: {'calls', 'puts'}}}}
+            top_n: 只返回排名前 N 的合約
+        
+        返回:
+            DataFrame: 全清單排名表
+        """
+        frames = [
+            self._build_frame(ticker, data.get('stock_price', 0), data.get('chains', {}), strategies, as_of)
+            for ticker, data in watchlist.items()
+        ]
+        frames = [f for f in frames if not f.empty]
+        if not frames:
+            return pd.DataFrame(columns=self.OUTPUT_COLUMNS)
+        
+        table = self._rank(self._compute(pd.concat(frames, ignore_index=True), otm_only))
+        logger.info(f"* 觀察清單收益率矩陣: {len(watchlist)} 個股票, {len(table)} 個合約")
+        return table.head(top_n) if top_n else table
+    
+    def _build_frame(
+        self,
+        ticker: str,
+        stock_price: float,
+        chains: Dict[str, Dict[str, pd.DataFrame]],
+        strategies: Iterable[str],
+        as_of: Optional[datetime]
+    ) -> pd.DataFrame:
+        """把各到期日的 calls/puts 拼接成一個長表"""
+        if not stock_price or stock_price <= 0 or not chains:
+            return pd.DataFrame()
+        
+        as_of = as_of or datetime.now()
+        side_map = {'short_put': 'puts', 'covered_call': 'calls'}
+        parts = []
+        for expiration, chain in chains.items():
+            try:
+                dte = (datetime.strptime(str(expiration)[:10], '%Y-%m-%d').date() - as_of.date()).days
+            except ValueError:
+                logger.warning(f"! 無法解析到期日: {expiration}")
+                continue
+            if dte <= 0:
+                continue
+            
+            for strategy in strategies:
+                if strategy not in side_map:
+                    logger.warning(f"! 不支持的策略: {strategy}")
+                    continue
+                df = chain.get(side_map[strategy]) if chain else None
+                if df is None or len(df) == 0:
+                    continue
+                if not isinstance(df, pd.DataFrame):
+                    df = pd.DataFrame(df)
+                part = pd.DataFrame({
+                    'strike': pd.to_numeric(df['strike'], errors='coerce'),
+                    'bid': pd.to_numeric(df.get('bid', 0), errors='coerce'),
+                    'ask': pd.to_numeric(df.get('ask', 0), errors='coerce'),
+                    'volume': pd.to_numeric(df.get('volume', 0), errors='coerce'),
+                    'open_interest': pd.to_numeric(df.get('openInterest', 0), errors='coerce'),
+                    'iv': pd.to_numeric(df.get('impliedVolatility', np.nan), errors='coerce'),
+                    'delta': pd.to_numeric(df.get('delta', np.nan), errors='coerce'),
+                })
+                part['ticker'] = ticker
+                part['strategy'] = strategy
+                part['expiration'] = str(expiration)[:10]
+                part['dte'] = dte
+                part['stock_price'] = float(stock_price)
+                parts.append(part)
+        
+        return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+    
+    def _compute(self, frame: pd.DataFrame, otm_only: bool) -> pd.DataFrame:
+        """在長表上以向量化方式計算所有指標並應用流動性掩碼"""
+        strike = frame['strike'].to_numpy(dtype=float)
+        spot = frame['stock_price'].to_numpy(dtype=float)
+        bid = np.nan_to_num(frame['bid'].to_numpy(dtype=float))
+        ask = np.nan_to_num(frame['ask'].to_numpy(dtype=float))
+        volume = np.nan_to_num(frame['volume'].to_numpy(dtype=float))
+        oi = np.nan_to_num(frame['open_interest'].to_numpy(dtype=float))
+        dte = frame['dte'].to_numpy(dtype=float)
+        is_put = (frame['strategy'] == 'short_put').to_numpy()
+        
+        # IV 標準化為小數（> 5 視為百分比，與 Module 22 規則一致）
+        iv = frame['iv'].to_numpy(dtype=float)
+        iv = np.where(iv > 5.0, iv / 100.0, iv)
+        
+        premium = bid
+        mid = (bid + ask) / 2.0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            spread_pct = np.where(mid > 0, (ask - bid) / mid * 100.0, np.inf)
+        annualize = 365.0 / dte
+        
+        # 持倉成本與年化收益率
+        cost_basis = np.where(is_put, strike, spot)
+        annualized_yield = premium / cost_basis * annualize * 100.0
+        
+        # 保證金: Short Put 用 Reg T 裸賣公式，Covered Call 用 50% 股票保證金
+        # 裸賣 Put = max(20% × 股價 − 價外金額 + 權利金, 10% × 行使價 + 權利金)
+        otm_amount = np.maximum(spot - strike, 0.0)
+        naked_margin = np.maximum(
+            self.NAKED_MARGIN_PCT * spot - otm_amount + premium,
+            self.NAKED_MARGIN_FLOOR_PCT * strike + premium
+        )
+        margin = np.where(is_put, naked_margin, self.STOCK_MARGIN_PCT * spot)
+        yield_on_margin = premium / margin * annualize * 100.0
+        
+        # 盈虧平衡點與距離
+        breakeven = np.where(is_put, strike, spot) - premium
+        breakeven_distance_pct = (spot - breakeven) / spot * 100.0
+        
+        # PoP = P(S_T > 盈虧平衡點)，IV 缺失時退回 1 - |Delta|
+        t = dte / 365.0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            d = (np.log(spot / breakeven) + (self.risk_free_rate - 0.5 * iv ** 2) * t) / (iv * np.sqrt(t))
+        pop = norm.cdf(d)
+        delta = frame['delta'].to_numpy(dtype=float)
+        iv_valid = np.isfinite(iv) & (iv > 0) & (breakeven > 0)
+        pop = np.where(iv_valid, pop, 1.0 - np.abs(delta)) * 100.0
+        
+        # 流動性掩碼
+        mask = (
+            np.isfinite(strike) & (strike > 0) & (premium > 0)
+            & ((volume >= self.MIN_VOLUME) | (oi >= self.MIN_OPEN_INTEREST))
+            & (spread_pct <= self.MAX_BID_ASK_SPREAD_PCT)
+        )
+        if otm_only:
+            mask &= np.where(is_put, strike <= spot, strike >= spot)
+        
+        result = pd.DataFrame({
+            'ticker': frame['ticker'].to_numpy(),
+            'strategy': frame['strategy'].to_numpy(),
+            'expiration': frame['expiration'].to_numpy(),
+            'dte': dte.astype(int),
+            'strike': strike,
+            'stock_price': spot,
+            'premium': premium,
+            'annualized_yield': annualized_yield,
+            'yield_on_margin': yield_on_margin,
+            'pop': pop,
+            'breakeven': breakeven,
+            'breakeven_distance_pct': breakeven_distance_pct,
+            'iv': iv,
+            'volume': volume.astype(int),
+            'open_interest': oi.astype(int),
+            'bid_ask_spread_pct': spread_pct,
+        })
+        return result[mask]
+    
+    def _rank(self, table: pd.DataFrame, sort_by: str = 'annualized_yield') -> pd.DataFrame:
+        """按指標排序並加入排名列"""
+        table = table.sort_values(sort_by, ascending=False, kind='mergesort').reset_index(drop=True)
+        table.insert(0, 'rank', np.arange(1, len(table) + 1))
+        return table.round({
+            'premium': 2, 'annualized_yield': 2, 'yield_on_margin': 2, 'pop': 1,
+            'breakeven': 2, 'breakeven_distance_pct': 2, 'iv': 4, 'bid_ask_spread_pct': 2
+        })
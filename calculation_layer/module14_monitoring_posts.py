@@ -6,9 +6,12 @@
 
 import logging
 from dataclasses import dataclass, field
-from typing import Dict
+from typing import Dict, Optional
 from datetime import datetime
 
+import numpy as np
+import pandas as pd
+
 logger = logging.getLogger(__name__)
 
 
@@ -424,12 +427,7 @@ class MonitoringPostsCalculator:
             }
             
             # 判斷風險等級
-            if alerts >= 4:
-                risk_level = "高風險"
-            elif alerts >= 2:
-                risk_level = "中風險"
-            else:
-                risk_level = "低風險"
+            risk_level = self.risk_level_from_alerts(alerts)
             
             logger.info(f"  監察結果:")
             logger.info(f"    警報數: {alerts}")
@@ -474,6 +472,15 @@ class MonitoringPostsCalculator:
             logger.error(f"x 12監察崗位分析失敗: {e}")
             raise
     
+    @staticmethod
+    def risk_level_from_alerts(alerts: int) -> str:
+        """根據警報數判斷風險等級（崗位13整合後亦用此規則重算）"""
+        if alerts >= 4:
+            return "高風險"
+        elif alerts >= 2:
+            return "中風險"
+        return "低風險"
+    
     @staticmethod
     def _validate_inputs(stock_price: float, option_premium: float, iv: float, 
                         delta: float, volume: int, bid_ask_spread: float, atr: float, vix: float) -> bool:
@@ -602,4 +609,247 @@ class MonitoringPostsCalculator:
                 'note': f'計算失敗: {e}',
                 'strategy_suggestion': '無法提供建議',
                 'iv_environment': '未知'
-            }
\ No newline at end of file
+            }
+
+class MonitoringPostsBatchEvaluator:
+    """
+    監察崗位批量評估器（整個持倉觀察列表，崗位1-13）
+    
+    - 以 DataFrame 一次評估所有股票，每個崗位為一條向量化規則
+    - 記住每隻股票上次的輸入，只重算輸入有變化的崗位
+      （日期類崗位9-11在評估日期改變時全部重算）
+    - 判斷標準與 MonitoringPostsCalculator.calculate / check_iv_rank_post 完全一致
+    
+    使用示例:
+    >>> evaluator = MonitoringPostsBatchEvaluator()
+    >>> table = evaluator.evaluate(pd.DataFrame([
+    ...     {'ticker': 'AAPL', 'stock_price': 180, 'option_premium': 2.5, 'iv': 28, 'delta': 0.12,
+    ...      'open_interest': 800, 'volume': 150, 'bid_ask_spread': 0.1, 'atr': 3.2, 'vix': 16,
+    ...      'expiration_date': '2026-12-18', 'iv_rank': 45},
+    ... ]))
+    >>> table.loc['AAPL', 'risk_level']
+    """
+    
+    NUMERIC_INPUTS = ('stock_price', 'option_premium', 'iv', 'delta', 'open_interest',
+                      'volume', 'bid_ask_spread', 'atr', 'vix', 'iv_rank')
+    DATE_INPUTS = ('dividend_date', 'earnings_date', 'expiration_date')
+    
+    # 每個崗位依賴的輸入欄位
+    POST_INPUTS = {
+        1: ('stock_price',),
+        2: ('option_premium',),
+        3: ('iv', 'vix'),
+        4: ('delta',),
+        5: ('open_interest',),
+        6: ('volume',),
+        7: ('bid_ask_spread', 'option_premium'),
+        8: ('atr', 'stock_price'),
+        9: ('dividend_date',),
+        10: ('earnings_date',),
+        11: ('expiration_date',),
+        12: ('vix',),
+        13: ('iv_rank',),
+    }
+    DATE_POSTS = (9, 10, 11)
+    
+    STATUS_COLUMNS = {
+        1: 'post1_stock_price_status',
+        2: 'post2_option_premium_status',
+        3: 'post3_iv_status',
+        4: 'post4_delta_status',
+        5: 'post5_open_interest_status',
+        6: 'post6_volume_status',
+        7: 'post7_bid_ask_spread_status',
+        8: 'post8_atr_status',
+        9: 'post9_dividend_date_status',
+        10: 'post10_earnings_date_status',
+        11: 'post11_expiration_date_status',
+        12: 'post12_vix_status',
+        13: 'post13_iv_rank_status',
+    }
+    
+    def __init__(self):
+        self._inputs = pd.DataFrame()
+        self._outputs = pd.DataFrame()
+        self._last_as_of = None
+        self.stats = {'evaluations': 0, 'posts_recomputed': 0, 'posts_skipped': 0}
+        logger.info("* 監察崗位批量評估器已初始化")
+    
+    def evaluate(self, inputs, as_of: Optional[datetime] = None) -> pd.DataFrame:
+        """
+        評估觀察列表中所有股票的13個監察崗位
+        
+        參數:
+            inputs: DataFrame（含 ticker 列或以 ticker 為索引）、
+                    {ticker: {欄位: 值}} 字典或記錄列表；
+                    缺少的日期欄位視為空，缺少的 iv_rank 視為數據不足
+            as_of: 評估時間（默認現在），用於日期類崗位
+        
+        返回:
+            pd.DataFrame: 以 ticker 為索引，含 postN_..._status、postN_alerts、
+                          total_alerts、risk_level
+        """
+        frame = self._normalize_inputs(inputs)
+        as_of = as_of or datetime.now()
+        date_changed = self._last_as_of is None or self._last_as_of.date() != as_of.date()
+        
+        previous = self._inputs.reindex(frame.index)
+        known = frame.index.isin(self._inputs.index)
+        changed_cols = {}
+        for col in frame.columns:
+            new, old = frame[col], previous[col] if col in previous else pd.Series(np.nan, index=frame.index)
+            same = (new == old) | (new.isna() & old.isna())
+            changed_cols[col] = ~same.to_numpy() | ~known
+        
+        outputs = self._outputs.reindex(frame.index)
+        for post, cols in self.POST_INPUTS.items():
+            mask = np.zeros(len(frame), dtype=bool)
+            for col in cols:
+                mask |= changed_cols[col]
+            if post in self.DATE_POSTS and date_changed:
+                mask[:] = True
+            n_changed = int(mask.sum())
+            self.stats['posts_recomputed'] += n_changed
+            self.stats['posts_skipped'] += len(frame) - n_changed
+            if not n_changed:
+                continue
+            status, alerts = getattr(self, f'_post{post}')(frame.loc[mask], as_of)
+            outputs.loc[mask, self.STATUS_COLUMNS[post]] = status.to_numpy()
+            outputs.loc[mask, f'post{post}_alerts'] = alerts.to_numpy()
+        
+        alert_cols = [f'post{p}_alerts' for p in self.POST_INPUTS]
+        outputs[alert_cols] = outputs[alert_cols].astype(int)
+        outputs['total_alerts'] = outputs[alert_cols].sum(axis=1)
+        outputs['risk_level'] = np.select(
+            [outputs['total_alerts'] >= 4, outputs['total_alerts'] >= 2],
+            ['高風險', '中風險'], default='低風險'
+        )
+        
+        # 更新狀態（保留本次未出現的股票，下次出現時仍可增量比較）
+        self._inputs = pd.concat([self._inputs.drop(frame.index, errors='ignore'), frame])
+        self._outputs = pd.concat([self._outputs.drop(frame.index, errors='ignore'), outputs])
+        self._last_as_of = as_of
+        self.stats['evaluations'] += 1
+        
+        logger.info(
+            f"  監察崗位批量評估: {len(frame)} 隻股票, "
+            f"高風險 {(outputs['risk_level'] == '高風險').sum()} 隻"
+        )
+        return outputs.copy()
+    
+    def reset(self):
+        """清除所有股票的歷史輸入，下次評估全部重算"""
+        self._inputs = pd.DataFrame()
+        self._outputs = pd.DataFrame()
+        self._last_as_of = None
+    
+    def _normalize_inputs(self, inputs) -> pd.DataFrame:
+        if isinstance(inputs, dict):
+            frame = pd.DataFrame.from_dict(inputs, orient='index')
+        else:
+            frame = pd.DataFrame(inputs)
+            if 'ticker' in frame.columns:
+                frame = frame.set_index('ticker')
+        frame.index = frame.index.astype(str).str.upper()
+        frame.index.name = 'ticker'
+        
+        for col in self.NUMERIC_INPUTS:
+            frame[col] = pd.to_numeric(frame[col], errors='coerce') if col in frame else np.nan
+        for col in self.DATE_INPUTS:
+            frame[col] = frame[col].fillna('').astype(str) if col in frame else ''
+        return frame[list(self.NUMERIC_INPUTS + self.DATE_INPUTS)]
+    
+    # ========== 向量化崗位規則（與 calculate 的判斷一致） ==========
+    
+    @staticmethod
+    def _ok(frame):
+        return pd.Series("OK 正常", index=frame.index), pd.Series(0, index=frame.index)
+    
+    def _post1(self, frame, as_of):
+        return self._ok(frame)
+    
+    def _post2(self, frame, as_of):
+        return self._ok(frame)
+    
+    @staticmethod
+    def _post3(frame, as_of):
+        threshold = np.where(frame['vix'] > 0, frame['vix'] + 10.0, 40.0)
+        alert = frame['iv'] > threshold
+        return pd.Series(np.where(alert, "! 警報", "OK 正常"), index=frame.index), alert.astype(int)
+    
+    @staticmethod
+    def _post4(frame, as_of):
+        delta = frame['delta']
+        out_of_range = (delta > 0.15) | (delta < 0.10)
+        deep_otm = delta < 0.20
+        status = np.select([deep_otm, out_of_range], ["! 警報 - 深度價外", "! 警報"], default="OK 正常")
+        return pd.Series(status, index=frame.index), out_of_range.astype(int) + deep_otm.astype(int)
+    
+    @staticmethod
+    def _tiered(values, minimum, recommended, below):
+        if below:
+            severe, warn = values < minimum, values < recommended
+        else:
+            severe, warn = values > minimum, values > recommended
+        status = np.select([severe, warn], ["! 嚴重警報", "! 警報"], default="OK 正常")
+        return pd.Series(status, index=values.index), (severe | warn).astype(int)
+    
+    def _post5(self, frame, as_of):
+        return self._tiered(frame['open_interest'], 100, 500, below=True)
+    
+    def _post6(self, frame, as_of):
+        return self._tiered(frame['volume'], 10, 100, below=True)
+    
+    def _post7(self, frame, as_of):
+        premium = frame['option_premium']
+        spread_pct = (frame['bid_ask_spread'] / premium.where(premium > 0) * 100).fillna(0.0)
+        return self._tiered(spread_pct, 10.0, 5.0, below=False)
+    
+    @staticmethod
+    def _post8(frame, as_of):
+        alert = frame['atr'] > frame['stock_price'] * 0.05
+        return pd.Series(np.where(alert, "! 警報", "OK 正常"), index=frame.index), alert.astype(int)
+    
+    @staticmethod
+    def _days_until(dates, as_of):
+        parsed = pd.to_datetime(dates.where(dates != ''), format='%Y-%m-%d', errors='coerce')
+        return (parsed - pd.Timestamp(as_of)).dt.days
+    
+    def _event_within_week(self, dates, as_of):
+        days = self._days_until(dates, as_of)
+        alert = (days >= 0) & (days <= 7)
+        return pd.Series(np.where(alert, "! 警報", "OK 正常"), index=dates.index), alert.astype(int)
+    
+    def _post9(self, frame, as_of):
+        return self._event_within_week(frame['dividend_date'], as_of)
+    
+    def _post10(self, frame, as_of):
+        return self._event_within_week(frame['earnings_date'], as_of)
+    
+    def _post11(self, frame, as_of):
+        days = self._days_until(frame['expiration_date'], as_of)
+        valid = days.notna()
+        status = np.select(
+            [valid & (days < 7), valid & (days < 30), valid & (days <= 90), valid],
+            ["! 嚴重警報", "⚠️ 注意", "✓ 最佳範圍", "! 警報"],
+            default="OK 正常"
+        )
+        alert = valid & ((days < 7) | (days > 90))
+        return pd.Series(status, index=frame.index), alert.astype(int)
+    
+    @staticmethod
+    def _post12(frame, as_of):
+        alert = frame['vix'] > 25.0
+        return pd.Series(np.where(alert, "! 警報", "OK 正常"), index=frame.index), alert.astype(int)
+    
+    @staticmethod
+    def _post13(frame, as_of):
+        iv_rank = frame['iv_rank']
+        valid = iv_rank.notna()
+        status = np.select(
+            [~valid, iv_rank > 70, iv_rank < 30],
+            ['! 數據不足', '⚠️ 高IV環境', '⚠️ 低IV環境'],
+            default='OK 中性IV環境'
+        )
+        alert = valid & ((iv_rank > 70) | (iv_rank < 30))
+        return pd.Series(status, index=frame.index), alert.astype(int)
@@ -54,6 +54,9 @@ from dataclasses import dataclass
 from typing import Dict
 from datetime import datetime
 
+import numpy as np
+from scipy.stats import norm
+
 # 導入 Module 15 的 Black-Scholes 計算器 和 AmericanOptionPricer
 try:
     from calculation_layer.module15_black_scholes import BlackScholesCalculator
@@ -891,9 +894,10 @@ class GreeksCalculator:
             float: Vanna 值（單位與 Vega 一致：$/百分點/美元）
         
         公式:
-            Vanna = -N'(d1) × d2 / σ / 100
+            Vanna = -e^(-qT) × N'(d1) × d2 / σ / 100
             
             其中:
+            - q = 股息率
             - N'(d1) = 標準正態概率密度函數
             - d2 = d1 - σ√T
             - σ = 波動率
@@ -929,8 +933,9 @@ class GreeksCalculator:
             )
             
             # 🔧 BUG-16-03 Fix: Vanna 需要除以 100 以與 Vega 單位一致
-            # Vanna = -N'(d1) × d2 / σ / 100
-            vanna = -self.bs_calculator.normal_pdf(d1) * d2 / volatility / 100
+            # Vanna = -e^(-qT) × N'(d1) × d2 / σ / 100
+            q_discount = math.exp(-dividend_yield * time_to_expiration)
+            vanna = -q_discount * self.bs_calculator.normal_pdf(d1) * d2 / volatility / 100
             
             logger.debug(f"  Vanna: {vanna:.6f}")
             
@@ -967,7 +972,7 @@ class GreeksCalculator:
             float: Volga 值（總是正數）
         
         公式:
-            Volga = Vega_raw × d1 × d2 / σ = S × N'(d1) × √T × d1 × d2 / σ
+            Volga = Vega_raw × d1 × d2 / σ = S × e^(-qT) × N'(d1) × √T × d1 × d2 / σ
             
             其中:
             - S = 股價
@@ -1001,9 +1006,10 @@ class GreeksCalculator:
             )
             
             # 🔧 BUG-16-01 Fix: Volga 公式需要包含 √T 因子
-            # Volga = S × N'(d1) × √T × d1 × d2 / σ
+            # Volga = S × e^(-qT) × N'(d1) × √T × d1 × d2 / σ
             sqrt_t = math.sqrt(time_to_expiration)
-            volga = stock_price * self.bs_calculator.normal_pdf(d1) * sqrt_t * d1 * d2 / volatility
+            q_discount = math.exp(-dividend_yield * time_to_expiration)
+            volga = stock_price * q_discount * self.bs_calculator.normal_pdf(d1) * sqrt_t * d1 * d2 / volatility
             
             logger.debug(f"  Volga: {volga:.6f}")
             
@@ -1045,12 +1051,14 @@ class GreeksCalculator:
             float: Charm 值（每日 Delta 變化）
         
         公式:
-            Charm_annual = -N'(d1) × [2rT - d2×σ×√T] / (2T×σ×√T)
+            Charm_annual = ±q×e^(-qT)×N(±d1) - e^(-qT)×N'(d1) × [2(r-q)T - d2×σ×√T] / (2T×σ×√T)
+            （Call 取 +q×e^(-qT)×N(d1)，Put 取 -q×e^(-qT)×N(-d1)；q = 0 時兩者相同）
             Charm_daily = Charm_annual / 252
             
             其中:
             - N'(d1) = 標準正態概率密度函數
             - r = 無風險利率
+            - q = 股息率
             - T = 到期時間
             - σ = 波動率
             - 252 = 一年交易日數
@@ -1088,17 +1096,21 @@ class GreeksCalculator:
             
             sqrt_t = math.sqrt(time_to_expiration)
             
-            # Charm_annual = -N'(d1) × [2rT - d2×σ×√T] / (2T×σ×√T)
-            numerator = 2 * risk_free_rate * time_to_expiration - d2 * volatility * sqrt_t
+            # Charm_annual = ±q×e^(-qT)×N(±d1) - e^(-qT)×N'(d1) × [2(r-q)T - d2×σ×√T] / (2T×σ×√T)
+            q_discount = math.exp(-dividend_yield * time_to_expiration)
+            numerator = 2 * (risk_free_rate - dividend_yield) * time_to_expiration - d2 * volatility * sqrt_t
             denominator = 2 * time_to_expiration * volatility * sqrt_t
             
-            charm_annual = -self.bs_calculator.normal_pdf(d1) * numerator / denominator
+            charm_annual = -q_discount * self.bs_calculator.normal_pdf(d1) * numerator / denominator
+            if option_type.lower() == 'call':
+                charm_annual += dividend_yield * q_discount * self.bs_calculator.normal_cdf(d1)
+            else:
+                charm_annual -= dividend_yield * q_discount * self.bs_calculator.normal_cdf(-d1)
             
             # 🔧 BUG-16-04 Fix: 轉換為每日 Charm（與 Theta 慣例一致）
             charm_daily = charm_annual / 252.0
             
-            # Call 和 Put 的 Charm 公式相同（在 Black-Scholes 框架下）
-            # 但符號可能不同
+            # 無股息時 Call 和 Put 的 Charm 相同；有股息時相差 q×e^(-qT)
             
             logger.debug(f"  Charm ({option_type}, daily): {charm_daily:.6f}")
             
@@ -1171,6 +1183,85 @@ class GreeksCalculator:
         }
 
 
+    # ========== 批量 Greeks (向量化) ==========
+    
+    @staticmethod
+    def calculate_greeks_batch(
+        stock_price,
+        strike_price,
+        risk_free_rate: float,
+        time_to_expiration,
+        volatility,
+        option_type,
+        dividend_yield: float = 0.0
+    ) -> Dict[str, np.ndarray]:
+        """
+        向量化計算整條期權鏈的歐式 (Black-Scholes) Greeks
+        
+        所有數組參數按 NumPy 規則廣播，因此既可傳入一條鏈（每個合約一個元素），
+        也可傳入 (價格網格 × 合約) 的二維數組做情景分析。
+        單位與單合約方法一致:
+            delta, gamma: 標準單位
+            vega, vanna: $/百分點（已除以 100）
+            volga: 與 calculate_volga 一致
+            charm: 每日 Delta 變化（年化 / 252）
+        
+        參數:
+            stock_price: 股價（標量或數組）
+            strike_price: 行使價數組
+            risk_free_rate: 無風險利率（小數形式）
+            time_to_expiration: 到期時間（年）數組
+            volatility: 波動率（小數形式）數組
+            option_type: 'call'/'put' 數組，或布爾數組（True 表示 Call）
+            dividend_yield: 股息率（小數形式）
+        
+        返回:
+            Dict[str, np.ndarray]: {'delta', 'gamma', 'vega', 'vanna', 'volga', 'charm'}
+            T <= 0 或 σ <= 0 的合約所有 Greeks 為 0
+        """
+        s = np.asarray(stock_price, dtype=float)
+        k = np.asarray(strike_price, dtype=float)
+        t = np.asarray(time_to_expiration, dtype=float)
+        sigma = np.asarray(volatility, dtype=float)
+        opt = np.asarray(option_type)
+        is_call = opt if opt.dtype == bool else np.char.lower(opt.astype(str)) == 'call'
+        
+        valid = (t > 1e-10) & (sigma > 1e-10) & (k > 0) & (s > 0)
+        t_safe = np.where(valid, t, 1.0)
+        sigma_safe = np.where(valid, sigma, 1.0)
+        k_safe = np.where(valid, k, 1.0)
+        s_safe = np.where(valid, s, 1.0)
+        
+        sqrt_t = np.sqrt(t_safe)
+        vol_sqrt_t = sigma_safe * sqrt_t
+        d1 = (np.log(s_safe * np.exp(-dividend_yield * t_safe) / k_safe)
+              + (risk_free_rate + 0.5 * sigma_safe ** 2) * t_safe) / vol_sqrt_t
+        d2 = d1 - vol_sqrt_t
+        pdf_d1 = norm.pdf(d1)
+        q_discount = np.exp(-dividend_yield * t_safe)
+        
+        delta = np.where(is_call, q_discount * norm.cdf(d1), q_discount * (norm.cdf(d1) - 1.0))
+        gamma = q_discount * pdf_d1 / (s_safe * vol_sqrt_t)
+        vega = s_safe * q_discount * pdf_d1 * sqrt_t / 100.0
+        vanna = -q_discount * pdf_d1 * d2 / sigma_safe / 100.0
+        volga = s_safe * q_discount * pdf_d1 * sqrt_t * d1 * d2 / sigma_safe
+        charm_carry = np.where(
+            is_call,
+            dividend_yield * q_discount * norm.cdf(d1),
+            -dividend_yield * q_discount * norm.cdf(-d1)
+        )
+        charm = (charm_carry - q_discount * pdf_d1 * (2 * (risk_free_rate - dividend_yield) * t_safe - d2 * vol_sqrt_t)
+                 / (2 * t_safe * vol_sqrt_t)) / 252.0
+        
+        return {
+            name: np.where(valid, values, 0.0)
+            for name, values in (
+                ('delta', delta), ('gamma', gamma), ('vega', vega),
+                ('vanna', vanna), ('volga', volga), ('charm', charm)
+            )
+        }
+
+
 # 使用示例和測試
 if __name__ == "__main__":
     import logging
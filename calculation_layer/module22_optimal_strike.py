@@ -17,12 +17,15 @@ Module 22: 最佳行使價分析
 """
 
 import logging
+import numpy as np
 import pandas as pd
 from dataclasses import dataclass, field
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 from functools import lru_cache
 
+from data_layer.option_chain import OptionChain
+
 # 導入異動偵測模塊
 try:
     from calculation_layer.module30_unusual_activity import UnusualActivityAnalyzer
@@ -256,9 +259,28 @@ class OptimalStrikeCalculator:
         self._iv_calculator = None
         self._greeks_calculator = None  # 添加 Greeks 計算器
         self._uoa_analyzer = None       # 添加異動偵測器
+        self._sabr_calibrator = None    # 可選的 SABR 校準器（IV 缺失時查詢模型 IV）
+        self._sabr_key = None           # 當前分析的 (ticker, expiration)
         self._cache_hits = 0  # 緩存命中計數
         self._cache_misses = 0  # 緩存未命中計數
     
+    def set_sabr_calibrator(self, calibrator):
+        """設置共享的 SABR 校準器（與 Module 25 共用同一實例）"""
+        self._sabr_calibrator = calibrator
+    
+    def _get_sabr_iv(self, strike: float) -> Optional[float]:
+        """查詢當前到期日的 SABR 模型 IV（未校準時返回 None）"""
+        if self._sabr_calibrator is None or self._sabr_key is None:
+            return None
+        ticker, expiration = self._sabr_key
+        if not ticker or not expiration:
+            return None
+        try:
+            return self._sabr_calibrator.get_model_iv(ticker, expiration, strike)
+        except Exception as e:
+            logger.debug(f"  SABR 模型 IV 查詢失敗: {e}")
+            return None
+    
     def _get_uoa_analyzer(self):
         """延遲初始化異動偵測器"""
         if self._uoa_analyzer is None and UnusualActivityAnalyzer:
@@ -487,7 +509,8 @@ class OptimalStrikeCalculator:
         0. IBKR IV（如果可用且有效）
         1. Module 17 從市場價格反推（最準確）
         2. Yahoo Finance IV（需驗證）
-        3. 默認值 0.30
+        3. SABR 模型 IV（已校準該到期日時）
+        4. 默認值 0.30
         
         參數:
             option: 期權數據字典
@@ -500,7 +523,7 @@ class OptimalStrikeCalculator:
         返回:
             tuple: (iv: float, source: str)
                 - iv: 小數形式的 IV（如 0.35 表示 35%）
-                - source: IV 來源 ('ibkr', 'module17', 'yahoo', 'default')
+                - source: IV 來源 ('ibkr', 'module17', 'yahoo', 'sabr', 'default')
         
         Requirements: 1.1, 1.2, 1.3, 1.6
         """
@@ -556,7 +579,14 @@ class OptimalStrikeCalculator:
             logger.debug(f"  使用 Yahoo Finance IV: {raw_yahoo_iv} -> {corrected_iv:.4f}")
             return (corrected_iv, 'yahoo')
         
-        # 策略 3: 使用默認值
+        # 策略 3: 使用 SABR 模型 IV（按到期日校準的微笑曲線）
+        sabr_iv = self._get_sabr_iv(strike)
+        if sabr_iv is not None:
+            corrected_iv = max(0.01, min(5.0, sabr_iv))
+            logger.debug(f"  使用 SABR 模型 IV: {corrected_iv:.4f}")
+            return (corrected_iv, 'sabr')
+        
+        # 策略 4: 使用默認值
         logger.warning(f"  IV 數據無效或缺失，使用默認值 {self.DEFAULT_IV}")
         return (self.DEFAULT_IV, 'default')
     
@@ -564,13 +594,14 @@ class OptimalStrikeCalculator:
         self,
         ticker: str,
         current_price: float,
-        option_chain: Dict[str, Any],
+        option_chain: Any,
         strategy_type: str,
         days_to_expiration: int = 30,
         iv_rank: float = 50.0,
         target_price: Optional[float] = None,
         support_resistance_data: Optional[Dict] = None,
-        enable_max_profit_analysis: bool = False
+        enable_max_profit_analysis: bool = False,
+        expiration: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         分析多個行使價並計算綜合評分
@@ -578,18 +609,21 @@ class OptimalStrikeCalculator:
         參數:
             ticker: 股票代碼
             current_price: 當前股價
-            option_chain: 期權鏈數據 {'calls': [...], 'puts': [...]}
+            option_chain: OptionChain，或舊格式 {'calls': [...], 'puts': [...]}
             strategy_type: 策略類型 ('long_call', 'long_put', 'short_call', 'short_put')
             days_to_expiration: 到期天數
             iv_rank: IV Rank (0-100)
             target_price: 目標價格（用於計算風險回報）
             support_resistance_data: 支持阻力位數據 {'support_level': float, 'resistance_level': float}
             enable_max_profit_analysis: 是否啟用最大利潤分析
+            expiration: 到期日 YYYY-MM-DD（用於查詢 SABR 模型 IV，可選）
         
         返回:
             Dict: 分析結果
         """
         try:
+            self._sabr_key = (ticker, expiration)
+
             logger.info(f"開始最佳行使價分析...")
             logger.info(f"  當前股價: ${current_price:.2f}")
             logger.info(f"  策略類型: {strategy_type}")
@@ -608,15 +642,18 @@ class OptimalStrikeCalculator:
                     if target_price:
                         logger.info(f"  使用支持位作為目標價: ${target_price:.2f}")
             
+            # 按列數組處理（舊格式在此轉換一次，四種策略調用可共用同一個 OptionChain）
+            option_chain = OptionChain.coerce(option_chain, ticker=ticker, expiration=expiration or '')
+            expiry = expiration if expiration in option_chain.expirations else None
+            
             # 確定分析的期權類型
             if strategy_type in ['long_call', 'short_call']:
                 option_type = 'call'
-                options_data = option_chain.get('calls', [])
             else:
                 option_type = 'put'
-                options_data = option_chain.get('puts', [])
+            options_data = option_chain.select(option_type, expiry)
             
-            if not options_data:
+            if not len(options_data):
                 logger.warning("! 期權鏈數據為空")
                 return self._create_empty_result("期權鏈數據為空")
             
@@ -626,9 +663,9 @@ class OptimalStrikeCalculator:
             try:
                 uoa_analyzer = self._get_uoa_analyzer()
                 if uoa_analyzer:
-                    # 構建 DataFrame 用於分析
-                    calls_df = pd.DataFrame(option_chain.get('calls', []))
-                    puts_df = pd.DataFrame(option_chain.get('puts', []))
+                    # 構建 DataFrame 用於分析（直接包裝列數組，不複製）
+                    calls_df = option_chain.to_frame('C')
+                    puts_df = option_chain.to_frame('P')
                     
                     uoa_results = uoa_analyzer.analyze_chain(calls_df, puts_df)
                     
@@ -646,27 +683,15 @@ class OptimalStrikeCalculator:
                 logger.warning(f"! 異動偵測失敗: {e}")
             
             # 新邏輯：從 ATM 行使價向上和向下各取最多 20 個行使價
-            # 1. 先按行使價排序所有期權
-            sorted_options = sorted(options_data, key=lambda x: x.get('strike', 0))
-            
-            # 2. 找到最接近 ATM 的行使價索引
-            atm_index = 0
-            min_distance = float('inf')
-            for i, opt in enumerate(sorted_options):
-                strike = opt.get('strike', 0)
-                distance = abs(strike - current_price)
-                if distance < min_distance:
-                    min_distance = distance
-                    atm_index = i
-            
-            # 3. 從 ATM 向下取最多 20 個（價內 for call，價外 for put）
-            lower_options = sorted_options[max(0, atm_index - self.MAX_STRIKES_EACH_SIDE):atm_index]
-            
-            # 4. 從 ATM 向上取最多 20 個（價外 for call，價內 for put）
-            upper_options = sorted_options[atm_index:min(len(sorted_options), atm_index + self.MAX_STRIKES_EACH_SIDE + 1)]
-            
-            # 5. 合併選中的行使價
-            selected_options = lower_options + upper_options
+            # 1. OptionChain 的行已按行使價排序，二分查找最接近 ATM 的行使價索引
+            atm_index = options_data.nearest(current_price)
+            
+            # 2. 從 ATM 向下取最多 20 個（價內 for call，價外 for put），
+            #    向上取最多 20 個（價外 for call，價內 for put），只轉換選中的行
+            selected_options = options_data.records(
+                max(0, atm_index - self.MAX_STRIKES_EACH_SIDE),
+                atm_index + self.MAX_STRIKES_EACH_SIDE + 1
+            )
             
             # 計算實際選取的範圍
             if selected_options:
@@ -811,8 +836,8 @@ class OptimalStrikeCalculator:
                 am_analyzer = self._get_advanced_metrics_analyzer()
                 if am_analyzer:
                     # 使用完整數據計算鏈級指標
-                    calls_df = pd.DataFrame(option_chain.get('calls', []))
-                    puts_df = pd.DataFrame(option_chain.get('puts', []))
+                    calls_df = option_chain.to_frame('C')
+                    puts_df = option_chain.to_frame('P')
                     
                     if not calls_df.empty and not puts_df.empty:
                         advanced_metrics = am_analyzer.calculate_metrics(calls_df, puts_df, current_price)
@@ -1594,7 +1619,7 @@ class OptimalStrikeCalculator:
     
     def _validate_parity_for_atm(
         self,
-        option_chain: Dict[str, Any],
+        option_chain: OptionChain,
         current_price: float,
         time_to_expiration: float,
         risk_free_rate: float = 0.045
@@ -1603,7 +1628,7 @@ class OptimalStrikeCalculator:
         驗證 ATM 期權的 Put-Call Parity
         
         參數:
-            option_chain: 期權鏈數據 {'calls': [...], 'puts': [...]}
+            option_chain: OptionChain
             current_price: 當前股價
             time_to_expiration: 到期時間（年）
             risk_free_rate: 無風險利率
@@ -1625,43 +1650,27 @@ class OptimalStrikeCalculator:
         try:
             logger.info("開始驗證 ATM 期權的 Put-Call Parity...")
             
-            calls = option_chain.get('calls', [])
-            puts = option_chain.get('puts', [])
+            calls = option_chain.select('C')
+            puts = option_chain.select('P')
             
-            if not calls or not puts:
+            if not len(calls) or not len(puts):
                 logger.warning("! 期權鏈數據不完整，跳過 Parity 驗證")
                 return None
             
-            # 找到最接近 ATM 的行使價
-            atm_strike = None
-            min_distance = float('inf')
-            
-            # 從 calls 中找到所有行使價
-            call_strikes = {opt.get('strike', 0): opt for opt in calls if opt.get('strike', 0) > 0}
-            put_strikes = {opt.get('strike', 0): opt for opt in puts if opt.get('strike', 0) > 0}
-            
             # 找到同時存在於 calls 和 puts 的行使價中最接近 ATM 的
-            common_strikes = set(call_strikes.keys()) & set(put_strikes.keys())
+            common_strikes = np.intersect1d(calls.strikes[calls.strikes > 0], puts.strikes[puts.strikes > 0])
             
-            if not common_strikes:
+            if not len(common_strikes):
                 logger.warning("! 沒有找到同時存在 Call 和 Put 的行使價")
                 return None
             
-            for strike in common_strikes:
-                distance = abs(strike - current_price)
-                if distance < min_distance:
-                    min_distance = distance
-                    atm_strike = strike
-            
-            if atm_strike is None:
-                logger.warning("! 無法找到 ATM 行使價")
-                return None
+            atm_strike = float(common_strikes[np.argmin(np.abs(common_strikes - current_price))])
             
             logger.info(f"  ATM 行使價: ${atm_strike:.2f} (股價: ${current_price:.2f})")
             
             # 獲取 ATM Call 和 Put 的價格
-            atm_call = call_strikes[atm_strike]
-            atm_put = put_strikes[atm_strike]
+            atm_call = calls.row(calls.index(atm_strike, 'C'))
+            atm_put = puts.row(puts.index(atm_strike, 'P'))
             
             # 獲取價格（優先使用 lastPrice，其次 markPrice，否則使用 mid price）
             call_price = atm_call.get('lastPrice', 0) or 0
@@ -1732,7 +1741,7 @@ class OptimalStrikeCalculator:
     
     def _analyze_volatility_smile(
         self,
-        option_chain: Dict[str, Any],
+        option_chain: OptionChain,
         current_price: float,
         time_to_expiration: float,
         risk_free_rate: float = 0.045
@@ -1741,7 +1750,7 @@ class OptimalStrikeCalculator:
         執行波動率微笑分析
         
         參數:
-            option_chain: 期權鏈數據 {'calls': [...], 'puts': [...]}
+            option_chain: OptionChain
             current_price: 當前股價
             time_to_expiration: 到期時間（年）
             risk_free_rate: 無風險利率
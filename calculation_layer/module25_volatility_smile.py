@@ -28,6 +28,10 @@ from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime
 from enum import Enum
 
+import numpy as np
+
+from data_layer.option_chain import OptionChain
+
 logger = logging.getLogger(__name__)
 
 
@@ -124,6 +128,9 @@ class VolatilitySmileResult:
     data_quality_reason: str = ""
     valid_data_points: int = 0
     
+    # SABR 模型參數（提供 ticker/expiration 且已配置校準器時填充）
+    sabr_params: Optional[Dict] = None
+    
     # 計算時間戳
     calculation_date: str = ""
     
@@ -154,6 +161,7 @@ class VolatilitySmileResult:
             'data_quality': self.data_quality,
             'data_quality_reason': self.data_quality_reason,
             'valid_data_points': self.valid_data_points,
+            'sabr_params': self.sabr_params,
             'calculation_date': self.calculation_date
         }
 
@@ -183,24 +191,66 @@ class VolatilitySmileAnalyzer:
     STEEP_SMILE_THRESHOLD = 0.10  # 超過 10% 的微笑為陡峭
     FLAT_IV_THRESHOLD = 0.02      # 低於 2% 的傾斜為平坦
     
-    def __init__(self):
+    def __init__(self, sabr_calibrator=None):
+        """
+        參數:
+            sabr_calibrator: 可選的 SABRCalibrator，用於擬合並查詢任意行使價的模型 IV
+        """
+        self.sabr_calibrator = sabr_calibrator
+        self._sabr_fitted: Dict[Tuple[str, str], Optional[Dict]] = {}  # calibrate_sabr() 的結果，供 analyze_smile() 復用
         logger.info("* 波動率微笑分析器已初始化")
     
+    def calibrate_sabr(
+        self,
+        option_chain: Any,
+        current_price: float,
+        time_to_expiration: float,
+        risk_free_rate: float,
+        ticker: str,
+        expiration: str
+    ) -> Optional[Dict]:
+        """
+        只校準當前到期日的 SABR 參數（不做微笑分析）
+        
+        Module 22 在 Module 25 之前運行，先調用此方法，使其查詢的模型 IV 來自當前期權鏈，
+        而不是上一次持久化的參數（遠期價格已過時）或冷緩存下的空結果。
+        同一實例隨後的 analyze_smile() 直接復用本次結果，不重複校準。
+        
+        返回:
+            SABR 參數字典；未配置校準器或數據不足時返回 None
+        """
+        if self.sabr_calibrator is None or not ticker or not expiration:
+            return None
+        chain = OptionChain.coerce(option_chain, ticker=ticker, expiration=expiration)
+        expiry = expiration if expiration in chain.expirations else None
+        call_ivs = self._extract_iv_data(chain.select('C', expiry), 'call')
+        put_ivs = self._extract_iv_data(chain.select('P', expiry), 'put')
+        params = self._fit_sabr(
+            ticker, expiration, call_ivs, put_ivs,
+            current_price, time_to_expiration, risk_free_rate
+        )
+        self._sabr_fitted[(ticker.upper(), expiration)] = params
+        return params
+    
     def analyze_smile(
         self,
-        option_chain: Dict[str, Any],
+        option_chain: Any,
         current_price: float,
         time_to_expiration: float,
-        risk_free_rate: float = 0.045
+        risk_free_rate: float = 0.045,
+        ticker: Optional[str] = None,
+        expiration: Optional[str] = None
     ) -> VolatilitySmileResult:
         """
         分析期權鏈的波動率微笑
         
         參數:
-            option_chain: 期權鏈數據 {'calls': [...], 'puts': [...]}
+            option_chain: OptionChain，或舊格式 {'calls': [...], 'puts': [...]}
             current_price: 當前股價
             time_to_expiration: 到期時間（年）
             risk_free_rate: 無風險利率
+            ticker: 股票代碼（SABR 校準用，可選）
+            expiration: 到期日 YYYY-MM-DD（SABR 校準用，可選）
         
         返回:
             VolatilitySmileResult: 分析結果
@@ -210,11 +260,13 @@ class VolatilitySmileAnalyzer:
             logger.info(f"  當前股價: ${current_price:.2f}")
             logger.info(f"  到期時間: {time_to_expiration*252:.0f} 天")
             
-            # 1. 提取 IV 數據
-            calls_data = option_chain.get('calls', [])
-            puts_data = option_chain.get('puts', [])
+            # 1. 提取 IV 數據（按列數組處理，舊格式在此轉換一次）
+            chain = OptionChain.coerce(option_chain, ticker=ticker or '', expiration=expiration or '')
+            expiry = expiration if expiration in chain.expirations else None
+            calls_data = chain.select('C', expiry)
+            puts_data = chain.select('P', expiry)
             
-            if not calls_data or not puts_data:
+            if not len(calls_data) or not len(puts_data):
                 logger.warning("! 期權鏈數據不完整")
                 return self._create_empty_result(current_price)
             
@@ -319,6 +371,17 @@ class VolatilitySmileAnalyzer:
             result.trading_recommendations, result.recommendation_confidence = \
                 self._generate_recommendations(result)
             
+            # 12. SABR 擬合（熱啟動，供任意行使價查詢模型 IV）
+            if self.sabr_calibrator is not None and ticker and expiration:
+                fitted_key = (ticker.upper(), expiration)
+                if fitted_key in self._sabr_fitted:
+                    result.sabr_params = self._sabr_fitted.pop(fitted_key)
+                else:
+                    result.sabr_params = self._fit_sabr(
+                        ticker, expiration, call_ivs, put_ivs,
+                        current_price, time_to_expiration, risk_free_rate
+                    )
+            
             logger.info(f"* 波動率微笑分析完成")
             return result
             
@@ -328,70 +391,87 @@ class VolatilitySmileAnalyzer:
             traceback.print_exc()
             return self._create_empty_result(current_price)
     
-    def _find_atm_strike(self, options: List[Dict], current_price: float) -> Optional[float]:
+    def _fit_sabr(
+        self,
+        ticker: str,
+        expiration: str,
+        call_ivs: Dict[float, float],
+        put_ivs: Dict[float, float],
+        current_price: float,
+        time_to_expiration: float,
+        risk_free_rate: float
+    ) -> Optional[Dict]:
+        """
+        以 OTM 兩翼 IV 校準 SABR（K < F 用 Put，K >= F 用 Call）
+        """
+        try:
+            # 利率可能以百分比傳入（4.5 = 4.5%）
+            rate = risk_free_rate / 100.0 if risk_free_rate > 1 else risk_free_rate
+            forward = current_price * math.exp(rate * time_to_expiration)
+            smile_points = {k: iv for k, iv in put_ivs.items() if k < forward}
+            smile_points.update({k: iv for k, iv in call_ivs.items() if k >= forward})
+            if not smile_points:
+                return None
+            
+            strikes = sorted(smile_points)
+            params = self.sabr_calibrator.calibrate(
+                ticker, expiration, strikes, [smile_points[k] for k in strikes],
+                forward=forward, time_to_expiration=time_to_expiration
+            )
+            return params.to_dict() if params else None
+        except Exception as e:
+            logger.debug(f"SABR 擬合失敗: {e}")
+            return None
+    
+    def get_model_iv(self, ticker: str, expiration: str, strike: float) -> Optional[float]:
+        """
+        查詢任意行使價的 SABR 模型 IV（小數形式，O(1)）
+        
+        未配置校準器或該到期日尚未校準時返回 None
+        """
+        if self.sabr_calibrator is None:
+            return None
+        return self.sabr_calibrator.get_model_iv(ticker, expiration, strike)
+    
+    def _find_atm_strike(self, options: OptionChain, current_price: float) -> Optional[float]:
         """
         找到最接近當前股價的 ATM 行使價
         """
         try:
-            min_distance = float('inf')
-            atm_strike = None
-            
-            for opt in options:
-                strike = opt.get('strike', 0)
-                distance = abs(strike - current_price)
-                
-                if distance < min_distance:
-                    min_distance = distance
-                    atm_strike = strike
-            
-            return atm_strike if atm_strike is not None else None
+            row = options.nearest(current_price)
+            return float(options.strikes[row]) if row is not None else None
         except Exception as e:
             logger.error(f"找到 ATM 行使價失敗: {e}")
             return None
     
-    def _extract_iv_data(self, options: List[Dict], option_type: str) -> Dict[float, float]:
+    def _extract_iv_data(self, options: OptionChain, option_type: str) -> Dict[float, float]:
         """
-        提取期權鏈的 IV 數據
+        提取期權鏈的 IV 數據（向量化）
         
         返回: {strike: iv, ...}
         """
-        iv_data = {}
+        strikes = options.strikes
+        iv = options.column('impliedVolatility').astype(np.float64)
+        bid = np.nan_to_num(options.column('bid').astype(np.float64))
+        ask = np.nan_to_num(options.column('ask').astype(np.float64))
         
-        for opt in options:
-            strike = opt.get('strike', 0)
-            
-            # 獲取 IV（優先 impliedVolatility，否則嘗試計算）
-            iv_raw = opt.get('impliedVolatility', 0)
-            
-            if iv_raw is None or iv_raw == 0:
-                # 嘗試從 bid/ask/lastPrice 反推 IV（簡化版）
-                bid = opt.get('bid', 0) or 0
-                ask = opt.get('ask', 0) or 0
-                
-                if bid > 0 and ask > 0:
-                    # Fix 11: 優先使用 IBKR markPrice，否則 (bid+ask)/2
-                    mark_price = opt.get('markPrice')
-                    if mark_price and mark_price > 0:
-                        mid_price = mark_price
-                    else:
-                        mid_price = (bid + ask) / 2
-                    # 簡化：IV = (mid_price / strike) × volatility_factor
-                    # 實際應使用完整的 IV 計算
-                    iv_raw = mid_price / strike * 0.3 if strike > 0 else 0.3
-                else:
-                    continue  # 跳過無效期權
-            
-            # 標準化 IV 為小數形式
-            if iv_raw > 1.0:  # 百分比形式
-                iv_normalized = iv_raw / 100.0
-            else:
-                iv_normalized = iv_raw
-            
-            # 過濾異常 IV
-            if 0.01 <= iv_normalized <= 5.0:
-                iv_data[strike] = iv_normalized
+        # IV 缺失時從 bid/ask 反推（簡化版）
+        # Fix 11: 優先使用 IBKR markPrice，否則 (bid+ask)/2
+        mark = options.column('markPrice').astype(np.float64)
+        mid = np.where(mark > 0, mark, (bid + ask) / 2)
+        # 簡化：IV = (mid_price / strike) × volatility_factor
+        # 實際應使用完整的 IV 計算
+        with np.errstate(divide='ignore', invalid='ignore'):
+            estimated = np.where(strikes > 0, mid / strikes * 0.3, 0.3)
+        missing = np.isnan(iv) | (iv == 0)
+        iv = np.where(missing, np.where((bid > 0) & (ask > 0), estimated, np.nan), iv)
         
-        return iv_data
+        # 標準化 IV 為小數形式（> 1.0 為百分比形式）
+        iv = np.where(iv > 1.0, iv / 100.0, iv)
+        
+        # 過濾異常 IV
+        valid = (iv >= 0.01) & (iv <= 5.0)
+        return dict(zip(strikes[valid].tolist(), iv[valid].tolist()))
     
     def _get_atm_iv(self, call_ivs: Dict[float, float], atm_strike: float) -> Optional[float]:
         """
@@ -560,8 +640,8 @@ class VolatilitySmileAnalyzer:
     
     def _create_moneyness_buckets(
         self,
-        calls_data: List[Dict],
-        puts_data: List[Dict],
+        calls_data: OptionChain,
+        puts_data: OptionChain,
         current_price: float,
         atm_strike: float
     ) -> List[MoneynessBucket]:
@@ -571,17 +651,15 @@ class VolatilitySmileAnalyzer:
         buckets = []
         
         try:
-            # 構建 strike -> option 的映射
-            call_map = {opt.get('strike'): opt for opt in calls_data}
-            put_map = {opt.get('strike'): opt for opt in puts_data}
+            # 一次性查找每個 Moneyness 層級最接近的 Call 和 Put
+            targets = [current_price * moneyness_pct for moneyness_pct, _ in self.MONEYNESS_GROUPS]
+            call_rows = calls_data.nearest_many(targets)
+            put_rows = puts_data.nearest_many(targets)
             
             # 為每個 Moneyness 層級創建 bucket
-            for moneyness_pct, label in self.MONEYNESS_GROUPS:
-                target_strike = current_price * moneyness_pct
-                
-                # 找最接近的 Call 和 Put
-                closest_call = self._find_closest_option(call_map, target_strike)
-                closest_put = self._find_closest_option(put_map, target_strike)
+            for i, (moneyness_pct, label) in enumerate(self.MONEYNESS_GROUPS):
+                closest_call = calls_data.row(call_rows[i]) if len(call_rows) else None
+                closest_put = puts_data.row(put_rows[i]) if len(put_rows) else None
                 
                 if closest_call is not None or closest_put is not None:
                     strikes = []
@@ -638,24 +716,6 @@ class VolatilitySmileAnalyzer:
         
         return closest_iv
     
-    def _find_closest_option(self, option_map: Dict, target_strike: float) -> Optional[Dict]:
-        """
-        找到最接近目標行使價的期權
-        """
-        if not option_map:
-            return None
-        
-        min_distance = float('inf')
-        closest_option = None
-        
-        for strike, opt in option_map.items():
-            distance = abs(strike - target_strike)
-            if distance < min_distance:
-                min_distance = distance
-                closest_option = opt
-        
-        return closest_option
-    
     def _normalize_iv(self, iv_raw: float) -> Optional[float]:
         """
         標準化 IV 為小數形式
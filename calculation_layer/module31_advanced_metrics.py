@@ -7,14 +7,17 @@ Features:
 1. Put/Call Ratio (PCR)
 2. Max Pain
 3. Gamma Exposure (GEX)
+4. Dealer exposure map (gamma/vanna/charm by strike x expiry, shared snapshot cache)
 """
 
 import logging
 from dataclasses import dataclass
-from typing import Dict
+from typing import Any, Dict, Optional
 
 import pandas as pd
 
+from calculation_layer.exposure_map import DealerExposureCalculator, DealerExposureMap
+
 logger = logging.getLogger(__name__)
 
 
@@ -73,6 +76,23 @@ class AdvancedMetricsAnalyzer:
             logger.error(f"Advanced metrics calculation failed: {e}")
             return MarketMetrics()
 
+    def calculate_exposure_map(
+        self,
+        ticker: str,
+        chains: Dict[str, Dict[str, Any]],
+        current_price: float,
+        risk_free_rate: float = 0.045,
+        snapshot_id: Optional[str] = None,
+    ) -> Optional[DealerExposureMap]:
+        """
+        Build (or fetch from the shared snapshot cache) the OI-weighted
+        gamma/vanna/charm exposure map for a whole chain.
+
+        chains: {expiration: {'calls': DataFrame/list, 'puts': DataFrame/list}}
+        """
+        calculator = DealerExposureCalculator(risk_free_rate=risk_free_rate)
+        return calculator.get_exposure_map(ticker, chains, current_price, snapshot_id=snapshot_id)
+
     def _calculate_pcr(self, calls: pd.DataFrame, puts: pd.DataFrame, metric: str = 'volume') -> float:
         """Calculate Put/Call Ratio for volume or open interest."""
         try:
@@ -26,6 +26,8 @@ from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 from collections import deque
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
 # Large order detection thresholds
@@ -203,6 +205,80 @@ class LargeOrderDetector:
         
         return signals
     
+    def detect_from_trades(
+        self,
+        ticker: str,
+        trades,
+        vwap: Optional[float] = None,
+        block_threshold: Optional[int] = None,
+        value_threshold: Optional[float] = None
+    ) -> List[LargeOrderSignal]:
+        """
+        Vectorized large order detection over a tick ring buffer window
+        
+        Args:
+            ticker: Stock symbol
+            trades: TradeView from data_layer.tick_ring_buffer (ts/price/size arrays)
+            vwap: Volume-weighted average price (default: VWAP of the window)
+            block_threshold: Optional override for block threshold
+            value_threshold: Optional override for value threshold
+        
+        Returns:
+            List[LargeOrderSignal]: List of detected large orders
+        
+        Note:
+            Consecutive counts are computed within the window itself (binary search on
+            timestamps) and do not touch the per-ticker history used by detect_large_orders.
+        """
+        if not ticker:
+            raise ValueError("ticker must be non-empty string")
+        if vwap is None:
+            vwap = trades.vwap()
+        if vwap <= 0:
+            raise ValueError("vwap must be positive")
+        
+        if block_threshold is None:
+            block_threshold = self.block_threshold
+        if value_threshold is None:
+            value_threshold = self.value_threshold
+        
+        notional = trades.price * trades.size
+        idx = np.flatnonzero((trades.size >= block_threshold) | (notional >= value_threshold))
+        if idx.size == 0:
+            return []
+        
+        large_ts = trades.ts[idx]
+        large_price = trades.price[idx]
+        large_size = trades.size[idx]
+        large_value = notional[idx]
+        # Orders in [ts - window, ts] including the current one
+        first = np.searchsorted(large_ts, large_ts - self.consecutive_window, side='left')
+        consecutive = np.arange(idx.size) - first + 1
+        deviation = (large_price - vwap) / vwap * 100.0
+        institutional = large_value >= value_threshold
+        
+        signals = []
+        for k in range(idx.size):
+            signal = LargeOrderSignal(
+                ticker=ticker,
+                timestamp=datetime.fromtimestamp(large_ts[k]),
+                order_size=int(large_size[k]),
+                order_value=float(large_value[k]),
+                price=float(large_price[k]),
+                consecutive_count=int(consecutive[k]),
+                institutional_footprint=bool(institutional[k]),
+                vwap_deviation=float(deviation[k])
+            )
+            signals.append(signal)
+            
+            if signal.institutional_footprint:
+                logger.warning(
+                    f"[WHALE] {ticker} Institutional Order: {signal.order_size:,} shares @ ${signal.price:.2f} "
+                    f"(${signal.order_value:,.0f}, VWAP dev: {signal.vwap_deviation:+.2f}%)"
+                )
+        
+        return signals
+    
     def track_consecutive_orders(
         self,
         ticker: str,
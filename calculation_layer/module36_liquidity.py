@@ -26,6 +26,8 @@ from dataclasses import dataclass
 from datetime import datetime
 from typing import Dict, Optional
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
 # Liquidity detection thresholds
@@ -207,6 +209,48 @@ class LiquidityMonitor:
         
         return result
     
+    def calculate_from_trades(
+        self,
+        ticker: str,
+        trades,
+        avg_volume_baseline: int,
+        now: Optional[float] = None,
+        price_breakout: bool = False,
+        at_new_high: bool = False
+    ) -> LiquidityMetrics:
+        """
+        Calculate volume acceleration from a tick ring buffer window
+        
+        The 3/5/10-minute volumes are cumulative sums over the window, located by
+        binary search on the (monotonic) trade timestamps instead of Tick 63/64/65.
+        
+        Args:
+            ticker: Stock symbol
+            trades: TradeView from data_layer.tick_ring_buffer (should cover >= 10 minutes)
+            avg_volume_baseline: Historical average volume baseline
+            now: Epoch seconds for the window end (default: last trade timestamp)
+            price_breakout: Whether price has broken out (optional)
+            at_new_high: Whether price is at new high (optional)
+        
+        Returns:
+            LiquidityMetrics: Liquidity analysis results
+        """
+        if now is None:
+            now = float(trades.ts[-1]) if len(trades.ts) else 0.0
+        cumulative = np.concatenate(([0.0], np.cumsum(trades.size)))
+        starts = np.searchsorted(trades.ts, now - np.array([180.0, 300.0, 600.0]), side='right')
+        volume_3min, volume_5min, volume_10min = (int(v) for v in cumulative[-1] - cumulative[starts])
+        
+        return self.calculate_volume_acceleration(
+            ticker=ticker,
+            volume_3min=volume_3min,
+            volume_5min=volume_5min,
+            volume_10min=volume_10min,
+            avg_volume_baseline=avg_volume_baseline,
+            price_breakout=price_breakout,
+            at_new_high=at_new_high
+        )
+    
     def calculate_acceleration_ratio(
         self,
         volume_3min: int,
@@ -224,6 +224,47 @@ class DarkPoolDetector:
         
         return result
     
+    def detect_from_trades(
+        self,
+        ticker: str,
+        trades,
+        current_price: Optional[float] = None,
+        historical_avg: Optional[float] = None
+    ) -> DarkPoolData:
+        """
+        Detect dark pool activity from a tick ring buffer window
+        
+        Dark volume is the size printed on FINRA ADF (exchange 'D'), flagged at
+        ingestion time; lit volume is the remainder of the window.
+        
+        Args:
+            ticker: Stock symbol
+            trades: TradeView from data_layer.tick_ring_buffer
+            current_price: Current market price (default: last trade price)
+            historical_avg: Optional historical average dark pool volume
+        
+        Returns:
+            DarkPoolData: Dark pool analysis results
+        
+        Raises:
+            ValueError: If the window contains no volume
+        """
+        rt_volume = int(trades.volume())
+        if rt_volume <= 0:
+            raise ValueError("trade window contains no volume")
+        dark_volume = int(trades.dark_volume())
+        if current_price is None:
+            current_price = trades.last_price()
+        
+        return self.detect_dark_pool_activity(
+            ticker=ticker,
+            rt_volume=rt_volume,
+            rt_trade_volume=rt_volume - dark_volume,
+            vwap=trades.vwap(),
+            current_price=current_price,
+            historical_avg=historical_avg
+        )
+    
     def calculate_historical_average(self, ticker: str, window: int = None) -> float:
         """
         Calculate historical average dark pool volume
@@ -225,6 +225,39 @@ class HedgeQuantityCalculator:
             logger.error(f"x 對沖量計算失敗（含 Delta）: {e}")
             raise
     
+    def simulate_dynamic_hedge(
+        self,
+        price_paths,
+        strike: float,
+        time_to_expiration: float,
+        implied_volatility: float,
+        option_type: str = 'put',
+        policies=None,
+        contracts: int = 1,
+        risk_free_rate: float = 0.045,
+        commission_per_share: float = 0.005,
+        slippage_bps: float = 2.0,
+        dividend_yield: float = 0.0
+    ):
+        """
+        動態 Delta 對沖模擬（靜態對沖量的延伸）
+
+        在歷史或模擬價格路徑上比較不同再平衡規則的對沖損益、
+        交易成本與對沖誤差方差，詳見 calculation_layer/hedging_simulator.py
+
+        返回:
+            pd.DataFrame: 每個對沖策略一行，按對沖誤差標準差排序
+        """
+        from calculation_layer.hedging_simulator import DeltaHedgingSimulator
+
+        simulator = DeltaHedgingSimulator(risk_free_rate=risk_free_rate, dividend_yield=dividend_yield)
+        results = simulator.simulate(
+            price_paths, strike, time_to_expiration, implied_volatility,
+            option_type=option_type, policies=policies, contracts=contracts,
+            commission_per_share=commission_per_share, slippage_bps=slippage_bps
+        )
+        return DeltaHedgingSimulator.to_frame(results)
+    
     @staticmethod
     def _validate_inputs(stock_quantity: int, stock_price: float) -> bool:
         """驗證輸入參數"""
@@ -168,53 +168,101 @@ class VWAPIntradayAnalyzer:
 
             std_dev = float(df['std_dev'].iloc[-1])
 
-            upper_band_1 = vwap + 1 * std_dev
-            lower_band_1 = vwap - 1 * std_dev
-            upper_band_2 = vwap + 2 * std_dev
-            lower_band_2 = vwap - 2 * std_dev
-
-            # ── 價格位置分析 ───────────────────────────────────
-            price_vs_vwap_pct = (current_price - vwap) / vwap * 100
-            tolerance = vwap * self.AT_VWAP_TOLERANCE_PCT
-
-            if abs(current_price - vwap) <= tolerance:
-                position = 'at_vwap'
-            elif current_price > vwap:
-                position = 'above_vwap'
-            else:
-                position = 'below_vwap'
-
-            # ── 信號生成 ───────────────────────────────────────
-            signal, signal_strength, entry_condition = self._generate_signal(
-                current_price, vwap, price_vs_vwap_pct,
-                upper_band_1, lower_band_1, upper_band_2, lower_band_2, position
-            )
-
-            logger.info(f"  VWAP: ${vwap:.2f} | 現價: ${current_price:.2f} | "
-                        f"偏差: {price_vs_vwap_pct:+.2f}% | 信號: {signal} ({signal_strength})")
-
-            return VWAPResult(
-                ticker=ticker,
-                current_price=current_price,
-                vwap=vwap,
-                price_vs_vwap_pct=price_vs_vwap_pct,
-                position=position,
-                upper_band_1=upper_band_1,
-                lower_band_1=lower_band_1,
-                upper_band_2=upper_band_2,
-                lower_band_2=lower_band_2,
-                signal=signal,
-                signal_strength=signal_strength,
-                entry_condition=entry_condition,
-                total_volume=total_volume,
-                data_points=len(df),
-                calculation_time=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            )
+            return self._build_result(ticker, current_price, vwap, std_dev, total_volume, len(df))
 
         except Exception as e:
             logger.error(f"x VWAP 計算失敗: {e}")
             raise
 
+    def calculate_from_trades(
+        self,
+        ticker: str,
+        trades,
+        current_price: Optional[float] = None,
+    ) -> VWAPResult:
+        """
+        直接在 Tick 環形緩衝區窗口上計算 VWAP（逐筆成交，不重採樣為 1 分鐘 K 線）
+
+        參數:
+            ticker: 股票代碼
+            trades: data_layer.tick_ring_buffer.TradeView
+            current_price: 當前股價（默認為窗口內最後成交價）
+
+        返回:
+            VWAPResult
+        """
+        if len(trades) < 2:
+            raise ValueError(f"數據點不足: {len(trades)} 筆（需要至少 2 筆）")
+        cumulative_vol = np.cumsum(trades.size)
+        total = float(cumulative_vol[-1])
+        if total <= 0:
+            raise ValueError("成交量為 0")
+
+        # 與 calculate 相同的方差定義: Σ v·(p - VWAP_t)² / Σ v，VWAP_t 為截至該筆的累計 VWAP
+        with np.errstate(divide='ignore', invalid='ignore'):
+            running_vwap = np.cumsum(trades.price * trades.size) / cumulative_vol
+        running_vwap = np.where(cumulative_vol > 0, running_vwap, trades.price)
+        vwap = float(running_vwap[-1])
+        variance = float(np.dot(trades.size, (trades.price - running_vwap) ** 2) / total)
+        std_dev = math.sqrt(max(variance, 0.0))
+
+        if current_price is None:
+            current_price = trades.last_price()
+        return self._build_result(ticker, current_price, vwap, std_dev, int(total), len(trades))
+
+    def _build_result(
+        self,
+        ticker: str,
+        current_price: float,
+        vwap: float,
+        std_dev: float,
+        total_volume: int,
+        data_points: int
+    ) -> VWAPResult:
+        """由 VWAP 與標準差生成 Bands、位置與信號"""
+        upper_band_1 = vwap + 1 * std_dev
+        lower_band_1 = vwap - 1 * std_dev
+        upper_band_2 = vwap + 2 * std_dev
+        lower_band_2 = vwap - 2 * std_dev
+
+        # ── 價格位置分析 ───────────────────────────────────
+        price_vs_vwap_pct = (current_price - vwap) / vwap * 100
+        tolerance = vwap * self.AT_VWAP_TOLERANCE_PCT
+
+        if abs(current_price - vwap) <= tolerance:
+            position = 'at_vwap'
+        elif current_price > vwap:
+            position = 'above_vwap'
+        else:
+            position = 'below_vwap'
+
+        # ── 信號生成 ───────────────────────────────────────
+        signal, signal_strength, entry_condition = self._generate_signal(
+            current_price, vwap, price_vs_vwap_pct,
+            upper_band_1, lower_band_1, upper_band_2, lower_band_2, position
+        )
+
+        logger.info(f"  VWAP: ${vwap:.2f} | 現價: ${current_price:.2f} | "
+                    f"偏差: {price_vs_vwap_pct:+.2f}% | 信號: {signal} ({signal_strength})")
+
+        return VWAPResult(
+            ticker=ticker,
+            current_price=current_price,
+            vwap=vwap,
+            price_vs_vwap_pct=price_vs_vwap_pct,
+            position=position,
+            upper_band_1=upper_band_1,
+            lower_band_1=lower_band_1,
+            upper_band_2=upper_band_2,
+            lower_band_2=lower_band_2,
+            signal=signal,
+            signal_strength=signal_strength,
+            entry_condition=entry_condition,
+            total_volume=total_volume,
+            data_points=data_points,
+            calculation_time=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        )
+
     def _generate_signal(
         self,
         current_price: float,
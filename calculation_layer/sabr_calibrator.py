@@ -0,0 +1,414 @@
+# calculation_layer/sabr_calibrator.py
+"""
+SABR 波動率微笑校準器（β 固定，按到期日校準）
+
+功能:
+- 向量化 Hagan (2002) 近似公式：一次目標函數調用評估所有行使價
+- 按 (ticker, expiry) 保存最近一次參數，作為下一次校準的熱啟動點
+- 參數持久化到本地 SQLite，重啟後無需從頭校準
+- 對任意行使價 O(1) 查詢模型 IV（供 Module 25 / Module 22 使用）
+
+公式 (Hagan et al., 2002, lognormal implied vol):
+─────────────────────────────────────
+σ_B(K) = α / [(FK)^((1-β)/2) × (1 + (1-β)²/24 × ln²(F/K) + (1-β)⁴/1920 × ln⁴(F/K))]
+         × z / x(z)
+         × [1 + ((1-β)²/24 × α²/(FK)^(1-β) + ρβνα/(4(FK)^((1-β)/2)) + (2-3ρ²)/24 × ν²) × T]
+
+z    = ν/α × (FK)^((1-β)/2) × ln(F/K)
+x(z) = ln[(√(1 - 2ρz + z²) + z - ρ) / (1 - ρ)]
+─────────────────────────────────────
+
+參考文獻:
+- Hagan, P., Kumar, D., Lesniewski, A., Woodward, D. (2002). Managing Smile Risk.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.optimize import least_squares
+
+logger = logging.getLogger(__name__)
+
+
+def hagan_implied_volatility(
+    strikes,
+    forward: float,
+    time_to_expiration: float,
+    alpha: float,
+    beta: float,
+    rho: float,
+    nu: float
+) -> np.ndarray:
+    """
+    向量化 Hagan SABR 隱含波動率
+
+    參數:
+        strikes: 行使價（標量或數組）
+        forward: 遠期價格
+        time_to_expiration: 到期時間（年）
+        alpha, beta, rho, nu: SABR 參數
+
+    返回:
+        np.ndarray: 每個行使價的隱含波動率（小數形式）
+    """
+    k = np.asarray(strikes, dtype=float)
+    f = float(forward)
+    one_minus_beta = 1.0 - beta
+
+    log_fk = np.log(f / k)
+    fk_pow = (f * k) ** (one_minus_beta / 2.0)
+
+    z = (nu / alpha) * fk_pow * log_fk
+    sqrt_term = np.sqrt(1.0 - 2.0 * rho * z + z * z)
+    x_z = np.log((sqrt_term + z - rho) / (1.0 - rho))
+
+    # z → 0 時 z/x(z) → 1（ATM 附近避免 0/0）
+    small = np.abs(z) < 1e-7
+    safe_x = np.where(small, 1.0, x_z)
+    z_over_x = np.where(small, 1.0, z / safe_x)
+
+    denominator = fk_pow * (
+        1.0
+        + (one_minus_beta ** 2) / 24.0 * log_fk ** 2
+        + (one_minus_beta ** 4) / 1920.0 * log_fk ** 4
+    )
+    correction = 1.0 + (
+        (one_minus_beta ** 2) / 24.0 * alpha ** 2 / (fk_pow ** 2)
+        + rho * beta * nu * alpha / (4.0 * fk_pow)
+        + (2.0 - 3.0 * rho ** 2) / 24.0 * nu ** 2
+    ) * time_to_expiration
+
+    return alpha / denominator * z_over_x * correction
+
+
+@dataclass
+class SABRParameters:
+    """單個到期日的 SABR 校準結果"""
+    ticker: str
+    expiry: str
+    alpha: float
+    beta: float
+    rho: float
+    nu: float
+    forward: float
+    time_to_expiration: float
+    rmse: float
+    n_points: int
+    calibrated_at: str
+    warm_started: bool = False
+
+    def implied_volatility(self, strike: float) -> float:
+        """以本組參數計算單個行使價的模型 IV（O(1)）"""
+        return float(hagan_implied_volatility(
+            strike, self.forward, self.time_to_expiration,
+            self.alpha, self.beta, self.rho, self.nu
+        ))
+
+    def to_dict(self) -> Dict:
+        return {
+            'ticker': self.ticker,
+            'expiry': self.expiry,
+            'alpha': round(self.alpha, 6),
+            'beta': round(self.beta, 4),
+            'rho': round(self.rho, 6),
+            'nu': round(self.nu, 6),
+            'forward': round(self.forward, 4),
+            'time_to_expiration': round(self.time_to_expiration, 6),
+            'rmse': round(self.rmse, 6),
+            'n_points': self.n_points,
+            'calibrated_at': self.calibrated_at,
+            'warm_started': self.warm_started,
+            'model': 'SABR (Hagan 2002)'
+        }
+
+
+def default_db_path() -> str:
+    """settings.CACHE_DIR 下的參數庫路徑"""
+    from config.settings import settings
+    return os.path.join(settings.CACHE_DIR, 'sabr_params.db')
+
+
+class SABRParameterStore:
+    """
+    SABR 參數本地存儲（SQLite）
+
+    每個 (ticker, expiry) 只保留最近一次校準結果。
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or default_db_path()
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._init_db()
+
+    def _init_db(self):
+        """初始化參數表"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS sabr_parameters (
+                        ticker TEXT NOT NULL,
+                        expiry TEXT NOT NULL,
+                        alpha REAL NOT NULL,
+                        beta REAL NOT NULL,
+                        rho REAL NOT NULL,
+                        nu REAL NOT NULL,
+                        forward REAL NOT NULL,
+                        time_to_expiration REAL NOT NULL,
+                        rmse REAL,
+                        n_points INTEGER,
+                        calibrated_at TEXT NOT NULL,
+                        PRIMARY KEY (ticker, expiry)
+                    )
+                ''')
+                conn.commit()
+        except Exception as e:
+            logger.error(f"x 初始化 SABR 參數存儲失敗: {e}")
+
+    def load_all(self) -> Dict[Tuple[str, str], SABRParameters]:
+        """讀取全部已存儲參數"""
+        params = {}
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                rows = conn.execute('''
+                    SELECT ticker, expiry, alpha, beta, rho, nu, forward,
+                           time_to_expiration, rmse, n_points, calibrated_at
+                    FROM sabr_parameters
+                ''').fetchall()
+            for row in rows:
+                p = SABRParameters(*row)
+                params[(p.ticker, p.expiry)] = p
+        except Exception as e:
+            logger.error(f"x 讀取 SABR 參數失敗: {e}")
+        return params
+
+    def save(self, params: SABRParameters):
+        """寫入（覆蓋）單個到期日參數"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute('''
+                    INSERT OR REPLACE INTO sabr_parameters (
+                        ticker, expiry, alpha, beta, rho, nu, forward,
+                        time_to_expiration, rmse, n_points, calibrated_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    params.ticker, params.expiry, params.alpha, params.beta,
+                    params.rho, params.nu, params.forward, params.time_to_expiration,
+                    params.rmse, params.n_points, params.calibrated_at
+                ))
+                conn.commit()
+        except Exception as e:
+            logger.error(f"x 寫入 SABR 參數失敗 ({params.ticker} {params.expiry}): {e}")
+
+    def delete_expired(self, today: Optional[str] = None) -> int:
+        """刪除已過期到期日的參數，返回刪除行數"""
+        today = today or datetime.now().strftime('%Y-%m-%d')
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.execute('DELETE FROM sabr_parameters WHERE expiry < ?', (today,))
+                conn.commit()
+                return cursor.rowcount
+        except Exception as e:
+            logger.error(f"x 清理過期 SABR 參數失敗: {e}")
+            return 0
+
+
+class SABRCalibrator:
+    """
+    SABR 按到期日校準器
+
+    使用示例:
+    >>> calibrator = SABRCalibrator()
+    >>> params = calibrator.calibrate('AAPL', '2026-01-16', strikes, ivs,
+    ...                               forward=180.0, time_to_expiration=0.25)
+    >>> calibrator.get_model_iv('AAPL', '2026-01-16', 172.5)
+    """
+
+    DEFAULT_BETA = 0.5          # 股票期權常用 β
+    MIN_POINTS = 4              # 三個自由參數至少需要 4 個點
+    MIN_IV = 0.01
+    MAX_IV = 5.0
+
+    # 參數邊界: alpha, rho, nu
+    LOWER_BOUNDS = (1e-4, -0.999, 1e-4)
+    UPPER_BOUNDS = (50.0, 0.999, 10.0)
+
+    def __init__(
+        self,
+        beta: float = DEFAULT_BETA,
+        store: Optional[SABRParameterStore] = None,
+        db_path: Optional[str] = ''
+    ):
+        """
+        參數:
+            beta: 固定的 β 參數
+            store: 參數存儲實例（優先）
+            db_path: 未提供 store 時創建的 SQLite 路徑；空字符串為 settings.CACHE_DIR/sabr_params.db，
+                None 表示僅內存
+        """
+        self.beta = beta
+        if store is None and db_path is not None:
+            store = SABRParameterStore(db_path)
+        self.store = store
+        self._lock = threading.Lock()
+        self._params: Dict[Tuple[str, str], SABRParameters] = (
+            self.store.load_all() if self.store else {}
+        )
+        logger.info(f"* SABR 校準器已初始化 (β={beta}, 已載入 {len(self._params)} 組參數)")
+
+    @staticmethod
+    def _key(ticker: str, expiry: str) -> Tuple[str, str]:
+        return (ticker.upper(), str(expiry))
+
+    def get_parameters(self, ticker: str, expiry: str) -> Optional[SABRParameters]:
+        """獲取已校準參數（無則返回 None）"""
+        return self._params.get(self._key(ticker, expiry))
+
+    def get_model_iv(self, ticker: str, expiry: str, strike: float) -> Optional[float]:
+        """
+        查詢任意行使價的模型 IV（O(1)：字典查找 + 閉式公式）
+
+        返回:
+            float: 小數形式 IV；未校準或結果無效時返回 None
+        """
+        params = self.get_parameters(ticker, expiry)
+        if params is None or strike is None or strike <= 0:
+            return None
+        iv = params.implied_volatility(strike)
+        if not np.isfinite(iv) or iv <= 0:
+            return None
+        return iv
+
+    def calibrate(
+        self,
+        ticker: str,
+        expiry: str,
+        strikes: Sequence[float],
+        ivs: Sequence[float],
+        forward: float,
+        time_to_expiration: float,
+        weights: Optional[Sequence[float]] = None
+    ) -> Optional[SABRParameters]:
+        """
+        校準單個到期日的 SABR 參數
+
+        參數:
+            ticker: 股票代碼
+            expiry: 到期日（YYYY-MM-DD）
+            strikes: 行使價數組
+            ivs: 對應的市場 IV（小數形式）
+            forward: 遠期價格
+            time_to_expiration: 到期時間（年）
+            weights: 可選的殘差權重（例如按 Vega 或流動性）
+
+        返回:
+            SABRParameters 或 None（數據不足 / 校準失敗）
+        """
+        try:
+            k = np.asarray(strikes, dtype=float)
+            v = np.asarray(ivs, dtype=float)
+            w = np.ones_like(k) if weights is None else np.asarray(weights, dtype=float)
+
+            mask = (
+                np.isfinite(k) & np.isfinite(v) & np.isfinite(w)
+                & (k > 0) & (v >= self.MIN_IV) & (v <= self.MAX_IV) & (w > 0)
+            )
+            k, v, w = k[mask], v[mask], w[mask]
+
+            if len(k) < self.MIN_POINTS or forward <= 0 or time_to_expiration <= 0:
+                logger.warning(
+                    f"! SABR 校準跳過 ({ticker} {expiry}): 有效點 {len(k)}，"
+                    f"F={forward}, T={time_to_expiration}"
+                )
+                return None
+
+            key = self._key(ticker, expiry)
+            previous = self._params.get(key)
+            warm_started = previous is not None and previous.beta == self.beta
+            x0 = self._initial_guess(k, v, forward, previous if warm_started else None)
+
+            beta = self.beta
+            sqrt_w = np.sqrt(w)
+
+            def residuals(x):
+                model = hagan_implied_volatility(k, forward, time_to_expiration, x[0], beta, x[1], x[2])
+                return sqrt_w * (model - v)
+
+            solution = least_squares(
+                residuals, x0,
+                bounds=(self.LOWER_BOUNDS, self.UPPER_BOUNDS),
+                method='trf',
+                x_scale='jac'
+            )
+
+            alpha, rho, nu = (float(p) for p in solution.x)
+            fitted = hagan_implied_volatility(k, forward, time_to_expiration, alpha, beta, rho, nu)
+            if not np.all(np.isfinite(fitted)):
+                logger.warning(f"! SABR 校準結果無效 ({ticker} {expiry})")
+                return None
+            rmse = float(np.sqrt(np.mean((fitted - v) ** 2)))
+
+            params = SABRParameters(
+                ticker=key[0],
+                expiry=key[1],
+                alpha=alpha,
+                beta=beta,
+                rho=rho,
+                nu=nu,
+                forward=float(forward),
+                time_to_expiration=float(time_to_expiration),
+                rmse=rmse,
+                n_points=int(len(k)),
+                calibrated_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                warm_started=warm_started
+            )
+
+            with self._lock:
+                self._params[key] = params
+            if self.store:
+                self.store.save(params)
+
+            logger.info(
+                f"* SABR 校準完成 {key[0]} {key[1]}: α={alpha:.4f}, ρ={rho:.3f}, ν={nu:.3f}, "
+                f"RMSE={rmse*100:.2f}% ({len(k)} 點, 評估 {solution.nfev} 次"
+                f"{', 熱啟動' if warm_started else ''})"
+            )
+            return params
+
+        except Exception as e:
+            logger.error(f"x SABR 校準失敗 ({ticker} {expiry}): {e}")
+            return None
+
+    def _initial_guess(
+        self,
+        strikes: np.ndarray,
+        ivs: np.ndarray,
+        forward: float,
+        previous: Optional[SABRParameters]
+    ) -> np.ndarray:
+        """熱啟動使用上一次參數，否則以 ATM IV 推出 α"""
+        lower = np.array(self.LOWER_BOUNDS)
+        upper = np.array(self.UPPER_BOUNDS)
+        if previous is not None:
+            x0 = np.array([previous.alpha, previous.rho, previous.nu])
+        else:
+            atm_iv = float(ivs[np.argmin(np.abs(strikes - forward))])
+            x0 = np.array([atm_iv * forward ** (1.0 - self.beta), -0.3, 0.5])
+        return np.clip(x0, lower + 1e-6, upper - 1e-6)
+
+    def purge_expired(self, today: Optional[str] = None) -> int:
+        """移除已過到期日的參數（內存與磁盤）"""
+        today = today or datetime.now().strftime('%Y-%m-%d')
+        with self._lock:
+            expired = [key for key in self._params if key[1] < today]
+            for key in expired:
+                del self._params[key]
+        if self.store:
+            self.store.delete_expired(today)
+        return len(expired)
@@ -163,6 +163,25 @@ class APIConfig:
         'fallback_on_error': True
     }
     
+    # 共享令牌桶速率限制（data_layer/utils/rate_limiter.py）
+    #
+    # rate: 每秒請求數；burst: 允許的突發請求數
+    # jitter: 等待時額外的隨機抖動（請求間隔的比例，降低被識別為爬蟲的概率）
+    # backoff: 收到 429/5xx 時的退避參數（由 RetryHandler 計算）
+    # 未列出的數據源使用客戶端自身的請求間隔
+    RATE_LIMITS = {
+        'finnhub': {'rate': 1.0, 'burst': 5},                      # 60次/分鐘
+        'fred': {'rate': 2.0, 'burst': 5},                         # 120次/分鐘
+        'alpha_vantage': {'rate': 5 / 60, 'burst': 1},             # 5次/分鐘
+        'massive': {'rate': 1.0, 'burst': 1},
+        'rapidapi': {'rate': 1.0, 'burst': 1},
+        'finviz': {'rate': 0.2, 'burst': 1, 'jitter': 0.4,
+                   'backoff': {'initial_delay': 5.0, 'max_delay': 120.0,
+                               'status_codes': [403, 429, 500, 502, 503, 504]}},
+        'yahoo_v2': {'rate': 1 / 8, 'burst': 1, 'jitter': 0.25,
+                     'backoff': {'initial_delay': 15.0, 'max_delay': 120.0}},
+    }
+    
     # 數據優先級（按順序嘗試，第一個失敗時自動嘗試下一個）
     # 
     # 降級策略說明:
@@ -38,6 +38,24 @@ class Settings:
     IBKR_REJECT_OUTSIDE_RTH = os.getenv("IBKR_REJECT_OUTSIDE_RTH", "False").lower() == "true"  # 拒絕盤外數據
     IBKR_IV_SPIKE_THRESHOLD = float(os.getenv("IBKR_IV_SPIKE_THRESHOLD", "3.0"))  # 300% IV 異常閾值
     IBKR_PRICE_MISMATCH_THRESHOLD = float(os.getenv("IBKR_PRICE_MISMATCH_THRESHOLD", "0.01"))  # 1% 價格偏差閾值
+    IBKR_SNAPSHOT_MAX_IN_FLIGHT = int(os.getenv("IBKR_SNAPSHOT_MAX_IN_FLIGHT", "80"))  # 期權鏈快照同時在途的訂閱數（行情線配額）
+    IBKR_SNAPSHOT_CONTRACT_TIMEOUT = float(os.getenv("IBKR_SNAPSHOT_CONTRACT_TIMEOUT", "4.0"))  # 單個合約最長等待（秒）
+    STRIKE_PLANNER_ENABLED = os.getenv("STRIKE_PLANNER_ENABLED", "True").lower() == "true"  # 期權鏈快照按歷史流動性 / 模塊使用預測行使價
+    IBKR_CONTRACT_CACHE_ENABLED = os.getenv("IBKR_CONTRACT_CACHE_ENABLED", "True").lower() == "true"  # 合約驗證 / 期權鏈定義按交易日持久化
+    IBKR_MARKET_DATA_LINES = int(os.getenv("IBKR_MARKET_DATA_LINES", "100"))  # 帳戶行情線配額（所有 reqMktData 共用）
+    IBKR_LINE_IDLE_TTL = float(os.getenv("IBKR_LINE_IDLE_TTL", "600"))  # 空閒行情線保持訂閱的秒數
+    IBKR_HIST_MAX_REQUESTS = int(os.getenv("IBKR_HIST_MAX_REQUESTS", "60"))  # 歷史數據：每窗口最大請求數（IBKR pacing，僅 ≤30 秒 K 線）
+    IBKR_HIST_WINDOW_SECONDS = float(os.getenv("IBKR_HIST_WINDOW_SECONDS", "600"))  # 歷史數據 pacing 窗口（秒）
+    IBKR_HIST_MAX_CONCURRENT = int(os.getenv("IBKR_HIST_MAX_CONCURRENT", "6"))  # 歷史數據同時在途請求數
+    TICK_BUFFER_CAPACITY = int(os.getenv("TICK_BUFFER_CAPACITY", "32768"))  # 每隻股票 Tick 環形緩衝區容量（筆）
+    IBKR_RECORD_PATH = os.getenv("IBKR_RECORD_PATH", "")  # 非空時錄製 IBKR 收到的全部數據到該日誌文件
+    IBKR_REPLAY_PATH = os.getenv("IBKR_REPLAY_PATH", "")  # 非空時以該日誌回放代替真實連接（離線基準測試）
+    IBKR_REPLAY_SPEED = float(os.getenv("IBKR_REPLAY_SPEED", "1.0"))  # 回放速度（1 實時，>1 加速，0 最高速）
+    IBKR_SIMULATOR = os.getenv("IBKR_SIMULATOR", "false").lower() == "true"  # 使用進程內模擬 Gateway（負載測試）
+    IBKR_SIM_LATENCY = float(os.getenv("IBKR_SIM_LATENCY", "0.05"))  # 模擬請求往返延遲（秒）
+    IBKR_SIM_TICK_INTERVAL = float(os.getenv("IBKR_SIM_TICK_INTERVAL", "1.0"))  # 模擬行情推送間隔（秒）
+    IBKR_SIM_MARKET_DATA_LINES = int(os.getenv("IBKR_SIM_MARKET_DATA_LINES", "100"))  # 模擬行情線上限
+    IBKR_SIM_DATA_PATH = os.getenv("IBKR_SIM_DATA_PATH", "")  # 模擬器優先使用的錄製日誌（空則全部合成）
     
     # RapidAPI設置
     RAPIDAPI_ENABLED = os.getenv("RAPIDAPI_ENABLED", "True").lower() == "true"
@@ -68,10 +86,50 @@ class Settings:
     MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))  # 最大重试次数
     RETRY_DELAY = float(os.getenv("RETRY_DELAY", "5"))  # 重试延迟（秒）
     
+    # 並發抓取計劃（get_complete_analysis_data）
+    FETCH_PLAN_MAX_WORKERS = int(os.getenv("FETCH_PLAN_MAX_WORKERS", "6"))  # 最大並發線程數（1 = 順序執行）
+    FETCH_SOURCE_CONCURRENCY = {  # 每個數據源同時進行的請求上限
+        'yahoo': 2,
+        'finviz': 1,
+        'finnhub': 2,
+        'fred': 1,
+    }
+    
+    # 對沖（競速）多數據源抓取（_fetch_with_fallback）
+    HEDGED_FETCH_ENABLED = os.getenv("HEDGED_FETCH_ENABLED", "False").lower() == "true"
+    HEDGED_FETCH_DEFAULT_BUDGET = float(os.getenv("HEDGED_FETCH_DEFAULT_BUDGET", "3.0"))  # 歷史樣本不足時的延遲預算（秒）
+    HEDGED_FETCH_MIN_BUDGET = 0.2  # 延遲預算下限（秒）
+    HEDGED_FETCH_MIN_SAMPLES = 5  # 使用 p90 預算所需的最少成功樣本
+    HEDGED_FETCH_LATENCY_WINDOW = 200  # 每個 (數據類型, 數據源) 保留的延遲樣本數
+    HEDGED_FETCH_MAX_WORKERS = 8
+    HEDGED_FETCH_HISTOGRAM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0)
+    
+    # 相同數據請求合併（single-flight）：並發的相同請求共享一次抓取結果
+    SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "True").lower() == "true"
+    SINGLE_FLIGHT_FRESHNESS_SECONDS = float(os.getenv("SINGLE_FLIGHT_FRESHNESS_SECONDS", "2.0"))  # 完成後共享結果的新鮮窗口
+    
     # 緩存設置
     ENABLE_CACHE = True
     CACHE_TTL = 3600  # 秒（默認緩存時長）
     CACHE_DIR = "cache/"
+    CACHE_MEMORY_BUDGET_MB = int(os.getenv("CACHE_MEMORY_BUDGET_MB", "64"))  # DataCache 內存 LRU 預算
+    BAR_STORE_ENABLED = os.getenv("BAR_STORE_ENABLED", "True").lower() == "true"  # 本地增量 K 線存儲
+    BAR_STORE_REFRESH_SECONDS = int(os.getenv("BAR_STORE_REFRESH_SECONDS", "900"))  # 距上次抓取多久後才增量刷新
+    YAHOO_CRUMB_STORE_ENABLED = os.getenv("YAHOO_CRUMB_STORE_ENABLED", "True").lower() == "true"  # 跨進程共享 Yahoo crumb/cookies
+    YAHOO_CRUMB_STORE_TTL_SECONDS = int(os.getenv("YAHOO_CRUMB_STORE_TTL_SECONDS", "21600"))  # 持久化 crumb 有效期（401 時提前作廢）
+    FINVIZ_SNAPSHOT_ENABLED = os.getenv("FINVIZ_SNAPSHOT_ENABLED", "True").lower() == "true"  # Finviz 基本面每日快照
+    FINVIZ_SNAPSHOT_UNIVERSE = os.getenv("FINVIZ_SNAPSHOT_UNIVERSE", "f=cap_midover,sh_opt_option")  # 每日批量抓取的股票範圍
+    FINVIZ_SNAPSHOT_MAX_AGE_DAYS = int(os.getenv("FINVIZ_SNAPSHOT_MAX_AGE_DAYS", "3"))  # 可接受的快照天數（覆蓋週末）
+    FINVIZ_SNAPSHOT_MAX_PAGES = int(os.getenv("FINVIZ_SNAPSHOT_MAX_PAGES", "100"))  # 每個篩選條件最多抓取頁數（20 行/頁）
+    FINVIZ_SNAPSHOT_KEEP_DAYS = int(os.getenv("FINVIZ_SNAPSHOT_KEEP_DAYS", "30"))  # 快照保留天數
+    FETCH_CACHE_ENABLED = os.getenv("FETCH_CACHE_ENABLED", "True").lower() == "true"  # 到期日 / 業績 / 派息等慢變數據寫入 DataCache
+    
+    # 盤前觀察清單預熱（services/warmup_service.py）
+    WARMUP_LEAD_MINUTES = int(os.getenv("WARMUP_LEAD_MINUTES", "45"))  # 開盤前多少分鐘開始預熱
+    WARMUP_MAX_CONCURRENT = int(os.getenv("WARMUP_MAX_CONCURRENT", "4"))  # 同時預熱的請求數
+    WARMUP_RATE_PER_SECOND = float(os.getenv("WARMUP_RATE_PER_SECOND", "2.0"))  # 預熱請求發出速率上限
+    WARMUP_HISTORY_DAYS = int(os.getenv("WARMUP_HISTORY_DAYS", "5"))  # 最近多少天分析過的股票納入清單
+    WARMUP_MAX_TICKERS = int(os.getenv("WARMUP_MAX_TICKERS", "100"))  # 觀察清單上限
     
     # 不同數據類型的緩存時長（秒）
     # 這些設置允許根據數據的時效性需求設置不同的緩存時長
@@ -83,6 +141,7 @@ class Settings:
     CACHE_DURATION_VIX = int(os.getenv("CACHE_DURATION_VIX", "60"))  # VIX: 1分鐘
     CACHE_DURATION_RISK_FREE_RATE = int(os.getenv("CACHE_DURATION_RISK_FREE_RATE", "3600"))  # 無風險利率: 1小時
     CACHE_DURATION_FUNDAMENTALS = int(os.getenv("CACHE_DURATION_FUNDAMENTALS", "1800"))  # 基本面數據: 30分鐘
+    CACHE_DURATION_EXPIRATIONS = int(os.getenv("CACHE_DURATION_EXPIRATIONS", "21600"))  # 期權到期日列表: 6小時
     
     # 錯誤處理設置
     MAX_API_FAILURE_RECORDS = int(os.getenv("MAX_API_FAILURE_RECORDS", "100"))  # 每個 API 最多保留的故障記錄數
@@ -175,6 +234,7 @@ class Settings:
             ('CACHE_DURATION_VIX', cls.CACHE_DURATION_VIX),
             ('CACHE_DURATION_RISK_FREE_RATE', cls.CACHE_DURATION_RISK_FREE_RATE),
             ('CACHE_DURATION_FUNDAMENTALS', cls.CACHE_DURATION_FUNDAMENTALS),
+            ('CACHE_DURATION_EXPIRATIONS', cls.CACHE_DURATION_EXPIRATIONS),
         ]
         for name, value in cache_settings:
             if value < 0:
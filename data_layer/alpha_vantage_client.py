@@ -24,6 +24,9 @@ import os
 from datetime import datetime, timedelta
 from typing import Dict, Optional, Any, List
 
+from data_layer.http_session import http_sessions
+from data_layer.utils.rate_limiter import rate_limiters
+
 logger = logging.getLogger(__name__)
 
 # 計數器持久化文件路徑
@@ -65,6 +68,7 @@ class AlphaVantageClient:
         self.api_key = api_key
         self.request_delay = max(request_delay, self.MIN_REQUEST_INTERVAL)
         self.last_request_time = 0
+        self.session = http_sessions.shared('alpha_vantage')
         
         # 從持久化文件加載每日計數
         self.daily_request_count, self.daily_request_reset = self._load_daily_count()
@@ -141,12 +145,8 @@ class AlphaVantageClient:
             logger.error("x Alpha Vantage 每日請求限制已達 (500次/天)")
             raise Exception("Alpha Vantage daily limit exceeded")
         
-        # 請求間隔控制
-        elapsed = time.time() - self.last_request_time
-        if elapsed < self.request_delay:
-            sleep_time = self.request_delay - elapsed
-            logger.debug(f"  速率限制延遲: {sleep_time:.2f}秒")
-            time.sleep(sleep_time)
+        # 請求間隔控制（共享令牌桶）
+        rate_limiters.get('alpha_vantage', default_interval=self.request_delay).acquire()
         
         self.last_request_time = time.time()
         self.daily_request_count += 1
@@ -171,12 +171,14 @@ class AlphaVantageClient:
             
             logger.debug(f"  請求 Alpha Vantage: {params.get('function', 'unknown')}")
             
-            response = requests.get(
+            response = self.session.get(
                 self.BASE_URL,
                 params=params,
                 timeout=30
             )
             
+            limiter = rate_limiters.get('alpha_vantage')
+            limiter.on_response(response.status_code)
             response.raise_for_status()
             data = response.json()
             
@@ -186,8 +188,9 @@ class AlphaVantageClient:
                 return None
             
             if 'Note' in data:
-                # API 限制警告
+                # API 限制警告（按 429 處理，觸發令牌桶退避）
                 logger.warning(f"! Alpha Vantage 警告: {data['Note']}")
+                limiter.on_response(429)
                 return None
             
             if 'Information' in data:
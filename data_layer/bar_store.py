@@ -0,0 +1,333 @@
+# data_layer/bar_store.py
+"""
+本地增量 K 線存儲
+
+每個 (ticker, interval, 復權方式) 一組緊湊的列式 NumPy 文件:
+- <key>.ts.npy     int64 時間戳（ns，無時區）
+- <key>.ohlcv.npy  float64 (n, 5) Open/High/Low/Close/Volume
+- <key>.meta.json  覆蓋起點、最後抓取時間
+
+增量邏輯:
+- 已覆蓋請求區間時，只向數據源請求最後一根 K 線之後的缺失部分（含少量重疊）
+- 重疊窗口的校驗和與本地不一致（拆股/除權調整）時，作廢本地數據並重新抓取完整區間
+- 讀取返回只讀數組的切片視圖（零拷貝），調用方如需修改請先 .copy()
+- 已復權（Yahoo / Finnhub）與未復權（IBKR TRADES）序列分開存儲，互不覆蓋
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SeriesKey = Tuple[str, str, str]   # (ticker, interval, 復權方式)
+
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+PERIOD_DAYS = {
+    '1d': 1, '2d': 2, '5d': 5, '1mo': 31, '3mo': 92, '6mo': 183,
+    '1y': 366, '2y': 731, '5y': 1827, '10y': 3653,
+}
+# 增量抓取時使用的標準週期（從小到大）
+FETCH_PERIODS = ['5d', '1mo', '3mo', '6mo', '1y', '2y', '5y']
+
+DAILY_INTERVALS = {'1d', 'D', '1wk', '1mo'}
+
+# 復權方式（存儲鍵的一部分）
+ADJUSTED = 'adjusted'   # 拆股/除息調整後的價格（yfinance、Finnhub、IBKR ADJUSTED_LAST）
+RAW = 'raw'             # 未調整的成交價（IBKR TRADES）
+
+
+def period_to_days(period: str) -> Optional[int]:
+    """把 yfinance 風格的 period 轉換為日曆天數（不支持的格式返回 None）"""
+    if period in PERIOD_DAYS:
+        return PERIOD_DAYS[period]
+    match = re.fullmatch(r'(\d+)d', period or '')
+    return int(match.group(1)) if match else None
+
+
+def ib_duration(period: str) -> str:
+    """把 period 轉換為 IBKR 的 durationStr"""
+    days = period_to_days(period) or 30
+    if days > 365:
+        return f"{int(np.ceil(days / 366))} Y"
+    return f"{days} D"
+
+
+class LocalBarStore:
+    """
+    本地增量 K 線存儲
+
+    使用示例:
+    >>> store = LocalBarStore('cache/bars')
+    >>> df = store.get_bars('AAPL', '1d', '1y', lambda period: source.get_history('AAPL', period))
+    """
+
+    OVERLAP_DAYS = 3   # 增量抓取時與本地數據重疊的日曆天數（用於校驗和比對）
+
+    def __init__(self, root_dir: str = 'cache/bars', refresh_seconds: int = 900):
+        self.root = Path(root_dir)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.RLock()
+        self._series: Dict[SeriesKey, Tuple[np.ndarray, np.ndarray, Dict]] = {}
+        self.stats = {'hits': 0, 'incremental': 0, 'full': 0, 'invalidations': 0}
+
+    # ========== 讀寫 ==========
+
+    @staticmethod
+    def _key(ticker: str, interval: str, adjustment: str) -> SeriesKey:
+        return ticker.upper(), interval, adjustment
+
+    def _paths(self, key: SeriesKey) -> Tuple[Path, Path, Path]:
+        stem = '_'.join(key).replace('/', '_')
+        return (self.root / f"{stem}.ts.npy", self.root / f"{stem}.ohlcv.npy",
+                self.root / f"{stem}.meta.json")
+
+    def _load(self, key: SeriesKey) -> Tuple[np.ndarray, np.ndarray, Dict]:
+        if key in self._series:
+            return self._series[key]
+        ts_path, values_path, meta_path = self._paths(key)
+        ts, values, meta = np.empty(0, dtype='int64'), np.empty((0, len(COLUMNS))), {}
+        if ts_path.exists() and values_path.exists() and meta_path.exists():
+            try:
+                ts = np.load(ts_path)
+                values = np.load(values_path)
+                meta = json.loads(meta_path.read_text())
+            except Exception as e:
+                logger.warning(f"! K 線存儲讀取失敗 {key}: {e}，將重新抓取")
+                ts, values, meta = np.empty(0, dtype='int64'), np.empty((0, len(COLUMNS))), {}
+        ts.setflags(write=False)
+        values.setflags(write=False)
+        self._series[key] = (ts, values, meta)
+        return self._series[key]
+
+    def _save(self, key: SeriesKey, ts: np.ndarray, values: np.ndarray, meta: Dict):
+        ts_path, values_path, meta_path = self._paths(key)
+        for path, array in ((ts_path, ts), (values_path, values)):
+            tmp = path.with_suffix('.tmp.npy')
+            np.save(tmp, array)
+            os.replace(tmp, path)
+        meta_path.write_text(json.dumps(meta))
+        ts.setflags(write=False)
+        values.setflags(write=False)
+        self._series[key] = (ts, values, meta)
+
+    @staticmethod
+    def _to_arrays(df: pd.DataFrame, interval: str) -> Tuple[np.ndarray, np.ndarray]:
+        """把數據源返回的 DataFrame 轉為 (時間戳, OHLCV) 數組，統一為無時區時間"""
+        index = pd.DatetimeIndex(pd.to_datetime(df.index))
+        if index.tz is not None:
+            index = index.tz_convert('America/New_York').tz_localize(None)
+        if interval in DAILY_INTERVALS:
+            index = index.normalize()
+        frame = df.reindex(columns=COLUMNS).astype('float64')
+        frame.index = index
+        frame = frame[~frame.index.duplicated(keep='last')].sort_index()
+        frame = frame.dropna(subset=['Close'])
+        return frame.index.as_unit('ns').asi8.astype('int64'), frame.to_numpy(dtype='float64')
+
+    @staticmethod
+    def _checksum(values: np.ndarray) -> str:
+        return hashlib.sha1(np.round(values[:, :4], 4).tobytes()).hexdigest()
+
+    def _overlap_matches(self, ts, values, new_ts, new_values) -> bool:
+        """比對重疊窗口（不含本地最後一根，可能是未收盤K線）的 OHLC 校驗和"""
+        if len(ts) < 2:
+            return True
+        settled = ts[:-1]
+        common, old_idx, new_idx = np.intersect1d(settled, new_ts, return_indices=True)
+        if len(common) == 0:
+            return True
+        return self._checksum(values[old_idx]) == self._checksum(new_values[new_idx])
+
+    # ========== 查詢 ==========
+
+    @staticmethod
+    def _covering_period(days: int) -> str:
+        """覆蓋指定天數的最小標準 period"""
+        for candidate in FETCH_PERIODS:
+            if PERIOD_DAYS[candidate] >= days:
+                return candidate
+        return f"{days}d"
+
+    @staticmethod
+    def _lookback_days(days: int, end_date: Optional[str]) -> int:
+        """從今天起需要覆蓋的天數（指定截止日期時向前延伸）"""
+        if not end_date:
+            return days
+        return days + max(0, (datetime.now() - pd.Timestamp(end_date).to_pydatetime()).days)
+
+    def _plan(self, key: SeriesKey, lookback: int) -> Tuple[Optional[str], bool]:
+        """
+        返回 (需要向數據源請求的 period, 是否完整抓取)；period 為 None 表示本地數據已足夠
+        """
+        full_period = self._covering_period(lookback)
+        ts, _, meta = self._load(key)
+        if not len(ts) or not meta:
+            return full_period, True
+
+        requested_start = datetime.now() - timedelta(days=lookback)
+        if datetime.fromisoformat(meta['covered_since']) > requested_start + timedelta(days=1):
+            return full_period, True
+
+        if time.time() - meta.get('fetched_at', 0) < self.refresh_seconds:
+            return None, False
+
+        last_bar = pd.Timestamp(int(ts[-1])).to_pydatetime()
+        gap_days = (datetime.now() - last_bar).days + self.OVERLAP_DAYS
+        tail_period = self._covering_period(gap_days)
+        if period_to_days(tail_period) >= lookback:
+            return full_period, True
+        return tail_period, False
+
+    def _merge(self, key: SeriesKey, fetched: pd.DataFrame, full: bool, fetch_period: str) -> bool:
+        """合併抓取結果；重疊窗口校驗和不一致時返回 False（需要完整重抓）"""
+        new_ts, new_values = self._to_arrays(fetched, key[1])
+        ts, values, meta = self._load(key)
+
+        if full or not len(ts):
+            covered_since = datetime.now() - timedelta(days=period_to_days(fetch_period))
+            if len(new_ts):
+                # 數據源返回的歷史比請求短（例如新上市）時，以實際起點為準不會反復重抓
+                covered_since = min(covered_since, pd.Timestamp(int(new_ts[0])).to_pydatetime())
+            self._save(key, new_ts.copy(), new_values.copy(),
+                       {'covered_since': covered_since.isoformat(), 'fetched_at': time.time()})
+            return True
+
+        if not self._overlap_matches(ts, values, new_ts, new_values):
+            return False
+
+        keep = ts < new_ts[0] if len(new_ts) else np.ones(len(ts), dtype=bool)
+        merged_ts = np.concatenate([ts[keep], new_ts])
+        merged_values = np.concatenate([values[keep], new_values])
+        self._save(key, merged_ts, merged_values,
+                   {**meta, 'fetched_at': time.time()})
+        return True
+
+    def _slice(self, key: SeriesKey, days: int, end_date: Optional[str] = None) -> Optional[pd.DataFrame]:
+        """按回看天數切片，返回共享底層只讀數組的 DataFrame"""
+        ts, values, _ = self._load(key)
+        if not len(ts):
+            return None
+        end = pd.Timestamp(end_date) if end_date else pd.Timestamp(datetime.now()).normalize()
+        end = end + pd.Timedelta(days=1)
+        start = end - pd.Timedelta(days=days + 1)
+        i0, i1 = np.searchsorted(ts, [start.value, end.value], side='left')
+        if i0 >= i1:
+            return None
+        return pd.DataFrame(values[i0:i1], index=pd.DatetimeIndex(ts[i0:i1], name='Date'),
+                            columns=COLUMNS, copy=False)
+
+    def _record(self, key: SeriesKey, fetch_period: Optional[str], full: bool):
+        if fetch_period is None:
+            self.stats['hits'] += 1
+            return
+        self.stats['full' if full else 'incremental'] += 1
+        logger.info(f"  K 線存儲 {' '.join(key)}: {'完整' if full else '增量'}抓取 {fetch_period}")
+
+    def get_bars(self, ticker: str, interval: str, period: str,
+                 fetch: Callable[[str], Optional[pd.DataFrame]],
+                 end_date: Optional[str] = None, adjustment: str = ADJUSTED) -> Optional[pd.DataFrame]:
+        """
+        讀取 K 線，本地缺失時調用 fetch(period) 補齊
+
+        參數:
+            ticker / interval: 存儲鍵
+            period: 需要的回看區間（yfinance 風格，例如 '1y' 或 '200d'）
+            fetch: 數據源函數，接收 period 返回 DataFrame（Open/High/Low/Close/Volume）
+            end_date: 可選截止日期（YYYY-MM-DD），用於回測時避免未來數據
+            adjustment: fetch 返回數據的復權方式（ADJUSTED / RAW），不同方式分開存儲
+
+        返回:
+            DataFrame（只讀零拷貝視圖），無數據時返回 None
+        """
+        days = period_to_days(period)
+        if days is None:
+            return fetch(period)
+        lookback = self._lookback_days(days, end_date)
+        key = self._key(ticker, interval, adjustment)
+
+        with self._lock:
+            fetch_period, full = self._plan(key, lookback)
+            if fetch_period is not None:
+                fetched = fetch(fetch_period)
+                if fetched is None or fetched.empty:
+                    # 數據源失敗時退回本地數據
+                    return self._slice(key, days, end_date)
+                if not self._merge(key, fetched, full, fetch_period):
+                    logger.info(f"  K 線存儲 {' '.join(key)}: 重疊窗口校驗和不一致（拆股/調整），重新完整抓取")
+                    self.stats['invalidations'] += 1
+                    fetch_period, full = self._covering_period(lookback), True
+                    fetched = fetch(fetch_period)
+                    if fetched is None or fetched.empty:
+                        return None
+                    self._merge(key, fetched, True, fetch_period)
+            self._record(key, fetch_period, full)
+            return self._slice(key, days, end_date)
+
+    async def get_bars_async(self, ticker: str, interval: str, period: str, fetch,
+                             end_date: Optional[str] = None, adjustment: str = ADJUSTED) -> Optional[pd.DataFrame]:
+        """get_bars 的異步版本，fetch(period) 為協程函數（例如 reqHistoricalDataAsync 封裝）"""
+        days = period_to_days(period)
+        if days is None:
+            return await fetch(period)
+        lookback = self._lookback_days(days, end_date)
+        key = self._key(ticker, interval, adjustment)
+
+        fetch_period, full = self._plan(key, lookback)
+        if fetch_period is not None:
+            fetched = await fetch(fetch_period)
+            if fetched is None or fetched.empty:
+                return self._slice(key, days, end_date)
+            with self._lock:
+                merged = self._merge(key, fetched, full, fetch_period)
+            if not merged:
+                self.stats['invalidations'] += 1
+                fetch_period, full = self._covering_period(lookback), True
+                fetched = await fetch(fetch_period)
+                if fetched is None or fetched.empty:
+                    return None
+                with self._lock:
+                    self._merge(key, fetched, True, fetch_period)
+        self._record(key, fetch_period, full)
+        return self._slice(key, days, end_date)
+
+    def invalidate(self, ticker: str, interval: Optional[str] = None) -> int:
+        """刪除某隻股票（或指定週期）的本地 K 線（兩種復權方式都刪除）"""
+        removed = 0
+        with self._lock:
+            pattern = f"{ticker.upper()}_{interval or '*'}_*.*"
+            for path in self.root.glob(pattern):
+                path.unlink()
+                removed += 1
+            for key in [k for k in self._series if k[0] == ticker.upper() and (interval is None or k[1] == interval)]:
+                del self._series[key]
+        return removed
+
+
+_default_store: Optional[LocalBarStore] = None
+_default_lock = threading.Lock()
+
+
+def get_bar_store() -> LocalBarStore:
+    """進程內共享的 K 線存儲（DataFetcher、IBKRClient、ScannerService 共用）"""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            from config.settings import settings
+            _default_store = LocalBarStore(
+                os.path.join(settings.CACHE_DIR, 'bars'),
+                refresh_seconds=settings.BAR_STORE_REFRESH_SECONDS
+            )
+        return _default_store
@@ -0,0 +1,174 @@
+# data_layer/crumb_store.py
+"""
+Yahoo Finance Crumb / Cookie 持久化存儲
+
+每個新進程（CLI、worker）原本都要重新走一遍 crumb 獲取流程（訪問主頁、
+getcrumb API、頁面提取、consent），耗時數秒。
+
+本模塊把有效的 crumb 與對應 cookies 保存到一個小 JSON 文件:
+- 帶過期時間，讀取時只檢查過期，不發網絡請求（惰性驗證：請求返回 401 時再作廢）
+- 多進程共享：讀寫都在文件鎖內進行；刷新 crumb 時持有鎖，
+  其他進程等待後直接使用剛保存的結果，而不是各自重走一遍流程
+- 寫入使用臨時文件 + os.replace，讀取方不會看到寫了一半的文件
+"""
+
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from requests.cookies import RequestsCookieJar
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+
+class CrumbStore:
+    """
+    Crumb / Cookie 文件存儲
+
+    使用示例:
+    >>> store = CrumbStore('cache/yahoo_crumb.json', ttl_seconds=6 * 3600)
+    >>> entry = store.load()
+    >>> if entry:
+    ...     store.apply_cookies(session.cookies, entry)
+    """
+
+    def __init__(self, path: str, ttl_seconds: int = 6 * 3600):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock_path = self.path.with_suffix(self.path.suffix + '.lock')
+        self.ttl_seconds = ttl_seconds
+
+    @classmethod
+    def default(cls) -> Optional['CrumbStore']:
+        """按設置創建默認存儲（未啟用時返回 None）"""
+        from config.settings import settings
+        if not settings.YAHOO_CRUMB_STORE_ENABLED:
+            return None
+        return cls(os.path.join(settings.CACHE_DIR, 'yahoo_crumb.json'),
+                   ttl_seconds=settings.YAHOO_CRUMB_STORE_TTL_SECONDS)
+
+    @contextmanager
+    def locked(self):
+        """跨進程互斥鎖（阻塞直到取得）"""
+        with open(self.lock_path, 'a+b') as handle:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            else:
+                handle.seek(0)
+                # msvcrt.LK_LOCK 重試約 10 秒後拋出 OSError，繼續等待直到取得
+                while True:
+                    try:
+                        msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+                else:
+                    handle.seek(0)
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _read(self) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(self.path.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.debug(f"Crumb 存儲讀取失敗: {e}")
+            return None
+
+    def load(self, lock: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        讀取未過期的條目
+
+        參數:
+            lock: 是否在文件鎖內讀取（調用方已持有鎖時傳 False）
+
+        返回:
+            dict: {'crumb', 'cookies', 'user_agent', 'saved_at', 'expires_at'}，無有效條目時返回 None
+        """
+        if lock:
+            with self.locked():
+                entry = self._read()
+        else:
+            entry = self._read()
+        if not entry or not entry.get('crumb'):
+            return None
+        if entry.get('expires_at', 0) <= time.time():
+            return None
+        return entry
+
+    def save(self, crumb: str, cookies, user_agent: Optional[str] = None, lock: bool = True):
+        """
+        保存 crumb 與 cookies
+
+        參數:
+            crumb: 有效的 crumb
+            cookies: requests 的 CookieJar
+            user_agent: 獲取 crumb 時使用的 User-Agent（Yahoo 會校驗一致性）
+            lock: 是否在文件鎖內寫入（調用方已持有鎖時傳 False）
+        """
+        now = time.time()
+        entry = {
+            'crumb': crumb,
+            'cookies': [
+                {'name': c.name, 'value': c.value, 'domain': c.domain, 'path': c.path,
+                 'expires': c.expires, 'secure': c.secure}
+                for c in cookies
+            ],
+            'user_agent': user_agent,
+            'saved_at': now,
+            'expires_at': now + self.ttl_seconds
+        }
+        if lock:
+            with self.locked():
+                self._write(entry)
+        else:
+            self._write(entry)
+
+    def _write(self, entry: Dict[str, Any]):
+        tmp = self.path.with_suffix(self.path.suffix + f'.{os.getpid()}.tmp')
+        tmp.write_text(json.dumps(entry), encoding='utf-8')
+        os.replace(tmp, self.path)
+
+    def invalidate(self, crumb: Optional[str] = None):
+        """
+        作廢存儲的條目
+
+        參數:
+            crumb: 只有當存儲的 crumb 與此相同時才作廢（避免刪除其他進程剛刷新的結果）
+        """
+        with self.locked():
+            entry = self._read()
+            if entry is None:
+                return
+            if crumb is not None and entry.get('crumb') != crumb:
+                return
+            try:
+                self.path.unlink()
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def apply_cookies(jar: RequestsCookieJar, entry: Dict[str, Any]):
+        """把存儲的 cookies 寫入 Session 的 CookieJar（跳過已過期的）"""
+        now = time.time()
+        for cookie in entry.get('cookies', []):
+            if cookie.get('expires') and cookie['expires'] <= now:
+                continue
+            jar.set(cookie['name'], cookie['value'], domain=cookie.get('domain'),
+                    path=cookie.get('path') or '/', expires=cookie.get('expires'),
+                    secure=cookie.get('secure', False))
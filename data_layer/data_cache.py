@@ -6,15 +6,21 @@
 - 支持不同數據類型的緩存時長
 - 手動失效緩存功能
 - 緩存有效性檢查
+- 兩級緩存: 進程內 LRU（按字節預算）+ 單文件 SQLite 存儲（BLOB + 過期索引）
 """
 
-import json
+import functools
+import inspect
 import pickle
 import logging
 import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
-from datetime import datetime, timedelta
-from typing import Any, Optional, Dict, List
+from datetime import datetime, time as dtime
+from typing import Any, Optional, Dict, List, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -29,8 +35,23 @@ DATA_TYPE_PATTERNS = {
     'vix': [r'^vix_', r'^vix$'],
     'risk_free_rate': [r'^risk_free_', r'^treasury_', r'^rate_'],
     'fundamentals': [r'^fundamentals_', r'^financial_'],
+    'expirations': [r'^expirations_'],
 }
 
+# 當天常規交易時段收盤（美東）
+SESSION_CLOSE = dtime(16, 0)
+
+
+def seconds_until_close(now: Optional[datetime] = None) -> int:
+    """距當天美東收盤的秒數（已收盤時為 0；naive 時間視為美東時間）"""
+    from data_layer.session_utils import ET_TZ
+    if now is None:
+        now_et = datetime.now(ET_TZ)
+    else:
+        now_et = ET_TZ.localize(now) if now.tzinfo is None else now.astimezone(ET_TZ)
+    close = ET_TZ.localize(datetime.combine(now_et.date(), SESSION_CLOSE))
+    return max(0, int((close - now_et).total_seconds()))
+
 
 class DataCache:
     """
@@ -40,9 +61,19 @@ class DataCache:
     - 支持不同數據類型的緩存時長
     - 手動失效緩存功能
     - 緩存有效性檢查
+    
+    存儲結構:
+    - 內存索引 {key: (created_at, expires_at, size)}：有效性檢查優先查內存；
+      索引缺失或已過期時回查 SQLite 並重新索引，其他進程（如盤前預熱）寫入的記錄同樣可見
+    - 內存 LRU：保存序列化後的數據，總大小不超過 memory_budget_bytes
+    - SQLite 單文件存儲（cache_dir/data_cache.db）：BLOB 數據 + expires_at 索引，
+      過期記錄以一條 DELETE 批量清除
     """
     
-    def __init__(self, cache_dir='cache/', ttl=3600, type_specific_ttl: Optional[Dict[str, int]] = None):
+    DB_FILENAME = 'data_cache.db'
+    
+    def __init__(self, cache_dir='cache/', ttl=3600, type_specific_ttl: Optional[Dict[str, int]] = None,
+                 memory_budget_bytes: Optional[int] = None):
         """
         初始化緩存系統
         
@@ -51,6 +82,7 @@ class DataCache:
             ttl: 默認緩存有效期（秒），默認1小時
             type_specific_ttl: 數據類型特定的緩存時長字典
                 例如: {'stock_info': 300, 'vix': 60, 'earnings': 3600}
+            memory_budget_bytes: 內存 LRU 的字節預算（None 時從 settings 讀取，默認 64MB）
         """
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(exist_ok=True)
@@ -64,8 +96,23 @@ class DataCache:
         
         # 嘗試從 settings 加載數據類型特定的緩存時長
         self._load_type_specific_ttl_from_settings()
-        
-        logger.info(f"緩存系統已初始化，目錄: {self.cache_dir}, 默認TTL: {ttl}秒")
+        if memory_budget_bytes is None:
+            memory_budget_bytes = self._memory_budget_from_settings()
+        self.memory_budget_bytes = memory_budget_bytes
+        
+        self._lock = threading.RLock()
+        self._index: Dict[str, Tuple[float, float, int]] = {}
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+        
+        self.db_path = self.cache_dir / self.DB_FILENAME
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._init_db()
+        self._load_index()
+        
+        logger.info(f"緩存系統已初始化，目錄: {self.cache_dir}, 默認TTL: {ttl}秒, "
+                    f"內存預算: {self.memory_budget_bytes / 1024 / 1024:.0f}MB, 已有 {len(self._index)} 條")
         if self.type_specific_ttl:
             logger.debug(f"數據類型特定TTL: {self.type_specific_ttl}")
     
@@ -87,6 +134,7 @@ class DataCache:
                 'vix': getattr(settings, 'CACHE_DURATION_VIX', None),
                 'risk_free_rate': getattr(settings, 'CACHE_DURATION_RISK_FREE_RATE', None),
                 'fundamentals': getattr(settings, 'CACHE_DURATION_FUNDAMENTALS', None),
+                'expirations': getattr(settings, 'CACHE_DURATION_EXPIRATIONS', None),
             }
             
             # 只添加有值的配置（不覆蓋已有的 type_specific_ttl）
@@ -99,15 +147,76 @@ class DataCache:
         except ImportError as e:
             logger.debug(f"無法加載 settings，使用默認緩存時長: {e}")
     
-    def _get_cache_file(self, key: str) -> Path:
-        """獲取緩存文件路徑"""
-        safe_key = key.replace('/', '_').replace('\\', '_')
-        return self.cache_dir / f"{safe_key}.cache"
-    
-    def _get_meta_file(self, key: str) -> Path:
-        """獲取元數據文件路徑"""
-        safe_key = key.replace('/', '_').replace('\\', '_')
-        return self.cache_dir / f"{safe_key}.meta"
+    @staticmethod
+    def _memory_budget_from_settings() -> int:
+        """從 settings 讀取內存 LRU 預算（MB → 字節）"""
+        try:
+            from config.settings import settings
+            return int(getattr(settings, 'CACHE_MEMORY_BUDGET_MB', 64) * 1024 * 1024)
+        except ImportError:
+            return 64 * 1024 * 1024
+    
+    def _init_db(self):
+        """初始化 SQLite 存儲與過期索引"""
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    key TEXT PRIMARY KEY,
+                    payload BLOB NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    size INTEGER NOT NULL
+                )
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache_entries(expires_at)')
+            self._conn.commit()
+    
+    def _load_index(self):
+        """載入元數據索引（不讀取數據本身）"""
+        with self._lock:
+            rows = self._conn.execute('SELECT key, created_at, expires_at, size FROM cache_entries').fetchall()
+            self._index = {key: (created_at, expires_at, size) for key, created_at, expires_at, size in rows}
+    
+    def _reload_entry(self, key: str) -> Optional[Tuple[float, float, int]]:
+        """從 SQLite 重新讀取單個鍵的元數據（其他進程寫入或覆蓋的記錄）"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT created_at, expires_at, size FROM cache_entries WHERE key = ?', (key,)
+            ).fetchone()
+            entry = tuple(row) if row else None
+            if entry != self._index.get(key):
+                # 記錄已被其他進程替換或刪除：內存中的舊數據作廢
+                self._memory_drop(key)
+                if entry is None:
+                    self._index.pop(key, None)
+                else:
+                    self._index[key] = entry
+            return entry
+    
+    # ========== 內存 LRU ==========
+    
+    def _memory_put(self, key: str, payload: bytes):
+        self._memory_drop(key)
+        if len(payload) > self.memory_budget_bytes:
+            return
+        self._memory[key] = payload
+        self._memory_bytes += len(payload)
+        while self._memory_bytes > self.memory_budget_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self.stats['evictions'] += 1
+    
+    def _memory_drop(self, key: str):
+        payload = self._memory.pop(key, None)
+        if payload is not None:
+            self._memory_bytes -= len(payload)
+    
+    def _forget(self, keys: List[str]):
+        """從內存索引與 LRU 中移除"""
+        for key in keys:
+            self._index.pop(key, None)
+            self._memory_drop(key)
     
     def _get_cache_duration_for_key(self, cache_key: str) -> int:
         """
@@ -128,30 +237,37 @@ class DataCache:
             >>> cache._get_cache_duration_for_key('vix')
             60   # VIX緩存1分鐘
         """
-        # 嘗試根據緩存鍵模式匹配數據類型
-        for data_type, patterns in DATA_TYPE_PATTERNS.items():
-            for pattern in patterns:
-                if re.match(pattern, cache_key, re.IGNORECASE):
-                    duration = self.type_specific_ttl.get(data_type, self.ttl)
-                    logger.debug(f"緩存鍵 '{cache_key}' 匹配數據類型 '{data_type}'，TTL: {duration}秒")
-                    return duration
+        data_type = self._get_data_type_for_key(cache_key)
+        if data_type != 'unknown':
+            duration = self.type_specific_ttl.get(data_type, self.ttl)
+            logger.debug(f"緩存鍵 '{cache_key}' 匹配數據類型 '{data_type}'，TTL: {duration}秒")
+            return duration
         
         # 如果沒有匹配到任何模式，返回默認 TTL
         logger.debug(f"緩存鍵 '{cache_key}' 未匹配任何數據類型，使用默認TTL: {self.ttl}秒")
         return self.ttl
     
+    @staticmethod
+    def _get_data_type_for_key(cache_key: str) -> str:
+        """根據緩存鍵模式推斷數據類型"""
+        for data_type, patterns in DATA_TYPE_PATTERNS.items():
+            for pattern in patterns:
+                if re.match(pattern, cache_key, re.IGNORECASE):
+                    return data_type
+        return 'unknown'
+    
     def _is_cache_valid(self, cache_key: str, duration: Optional[int] = None) -> bool:
         """
-        檢查緩存是否有效（增強版）
+        檢查緩存是否有效（增強版，內存索引未命中或已過期時回查 SQLite）
         
         此方法支持:
-        1. 不同數據類型的不同緩存時長
+        1. 不同數據類型的不同緩存時長（寫入時確定的過期時間）
         2. 手動失效的緩存檢測
         3. 自定義緩存時長覆蓋
         
         參數:
             cache_key: 緩存鍵
-            duration: 自定義緩存時長（秒），如果為 None 則根據數據類型自動確定
+            duration: 自定義緩存時長（秒），如果為 None 則使用寫入時確定的過期時間
         
         返回:
             bool: 緩存是否有效
@@ -167,49 +283,27 @@ class DataCache:
             logger.debug(f"緩存 '{cache_key}' 已被手動失效")
             return False
         
-        # 檢查緩存文件是否存在
-        cache_file = self._get_cache_file(cache_key)
-        meta_file = self._get_meta_file(cache_key)
-        
-        if not cache_file.exists() or not meta_file.exists():
+        now = time.time()
+        entry = self._index.get(cache_key)
+        if entry is None or now >= entry[1]:
+            entry = self._reload_entry(cache_key)
+        if entry is None:
             logger.debug(f"緩存 '{cache_key}' 不存在")
             return False
         
-        try:
-            # 讀取元數據
-            with open(meta_file, 'r') as f:
-                meta = json.load(f)
-            
-            # 獲取緩存創建時間
-            created_at = datetime.fromisoformat(meta['created_at'])
-            
-            # 確定緩存時長
-            if duration is None:
-                duration = self._get_cache_duration_for_key(cache_key)
-            
-            # 計算緩存年齡
-            age = (datetime.now() - created_at).total_seconds()
-            
-            # 檢查是否過期
-            is_valid = age < duration
-            
-            if is_valid:
-                logger.debug(f"緩存 '{cache_key}' 有效，年齡: {age:.1f}秒，TTL: {duration}秒")
-            else:
-                logger.debug(f"緩存 '{cache_key}' 已過期，年齡: {age:.1f}秒，TTL: {duration}秒")
-            
-            return is_valid
-            
-        except Exception as e:
-            logger.warning(f"檢查緩存有效性失敗 '{cache_key}': {e}")
-            return False
+        created_at, expires_at, _ = entry
+        is_valid = (now - created_at) < duration if duration is not None else now < expires_at
+        
+        if not is_valid:
+            logger.debug(f"緩存 '{cache_key}' 已過期，年齡: {now - created_at:.1f}秒")
+        return is_valid
     
     def invalidate(self, cache_key: str) -> bool:
         """
         手動失效指定的緩存
         
         此方法將緩存鍵添加到失效集合中，使其在下次訪問時被視為無效。
-        實際的緩存文件不會被立即刪除，但會在下次 get() 時被忽略。
+        實際的緩存數據不會被立即刪除，但會在下次 get() 時被忽略。
         
         參數:
             cache_key: 要失效的緩存鍵
@@ -248,18 +342,13 @@ class DataCache:
             5  # 失效了5個股票信息緩存
         """
         try:
-            count = 0
             regex = re.compile(pattern, re.IGNORECASE)
+            with self._lock:
+                matched = [key for key in self._index if regex.match(key)]
+                self._invalidated_keys.update(matched)
             
-            # 遍歷所有緩存文件
-            for cache_file in self.cache_dir.glob('*.cache'):
-                key = cache_file.stem
-                if regex.match(key):
-                    self._invalidated_keys.add(key)
-                    count += 1
-            
-            logger.info(f"根據模式 '{pattern}' 失效了 {count} 個緩存")
-            return count
+            logger.info(f"根據模式 '{pattern}' 失效了 {len(matched)} 個緩存")
+            return len(matched)
             
         except Exception as e:
             logger.error(f"根據模式失效緩存失敗 '{pattern}': {e}")
@@ -295,21 +384,19 @@ class DataCache:
     
     def clear_invalidated(self) -> int:
         """
-        清除所有已失效的緩存（實際刪除文件）
+        清除所有已失效的緩存（實際刪除數據）
         
-        此方法會刪除所有被手動失效的緩存文件，並清空失效集合。
+        此方法會刪除所有被手動失效的緩存記錄，並清空失效集合。
         
         返回:
             int: 刪除的緩存數量
         """
-        count = 0
-        for key in list(self._invalidated_keys):
-            if self.delete(key):
-                count += 1
-        
-        self._invalidated_keys.clear()
-        logger.info(f"已清除 {count} 個失效緩存")
-        return count
+        with self._lock:
+            keys = [key for key in self._invalidated_keys if key in self._index]
+            self._delete_many(keys)
+            self._invalidated_keys.clear()
+        logger.info(f"已清除 {len(keys)} 個失效緩存")
+        return len(keys)
     
     def get_cache_info(self, cache_key: str) -> Optional[Dict[str, Any]]:
         """
@@ -321,44 +408,24 @@ class DataCache:
         返回:
             dict: 緩存信息，包含創建時間、過期時間、數據類型等
         """
-        meta_file = self._get_meta_file(cache_key)
-        cache_file = self._get_cache_file(cache_key)
-        
-        if not meta_file.exists():
+        entry = self._index.get(cache_key)
+        if entry is None:
             return None
         
-        try:
-            with open(meta_file, 'r') as f:
-                meta = json.load(f)
-            
-            created_at = datetime.fromisoformat(meta['created_at'])
-            duration = self._get_cache_duration_for_key(cache_key)
-            age = (datetime.now() - created_at).total_seconds()
-            
-            # 推斷數據類型
-            data_type = 'unknown'
-            for dt, patterns in DATA_TYPE_PATTERNS.items():
-                for pattern in patterns:
-                    if re.match(pattern, cache_key, re.IGNORECASE):
-                        data_type = dt
-                        break
-                if data_type != 'unknown':
-                    break
-            
-            return {
-                'key': cache_key,
-                'data_type': data_type,
-                'created_at': meta['created_at'],
-                'ttl': duration,
-                'age_seconds': age,
-                'is_valid': age < duration and cache_key not in self._invalidated_keys,
-                'is_invalidated': cache_key in self._invalidated_keys,
-                'file_size': cache_file.stat().st_size if cache_file.exists() else 0,
-            }
-            
-        except Exception as e:
-            logger.error(f"獲取緩存信息失敗 '{cache_key}': {e}")
-            return None
+        created_at, expires_at, size = entry
+        age = time.time() - created_at
+        is_invalidated = cache_key in self._invalidated_keys
+        return {
+            'key': cache_key,
+            'data_type': self._get_data_type_for_key(cache_key),
+            'created_at': datetime.fromtimestamp(created_at).isoformat(),
+            'ttl': round(expires_at - created_at),
+            'age_seconds': age,
+            'is_valid': time.time() < expires_at and not is_invalidated,
+            'is_invalidated': is_invalidated,
+            'file_size': size,
+            'in_memory': cache_key in self._memory,
+        }
     
     def get_all_cache_info(self) -> List[Dict[str, Any]]:
         """
@@ -367,15 +434,21 @@ class DataCache:
         返回:
             list: 所有緩存的信息列表
         """
-        cache_info_list = []
-        
-        for cache_file in self.cache_dir.glob('*.cache'):
-            key = cache_file.stem
-            info = self.get_cache_info(key)
-            if info:
-                cache_info_list.append(info)
-        
-        return cache_info_list
+        with self._lock:
+            keys = list(self._index)
+        return [info for info in (self.get_cache_info(key) for key in keys) if info]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """兩級緩存的命中統計"""
+        lookups = self.stats['memory_hits'] + self.stats['disk_hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'entries': len(self._index),
+            'memory_entries': len(self._memory),
+            'memory_bytes': self._memory_bytes,
+            'memory_budget_bytes': self.memory_budget_bytes,
+            'hit_rate': round((self.stats['memory_hits'] + self.stats['disk_hits']) / lookups, 4) if lookups else 0.0,
+        }
     
     def set(self, key: str, data: Any, ttl: Optional[int] = None) -> bool:
         """
@@ -389,30 +462,25 @@ class DataCache:
         返回: bool
         """
         try:
-            cache_file = self._get_cache_file(key)
-            meta_file = self._get_meta_file(key)
-            
-            # 如果緩存鍵之前被手動失效，現在重新設置時移除失效標記
-            if key in self._invalidated_keys:
-                self._invalidated_keys.discard(key)
-            
-            # 保存數據
-            with open(cache_file, 'wb') as f:
-                pickle.dump(data, f)
-            
             # 確定緩存時長
             if ttl is None:
                 ttl = self._get_cache_duration_for_key(key)
             
-            # 保存元數據
-            meta = {
-                'created_at': datetime.now().isoformat(),
-                'ttl': ttl,
-                'expires_at': (datetime.now() + timedelta(seconds=ttl)).isoformat()
-            }
-            
-            with open(meta_file, 'w') as f:
-                json.dump(meta, f)
+            payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+            created_at = time.time()
+            expires_at = created_at + ttl
+            
+            with self._lock:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO cache_entries (key, payload, created_at, expires_at, size) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (key, sqlite3.Binary(payload), created_at, expires_at, len(payload))
+                )
+                self._conn.commit()
+                self._index[key] = (created_at, expires_at, len(payload))
+                self._memory_put(key, payload)
+                # 如果緩存鍵之前被手動失效，現在重新設置時移除失效標記
+                self._invalidated_keys.discard(key)
             
             logger.info(f"緩存已設置: {key} (TTL: {ttl}秒)")
             return True
@@ -427,32 +495,51 @@ class DataCache:
         
         參數:
             key: 緩存鍵
-            duration: 自定義緩存時長（秒），用於覆蓋默認的數據類型特定時長
+            duration: 自定義緩存時長（秒），用於覆蓋寫入時確定的過期時間
         
         返回: 緩存的數據，如果不存在或過期則返回None
         """
         try:
-            # 使用增強的緩存有效性檢查
-            if not self._is_cache_valid(key, duration):
-                # 如果緩存無效，嘗試刪除過期的緩存文件
-                cache_file = self._get_cache_file(key)
-                if cache_file.exists():
-                    self.delete(key)
-                return None
-            
-            cache_file = self._get_cache_file(key)
-            
-            # 讀取數據
-            with open(cache_file, 'rb') as f:
-                data = pickle.load(f)
-            
-            logger.info(f"緩存命中: {key}")
-            return data
+            with self._lock:
+                # 使用增強的緩存有效性檢查（內存索引，必要時回查 SQLite）
+                if not self._is_cache_valid(key, duration):
+                    # 如果緩存無效，刪除過期的緩存記錄
+                    if key in self._index:
+                        self.delete(key)
+                    self.stats['misses'] += 1
+                    return None
+                
+                payload = self._memory.get(key)
+                if payload is not None:
+                    self._memory.move_to_end(key)
+                    self.stats['memory_hits'] += 1
+                else:
+                    row = self._conn.execute(
+                        'SELECT payload FROM cache_entries WHERE key = ?', (key,)
+                    ).fetchone()
+                    if row is None:
+                        self._forget([key])
+                        self.stats['misses'] += 1
+                        return None
+                    payload = bytes(row[0])
+                    self._memory_put(key, payload)
+                    self.stats['disk_hits'] += 1
+            
+            logger.debug(f"緩存命中: {key}")
+            return pickle.loads(payload)
             
         except Exception as e:
             logger.error(f"獲取緩存失敗 {key}: {e}")
             return None
     
+    def _delete_many(self, keys: List[str]):
+        if not keys:
+            return
+        with self._lock:
+            self._conn.executemany('DELETE FROM cache_entries WHERE key = ?', [(key,) for key in keys])
+            self._conn.commit()
+            self._forget(keys)
+    
     def delete(self, key: str) -> bool:
         """
         刪除緩存
@@ -463,15 +550,7 @@ class DataCache:
         返回: bool
         """
         try:
-            cache_file = self._get_cache_file(key)
-            meta_file = self._get_meta_file(key)
-            
-            if cache_file.exists():
-                cache_file.unlink()
-            
-            if meta_file.exists():
-                meta_file.unlink()
-            
+            self._delete_many([key])
             logger.info(f"緩存已刪除: {key}")
             return True
             
@@ -486,13 +565,12 @@ class DataCache:
         返回: 清除的緩存數量
         """
         try:
-            count = 0
-            for file in self.cache_dir.glob('*.cache'):
-                file.unlink()
-                count += 1
-            
-            for file in self.cache_dir.glob('*.meta'):
-                file.unlink()
+            with self._lock:
+                count = self._conn.execute('DELETE FROM cache_entries').rowcount
+                self._conn.commit()
+                self._index.clear()
+                self._memory.clear()
+                self._memory_bytes = 0
             
             logger.info(f"已清除所有緩存，共 {count} 個")
             return count
@@ -503,26 +581,16 @@ class DataCache:
     
     def clear_expired(self) -> int:
         """
-        清除過期緩存
+        清除過期緩存（按 expires_at 索引批量刪除）
         
         返回: 清除的緩存數量
         """
         try:
-            count = 0
-            for meta_file in self.cache_dir.glob('*.meta'):
-                try:
-                    with open(meta_file, 'r') as f:
-                        meta = json.load(f)
-                    
-                    expires_at = datetime.fromisoformat(meta['expires_at'])
-                    if datetime.now() > expires_at:
-                        # 提取key
-                        key = meta_file.stem
-                        self.delete(key)
-                        count += 1
-                        
-                except Exception:
-                    continue
+            now = time.time()
+            with self._lock:
+                count = self._conn.execute('DELETE FROM cache_entries WHERE expires_at <= ?', (now,)).rowcount
+                self._conn.commit()
+                self._forget([key for key, (_, expires_at, _) in self._index.items() if expires_at <= now])
             
             logger.info(f"已清除過期緩存，共 {count} 個")
             return count
@@ -537,11 +605,78 @@ class DataCache:
         
         參數:
             key: 緩存鍵
-            duration: 自定義緩存時長（秒），用於覆蓋默認的數據類型特定時長
+            duration: 自定義緩存時長（秒），用於覆蓋寫入時確定的過期時間
         
         返回: bool
         """
         return self._is_cache_valid(key, duration)
+    
+    def close(self):
+        """關閉 SQLite 連接"""
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache: Optional[DataCache] = None
+_default_lock = threading.Lock()
+
+
+def get_data_cache() -> DataCache:
+    """進程內共享的數據緩存（DataFetcher 慢變數據與盤前預熱服務共用）"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            from config.settings import settings
+            _default_cache = DataCache(cache_dir=settings.CACHE_DIR, ttl=settings.CACHE_TTL)
+        return _default_cache
+
+
+def _is_empty(result: Any) -> bool:
+    """None 與空容器視為獲取失敗，不寫入緩存"""
+    if result is None:
+        return True
+    return isinstance(result, (list, tuple, dict, str)) and not result
+
+
+def persisted(key_prefix: str, until_close: bool = False):
+    """
+    方法裝飾器：結果寫入共享 DataCache，有效期內跨實例 / 跨進程直接返回
+
+    緩存鍵為 key_prefix + 大寫參數（默認值已補齊），例如 earnings_calendar_AAPL，
+    有效期按鍵前綴對應的數據類型（DATA_TYPE_PATTERNS）確定；
+    until_close=True 時有效期至少延續到當天收盤，盤前預熱寫入的慢變數據在開盤後仍然有效。
+    被裝飾的方法暴露 cache_key(*args, **kwargs)，供預熱服務檢查覆蓋率。
+    """
+    def wrap(method):
+        signature = inspect.signature(method)
+
+        def key_for(*args, **kwargs) -> str:
+            bound = signature.bind(None, *args, **kwargs)
+            bound.apply_defaults()
+            parts = [str(v).upper() for v in list(bound.arguments.values())[1:]]
+            return key_prefix + '_'.join(parts) if parts else key_prefix.rstrip('_')
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            from config.settings import settings
+            if not settings.FETCH_CACHE_ENABLED:
+                return method(self, *args, **kwargs)
+            key = key_for(*args, **kwargs)
+            cache = get_data_cache()
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+            result = method(self, *args, **kwargs)
+            if not _is_empty(result):
+                ttl = None
+                if until_close:
+                    ttl = max(cache._get_cache_duration_for_key(key), seconds_until_close())
+                cache.set(key, result, ttl=ttl)
+            return result
+
+        wrapper.cache_key = key_for
+        return wrapper
+    return wrap
 
 
 # 使用示例
@@ -9,9 +9,13 @@ import pandas as pd
 import numpy as np
 from fredapi import Fred
 import finnhub
+import threading
 import time
 import traceback
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
+from itertools import groupby
 from typing import Dict, Optional, Any, List
 import logging
 import sys
@@ -23,6 +27,14 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config.settings import settings
 from config.api_config import api_config
+from data_layer.fetch_plan import ConcurrentFetchPlan, FetchStep
+from data_layer.data_cache import persisted
+from data_layer.single_flight import coalesced, get_single_flight
+from data_layer.utils.rate_limiter import rate_limiters
+from data_layer.http_session import http_sessions
+from data_layer.ibkr_historical_scheduler import get_historical_scheduler
+from data_layer.ibkr_market_data_lines import get_market_data_lines
+from data_layer.option_chain_normalizer import OptionChainNormalizer
 
 # 尝试导入交易日计算器（可选）
 try:
@@ -456,6 +468,14 @@ class DataFetcher:
         # API 故障記錄（用於報告）
         self.api_failures = {}  # {api_name: [error_messages]}
         self.fallback_used = {}  # {data_type: [used_sources]}
+        self._fallback_lock = threading.RLock()  # 並發抓取時保護故障 / 降級記錄（api_failures、fallback_used）
+        self.last_fetch_plan_report = None  # 最近一次並發抓取計劃的耗時報告
+        
+        # 對沖（競速）抓取：主數據源超出延遲預算時並發啟動下一個數據源
+        self.hedged_fetch_enabled = settings.HEDGED_FETCH_ENABLED
+        self._source_latencies = {}  # {(data_type, source): deque[(秒, 是否成功)]}
+        self._latency_lock = threading.Lock()
+        self._hedge_executor = None
         
         # 模塊執行狀態追蹤（Task 20.1）
         self.module_status = {}  # {module_name: {'status': 'success'|'skipped'|'failed', 'reason': str|None}}
@@ -860,9 +880,6 @@ class DataFetcher:
         
         Requirements: 5.3, 5.4, 7.1, 7.2, 7.3, 7.4
         """
-        if api_name not in self.api_failures:
-            self.api_failures[api_name] = []
-        
         # 構建詳細的錯誤記錄
         error_record = {
             'timestamp': datetime.now().isoformat(),
@@ -911,10 +928,10 @@ class DataFetcher:
             # 截斷過長的堆棧信息
             error_record['stack_trace'] = stack_trace[:2000] if len(stack_trace) > 2000 else stack_trace
         
-        self.api_failures[api_name].append(error_record)
-        
-        # 錯誤日誌清理機制
-        self._cleanup_api_failure_records(api_name)
+        with self._fallback_lock:
+            self.api_failures.setdefault(api_name, []).append(error_record)
+            # 錯誤日誌清理機制
+            self._cleanup_api_failure_records(api_name)
         
         # 記錄日誌（使用結構化格式）
         log_parts = [f"API 故障: {api_name}"]
@@ -1050,28 +1067,29 @@ class DataFetcher:
         
         Requirements: 7.1, 7.2
         """
-        if api_name not in self.api_failures:
-            return
-        
-        records = self.api_failures[api_name]
-        
-        # 限制: 每個 API 最多保留 100 條記錄
-        max_records = getattr(settings, 'MAX_API_FAILURE_RECORDS', 100)
-        if len(records) > max_records:
-            self.api_failures[api_name] = records[-max_records:]
-            logger.debug(f"清理 {api_name} 故障記錄，保留最近 {max_records} 條")
-        
-        # 清理超過 24 小時的記錄
-        retention_hours = getattr(settings, 'API_FAILURE_RETENTION_HOURS', 24)
-        cutoff_time = datetime.now() - timedelta(hours=retention_hours)
-        
-        original_count = len(self.api_failures[api_name])
-        self.api_failures[api_name] = [
-            record for record in self.api_failures[api_name]
-            if self._parse_timestamp(record.get('timestamp', '')) > cutoff_time
-        ]
-        
-        cleaned_count = original_count - len(self.api_failures[api_name])
+        with self._fallback_lock:
+            if api_name not in self.api_failures:
+                return
+            
+            records = self.api_failures[api_name]
+            
+            # 限制: 每個 API 最多保留 100 條記錄
+            max_records = getattr(settings, 'MAX_API_FAILURE_RECORDS', 100)
+            if len(records) > max_records:
+                records = records[-max_records:]
+                logger.debug(f"清理 {api_name} 故障記錄，保留最近 {max_records} 條")
+            
+            # 清理超過 24 小時的記錄
+            retention_hours = getattr(settings, 'API_FAILURE_RETENTION_HOURS', 24)
+            cutoff_time = datetime.now() - timedelta(hours=retention_hours)
+            
+            original_count = len(records)
+            self.api_failures[api_name] = [
+                record for record in records
+                if self._parse_timestamp(record.get('timestamp', '')) > cutoff_time
+            ]
+            
+            cleaned_count = original_count - len(self.api_failures[api_name])
         if cleaned_count > 0:
             logger.debug(f"清理 {api_name} 過期故障記錄: {cleaned_count} 條")
     
@@ -1335,8 +1353,9 @@ class DataFetcher:
         
         遍歷所有 API 並執行清理操作。
         """
-        for api_name in list(self.api_failures.keys()):
-            self._cleanup_api_failure_records(api_name)
+        with self._fallback_lock:
+            for api_name in list(self.api_failures.keys()):
+                self._cleanup_api_failure_records(api_name)
         
         logger.info("已清理所有 API 故障記錄")
     
@@ -1612,62 +1631,6 @@ class DataFetcher:
         except (ValueError, TypeError):
             return default
     
-    def _fill_missing_bid_ask(self, option_df: pd.DataFrame, option_type: str = 'call') -> pd.DataFrame:
-        """
-        填補缺失的 bid/ask 數據
-        
-        當期權數據缺失 bid/ask 時，使用估算值填補
-        
-        參數:
-            option_df: 期權 DataFrame
-            option_type: 'call' 或 'put'
-        
-        返回:
-            DataFrame: 填補後的期權數據
-        
-        Requirements: Code_Fix_Plan.md - 問題3
-        """
-        if option_df.empty:
-            return option_df
-        
-        if not BID_ASK_ESTIMATOR_AVAILABLE or BidAskEstimator is None:
-            return option_df
-        
-        result_df = option_df.copy()
-        filled_count = 0
-        
-        for idx, row in result_df.iterrows():
-            bid = row.get('bid')
-            ask = row.get('ask')
-            
-            # 檢查是否需要估算
-            needs_estimation = (
-                pd.isna(bid) or pd.isna(ask) or
-                bid <= 0 or ask <= 0
-            )
-            
-            if needs_estimation:
-                market_price = row.get('lastPrice') or row.get('last')
-                
-                if market_price and market_price > 0:
-                    estimated = BidAskEstimator.estimate_bid_ask(
-                        market_price=market_price,
-                        open_interest=self._safe_int(row.get('openInterest')),
-                        volume=self._safe_int(row.get('volume')),
-                        option_type=option_type
-                    )
-                    
-                    if estimated:
-                        result_df.at[idx, 'bid'] = estimated['bid']
-                        result_df.at[idx, 'ask'] = estimated['ask']
-                        result_df.at[idx, 'bid_ask_estimated'] = True
-                        filled_count += 1
-        
-        if filled_count > 0:
-            logger.info(f"  填補了 {filled_count} 個 {option_type} 期權的 bid/ask 數據")
-        
-        return result_df
-
     def _record_fallback(
         self, 
         data_type: str, 
@@ -1862,109 +1825,6 @@ class DataFetcher:
     
     # ==================== Task 16: API Degradation Chain and Retry Mechanisms ====================
     
-    # Task 16.1: Enhanced API degradation logic
-    FALLBACK_TRIGGERS = [
-        ConnectionError,
-        TimeoutError,
-        Exception,  # Includes HTTPError, DataValidationError, etc.
-    ]
-    
-    def _fetch_with_fallback(self, data_type: str, sources: List[str], fetch_func_map: Dict[str, callable], *args, **kwargs):
-        """
-        Fetch data with fallback mechanism through multiple sources.
-        
-        Implements the API degradation chain by attempting each data source in priority order.
-        Logs each attempt and records failures for diagnostics.
-        
-        Args:
-            data_type: Type of data being fetched (e.g., 'stock_info', 'option_chain')
-            sources: List of data source names in priority order
-            fetch_func_map: Dict mapping source names to fetch functions
-            *args, **kwargs: Arguments to pass to fetch functions
-        
-        Returns:
-            Data from the first successful source, or None if all fail
-        
-        Requirements: 1.3, 1.4, 2.3, 2.4, 3.1
-        """
-        # Initialize attempt path tracking if not exists
-        if not hasattr(self, '_attempt_paths'):
-            self._attempt_paths = {}
-        
-        if data_type not in self._attempt_paths:
-            self._attempt_paths[data_type] = {'history': [], 'current_attempt': []}
-        
-        current_attempt = []
-        
-        for source in sources:
-            fetch_func = fetch_func_map.get(source)
-            
-            if not fetch_func:
-                logger.debug(f"  {source}: No fetch function available, skipping")
-                continue
-            
-            try:
-                logger.info(f"Attempting {source} for {data_type}...")
-                
-                # Attempt to fetch data
-                result = fetch_func(*args, **kwargs)
-                
-                if result is not None:
-                    # Success
-                    logger.info(f"✓ {source} succeeded for {data_type}")
-                    current_attempt.append({
-                        'source': source,
-                        'success': True,
-                        'error_reason': None,
-                        'timestamp': datetime.now().isoformat()
-                    })
-                    
-                    # Record successful fallback
-                    self._record_fallback(data_type, source, success=True)
-                    
-                    # Save attempt history
-                    self._attempt_paths[data_type]['history'].append(current_attempt)
-                    
-                    return result
-                else:
-                    # Returned None - treat as failure
-                    error_msg = "Returned None or empty data"
-                    logger.warning(f"{source} failed: {error_msg}, trying next source...")
-                    
-                    current_attempt.append({
-                        'source': source,
-                        'success': False,
-                        'error_reason': error_msg,
-                        'timestamp': datetime.now().isoformat()
-                    })
-                    
-                    self._record_fallback_failure(data_type, source, error_msg)
-                    
-            except Exception as e:
-                # Exception occurred
-                error_type = type(e).__name__
-                error_message = str(e)
-                full_error = f"{error_type} - {error_message}"
-                
-                logger.warning(f"{source} failed: {full_error}, trying next source...")
-                
-                current_attempt.append({
-                    'source': source,
-                    'success': False,
-                    'error_reason': full_error,
-                    'timestamp': datetime.now().isoformat()
-                })
-                
-                # Record API failure
-                self._record_api_failure(source, error_message, operation=f'fetch_{data_type}')
-                self._record_fallback_failure(data_type, source, full_error)
-        
-        # All sources failed
-        logger.error(f"✗ All sources failed for {data_type}")
-        self._attempt_paths[data_type]['history'].append(current_attempt)
-        
-        return None
-    
     # Task 16.2: Intelligent retry mechanism with exponential backoff
     def _retry_with_backoff(self, func: callable, max_retries: int = 3, base_delay: float = 2.0, *args, **kwargs):
         """
@@ -2256,6 +2116,28 @@ class DataFetcher:
             # 降級使用統計（Requirements 6.3）
             'fallback_statistics': self.get_attempt_path_summary(),
             
+            # 各數據源延遲分佈（對沖抓取的預算依據）
+            'source_latency': self.get_source_latency_histogram(),
+            
+            # 相同請求合併統計（進程內所有 DataFetcher 共用）
+            'request_coalescing': get_single_flight().stats(),
+            
+            # 共享令牌桶狀態（各數據源速率與退避）
+            'rate_limiters': rate_limiters.stats(),
+            
+            # HTTP 連接池復用統計（新建連接數 vs 請求數）
+            'http_connections': http_sessions.stats(),
+            
+            # IBKR 行情線利用率（所有 IB 使用方共享同一預算）
+            'market_data_lines': get_market_data_lines().metrics(),
+            
+            # IBKR 歷史數據調度（pacing 窗口使用量、排隊與去重）
+            'historical_pacing': get_historical_scheduler().stats(),
+            
+            # Finviz 基本面每日快照命中統計
+            'finviz_snapshot': (self.finviz_scraper.snapshot_store.stats()
+                                if self.finviz_scraper and self.finviz_scraper.snapshot_store else None),
+            
             # 數據源健康度評分（Requirements 6.5）
             'health_score': health_score,
             
@@ -2480,30 +2362,24 @@ class DataFetcher:
         
         return health
     
-    def _rate_limit_delay(self, retry_count: int = 0):
+    def _rate_limit_delay(self, retry_count: int = 0, provider: str = 'yfinance'):
         """
-        请求速率限制（帶指數退避）
+        请求速率限制（共享令牌桶，帶指數退避）
         
         參數:
             retry_count: 重試次數（用於指數退避）
+            provider: 數據源名稱（api_config.RATE_LIMITS 的鍵）
         """
-        elapsed = time.time() - self.last_request_time
-        
-        # 基礎延遲
-        base_delay = self.request_delay
+        limiter = rate_limiters.get(provider, default_interval=self.request_delay)
         
-        # 如果是重試，使用指數退避
+        # 如果是重試，使用指數退避（暫停該數據源的令牌發放）
         if retry_count > 0:
             # 指數退避: 2^retry_count * base_delay，最多 30 秒
-            backoff_delay = min(base_delay * (2 ** retry_count), 30.0)
+            backoff_delay = min(self.request_delay * (2 ** retry_count), 30.0)
             logger.info(f"重試 #{retry_count}，使用指數退避延遲: {backoff_delay:.2f}秒")
-            time.sleep(backoff_delay)
-        elif elapsed < base_delay:
-            # 正常速率限制
-            sleep_time = base_delay - elapsed
-            logger.debug(f"速率限制延迟: {sleep_time:.2f}秒")
-            time.sleep(sleep_time)
+            limiter.backoff(backoff_delay)
         
+        limiter.acquire()
         self.last_request_time = time.time()
     def _merge_with_priority(self, target: Dict, source: Dict) -> Dict:
         """
@@ -2564,100 +2440,76 @@ class DataFetcher:
         logger.info(f"獲取 {ticker} 實時報價（Quote Primary）...")
         
         # 方案1: Finnhub（最高優先級）
-        if self.finnhub_client:
-            try:
-                logger.info("  使用 Finnhub API...")
-                self._rate_limit_delay()
-                
-                quote = self.finnhub_client.quote(ticker)
-                
-                if quote and quote.get('c', 0) > 0:
-                    quote_data: StockQuoteSchema = {
-                        'ticker': ticker,
-                        'current_price': quote.get('c', 0),
-                        'open': quote.get('o', 0),
-                        'intraday_high': quote.get('h', 0),
-                        'intraday_low': quote.get('l', 0),
-                        'previous_close': quote.get('pc', 0),
-                        'change': quote.get('d', 0),
-                        'change_percent': quote.get('dp', 0),
-                        'volume': None,  # Finnhub quote 不提供 volume
-                        'data_source': DataSource.FINNHUB,
-                        'is_market_hours': True,
-                        'data_timestamp': _dt.now().isoformat(),
-                    }
-                    
-                    logger.info(f"* 成功獲取 {ticker} 報價 (Finnhub): ${quote_data['current_price']:.2f}")
-                    self._record_fallback('stock_quote', DataSource.FINNHUB)
-                    return quote_data
-                else:
-                    logger.warning("! Finnhub 返回無效數據")
-                    self._record_fallback_failure('stock_quote', DataSource.FINNHUB, '返回無效數據')
-            except Exception as e:
-                logger.warning(f"! Finnhub 獲取失敗: {e}")
-                self._record_api_failure('Finnhub', f"get_stock_quote_primary: {e}")
-                self._record_fallback_failure('stock_quote', DataSource.FINNHUB, str(e))
-        
+        def from_finnhub():
+            self._rate_limit_delay(provider='finnhub')
+            quote = self.finnhub_client.quote(ticker)
+            if not quote or quote.get('c', 0) <= 0:
+                return None
+            return {
+                'ticker': ticker,
+                'current_price': quote.get('c', 0),
+                'open': quote.get('o', 0),
+                'intraday_high': quote.get('h', 0),
+                'intraday_low': quote.get('l', 0),
+                'previous_close': quote.get('pc', 0),
+                'change': quote.get('d', 0),
+                'change_percent': quote.get('dp', 0),
+                'volume': None,  # Finnhub quote 不提供 volume
+                'data_source': DataSource.FINNHUB,
+                'is_market_hours': True,
+                'data_timestamp': _dt.now().isoformat(),
+            }
+
         # 方案2: Alpha Vantage
-        if hasattr(self, 'alpha_vantage_client') and self.alpha_vantage_client:
-            try:
-                logger.info("  使用 Alpha Vantage API...")
-                quote_data_av = self.alpha_vantage_client.get_quote(ticker)
-                
-                if quote_data_av and quote_data_av.get('current_price', 0) > 0:
-                    quote_data: StockQuoteSchema = {
-                        'ticker': ticker,
-                        'current_price': quote_data_av.get('current_price', 0),
-                        'open': quote_data_av.get('open', 0),
-                        'intraday_high': quote_data_av.get('high', 0),
-                        'intraday_low': quote_data_av.get('low', 0),
-                        'previous_close': quote_data_av.get('previous_close', 0),
-                        'volume': quote_data_av.get('volume', 0),
-                        'change': quote_data_av.get('change', 0),
-                        'change_percent': quote_data_av.get('change_percent', 0),
-                        'data_source': DataSource.ALPHA_VANTAGE,
-                        'data_timestamp': _dt.now().isoformat(),
-                    }
-                    
-                    logger.info(f"* 成功獲取 {ticker} 報價 (Alpha Vantage): ${quote_data['current_price']:.2f}")
-                    self._record_fallback('stock_quote', DataSource.ALPHA_VANTAGE)
-                    return quote_data
-                else:
-                    logger.warning("! Alpha Vantage 返回無效數據")
-                    self._record_fallback_failure('stock_quote', DataSource.ALPHA_VANTAGE, '返回無效數據')
-            except Exception as e:
-                logger.warning(f"! Alpha Vantage 獲取失敗: {e}")
-                self._record_api_failure('Alpha Vantage', f"get_stock_quote_primary: {e}")
-                self._record_fallback_failure('stock_quote', DataSource.ALPHA_VANTAGE, str(e))
-        
+        def from_alpha_vantage():
+            quote_data_av = self.alpha_vantage_client.get_quote(ticker)
+            if not quote_data_av or quote_data_av.get('current_price', 0) <= 0:
+                return None
+            return {
+                'ticker': ticker,
+                'current_price': quote_data_av.get('current_price', 0),
+                'open': quote_data_av.get('open', 0),
+                'intraday_high': quote_data_av.get('high', 0),
+                'intraday_low': quote_data_av.get('low', 0),
+                'previous_close': quote_data_av.get('previous_close', 0),
+                'volume': quote_data_av.get('volume', 0),
+                'change': quote_data_av.get('change', 0),
+                'change_percent': quote_data_av.get('change_percent', 0),
+                'data_source': DataSource.ALPHA_VANTAGE,
+                'data_timestamp': _dt.now().isoformat(),
+            }
+
         # 方案3: yfinance（最後備用）
-        try:
+        def from_yfinance():
             self._rate_limit_delay()
-            logger.info("  使用 yfinance...")
-            stock = yf.Ticker(ticker)
-            info = stock.info
-            
-            if info.get('currentPrice', 0) > 0 or info.get('regularMarketPrice', 0) > 0:
-                current_price = info.get('currentPrice') or info.get('regularMarketPrice', 0)
-                quote_data: StockQuoteSchema = {
-                    'ticker': ticker,
-                    'current_price': current_price,
-                    'open': info.get('open', 0),
-                    'intraday_high': info.get('dayHigh', 0),
-                    'intraday_low': info.get('dayLow', 0),
-                    'previous_close': info.get('previousClose', 0),
-                    'volume': info.get('volume', 0),
-                    'data_source': DataSource.YFINANCE,
-                    'data_timestamp': _dt.now().isoformat(),
-                }
-                
-                logger.info(f"* 成功獲取 {ticker} 報價 (yfinance): ${quote_data['current_price']:.2f}")
-                self._record_fallback('stock_quote', DataSource.YFINANCE)
-                return quote_data
-        except Exception as e:
-            logger.error(f"x yfinance 獲取報價失敗: {e}")
-            self._record_api_failure('yfinance', f"get_stock_quote_primary: {e}")
-        
+            info = yf.Ticker(ticker).info
+            current_price = info.get('currentPrice') or info.get('regularMarketPrice', 0)
+            if not current_price or current_price <= 0:
+                return None
+            return {
+                'ticker': ticker,
+                'current_price': current_price,
+                'open': info.get('open', 0),
+                'intraday_high': info.get('dayHigh', 0),
+                'intraday_low': info.get('dayLow', 0),
+                'previous_close': info.get('previousClose', 0),
+                'volume': info.get('volume', 0),
+                'data_source': DataSource.YFINANCE,
+                'data_timestamp': _dt.now().isoformat(),
+            }
+
+        fetchers = {}
+        if self.finnhub_client:
+            fetchers[DataSource.FINNHUB] = from_finnhub
+        if getattr(self, 'alpha_vantage_client', None):
+            fetchers[DataSource.ALPHA_VANTAGE] = from_alpha_vantage
+        fetchers[DataSource.YFINANCE] = from_yfinance
+
+        quote_data: Optional[StockQuoteSchema] = self._fetch_with_fallback('stock_quote', list(fetchers), fetchers)
+        if quote_data:
+            logger.info(f"* 成功獲取 {ticker} 報價 ({quote_data['data_source'].value}): ${quote_data['current_price']:.2f}")
+            return quote_data
+
         logger.error(f"x 無法獲取 {ticker} 報價（所有來源失敗）")
         return None
     
@@ -2739,7 +2591,7 @@ class DataFetcher:
         if self.finnhub_client:
             try:
                 logger.info("  使用 Finnhub API...")
-                self._rate_limit_delay()
+                self._rate_limit_delay(provider='finnhub')
                 
                 profile = self.finnhub_client.company_profile2(symbol=ticker)
                 
@@ -2935,6 +2787,7 @@ class DataFetcher:
         duration_seconds: int = 60,
         min_block_size: int   = 10_000,
         method: str           = 'both',
+        avg_volume_baseline: Optional[int] = None,
     ) -> Optional[Dict[str, Any]]:
         """
         Layer 2：Dark Pool 數據聚合函式
@@ -2962,7 +2815,8 @@ class DataFetcher:
               'vwap':               Optional[float],
               'block_count':        int,
               'block_volume':       int,
-              'raw_ticks':          List[TickByTickData],  # 原始 DP tick
+              'raw_ticks':          List[Dict],  # DP 成交 {'time', 'price', 'size'}
+              'tick_flow':          Optional[Dict],  # 同一窗口的模塊 35/36/38 + VWAP（Tick 環形緩衝區）
               'duration_seconds':   int,
               'data_source':        'ibkr_dp',
               'data_quality':       str,        # 'complete' | 'partial' | 'unavailable'
@@ -2983,6 +2837,7 @@ class DataFetcher:
             duration_seconds=duration_seconds,
             min_block_size=min_block_size,
             method=method,
+            avg_volume_baseline=avg_volume_baseline,
         )
 
         if raw is None:
@@ -3036,6 +2891,7 @@ class DataFetcher:
             'block_count':       raw.get('dp_block_count', 0),
             'block_volume':      raw.get('dp_block_volume', 0),
             'raw_ticks':         raw.get('dp_ticks', []),
+            'tick_flow':         raw.get('tick_flow'),
             'duration_seconds':  duration_seconds,
             'data_source':       'ibkr_dp',
             'data_quality':      data_quality,
@@ -3073,6 +2929,14 @@ class DataFetcher:
     # 未來將逐步遷移到新的 get_stock_quote_primary + merge_stock_snapshot
     # ========================================================================
     
+    # 實時報價字段：Finviz 本地快照命中時保留 Finnhub / Alpha Vantage 的值
+    LIVE_QUOTE_FIELDS = (
+        'current_price', 'open', 'high', 'low', 'intraday_high', 'intraday_low',
+        'previous_close', 'change', 'change_percent', 'volume', 'is_market_hours',
+        'data_timestamp', 'data_source'
+    )
+
+    @coalesced('stock_info')
     def get_stock_info(self, ticker, **kwargs):
         """
         獲取股票基本信息（支持多数据源降级）
@@ -3100,13 +2964,14 @@ class DataFetcher:
         }
         """
         logger.info(f"開始獲取 {ticker} 基本信息...")
+        stock_data = None
         
         # 方案1: Finnhub（實時股價，最高優先級）
         # 注意: IBKR 只用於期權數據，股票價格優先使用 Finnhub 免費實時報價
         if self.finnhub_client:
             try:
                 logger.info("  使用 Finnhub API...")
-                self._rate_limit_delay()
+                self._rate_limit_delay(provider='finnhub')
                 
                 # 獲取實時報價
                 quote = self.finnhub_client.quote(ticker)
@@ -3226,6 +3091,12 @@ class DataFetcher:
                 logger.info("  使用 Finviz...")
                 finviz_data = self.finviz_scraper.get_stock_fundamentals(ticker)
                 
+                # 本地快照只含慢變基本面：價格與盤中字段沿用前面的實時報價
+                # （沒有實時報價時，驗證步驟會從 yfinance 補充價格）
+                live_quote = stock_data if finviz_data and finviz_data.get('snapshot_date') else None
+                if live_quote and live_quote.get('current_price'):
+                    finviz_data = {**finviz_data, 'price': live_quote['current_price']}
+                
                 if finviz_data:
                     # 驗證和補充 Finviz 數據
                     validated_data = self._validate_and_supplement_finviz_data(finviz_data, ticker)
@@ -3267,6 +3138,11 @@ class DataFetcher:
                             'supplemented_fields': validated_data.get('supplemented_fields', []),
                             'data_quality': validated_data.get('data_quality', 'complete')
                         }
+                        if live_quote:
+                            stock_data.update({
+                                field: live_quote[field] for field in self.LIVE_QUOTE_FIELDS
+                                if live_quote.get(field) is not None
+                            })
                         
                         logger.info(f"* 成功獲取 {ticker} 基本信息 (Finviz)")
                         logger.info(f"  當前股價: ${stock_data['current_price']:.2f}")
@@ -3454,7 +3330,43 @@ class DataFetcher:
         self._record_fallback_failure('stock_info', 'All Sources', '全部失敗')
         return None
     
-    def get_historical_data(self, ticker, period='1mo', interval='1d', max_retries=3):
+    @coalesced('historical_data')
+    def get_historical_data(self, ticker, period='1mo', interval='1d', max_retries=3,
+                            days=None, end_date=None):
+        """
+        獲取歷史OHLCV數據（經本地增量 K 線存儲）
+
+        本地已覆蓋請求區間時只向數據源請求最後一根K線之後的缺失部分，
+        拆股/除權導致重疊窗口不一致時自動完整重抓。
+
+        參數:
+            ticker: 股票代碼
+            period: 時間週期 ('1d', '5d', '1mo', '3mo', '1y')
+            interval: K線間隔 ('1m', '5m', '15m', '30m', '60m', '1d')
+            max_retries: 最大重試次數（默認3次）
+            days: 回看天數（指定時覆蓋 period）
+            end_date: 截止日期 'YYYY-MM-DD'（回測用，不返回之後的數據）
+
+        返回: DataFrame（只讀視圖，需要修改時請先 .copy()）
+        """
+        if days is not None:
+            period = f"{int(days)}d"
+
+        if not settings.BAR_STORE_ENABLED:
+            hist = self._download_historical_data(ticker, period, interval, max_retries)
+            if hist is not None and end_date:
+                hist = hist[pd.to_datetime(hist.index).tz_localize(None) <= pd.Timestamp(end_date) + pd.Timedelta(days=1)]
+            return hist
+
+        from data_layer.bar_store import ADJUSTED, get_bar_store
+        # 降級鏈以已復權來源為主，IBKR 在鏈中同樣請求 ADJUSTED_LAST，與 IBKR TRADES 序列分開存儲
+        return get_bar_store().get_bars(
+            ticker, interval, period,
+            lambda fetch_period: self._download_historical_data(ticker, fetch_period, interval, max_retries),
+            end_date=end_date, adjustment=ADJUSTED
+        )
+
+    def _download_historical_data(self, ticker, period='1mo', interval='1d', max_retries=3):
         """
         獲取歷史OHLCV數據（支持多數據源降級）
         
@@ -3471,218 +3383,110 @@ class DataFetcher:
         返回: DataFrame
         """
         logger.info(f"開始獲取 {ticker} 歷史數據... (週期: {period}, 間隔: {interval})")
-        
-        # 方案0: 最高優先級 - Finnhub（技術分析主來源）
-        if self.finnhub_client and interval in ['1d', 'D']:  # Finnhub 主要支持日線數據
-            try:
-                logger.info("  使用 Finnhub API (最高優先級 - 技術分析主來源)...")
-                
-                # 將 period 轉換為天數
-                period_days = {
-                    '1d': 1, '5d': 5, '1mo': 30, '3mo': 90, 
-                    '6mo': 180, '1y': 365, '2y': 730, '5y': 1825
-                }
-                days = period_days.get(period, 200)
-                
-                hist = self.get_finnhub_candles(ticker, resolution='D', days=days)
-                
-                if hist is not None and not hist.empty:
-                    logger.info(f"* 成功獲取 {ticker} 的 {len(hist)} 條歷史記錄 (Finnhub)")
-                    self._record_fallback('historical_data', 'Finnhub')
-                    return hist
-                else:
-                    logger.warning("! Finnhub 返回空數據，降級到 IBKR")
-                    self._record_fallback_failure('historical_data', 'Finnhub', '返回空數據')
-            except Exception as e:
-                logger.warning(f"! Finnhub 獲取失敗: {e}，降級到 IBKR")
-                self._record_api_failure('Finnhub', f"get_historical_data: {e}")
-                self._record_fallback_failure('historical_data', 'Finnhub', str(e))
-        
-        # 方案1: IBKR（第二優先級）
-        # 方案1: IBKR（第二優先級）
-        if self.ibkr_client and self.ibkr_client.is_connected():
-            try:
-                logger.info("  使用 IBKR API (第二優先級)...")
-                hist = self.ibkr_client.get_historical_data(ticker, period=period, interval=interval)
-                
-                if hist is not None and not hist.empty:
-                    logger.info(f"* 成功獲取 {ticker} 的 {len(hist)} 條歷史記錄 (IBKR)")
-                    self._record_fallback('historical_data', 'IBKR')
-                    return hist
-                else:
-                    logger.warning("! IBKR 返回空數據，降級到 yfinance")
-                    self._record_fallback_failure('historical_data', 'IBKR', '返回空數據')
-            except Exception as e:
-                logger.warning(f"! IBKR 獲取失敗: {e}，降級到 yfinance")
-                self._record_api_failure('IBKR', f"get_historical_data: {e}")
-                self._record_fallback_failure('historical_data', 'IBKR', str(e))
-        
+
+        period_days = {
+            '1d': 1, '5d': 5, '1mo': 30, '3mo': 90,
+            '6mo': 180, '1y': 365, '2y': 730, '5y': 1825
+        }
+
+        def non_empty(hist):
+            return hist if hist is not None and not hist.empty else None
+
+        # 方案0: Finnhub（技術分析主來源，主要支持日線數據）
+        def from_finnhub():
+            return non_empty(self.get_finnhub_candles(ticker, resolution='D', days=period_days.get(period, 200)))
+
+        # 方案1: IBKR（第二優先級，始終在調用線程執行）
+        def from_ibkr():
+            return non_empty(self.ibkr_client.get_historical_data(
+                ticker, period=period, interval=interval, use_store=False, adjusted=True
+            ))
+
         # 方案2: yfinance（第三優先級 - 使用 curl_cffi，更不容易被限流）
         # 2025-12-07: 將 yfinance 提升到 Yahoo Finance V2 之前，因為 yfinance 0.2.66 有更好的 429 處理
-        try:
-            logger.info(f"  使用 yfinance 獲取歷史數據...")
-            stock = yf.Ticker(ticker)
-            hist = stock.history(period=period, interval=interval)
-            
-            if hist is not None and not hist.empty:
-                logger.info(f"* 成功獲取 {ticker} 的 {len(hist)} 條歷史記錄 (yfinance)")
-                self._record_fallback('historical_data', 'yfinance')
-                return hist
-            else:
-                logger.warning(f"! yfinance 未獲得 {ticker} 的歷史數據，降級到 Yahoo Finance V2")
-                self._record_fallback_failure('historical_data', 'yfinance', '未獲得數據')
-        except Exception as e:
-            logger.warning(f"! yfinance 獲取失敗: {e}，降級到 Yahoo Finance V2")
-            self._record_api_failure('yfinance', f"get_historical_data: {e}")
-            self._record_fallback_failure('historical_data', 'yfinance', str(e))
-        
+        def from_yfinance():
+            return non_empty(yf.Ticker(ticker).history(period=period, interval=interval))
+
         # 方案3: Yahoo Finance V2（第四優先級 - 備用）
-        if self.yahoo_v2_client:
-            try:
-                logger.info(f"  使用 Yahoo Finance V2 獲取歷史數據...")
-                
-                response = self.yahoo_v2_client.get_historical_data(ticker, period=period, interval=interval)
-                
-                if response and 'chart' in response:
-                    result = response['chart'].get('result', [])
-                    if result and len(result) > 0:
-                        data = result[0]
-                        timestamps = data.get('timestamp', [])
-                        indicators = data.get('indicators', {})
-                        quote = indicators.get('quote', [{}])[0]
-                        
-                        if timestamps and quote:
-                            hist = pd.DataFrame({
-                                'Open': quote.get('open', []),
-                                'High': quote.get('high', []),
-                                'Low': quote.get('low', []),
-                                'Close': quote.get('close', []),
-                                'Volume': quote.get('volume', [])
-                            }, index=pd.to_datetime(timestamps, unit='s'))
-                            
-                            # 移除 NaN 行
-                            hist = hist.dropna()
-                            
-                            if not hist.empty:
-                                logger.info(f"* 成功獲取 {ticker} 的 {len(hist)} 條歷史記錄 (Yahoo Finance V2)")
-                                self._record_fallback('historical_data', 'Yahoo Finance V2')
-                                return hist
-                
-                logger.warning(f"! Yahoo Finance V2 未獲得 {ticker} 的歷史數據，降級到 Alpha Vantage")
-                self._record_fallback_failure('historical_data', 'Yahoo Finance V2', '未獲得數據')
-                    
-            except Exception as e:
-                logger.warning(f"! Yahoo Finance V2 獲取失敗: {e}，降級到 Alpha Vantage")
-                self._record_api_failure('Yahoo Finance V2', f"get_historical_data: {e}")
-                self._record_fallback_failure('historical_data', 'Yahoo Finance V2', str(e))
-        
+        def from_yahoo_v2():
+            response = self.yahoo_v2_client.get_historical_data(ticker, period=period, interval=interval)
+            if not response or 'chart' not in response:
+                return None
+            result = response['chart'].get('result', [])
+            if not result:
+                return None
+            data = result[0]
+            timestamps = data.get('timestamp', [])
+            quote = data.get('indicators', {}).get('quote', [{}])[0]
+            if not timestamps or not quote:
+                return None
+            hist = pd.DataFrame({
+                'Open': quote.get('open', []),
+                'High': quote.get('high', []),
+                'Low': quote.get('low', []),
+                'Close': quote.get('close', []),
+                'Volume': quote.get('volume', [])
+            }, index=pd.to_datetime(timestamps, unit='s'))
+            # 移除 NaN 行
+            return non_empty(hist.dropna())
+
         # 方案4: Alpha Vantage（第五優先級）
-        if hasattr(self, 'alpha_vantage_client') and self.alpha_vantage_client:
-            try:
-                logger.info(f"  使用 Alpha Vantage 獲取歷史數據...")
-                
-                # 根據 period 決定 outputsize
-                outputsize = 'full' if period in ['1y', '2y', '5y', 'max'] else 'compact'
-                
-                hist = self.alpha_vantage_client.get_daily_prices(ticker, outputsize=outputsize)
-                
-                if hist is not None and not hist.empty:
-                    logger.info(f"* 成功獲取 {ticker} 的 {len(hist)} 條歷史記錄 (Alpha Vantage)")
-                    self._record_fallback('historical_data', 'Alpha Vantage')
-                    return hist
-                else:
-                    logger.warning(f"! Alpha Vantage 未獲得 {ticker} 的歷史數據，降級到 yfinance")
-                    self._record_fallback_failure('historical_data', 'Alpha Vantage', '未獲得數據')
-                    
-            except Exception as e:
-                logger.warning(f"! Alpha Vantage 獲取失敗: {e}，降級到 yfinance")
-                self._record_api_failure('Alpha Vantage', f"get_historical_data: {e}")
-                self._record_fallback_failure('historical_data', 'Alpha Vantage', str(e))
-        
-        # 方案5: yfinance 已在上面嘗試過，這裡跳過
-        # 2025-12-07: yfinance 已提升到第二優先級，不需要在這裡重複嘗試
-        logger.info("  yfinance 已在上面嘗試過，降級到 Massive API...")
-        
-        # 方案6: 降級到 Massive API
-        if hasattr(self, 'massive_api_client') and self.massive_api_client:
-            try:
-                logger.info(f"  使用 Massive API 獲取歷史數據...")
-                
-                # 根據 period 計算天數
-                period_days = {
-                    '1d': 1, '5d': 5, '1mo': 30, '3mo': 90, 
-                    '6mo': 180, '1y': 365, '2y': 730, '5y': 1825
-                }
-                days = period_days.get(period, 100)
-                
-                hist = self.massive_api_client.get_daily_prices(ticker, days=days)
-                
-                if hist is not None and not hist.empty:
-                    logger.info(f"* 成功獲取 {ticker} 的 {len(hist)} 條歷史記錄 (Massive API)")
-                    self._record_fallback('historical_data', 'Massive API')
-                    return hist
-                else:
-                    logger.warning(f"! Massive API 未獲得 {ticker} 的歷史數據，降級到 RapidAPI")
-                    self._record_fallback_failure('historical_data', 'Massive API', '未獲得數據')
-                    
-            except Exception as e:
-                logger.warning(f"! Massive API 獲取失敗: {e}，降級到 RapidAPI")
-                self._record_api_failure('Massive API', f"get_historical_data: {e}")
-                self._record_fallback_failure('historical_data', 'Massive API', str(e))
-        
-        # 方案7: 降級到 RapidAPI（最後備用）
-        if hasattr(self, 'rapidapi_client') and self.rapidapi_client:
-            try:
-                logger.info(f"  使用 RapidAPI 獲取歷史數據...")
-                
-                response = self.rapidapi_client.get_historical_data(ticker, period=period)
-                
-                if response and response.get('body'):
-                    body = response['body']
-                    
-                    # 解析 RapidAPI 歷史數據
-                    if isinstance(body, list) and len(body) > 0:
-                        hist = pd.DataFrame(body)
-                        
-                        # 標準化列名
-                        column_mapping = {
-                            'date': 'Date',
-                            'open': 'Open',
-                            'high': 'High',
-                            'low': 'Low',
-                            'close': 'Close',
-                            'volume': 'Volume'
-                        }
-                        
-                        for old_name, new_name in column_mapping.items():
-                            if old_name in hist.columns:
-                                hist.rename(columns={old_name: new_name}, inplace=True)
-                        
-                        # 設置日期索引
-                        if 'Date' in hist.columns:
-                            hist['Date'] = pd.to_datetime(hist['Date'])
-                            hist.set_index('Date', inplace=True)
-                        
-                        if not hist.empty:
-                            logger.info(f"* 成功獲取 {ticker} 的 {len(hist)} 條歷史記錄 (RapidAPI)")
-                            self._record_fallback('historical_data', 'RapidAPI')
-                            return hist
-                
-                logger.warning(f"! RapidAPI 未獲得 {ticker} 的歷史數據")
-                self._record_fallback_failure('historical_data', 'RapidAPI', '未獲得數據')
-                    
-            except Exception as e:
-                logger.warning(f"! RapidAPI 獲取失敗: {e}")
-                self._record_api_failure('RapidAPI', f"get_historical_data: {e}")
-                self._record_fallback_failure('historical_data', 'RapidAPI', str(e))
-        
+        def from_alpha_vantage():
+            # 根據 period 決定 outputsize
+            outputsize = 'full' if period in ['1y', '2y', '5y', 'max'] else 'compact'
+            return non_empty(self.alpha_vantage_client.get_daily_prices(ticker, outputsize=outputsize))
+
+        # 方案5: Massive API
+        def from_massive():
+            return non_empty(self.massive_api_client.get_daily_prices(ticker, days=period_days.get(period, 100)))
+
+        # 方案6: RapidAPI（最後備用）
+        def from_rapidapi():
+            response = self.rapidapi_client.get_historical_data(ticker, period=period)
+            body = response.get('body') if response else None
+            if not isinstance(body, list) or not body:
+                return None
+            # 標準化列名
+            hist = pd.DataFrame(body).rename(columns={
+                'date': 'Date', 'open': 'Open', 'high': 'High',
+                'low': 'Low', 'close': 'Close', 'volume': 'Volume'
+            })
+            # 設置日期索引
+            if 'Date' in hist.columns:
+                hist['Date'] = pd.to_datetime(hist['Date'])
+                hist = hist.set_index('Date')
+            return non_empty(hist)
+
+        fetchers = {}
+        if self.finnhub_client and interval in ['1d', 'D']:
+            fetchers['Finnhub'] = from_finnhub
+        if self.ibkr_client and self.ibkr_client.is_connected():
+            fetchers['IBKR'] = from_ibkr
+        fetchers['yfinance'] = from_yfinance
+        if getattr(self, 'yahoo_v2_client', None):
+            fetchers['Yahoo Finance V2'] = from_yahoo_v2
+        if getattr(self, 'alpha_vantage_client', None):
+            fetchers['Alpha Vantage'] = from_alpha_vantage
+        if getattr(self, 'massive_api_client', None):
+            fetchers['Massive API'] = from_massive
+        if getattr(self, 'rapidapi_client', None):
+            fetchers['RapidAPI'] = from_rapidapi
+
+        # 按優先級降級；HEDGED_FETCH_ENABLED 時慢來源超出延遲預算會與下一來源競速（IBKR 除外）
+        hist = self._fetch_with_fallback('historical_data', list(fetchers), fetchers)
+        if hist is not None:
+            logger.info(f"* 成功獲取 {ticker} 的 {len(hist)} 條歷史記錄")
+            return hist
+
         # 所有數據源都失敗，輸出完整嘗試路徑
         self._log_attempt_path('historical_data')
         logger.error(f"x 所有數據源都無法獲取 {ticker} 歷史數據")
         return None
-    
+
     # ==================== 期權數據 ====================
     
+    @coalesced('option_expirations')
+    @persisted('expirations_')
     def get_option_expirations(self, ticker):
         """
         獲取所有期權到期日期 (增強版：IBKR 優先)
@@ -3704,80 +3508,55 @@ class DataFetcher:
             # 使用標準標示符
             ticker_normalized = self._normalize_ticker(ticker) or ticker
             
-            # 方案 1: IBKR (最優先)
-            if self.use_ibkr and self.ibkr_client and self.ibkr_client.is_connected():
-                try:
-                    logger.info("  使用 IBKR API...")
-                    expirations = self.ibkr_client.get_option_expirations(ticker_normalized)
-                    
-                    if expirations and len(expirations) > 0:
-                        logger.info(f"✓ 成功獲取 {ticker} 的 {len(expirations)} 個到期日期 (IBKR)")
-                        self._record_fallback('option_expirations', 'ibkr')
-                        return expirations
-                    else:
-                        logger.warning("! IBKR 獲取到期日列表為空，嘗試備用方案")
-                        self._record_fallback_failure('option_expirations', 'ibkr', '返回空列表')
-                except Exception as e:
-                    logger.warning(f"! IBKR 獲取到期日失敗: {e}")
-                    self._record_api_failure('ibkr', f"get_option_expirations: {e}")
-                    self._record_fallback_failure('option_expirations', 'ibkr', str(e))
-            
+            # 方案 1: IBKR (最優先，始終在調用線程執行)
+            def from_ibkr():
+                return self.ibkr_client.get_option_expirations(ticker_normalized) or None
+
             # 方案 2: Yahoo Finance V2 Client (備用)
-            if hasattr(self, 'yahoo_v2_client') and self.yahoo_v2_client:
-                try:
-                    logger.info("  備用: 嘗試使用 Yahoo Finance V2 API...")
-                    expirations_raw = self.yahoo_v2_client.get_available_expirations(ticker_normalized)
-                    
-                    if expirations_raw:
-                        # 轉換 Unix 時間戳為 YYYY-MM-DD
-                        expirations = []
-                        for ts in expirations_raw:
-                            try:
-                                # Yahoo 返回的是 UTC 時間戳
-                                expirations.append(datetime.fromtimestamp(ts).strftime('%Y-%m-%d'))
-                            except:
-                                continue
-                        
-                        if expirations:
-                            logger.info(f"✓ 成功獲取 {ticker} 的 {len(expirations)} 個到期日期 (Yahoo V2)")
-                            self._record_fallback('option_expirations', 'yahoo_v2')
-                            return sorted(list(set(expirations)))
-                except Exception as e:
-                    logger.warning(f"! Yahoo V2 獲取到期日失敗: {e}")
-                    self._record_api_failure('Yahoo V2', f"get_option_expirations: {e}")
-            
-            # 方案 3: yfinance (最後備用)
-            try:
-                logger.info("  備用: 嘗試使用 yfinance (已打補丁)...")
-                stock = yf.Ticker(ticker_normalized)
-                expirations = stock.options
-                
-                if expirations:
-                    logger.info(f"✓ 成功獲取 {ticker} 的 {len(expirations)} 個到期日期 (yfinance)")
-                    self._record_fallback('option_expirations', 'yfinance')
-                    return list(expirations)
-            except Exception as e:
-                logger.warning(f"! yfinance 獲取到期日失敗: {e}")
-                self._record_api_failure('yfinance', f"get_option_expirations: {e}")
-                
+            def from_yahoo_v2():
+                expirations = []
+                # 轉換 Unix 時間戳（UTC）為 YYYY-MM-DD
+                for ts in self.yahoo_v2_client.get_available_expirations(ticker_normalized) or []:
+                    try:
+                        expirations.append(datetime.fromtimestamp(ts).strftime('%Y-%m-%d'))
+                    except (TypeError, ValueError, OSError):
+                        continue
+                return sorted(set(expirations)) or None
+
+            # 方案 3: yfinance (最後備用，已打補丁)
+            def from_yfinance():
+                return list(yf.Ticker(ticker_normalized).options) or None
+
+            fetchers = {}
+            if self.use_ibkr and self.ibkr_client and self.ibkr_client.is_connected():
+                fetchers['ibkr'] = from_ibkr
+            if getattr(self, 'yahoo_v2_client', None):
+                fetchers['yahoo_v2'] = from_yahoo_v2
+            fetchers['yfinance'] = from_yfinance
+
+            expirations = self._fetch_with_fallback('option_expirations', list(fetchers), fetchers)
+            if expirations:
+                logger.info(f"✓ 成功獲取 {ticker} 的 {len(expirations)} 個到期日期")
+                return expirations
+
             logger.error(f"✗ 獲取 {ticker} 所有的期權到期日期均失敗")
             return []
-            
+
         except Exception as ge:
             logger.error(f"✗ get_option_expirations 發生未預期錯誤: {ge}")
             return []
     
-    def _merge_ibkr_opra_with_yahoo(self, yahoo_df: pd.DataFrame, ticker: str, 
-                                       expiration: str, option_type: str) -> pd.DataFrame:
+    def _fetch_ibkr_opra_quotes(self, yahoo_df: pd.DataFrame, ticker: str,
+                                expiration: str, option_type: str) -> Optional[pd.DataFrame]:
         """
-        整合 IBKR OPRA 實時 bid/ask 數據和 Yahoo Finance 的 IV 數據
+        獲取 ATM 附近期權的 IBKR OPRA 實時報價，供期權鏈標準化時按 (strike, right) 整合
         
         數據源分工:
-        - IBKR OPRA: bid, ask, volume, openInterest (實時)
+        - IBKR OPRA: bid, ask, volume, mid (實時)
         - Yahoo Finance: impliedVolatility, lastPrice, 其他數據
         
         注意: 如果 IBKR 無法返回有效的 bid/ask 數據（例如沒有 OPRA 訂閱），
-              會自動跳過整合，保留 Yahoo Finance 的原始數據
+              返回 None，保留 Yahoo Finance 的原始數據
         
         參數:
             yahoo_df: Yahoo Finance 的期權 DataFrame
@@ -3786,125 +3565,74 @@ class DataFetcher:
             option_type: 'call' 或 'put'
         
         返回:
-            DataFrame: 整合後的期權數據
+            DataFrame: 列 strike, right, bid, ask, volume, mid；不可用時返回 None
         """
         if yahoo_df.empty or not self.ibkr_client or not self.ibkr_client.is_connected():
-            return yahoo_df
+            return None
         
         logger.info(f"  嘗試整合 IBKR OPRA 實時數據 ({option_type})...")
         
-        # 先測試一個期權，看 IBKR 是否能返回有效的 bid/ask
-        test_strike = yahoo_df['strike'].iloc[len(yahoo_df) // 2] if 'strike' in yahoo_df.columns else None
-        if test_strike is None:
+        if 'strike' not in yahoo_df.columns:
             logger.warning("    無法找到測試行使價，跳過 IBKR 整合")
-            return yahoo_df
-        
+            return None
+        strikes = yahoo_df['strike'].astype(float).to_numpy()
+        test_strike = float(strikes[len(strikes) // 2])
         right = 'C' if option_type.lower() == 'call' else 'P'
         
-        try:
-            test_quote = self.ibkr_client.get_option_quote(
+        def fetch(strike):
+            quote = self.ibkr_client.get_option_quote(
                 ticker=ticker,
-                strike=float(test_strike),
+                strike=strike,
                 expiration=expiration,
                 option_type=right
             )
-            
-            # 檢查是否有有效的 bid/ask 數據
-            has_valid_bid_ask = (
-                test_quote and 
-                ('bid' in test_quote and test_quote['bid'] is not None and test_quote['bid'] > 0) or
-                ('ask' in test_quote and test_quote['ask'] is not None and test_quote['ask'] > 0)
-            )
-            
-            if not has_valid_bid_ask:
-                logger.info(f"    IBKR 未返回有效 bid/ask 數據（可能未訂閱 OPRA），跳過整合")
-                logger.info(f"    將使用 Yahoo Finance 的 bid/ask 數據")
-                return yahoo_df
-                
+            if not quote:
+                return None
+            has_bid_ask = any(quote.get(k) is not None and quote[k] > 0 for k in ('bid', 'ask'))
+            if not has_bid_ask:
+                return None
+            return {'strike': strike, 'right': right, **{k: quote.get(k) for k in ('bid', 'ask', 'volume', 'mid')}}
+        
+        # 先測試一個期權，看 IBKR 是否能返回有效的 bid/ask
+        try:
+            test_row = fetch(test_strike)
         except Exception as e:
             logger.warning(f"    IBKR OPRA 測試失敗: {e}，跳過整合")
-            return yahoo_df
+            return None
+        if test_row is None:
+            logger.info(f"    IBKR 未返回有效 bid/ask 數據（可能未訂閱 OPRA），跳過整合")
+            logger.info(f"    將使用 Yahoo Finance 的 bid/ask 數據")
+            return None
         
-        # IBKR 可以返回有效數據，繼續整合
+        # IBKR 可以返回有效數據，繼續獲取
         logger.info(f"    IBKR OPRA 數據可用，開始整合...")
         
-        # 限制更新數量，避免過多 API 請求（只更新 ATM 附近的期權）
+        # 限制更新數量，避免過多 API 請求（按與測試行使價的距離，只更新 ATM 附近的期權）
         max_updates = 10
-        updated_count = 0
+        rows = [test_row]
         failed_count = 0
-        
-        for idx, row in yahoo_df.iterrows():
-            if updated_count >= max_updates:
+        for strike in sorted(set(strikes.tolist()) - {test_strike}, key=lambda k: abs(k - test_strike)):
+            if len(rows) >= max_updates:
                 break
-            
             # 如果連續失敗太多次，停止嘗試
             if failed_count >= 3:
                 logger.info(f"    連續失敗 {failed_count} 次，停止 IBKR 整合")
                 break
-            
-            strike = row.get('strike')
-            if strike is None:
-                continue
-            
-            # 跳過已經測試過的行使價
-            if strike == test_strike:
-                # 使用測試結果
-                if 'bid' in test_quote and test_quote['bid'] is not None:
-                    yahoo_df.at[idx, 'bid'] = test_quote['bid']
-                if 'ask' in test_quote and test_quote['ask'] is not None:
-                    yahoo_df.at[idx, 'ask'] = test_quote['ask']
-                if 'volume' in test_quote and test_quote['volume'] is not None:
-                    yahoo_df.at[idx, 'volume'] = test_quote['volume']
-                if 'mid' in test_quote and test_quote['mid'] is not None:
-                    yahoo_df.at[idx, 'mid'] = test_quote['mid']
-                yahoo_df.at[idx, 'bid_ask_source'] = 'ibkr_opra'
-                updated_count += 1
-                continue
-            
             try:
-                # 獲取 IBKR OPRA 實時報價
-                opra_quote = self.ibkr_client.get_option_quote(
-                    ticker=ticker,
-                    strike=float(strike),
-                    expiration=expiration,
-                    option_type=right
-                )
-                
-                if opra_quote:
-                    has_data = False
-                    # 用 IBKR OPRA 的實時數據覆蓋 Yahoo Finance 的數據
-                    if 'bid' in opra_quote and opra_quote['bid'] is not None and opra_quote['bid'] > 0:
-                        yahoo_df.at[idx, 'bid'] = opra_quote['bid']
-                        has_data = True
-                    if 'ask' in opra_quote and opra_quote['ask'] is not None and opra_quote['ask'] > 0:
-                        yahoo_df.at[idx, 'ask'] = opra_quote['ask']
-                        has_data = True
-                    if 'volume' in opra_quote and opra_quote['volume'] is not None:
-                        yahoo_df.at[idx, 'volume'] = opra_quote['volume']
-                    if 'mid' in opra_quote and opra_quote['mid'] is not None:
-                        yahoo_df.at[idx, 'mid'] = opra_quote['mid']
-                    
-                    if has_data:
-                        yahoo_df.at[idx, 'bid_ask_source'] = 'ibkr_opra'
-                        updated_count += 1
-                        failed_count = 0  # 重置失敗計數
-                    else:
-                        failed_count += 1
-                else:
-                    failed_count += 1
-                    
+                row = fetch(strike)
             except Exception as e:
                 logger.debug(f"  獲取 {strike} {right} OPRA 報價失敗: {e}")
+                row = None
+            if row is None:
                 failed_count += 1
                 continue
+            rows.append(row)
+            failed_count = 0  # 重置失敗計數
         
-        if updated_count > 0:
-            logger.info(f"    已更新 {updated_count} 個期權的 IBKR OPRA 實時 bid/ask")
-        else:
-            logger.info(f"    未能更新任何期權的 bid/ask，將使用 Yahoo Finance 數據")
-        
-        return yahoo_df
+        logger.info(f"    已獲取 {len(rows)} 個期權的 IBKR OPRA 實時 bid/ask")
+        return pd.DataFrame(rows)
     
+    @coalesced('option_chain')
     def get_option_chain(self, ticker, expiration, strike_range_pct=30):
         """
         獲取完整期權鏈（整合多數據源）- 優化內存使用
@@ -3965,8 +3693,9 @@ class DataFetcher:
                 )
                 
                 if chain_data and (chain_data['calls'] or chain_data['puts']):
-                    calls_df = pd.DataFrame(chain_data['calls'])
-                    puts_df = pd.DataFrame(chain_data['puts'])
+                    columns = chain_data.get('columns') or {}
+                    calls_df = pd.DataFrame(columns.get('calls') or chain_data['calls'])
+                    puts_df = pd.DataFrame(columns.get('puts') or chain_data['puts'])
                     
                     # 應用行使價過濾
                     if not calls_df.empty and 'strike' in calls_df.columns and current_price > 0:
@@ -3989,42 +3718,20 @@ class DataFetcher:
                         logger.info(f"  Put期權: {len(puts_df)} 個")
 
                         # ── Session-aware Spread Quality Filter ──────────────────
-                        # 夜盤/盤前時段對期權報價品質要求更嚴格
+                        # 夜盤/盤前時段對期權報價品質要求更嚴格（IBKR IV 已是百分比格式）
                         session = get_session_type()
-                        liquidity_warnings: list[str] = []
-
                         if session in ('overnight', 'premarket'):
                             logger.warning(
                                 f"  ⚠️  非交易時段 ({session}): 對 {ticker} 期權鏈啟動嚴格流動性過濾"
                             )
-                            for df_ref, opt_type in [(calls_df, 'Call'), (puts_df, 'Put')]:
-                                if df_ref.empty:
-                                    continue
-                                has_bid = 'bid' in df_ref.columns
-                                has_ask = 'ask' in df_ref.columns
-                                if has_bid and has_ask:
-                                    total = len(df_ref)
-                                    low_liq_mask = pd.Series([False] * total, index=df_ref.index)
-                                    for idx in df_ref.index:
-                                        bid_v = df_ref.at[idx, 'bid'] or 0.0
-                                        ask_v = df_ref.at[idx, 'ask'] or 0.0
-                                        passed, reason = quote_passes_liquidity_check(
-                                            bid=float(bid_v), ask=float(ask_v)
-                                        )
-                                        if not passed:
-                                            low_liq_mask.at[idx] = True
-                                    low_count = low_liq_mask.sum()
-                                    if low_count > 0:
-                                        if 'data_quality' in df_ref.columns and hasattr(df_ref['data_quality'], 'cat'):
-                                            if 'low_liquidity' not in df_ref['data_quality'].cat.categories:
-                                                df_ref['data_quality'] = df_ref['data_quality'].cat.add_categories(['low_liquidity'])
-                                        df_ref.loc[low_liq_mask, 'data_quality'] = 'low_liquidity'
-                                        msg = (
-                                            f"{opt_type}: {low_count}/{total} 個行使價在 {session} 時段"
-                                            f"報價質量不足 (Spread>1%)，已標記 low_liquidity"
-                                        )
-                                        liquidity_warnings.append(msg)
-                                        logger.warning(f"    ! {msg}")
+                        normalizer = OptionChainNormalizer(iv_format='percentage', fill_bid_ask=False,
+                                                           session=session)
+                        calls_df, puts_df, reports = normalizer.normalize_chain(calls_df, puts_df, ticker)
+                        liquidity_warnings: list[str] = [
+                            msg for report in reports.values() for msg in report.warnings
+                        ]
+                        for msg in liquidity_warnings:
+                            logger.warning(f"    ! {msg}")
 
                         # 清理內存
                         gc.collect()
@@ -4086,36 +3793,6 @@ class DataFetcher:
                     for i in range(0, len(puts), 50):
                         logger.info(f"  處理 Put 期權: {i}/{len(puts)}")
             
-            # Task 17.3: Use simplified IVNormalizer.normalize() method
-            if 'impliedVolatility' in calls.columns and not calls.empty:
-                sample_iv_before = calls['impliedVolatility'].iloc[0] if not calls.empty else None
-                logger.debug(f"  yfinance Call IV 原始值樣本: {sample_iv_before}")
-                
-                # Apply normalization
-                def normalize_iv(x, ticker_symbol):
-                    if pd.notna(x):
-                        normalized = IVNormalizer.normalize(x, source='Yahoo', ticker=ticker_symbol)
-                        return normalized
-                    return None
-                
-                calls['impliedVolatility'] = calls['impliedVolatility'].apply(
-                    lambda x: normalize_iv(x, ticker)
-                )
-                
-                sample_iv_after = calls['impliedVolatility'].iloc[0] if not calls.empty else None
-                logger.debug(f"  yfinance Call IV 標準化後樣本: {sample_iv_after}%")
-            
-            if 'impliedVolatility' in puts.columns and not puts.empty:
-                sample_iv_before = puts['impliedVolatility'].iloc[0] if not puts.empty else None
-                
-                puts['impliedVolatility'] = puts['impliedVolatility'].apply(
-                    lambda x: normalize_iv(x, ticker)
-                )
-            
-            # 優化數據類型以減少內存使用
-            calls = self._optimize_dataframe_memory(calls)
-            puts = self._optimize_dataframe_memory(puts)
-            
             # 檢查數據有效性：lastPrice 不能全為 0
             has_valid_call_price = False
             has_valid_put_price = False
@@ -4131,20 +3808,27 @@ class DataFetcher:
                 logger.info(f"  Call期權: {len(calls)} 個")
                 logger.info(f"  Put期權: {len(puts)} 個")
                 
-                # 整合 IBKR OPRA 實時 bid/ask 數據（如果可用）
+                # 獲取 IBKR OPRA 實時 bid/ask 數據（如果可用）
                 # Use the ibkr_available flag set earlier (don't recalculate)
+                quotes = {}
                 if ibkr_available:
-                    calls = self._merge_ibkr_opra_with_yahoo(calls, ticker, expiration, 'call')
-                    puts = self._merge_ibkr_opra_with_yahoo(puts, ticker, expiration, 'put')
+                    quotes = {
+                        'calls': self._fetch_ibkr_opra_quotes(calls, ticker, expiration, 'call'),
+                        'puts': self._fetch_ibkr_opra_quotes(puts, ticker, expiration, 'put')
+                    }
                     data_source = 'yfinance+ibkr_opra'
                 else:
                     data_source = 'yfinance'
                 
                 self._record_fallback('option_chain', data_source)
                 
-                # 填補缺失的 bid/ask 數據（對於沒有 IBKR 數據的期權）
-                calls = self._fill_missing_bid_ask(calls, 'call')
-                puts = self._fill_missing_bid_ask(puts, 'put')
+                # 一次標準化：IV 小數轉百分比、整合 IBKR 報價、估算缺失的 bid/ask
+                normalizer = OptionChainNormalizer(iv_format='auto', liquidity_check=False)
+                calls, puts, _ = normalizer.normalize_chain(calls, puts, ticker, quotes)
+                
+                # 優化數據類型以減少內存使用
+                calls = self._optimize_dataframe_memory(calls)
+                puts = self._optimize_dataframe_memory(puts)
                 
                 # 清理內存
                 gc.collect()
@@ -4793,6 +4477,8 @@ class DataFetcher:
     
     # ==================== 基本面數據 ====================
     
+    @coalesced('eps')
+    @persisted('fundamentals_eps_', until_close=True)
     def get_eps(self, ticker):
         """
         獲取EPS (每股收益)
@@ -4818,6 +4504,8 @@ class DataFetcher:
             logger.error(f"x 獲取 {ticker} EPS失敗: {e}")
             return None
     
+    @coalesced('dividends')
+    @persisted('dividend_history_')
     def get_dividends(self, ticker, years=1):
         """
         獲取派息信息
@@ -4992,6 +4680,7 @@ class DataFetcher:
             logger.error(traceback.format_exc())
             return 0.0
 
+    @persisted('dividend_discrete_')
     def get_discrete_dividends(self, ticker: str) -> list:
         """
         獲取未來離散股息時間表 (Discrete Dividends Schedule)
@@ -5083,6 +4772,8 @@ class DataFetcher:
         
     # ==================== 宏觀數據 ====================
     
+    @coalesced('risk_free_rate')
+    @persisted('risk_free_rate_', until_close=True)
     def get_risk_free_rate(self):
         """
         獲取無風險利率 (10年期國債收益率)
@@ -5117,6 +4808,7 @@ class DataFetcher:
             self._log_attempt_path('risk_free_rate')
             return None
     
+    @coalesced('vix')
     def get_vix(self):
         """
         獲取VIX指數（CBOE Volatility Index）
@@ -5247,6 +4939,8 @@ class DataFetcher:
     
     # ==================== 業績和派息數據 ====================
     
+    @coalesced('earnings_calendar')
+    @persisted('earnings_calendar_', until_close=True)
     def get_earnings_calendar(self, ticker):
         """
         獲取業績發布日期（多層降級）- 岗位10監察
@@ -5589,6 +5283,8 @@ class DataFetcher:
             logger.error(f"x 推測業績日期失敗: {e}")
             return None
     
+    @coalesced('dividend_calendar')
+    @persisted('dividend_calendar_', until_close=True)
     def get_dividend_calendar(self, ticker):
         """
         獲取派息日期 - 岗位9監察
@@ -5705,24 +5401,23 @@ class DataFetcher:
     
     # ==================== 完整數據包 ====================
     
-    def get_complete_analysis_data(self, ticker, expiration=None, include_dark_pool=False):
+    def _build_analysis_fetch_plan(self, ticker, expiration=None, include_dark_pool=False) -> ConcurrentFetchPlan:
         """
-        獲取完整的分析所需數據包
+        構建完整分析數據包的並發抓取計劃
         
-        參數:
-            ticker: 股票代碼
-            expiration: 期權到期日期 (可選)
-            include_dark_pool: 是否攔截暗池大單 (Phase 5)
+        依賴關係:
+            stock_info → finviz_supplement
+            stock_info → current_price → historical_data
+            expiration → option_chain → atm_option (← current_price)
+            eps / dividends / risk_free_rate / vix / 業績日曆 / 派息日曆 互相獨立
         
-        返回: dict (包含所有必需數據)
+        IBKR 已連接時，可能使用 IBKR 的步驟在調用線程執行（ib_insync 不支持跨線程調用）。
+        historical_data 依賴 current_price，避免兩次歷史數據請求並發寫入同一降級路徑記錄。
         """
-        try:
-            logger.info("=" * 70)
-            logger.info(f"開始獲取 {ticker} 的完整分析數據包...")
-            logger.info("=" * 70)
-            
-            # 1. 股票基本信息
-            logger.info("\n[步驟1/6] 獲取股票基本信息...")
+        ibkr_active = bool(self.ibkr_client and self.ibkr_client.is_connected())
+        
+        def fetch_stock_info(_):
+            logger.info("\n[步驟1/7] 獲取股票基本信息...")
             stock_info = self.get_stock_info(ticker, include_dark_pool=include_dark_pool)
             if not stock_info:
                 logger.warning(f"! 無法從 API 獲取 {ticker} 基本信息，使用降級方案...")
@@ -5745,32 +5440,38 @@ class DataFetcher:
                     'sector': 'Unknown',
                     'industry': 'Unknown'
                 }
-            
-            current_price = stock_info['current_price']
-            
+            return stock_info
+        
+        def supplement_finviz(deps):
+            stock_info = deps['stock_info']
             # ✅ 補充 Finviz 數據（如果主數據源不是 Finviz）
-            if stock_info.get('data_source') != 'Finviz' and hasattr(self, 'finviz_scraper') and self.finviz_scraper:
-                logger.info("  補充 Finviz 數據...")
-                try:
-                    finviz_data = self.finviz_scraper.get_stock_fundamentals(ticker)
-                    if finviz_data:
-                        # 補充 Finviz 特有的字段
-                        finviz_fields_to_add = [
-                            'insider_own', 'inst_own', 'short_float', 'avg_volume',
-                            'peg', 'roe', 'roa', 'profit_margin', 'operating_margin',
-                            'debt_eq', 'atr', 'rsi', 'beta', 'target_price',
-                            'forward_pe', 'sector', 'industry', 'company_name'
-                        ]
-                        for field in finviz_fields_to_add:
-                            if finviz_data.get(field) is not None and stock_info.get(field) is None:
-                                stock_info[field] = finviz_data[field]
-                        # 特殊處理：peg -> peg_ratio
-                        if finviz_data.get('peg') is not None and stock_info.get('peg_ratio') is None:
-                            stock_info['peg_ratio'] = finviz_data['peg']
-                        logger.info(f"  * Finviz 數據補充完成")
-                except Exception as e:
-                    logger.warning(f"  ! Finviz 數據補充失敗: {e}")
-            
+            if stock_info.get('data_source') == 'Finviz' or not getattr(self, 'finviz_scraper', None):
+                return None
+            logger.info("  補充 Finviz 數據...")
+            try:
+                finviz_data = self.finviz_scraper.get_stock_fundamentals(ticker)
+                if finviz_data:
+                    # 補充 Finviz 特有的字段
+                    finviz_fields_to_add = [
+                        'insider_own', 'inst_own', 'short_float', 'avg_volume',
+                        'peg', 'roe', 'roa', 'profit_margin', 'operating_margin',
+                        'debt_eq', 'atr', 'rsi', 'beta', 'target_price',
+                        'forward_pe', 'sector', 'industry', 'company_name'
+                    ]
+                    for field in finviz_fields_to_add:
+                        if finviz_data.get(field) is not None and stock_info.get(field) is None:
+                            stock_info[field] = finviz_data[field]
+                    # 特殊處理：peg -> peg_ratio
+                    if finviz_data.get('peg') is not None and stock_info.get('peg_ratio') is None:
+                        stock_info['peg_ratio'] = finviz_data['peg']
+                    logger.info(f"  * Finviz 數據補充完成")
+            except Exception as e:
+                logger.warning(f"  ! Finviz 數據補充失敗: {e}")
+            return None
+        
+        def resolve_current_price(deps):
+            stock_info = deps['stock_info']
+            current_price = stock_info['current_price']
             # 如果 current_price 為 0，嘗試從歷史數據獲取
             if current_price == 0:
                 logger.info("  嘗試從歷史數據獲取當前價格...")
@@ -5790,28 +5491,117 @@ class DataFetcher:
             # 最後檢查：如果還是沒有價格，則無法繼續
             if current_price == 0:
                 raise ValueError(f"{ticker} 無法獲取有效股價，請稍後重試或檢查網絡連接")
-            
-            # 2. 確定期權到期日
-            logger.info("\n[步驟2/6] 確定期權到期日期...")
-            if expiration is None:
+            return current_price
+        
+        def resolve_expiration(_):
+            logger.info("\n[步驟2/7] 確定期權到期日期...")
+            selected = expiration
+            if selected is None:
                 expirations = self.get_option_expirations(ticker)
                 if not expirations:
                     raise ValueError(f"{ticker} 無可用期權")
-                expiration = expirations[0]  # 最近期權
-            
-            logger.info(f"使用期權到期日: {expiration}")
-            
-            # 3. 期權鏈數據
-            logger.info("\n[步驟3/6] 獲取期權鏈數據...")
-            option_chain = self.get_option_chain(ticker, expiration)
+                selected = expirations[0]  # 最近期權
+            logger.info(f"使用期權到期日: {selected}")
+            return selected
+        
+        def fetch_option_chain(deps):
+            logger.info("\n[步驟3/7] 獲取期權鏈數據...")
+            option_chain = self.get_option_chain(ticker, deps['expiration'])
             if not option_chain:
                 raise ValueError(f"無法獲取 {ticker} 期權鏈")
-            
-            # 4. ATM 期權數據與隱含波動率
-            logger.info("\n[步驟4/6] 獲取ATM期權與隱含波動率...")
-            atm_data = self.get_atm_option(ticker, expiration, option_chain_data=option_chain, current_price=current_price)
+            return option_chain
+        
+        def fetch_atm_option(deps):
+            logger.info("\n[步驟4/7] 獲取ATM期權與隱含波動率...")
+            atm_data = self.get_atm_option(
+                ticker, deps['expiration'],
+                option_chain_data=deps['option_chain'],
+                current_price=deps['current_price']
+            )
             if atm_data is None:
                 raise ValueError(f"無法獲取 {ticker} ATM 期權資料")
+            return atm_data
+        
+        def fetch_historical(_):
+            # 歷史數據 (用於 Module 18 HV計算 + IV Rank/Percentile)
+            # 使用 1y (1年) 以確保有足夠的數據 (需要 252+ 天數據)
+            logger.info("\n[步驟5/7] 獲取歷史數據 (用於HV計算和IV Rank)...")
+            historical_data = self.get_historical_data(ticker, period='1y', interval='1d')
+            if historical_data is not None and not historical_data.empty:
+                logger.info(f"  * 獲取了 {len(historical_data)} 條歷史記錄")
+                if len(historical_data) >= 252:
+                    logger.info(f"  * 數據足夠計算 IV Rank/Percentile (252天基準)")
+                else:
+                    logger.warning(f"  ! 數據不足252天，IV Rank/Percentile 可能不準確")
+            else:
+                logger.warning("  ! 無法獲取歷史數據，HV 和 IV Rank 計算將跳過")
+            return historical_data
+        
+        steps = [
+            FetchStep('stock_info', fetch_stock_info, sources=('yahoo',), required=True,
+                      run_on_caller=ibkr_active),
+            FetchStep('finviz_supplement', supplement_finviz, depends_on=('stock_info',),
+                      sources=('finviz',)),
+            FetchStep('current_price', resolve_current_price, depends_on=('stock_info',),
+                      sources=('yahoo',), required=True, run_on_caller=ibkr_active),
+            FetchStep('expiration', resolve_expiration, sources=('yahoo',), required=True,
+                      run_on_caller=ibkr_active),
+            FetchStep('option_chain', fetch_option_chain, depends_on=('expiration',),
+                      sources=('yahoo',), required=True, run_on_caller=ibkr_active),
+            FetchStep('atm_option', fetch_atm_option,
+                      depends_on=('expiration', 'option_chain', 'current_price'),
+                      required=True, run_on_caller=ibkr_active),
+            FetchStep('eps', lambda _: self.get_eps(ticker), sources=('yahoo',), required=True),
+            FetchStep('dividends', lambda _: self.get_dividends(ticker), sources=('yahoo',),
+                      required=True, run_on_caller=ibkr_active),
+            FetchStep('historical_data', fetch_historical, depends_on=('current_price',),
+                      sources=('yahoo',), required=True, run_on_caller=ibkr_active),
+            FetchStep('risk_free_rate', lambda _: self.get_risk_free_rate(), sources=('fred',),
+                      required=True),
+            FetchStep('vix', lambda _: self.get_vix(), sources=('yahoo', 'fred'), required=True),
+            FetchStep('earnings_calendar', lambda _: self.get_earnings_calendar(ticker),
+                      sources=('finnhub',), required=True),
+            FetchStep('dividend_calendar', lambda _: self.get_dividend_calendar(ticker),
+                      sources=('finnhub',), required=True),
+        ]
+        return ConcurrentFetchPlan(
+            steps,
+            source_limits=settings.FETCH_SOURCE_CONCURRENCY,
+            max_workers=settings.FETCH_PLAN_MAX_WORKERS
+        )
+    
+    
+    def get_complete_analysis_data(self, ticker, expiration=None, include_dark_pool=False):
+        """
+        獲取完整的分析所需數據包
+        
+        參數:
+            ticker: 股票代碼
+            expiration: 期權到期日期 (可選)
+            include_dark_pool: 是否攔截暗池大單 (Phase 5)
+        
+        返回: dict (包含所有必需數據)
+        """
+        try:
+            logger.info("=" * 70)
+            logger.info(f"開始獲取 {ticker} 的完整分析數據包...")
+            logger.info("=" * 70)
+            
+            report = self._build_analysis_fetch_plan(ticker, expiration, include_dark_pool).run()
+            results = report.results
+            stock_info = results['stock_info']
+            current_price = results['current_price']
+            expiration = results['expiration']
+            option_chain = results['option_chain']
+            atm_data = results['atm_option']
+            eps = results['eps']
+            dividends = results['dividends']
+            historical_data = results['historical_data']
+            risk_free_rate = results['risk_free_rate']
+            vix = results['vix']
+            earnings_calendar = results['earnings_calendar']
+            dividend_calendar = results['dividend_calendar']
+            self.last_fetch_plan_report = report.to_dict()
             
             call_atm = atm_data['call_atm']
             put_atm = atm_data['put_atm']
@@ -5868,35 +5658,6 @@ class DataFetcher:
                     iv = 30.0
                     logger.warning(f"  ! 使用默認 IV: {iv}%")
             
-            # 5. 基本面數據
-            logger.info("\n[步驟5/6] 獲取基本面數據...")
-            eps = self.get_eps(ticker)
-            dividends = self.get_dividends(ticker)
-            
-            # 5.1 歷史數據 (用於 Module 18 HV計算 + IV Rank/Percentile)
-            logger.info("\n[步驟5.1/6] 獲取歷史數據 (用於HV計算和IV Rank)...")
-            # 獲取足夠的歷史數據以計算 IV Rank/Percentile (需要 252+ 天數據)
-            # 使用 1y (1年) 以確保有足夠的數據
-            historical_data = self.get_historical_data(ticker, period='1y', interval='1d')
-            if historical_data is not None and not historical_data.empty:
-                logger.info(f"  * 獲取了 {len(historical_data)} 條歷史記錄")
-                if len(historical_data) >= 252:
-                    logger.info(f"  * 數據足夠計算 IV Rank/Percentile (252天基準)")
-                else:
-                    logger.warning(f"  ! 數據不足252天，IV Rank/Percentile 可能不準確")
-            else:
-                logger.warning("  ! 無法獲取歷史數據，HV 和 IV Rank 計算將跳過")
-
-            # 6. 宏觀數據
-            logger.info("\n[步驟6/7] 獲取宏觀數據...")
-            risk_free_rate = self.get_risk_free_rate()
-            vix = self.get_vix()
-            
-            # 7. 業績和派息數據
-            logger.info("\n[步驟7/7] 獲取業績和派息日期...")
-            earnings_calendar = self.get_earnings_calendar(ticker)
-            dividend_calendar = self.get_dividend_calendar(ticker)
-            
             # 計算天數至到期
             exp_date = pd.to_datetime(expiration).to_pydatetime()
             today_dt = datetime.now()
@@ -6266,6 +6027,12 @@ class DataFetcher:
         
         Requirements: 1.1, 1.4
         """
+        if settings.BAR_STORE_ENABLED:
+            # 本地 K 線存儲（內部同樣優先 Finnhub），只補抓缺失區間
+            hist = self.get_historical_data(ticker, days=days, interval='1d')
+            if hist is not None and len(hist) >= 50:
+                return hist
+
         # 方案1: Finnhub
         df = self.get_finnhub_candles(ticker, 'D', days)
         if df is not None and len(df) >= 50:
@@ -6396,7 +6163,10 @@ class DataFetcher:
             self._attempt_paths = {}
 
         if data_type not in self._attempt_paths:
-            self._attempt_paths[data_type] = {'history': []}
+            self._attempt_paths[data_type] = {'history': [], 'current_attempt': []}
+
+        if self.hedged_fetch_enabled:
+            return self._fetch_with_fallback_hedged(data_type, sources, fetch_func_map, *args, **kwargs)
 
         current_attempt = []
 
@@ -6411,7 +6181,7 @@ class DataFetcher:
                 logger.info(f"Attempting {source} for {data_type}...")
 
                 # Attempt to fetch data
-                result = fetch_func(*args, **kwargs)
+                result = self._timed_fetch(data_type, source, fetch_func, args, kwargs)
 
                 if result is not None:
                     # Success
@@ -6469,6 +6239,202 @@ class DataFetcher:
 
         return None
 
+    def _timed_fetch(self, data_type: str, source: str, fetch_func: callable, args, kwargs):
+        """Call a fetch function and record its latency for the (data_type, source) histogram."""
+        start = time.perf_counter()
+        succeeded = False
+        try:
+            result = fetch_func(*args, **kwargs)
+            succeeded = result is not None
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._latency_lock:
+                samples = self._source_latencies.setdefault(
+                    (data_type, source), deque(maxlen=settings.HEDGED_FETCH_LATENCY_WINDOW)
+                )
+                samples.append((elapsed, succeeded))
+
+    def _latency_budget(self, data_type: str, source: str) -> float:
+        """
+        Latency budget before hedging past a source: p90 of its recent successful latencies.
+
+        Falls back to settings.HEDGED_FETCH_DEFAULT_BUDGET until enough samples exist.
+        """
+        with self._latency_lock:
+            samples = [t for t, ok in self._source_latencies.get((data_type, source), ()) if ok]
+        if len(samples) < settings.HEDGED_FETCH_MIN_SAMPLES:
+            return settings.HEDGED_FETCH_DEFAULT_BUDGET
+        return max(float(np.percentile(samples, 90)), settings.HEDGED_FETCH_MIN_BUDGET)
+
+    # ib_insync 綁定在其事件循環所在線程，這些數據源從不進入競速線程池
+    CALLER_THREAD_SOURCES = frozenset({'ibkr'})
+
+    def _fetch_with_fallback_hedged(self, data_type: str, sources: List[str], fetch_func_map: Dict[str, callable], *args, **kwargs):
+        """
+        Hedged variant of _fetch_with_fallback.
+
+        Sources are still started in priority order, but if the running source has not answered
+        within its latency budget (p90 of recent history) the next source is started concurrently.
+        The first valid result wins; sources still in flight are cancelled (or, if already running,
+        abandoned and their late results discarded). Losers are recorded in the attempt path with
+        cancelled=True and are not counted as fallback failures: they did not fail, they lost the race.
+
+        Sources in CALLER_THREAD_SOURCES (IBKR) never race: they run alone on the caller thread at
+        their place in the priority order, and only the runs of other sources around them are hedged.
+        """
+        candidates = [(source, fetch_func_map[source]) for source in sources if fetch_func_map.get(source)]
+        current_attempt = []
+
+        def record_attempt(source, success, error_reason=None, hedged=False, cancelled=False):
+            current_attempt.append({
+                'source': source,
+                'success': success,
+                'error_reason': error_reason,
+                'hedged': hedged,
+                'cancelled': cancelled,
+                'timestamp': datetime.now().isoformat()
+            })
+            if success:
+                self._record_fallback(data_type, source)
+            elif not cancelled:
+                self._record_fallback_failure(data_type, source, error_reason)
+
+        def is_pinned(candidate):
+            return str(candidate[0]).lower() in self.CALLER_THREAD_SOURCES
+
+        for pinned, group in groupby(candidates, key=is_pinned):
+            group = list(group)
+            if pinned:
+                result = self._fetch_on_caller_thread(data_type, group, args, kwargs, record_attempt)
+            else:
+                result = self._race_sources(data_type, group, args, kwargs, record_attempt)
+            if result is not None:
+                self._attempt_paths[data_type]['history'].append(current_attempt)
+                return result
+
+        logger.error(f"✗ All sources failed for {data_type}")
+        self._attempt_paths[data_type]['history'].append(current_attempt)
+        return None
+
+    def _fetch_on_caller_thread(self, data_type: str, candidates, args, kwargs, record_attempt):
+        """Try event-loop-bound sources one by one on the calling thread (no hedging)."""
+        for source, fetch_func in candidates:
+            logger.info(f"Attempting {source} for {data_type} on caller thread...")
+            try:
+                result = self._timed_fetch(data_type, source, fetch_func, args, kwargs)
+            except Exception as e:
+                full_error = f"{type(e).__name__} - {e}"
+                logger.warning(f"{source} failed: {full_error}")
+                self._record_api_failure(source, str(e), operation=f'fetch_{data_type}')
+                record_attempt(source, False, full_error)
+                continue
+
+            if result is None:
+                logger.warning(f"{source} failed: Returned None or empty data")
+                record_attempt(source, False, "Returned None or empty data")
+                continue
+
+            logger.info(f"✓ {source} succeeded for {data_type}")
+            record_attempt(source, True)
+            return result
+        return None
+
+    def _race_sources(self, data_type: str, candidates, args, kwargs, record_attempt):
+        """Run thread-safe sources on the hedge pool, starting the next one when the current is over budget."""
+        if self._hedge_executor is None:
+            self._hedge_executor = ThreadPoolExecutor(
+                max_workers=settings.HEDGED_FETCH_MAX_WORKERS, thread_name_prefix='hedged-fetch'
+            )
+
+        in_flight = {}  # future -> (source, hedged)
+        next_index = 0
+        last_launch = (None, 0.0)
+
+        def launch(hedged):
+            nonlocal next_index, last_launch
+            source, fetch_func = candidates[next_index]
+            next_index += 1
+            if hedged:
+                logger.info(f"Hedging {data_type}: {last_launch[0]} over budget, starting {source} concurrently...")
+            else:
+                logger.info(f"Attempting {source} for {data_type}...")
+            future = self._hedge_executor.submit(self._timed_fetch, data_type, source, fetch_func, args, kwargs)
+            in_flight[future] = (source, hedged)
+            last_launch = (source, time.perf_counter())
+
+        if candidates:
+            launch(hedged=False)
+
+        while in_flight:
+            timeout = None
+            if next_index < len(candidates):
+                budget = self._latency_budget(data_type, last_launch[0])
+                timeout = max(0.0, last_launch[1] + budget - time.perf_counter())
+
+            done, _ = wait(list(in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                launch(hedged=True)
+                continue
+
+            for future in done:
+                source, hedged = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    full_error = f"{type(e).__name__} - {e}"
+                    logger.warning(f"{source} failed: {full_error}")
+                    self._record_api_failure(source, str(e), operation=f'fetch_{data_type}')
+                    record_attempt(source, False, full_error, hedged)
+                    continue
+
+                if result is None:
+                    logger.warning(f"{source} failed: Returned None or empty data")
+                    record_attempt(source, False, "Returned None or empty data", hedged)
+                    continue
+
+                # Winner: cancel what has not started; running losers cannot be interrupted and are abandoned
+                for loser, (loser_source, loser_hedged) in in_flight.items():
+                    outcome = 'cancelled' if loser.cancel() else 'abandoned while running'
+                    record_attempt(loser_source, False, f"{outcome} ({source} won hedged race)",
+                                   loser_hedged, cancelled=True)
+                in_flight.clear()
+
+                logger.info(f"✓ {source} succeeded for {data_type}{' (hedged)' if hedged else ''}")
+                record_attempt(source, True, hedged=hedged)
+                return result
+
+            if not in_flight and next_index < len(candidates):
+                launch(hedged=False)
+
+        return None
+
+    def get_source_latency_histogram(self, data_type: str = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-source latency histograms collected by _fetch_with_fallback.
+
+        Returns:
+            {"data_type/source": {"count", "success_rate", "p50", "p90", "buckets": {"<=0.5s": n, ...}}}
+        """
+        bounds = settings.HEDGED_FETCH_HISTOGRAM_BUCKETS
+        with self._latency_lock:
+            snapshot = {key: list(samples) for key, samples in self._source_latencies.items()
+                        if data_type is None or key[0] == data_type}
+
+        histograms = {}
+        for (dt, source), samples in snapshot.items():
+            latencies = np.array([t for t, _ in samples])
+            counts = np.histogram(latencies, bins=[0.0] + list(bounds) + [np.inf])[0]
+            labels = [f"<={b}s" for b in bounds] + [f">{bounds[-1]}s"]
+            histograms[f"{dt}/{source}"] = {
+                'count': len(samples),
+                'success_rate': round(sum(ok for _, ok in samples) / len(samples), 3),
+                'p50': round(float(np.percentile(latencies, 50)), 3),
+                'p90': round(float(np.percentile(latencies, 90)), 3),
+                'buckets': dict(zip(labels, counts.tolist()))
+            }
+        return histograms
+
     def _record_fallback(
         self,
         data_type: str,
@@ -6483,38 +6449,39 @@ class DataFetcher:
             data_type: Type of data (e.g., 'stock_info')
             source: Data source name
         """
-        if data_type not in self.fallback_used:
-            self.fallback_used[data_type] = []
+        with self._fallback_lock:
+            if data_type not in self.fallback_used:
+                self.fallback_used[data_type] = []
 
-        if not hasattr(self, '_attempt_paths'):
-            self._attempt_paths = {}
+            if not hasattr(self, '_attempt_paths'):
+                self._attempt_paths = {}
 
-        if data_type not in self._attempt_paths:
-            self._attempt_paths[data_type] = {
-                'current_attempt': [],
-                'history': []
-            }
+            if data_type not in self._attempt_paths:
+                self._attempt_paths[data_type] = {
+                    'current_attempt': [],
+                    'history': []
+                }
 
-        attempt_record = {
-            'source': source,
-            'success': success,
-            'timestamp': datetime.now().isoformat()
-        }
-        if not success and error_reason:
-            attempt_record['error_reason'] = error_reason
+            attempt_record = {
+                'source': source,
+                'success': success,
+                'timestamp': datetime.now().isoformat()
+            }
+            if not success and error_reason:
+                attempt_record['error_reason'] = error_reason
 
-        self._attempt_paths[data_type]['current_attempt'].append(attempt_record)
+            self._attempt_paths[data_type]['current_attempt'].append(attempt_record)
 
-        if success:
-            if source not in self.fallback_used[data_type]:
-                self.fallback_used[data_type].append(source)
-            self._log_attempt_path(data_type)
-            self._attempt_paths[data_type]['history'].append(
-                self._attempt_paths[data_type]['current_attempt'].copy()
-            )
-            self._attempt_paths[data_type]['current_attempt'] = []
-            if len(self._attempt_paths[data_type]['history']) > 50:
-                self._attempt_paths[data_type]['history'] = self._attempt_paths[data_type]['history'][-50:]
+            if success:
+                if source not in self.fallback_used[data_type]:
+                    self.fallback_used[data_type].append(source)
+                self._log_attempt_path(data_type)
+                self._attempt_paths[data_type]['history'].append(
+                    self._attempt_paths[data_type]['current_attempt'].copy()
+                )
+                self._attempt_paths[data_type]['current_attempt'] = []
+                if len(self._attempt_paths[data_type]['history']) > 50:
+                    self._attempt_paths[data_type]['history'] = self._attempt_paths[data_type]['history'][-50:]
 
     def _record_fallback_failure(self, data_type: str, source: str, reason: str):
         """
@@ -0,0 +1,193 @@
+# data_layer/fetch_plan.py
+"""
+依賴感知的並發抓取計劃
+
+把一次完整分析所需的多個數據請求描述為有向無環圖（DAG）：
+- 沒有依賴關係的步驟並發執行（線程池）
+- 每個數據源有獨立的並發上限（例如 Finviz 同時只允許 1 個請求）
+- 標記為 caller 親和的步驟（例如 IBKR，ib_insync 綁定在建立連接的線程事件循環上）
+  始終在調用線程上執行，與其他數據源的請求重疊
+- 總耗時取決於最慢的依賴鏈，而不是所有請求耗時之和
+
+各步驟內部仍然使用原有的 getter（含重試與降級），
+因此 _record_fallback 的降級記錄保持不變。
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FetchStep:
+    """
+    抓取計劃中的單個步驟
+
+    func 接收一個字典參數：{依賴步驟名: 結果}
+    """
+    name: str
+    func: Callable[[Dict[str, Any]], Any]
+    depends_on: Tuple[str, ...] = ()
+    sources: Tuple[str, ...] = ()      # 佔用的數據源（用於並發上限）
+    required: bool = False             # 失敗時是否中止整個計劃
+    default: Any = None                # 非必需步驟失敗時的結果
+    run_on_caller: bool = False        # 是否必須在調用線程執行
+
+
+@dataclass
+class FetchPlanReport:
+    """抓取計劃執行報告"""
+    results: Dict[str, Any]
+    timings: Dict[str, float] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+    wall_time: float = 0.0
+
+    @property
+    def sequential_time(self) -> float:
+        """若順序執行的估計耗時（各步驟耗時之和）"""
+        return sum(self.timings.values())
+
+    def to_dict(self) -> Dict:
+        return {
+            'timings': {k: round(v, 3) for k, v in self.timings.items()},
+            'errors': dict(self.errors),
+            'wall_time': round(self.wall_time, 3),
+            'sequential_time': round(self.sequential_time, 3)
+        }
+
+
+class ConcurrentFetchPlan:
+    """
+    依賴感知的並發抓取執行器
+
+    使用示例:
+    >>> plan = ConcurrentFetchPlan([
+    ...     FetchStep('stock_info', lambda r: fetcher.get_stock_info('AAPL'), required=True),
+    ...     FetchStep('vix', lambda r: fetcher.get_vix(), sources=('fred',)),
+    ... ], source_limits={'fred': 1})
+    >>> report = plan.run()
+    """
+
+    def __init__(self, steps: Sequence[FetchStep], source_limits: Optional[Dict[str, int]] = None,
+                 max_workers: int = 6):
+        self.steps = {step.name: step for step in steps}
+        if len(self.steps) != len(steps):
+            raise ValueError("抓取計劃中存在重複的步驟名稱")
+        for step in steps:
+            missing = [dep for dep in step.depends_on if dep not in self.steps]
+            if missing:
+                raise ValueError(f"步驟 {step.name} 依賴未定義的步驟: {missing}")
+        self._check_acyclic()
+        self.max_workers = max(1, int(max_workers))
+        self._semaphores = {
+            source: threading.BoundedSemaphore(max(1, int(limit)))
+            for source, limit in (source_limits or {}).items()
+        }
+
+    def _check_acyclic(self):
+        visiting, done = set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"抓取計劃存在循環依賴: {name}")
+            visiting.add(name)
+            for dep in self.steps[name].depends_on:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.steps:
+            visit(name)
+
+    def _execute(self, step: FetchStep, results: Dict[str, Any]) -> Tuple[Any, float]:
+        inputs = {dep: results[dep] for dep in step.depends_on}
+        # 按名稱順序獲取信號量，避免多源步驟之間死鎖
+        held = [self._semaphores[s] for s in sorted(set(step.sources)) if s in self._semaphores]
+        for semaphore in held:
+            semaphore.acquire()
+        start = time.perf_counter()
+        try:
+            return step.func(inputs), time.perf_counter() - start
+        finally:
+            for semaphore in reversed(held):
+                semaphore.release()
+
+    def run(self) -> FetchPlanReport:
+        """
+        執行抓取計劃
+
+        返回:
+            FetchPlanReport: 各步驟結果、耗時與錯誤
+
+        異常:
+            必需步驟失敗時拋出該步驟的原始異常（尚未開始的步驟會被取消）
+        """
+        report = FetchPlanReport(results={})
+        pending = dict(self.steps)
+        running = {}
+        plan_start = time.perf_counter()
+
+        def ready_steps():
+            return [s for s in pending.values()
+                    if all(dep in report.results for dep in s.depends_on)]
+
+        def finish(step, outcome, elapsed, error):
+            report.timings[step.name] = elapsed
+            if error is None:
+                report.results[step.name] = outcome
+                return
+            report.errors[step.name] = f"{type(error).__name__}: {error}"
+            if step.required:
+                raise error
+            logger.warning(f"! 抓取步驟 {step.name} 失敗，使用默認值: {error}")
+            report.results[step.name] = step.default
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='fetch-plan')
+        try:
+            while pending or running:
+                ready = ready_steps()
+                for step in ready:
+                    if not step.run_on_caller:
+                        del pending[step.name]
+                        running[executor.submit(self._execute, step, report.results)] = step
+
+                caller_step = next((s for s in ready if s.run_on_caller), None)
+                if caller_step is not None:
+                    # 在調用線程執行，期間線程池中的請求繼續進行
+                    del pending[caller_step.name]
+                    try:
+                        outcome, elapsed = self._execute(caller_step, report.results)
+                        finish(caller_step, outcome, elapsed, None)
+                    except Exception as e:
+                        finish(caller_step, None, 0.0, e)
+                    continue
+
+                if not running:
+                    if pending:
+                        raise RuntimeError(f"抓取計劃無法繼續: {sorted(pending)}")
+                    break
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    try:
+                        outcome, elapsed = future.result()
+                        finish(step, outcome, elapsed, None)
+                    except Exception as e:
+                        finish(step, None, 0.0, e)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            report.wall_time = time.perf_counter() - plan_start
+
+        logger.info(
+            f"  並發抓取完成: {len(report.results)} 個步驟, 耗時 {report.wall_time:.2f}s "
+            f"(順序執行估計 {report.sequential_time:.2f}s)"
+        )
+        return report
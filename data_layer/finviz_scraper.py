@@ -32,6 +32,12 @@ import re
 # 導入優化工具
 from .utils.user_agent_rotator import UserAgentRotator
 from .utils.retry_handler import RetryHandler, RetryConfig
+from .utils.rate_limiter import rate_limiters
+from .http_session import http_sessions
+from .finviz_snapshot import (
+    PAGE_SIZE, SCREENER_VIEW, FinvizSnapshotStore, get_finviz_snapshot_store,
+    is_intraday_screen, parse_screener_table, screener_query, to_fundamentals
+)
 from .utils import ConnectionConfig, FINVIZ_CONNECTION_CONFIG
 
 # 導入統一的數據標準化工具
@@ -145,7 +151,8 @@ class FinvizScraper:
         ua_rotator: Optional[UserAgentRotator] = None,
         retry_handler: Optional[RetryHandler] = None,
         random_delay_range: tuple = (3.0, 7.0),  # 增加隨機延遲避免被封鎖
-        connection_config: Optional[ConnectionConfig] = None
+        connection_config: Optional[ConnectionConfig] = None,
+        snapshot_store: Optional[FinvizSnapshotStore] = None
     ):
         """
         初始化 Finviz 抓取器（優化版）
@@ -158,27 +165,28 @@ class FinvizScraper:
             retry_handler: 重試處理器（可選，默認創建新實例）
             random_delay_range: 隨機延遲範圍（最小, 最大）秒
             connection_config: 連接配置（可選，默認使用 FINVIZ_CONNECTION_CONFIG）
+            snapshot_store: 基本面每日快照（可選，默認按設置使用共享快照）
         """
         self.request_delay = request_delay
         self.random_delay_range = random_delay_range
         self.last_request_time = 0
         self.use_elite = use_elite
         
+        # 共享令牌桶（所有 Finviz 客戶端共用配額，隨機抖動見 api_config.RATE_LIMITS）
+        self.rate_limiter = rate_limiters.get('finviz', default_interval=request_delay)
+        
         # 連接配置
         self.connection_config = connection_config or FINVIZ_CONNECTION_CONFIG
         
-        # 創建 Session（配置連接池）
-        self.session = requests.Session()
+        # 基本面每日快照（分析時優先讀取本地，未命中才實時抓取）
+        if snapshot_store is None:
+            from config.settings import settings
+            if settings.FINVIZ_SNAPSHOT_ENABLED:
+                snapshot_store = get_finviz_snapshot_store()
+        self.snapshot_store = snapshot_store
         
-        # 配置連接適配器
-        from requests.adapters import HTTPAdapter
-        adapter = HTTPAdapter(
-            pool_connections=self.connection_config.pool_connections,
-            pool_maxsize=self.connection_config.pool_maxsize,
-            max_retries=0
-        )
-        self.session.mount('http://', adapter)
-        self.session.mount('https://', adapter)
+        # 創建 Session（共享 keep-alive 連接池，重試由 RetryHandler 處理）
+        self.session = http_sessions.new_session('finviz', self.connection_config, retries=0)
         
         # 初始化 User-Agent 輪換器
         self.ua_rotator = ua_rotator or UserAgentRotator()
@@ -226,26 +234,11 @@ class FinvizScraper:
     
     def _rate_limit(self):
         """
-        速率限制（優化版：添加隨機延遲）
+        速率限制（共享令牌桶，帶隨機抖動）
         
         Requirements: 4.3
         """
-        elapsed = time.time() - self.last_request_time
-        
-        # 基礎延遲
-        if elapsed < self.request_delay:
-            base_sleep = self.request_delay - elapsed
-        else:
-            base_sleep = 0
-        
-        # 添加隨機延遲（1-3 秒）
-        random_sleep = random.uniform(*self.random_delay_range)
-        total_sleep = base_sleep + random_sleep
-        
-        if total_sleep > 0:
-            logger.debug(f"速率限制: 等待 {total_sleep:.2f}秒（基礎: {base_sleep:.2f}s + 隨機: {random_sleep:.2f}s）")
-            time.sleep(total_sleep)
-        
+        self.rate_limiter.acquire()
         self.last_request_time = time.time()
     
     def _rotate_user_agent(self) -> str:
@@ -266,7 +259,8 @@ class FinvizScraper:
         
         Requirements: 4.2
         """
-        # 檢查狀態碼
+        # 檢查狀態碼（同時驅動令牌桶的自適應退避）
+        self.rate_limiter.on_response(response.status_code)
         if response.status_code in [403, 429]:
             logger.warning(f"! 檢測到封鎖: HTTP {response.status_code}")
             self._block_count += 1
@@ -473,6 +467,13 @@ class FinvizScraper:
         
         Requirements: 4.1-4.4, 5.1, 1.2, 2.2
         """
+        if retry_count == 0 and self.snapshot_store is not None:
+            snapshot = self.snapshot_store.get_fundamentals(ticker)
+            if snapshot:
+                # 快照只含慢變基本面，price / volume / RSI 等為 None，由調用方用實時報價覆蓋
+                logger.info(f"* 使用 {ticker} Finviz 本地快照 ({snapshot['snapshot_date']}，不含價格與技術指標)")
+                return self._attach_data_quality(snapshot)
+        
         try:
             self._rate_limit()
             self._request_count += 1
@@ -683,38 +684,7 @@ class FinvizScraper:
             if available_fields < 9:
                 logger.warning(f"Finviz data incomplete: only {available_fields}/{total_fields} fields")
             
-            # 計算完整數據質量（包含所有字段）
-            all_fields = [
-                'price', 'eps_ttm', 'pe', 'forward_pe', 'peg', 'market_cap',
-                'beta', 'atr', 'rsi', 'insider_own', 'inst_own', 'short_float',
-                'avg_volume', 'roe', 'profit_margin', 'debt_eq'
-            ]
-            critical_fields = ['ticker', 'price']
-            
-            available = [f for f in all_fields if result.get(f) is not None]
-            missing = [f for f in all_fields if result.get(f) is None]
-            critical_present = all(result.get(f) is not None for f in critical_fields)
-            
-            # 確定質量等級
-            if len(available) >= len(all_fields) * 0.8:
-                quality_level = 'complete'
-            elif len(available) >= len(all_fields) * 0.5:
-                quality_level = 'partial'
-            else:
-                quality_level = 'minimal'
-            
-            result['data_quality'] = DataQualityIndicator(
-                quality_level=quality_level,
-                available_fields=available,
-                missing_fields=missing,
-                critical_fields_present=critical_present,
-                data_source='Finviz'
-            )
-            
-            if missing:
-                logger.debug(f"  缺失字段: {', '.join(missing[:5])}{'...' if len(missing) > 5 else ''}")
-            
-            return result
+            return self._attach_data_quality(result)
             
         except requests.exceptions.Timeout as e:
             # Task 17.2: Catch and log specific HTTP errors (timeout)
@@ -756,6 +726,40 @@ class FinvizScraper:
             logger.error(f"x Finviz 數據解析失敗: {e}")
             return None
     
+    def _attach_data_quality(self, result: Dict) -> Dict:
+        """計算完整數據質量（包含所有字段）並寫入 result['data_quality']"""
+        all_fields = [
+            'price', 'eps_ttm', 'pe', 'forward_pe', 'peg', 'market_cap',
+            'beta', 'atr', 'rsi', 'insider_own', 'inst_own', 'short_float',
+            'avg_volume', 'roe', 'profit_margin', 'debt_eq'
+        ]
+        critical_fields = ['ticker', 'price']
+        
+        available = [f for f in all_fields if result.get(f) is not None]
+        missing = [f for f in all_fields if result.get(f) is None]
+        critical_present = all(result.get(f) is not None for f in critical_fields)
+        
+        # 確定質量等級
+        if len(available) >= len(all_fields) * 0.8:
+            quality_level = 'complete'
+        elif len(available) >= len(all_fields) * 0.5:
+            quality_level = 'partial'
+        else:
+            quality_level = 'minimal'
+        
+        result['data_quality'] = DataQualityIndicator(
+            quality_level=quality_level,
+            available_fields=available,
+            missing_fields=missing,
+            critical_fields_present=critical_present,
+            data_source='Finviz'
+        )
+        
+        if missing:
+            logger.debug(f"  缺失字段: {', '.join(missing[:5])}{'...' if len(missing) > 5 else ''}")
+        
+        return result
+    
     def get_financial_statements(self, ticker: str) -> Optional[Dict]:
         """
         獲取財務報表數據（收入、利潤、現金流等）
@@ -833,6 +837,20 @@ class FinvizScraper:
         返回:
             List[Dict]: 股票列表，包含 ticker, price, change, volume 等
         """
+        # 非盤中篩選優先使用今天的本地快照（由 finviz_snapshot.ingest_daily 寫入）
+        # 快照只提供篩選出的股票，price / change_pct / volume 為 None，實時數據由調用方另行獲取
+        if self.snapshot_store is not None and not is_intraday_screen(filters):
+            rows = self.snapshot_store.get_screen(filters)
+            if rows is not None:
+                logger.info(f"* 使用 Finviz Screener 本地快照: {screener_query(filters)} ({len(rows)} 隻)")
+                return [{
+                    'ticker': row['ticker'],
+                    'price': row['price'],
+                    'change_pct': row['change_pct'],
+                    'volume': row['volume'],
+                    'source': 'Finviz_Snapshot'
+                } for row in rows[:limit]]
+        
         try:
             self._rate_limit()
             # 構建 Screener URL (v=111 是 overview 視圖)
@@ -992,6 +1010,55 @@ class FinvizScraper:
             logger.error(f"x 獲取 Screener 結果失敗: {e}")
             return []
 
+    def get_screener_table(self, filters: str, max_pages: int = 100) -> tuple:
+        """
+        分頁抓取 Screener 自定義視圖（一次帶齊基本面列），用於每日快照
+        
+        參數:
+            filters: Finviz 篩選參數（視圖 / 列 / 分頁參數會被替換）
+            max_pages: 最多抓取的頁數
+            
+        返回:
+            tuple: (List[Dict] get_stock_fundamentals 格式的行, 抓取的頁數)
+        """
+        base_url = "https://finviz.com/screener.ashx"
+        query = screener_query(filters)
+        rows: List[Dict] = []
+        seen = set()
+        pages = 0
+        
+        while pages < max_pages:
+            url = f"{base_url}?{SCREENER_VIEW}&{query}&r={pages * PAGE_SIZE + 1}"
+            try:
+                self._rate_limit()
+                self._request_count += 1
+                headers = self.headers.copy()
+                headers['User-Agent'] = self._rotate_user_agent()
+                if USE_CURL_CFFI:
+                    response = curl_requests.get(url, impersonate='chrome', headers=headers,
+                                                 timeout=self.connection_config.timeout)
+                else:
+                    response = self.session.get(url, headers=headers, timeout=self.connection_config.timeout)
+                if self._detect_block(response):
+                    logger.warning(f"! Screener 分頁請求被封鎖（第 {pages + 1} 頁），停止抓取")
+                    break
+                response.raise_for_status()
+            except Exception as e:
+                logger.warning(f"! Screener 分頁抓取失敗（第 {pages + 1} 頁）: {e}")
+                break
+            
+            pages += 1
+            page_rows = [to_fundamentals(raw, self._parse_value) for raw in parse_screener_table(response.text)]
+            # 超出最後一頁時 Finviz 會重複返回最後一頁
+            new_rows = [r for r in page_rows if r['ticker'] and r['ticker'] not in seen]
+            seen.update(r['ticker'] for r in new_rows)
+            rows.extend(new_rows)
+            if len(page_rows) < PAGE_SIZE or not new_rows:
+                break
+        
+        logger.info(f"* Screener 分頁抓取完成: {len(rows)} 隻股票 / {pages} 頁")
+        return rows, pages
+
     def validate_data_quality(self, data: Dict) -> Dict:
         """
         驗證數據質量
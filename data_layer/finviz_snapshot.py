@@ -0,0 +1,409 @@
+# data_layer/finviz_snapshot.py
+"""
+Finviz 基本面每日快照存儲
+
+原流程在分析時才抓取 Finviz：掃描器每個週期、每個策略調用一次 Screener，
+get_stock_fundamentals 再為每隻股票抓取一個完整的報價頁面（帶隨機延遲），
+並用 BeautifulSoup 解析整頁。而基本面數據每天才變化一次。
+
+本模塊:
+- 按自定義視圖（v=152）分頁抓取 Screener 表格，一頁 20 隻股票、一次帶齊所需的全部列
+- 定向解析：只截取 Screener 表格片段並用正則提取單元格，不構建整頁 DOM
+- 以 (snapshot_date, ticker) 為主鍵保存到單文件 SQLite 快照表，
+  同時記錄每個篩選條件當天的結果清單
+- FinvizScraper.get_stock_fundamentals / get_screener_results 優先讀取本地快照，
+  未命中時才回退到實時抓取
+- 個股快照只提供慢變基本面：價格、成交量、漲跌幅、RSI / ATR 等盤中字段讀取時置空，
+  由調用方用實時報價覆蓋（最多 FINVIZ_SNAPSHOT_MAX_AGE_DAYS 天前的價格不能當作現價）
+
+盤中信號類篩選（s=ta_topgainers、漲跌幅、缺口、相對成交量）每天多次變化，不做快照。
+
+使用示例:
+    >>> from data_layer.finviz_snapshot import get_finviz_snapshot_store, ingest_daily
+    >>> ingest_daily(FinvizScraper(), ['f=cap_midover,sh_opt_option'])
+    >>> get_finviz_snapshot_store().get_fundamentals('AAPL')['pe']
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+from html import unescape
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# (Finviz 自定義視圖列號, 表頭, 字段名)；字段名與 FinvizScraper.get_stock_fundamentals 一致
+SCREENER_COLUMNS = [
+    (1, 'Ticker', 'ticker'),
+    (2, 'Company', 'company_name'),
+    (3, 'Sector', 'sector'),
+    (4, 'Industry', 'industry'),
+    (5, 'Country', 'country'),
+    (6, 'Market Cap', 'market_cap'),
+    (7, 'P/E', 'pe'),
+    (8, 'Fwd P/E', 'forward_pe'),
+    (9, 'PEG', 'peg'),
+    (14, 'Dividend', 'dividend_yield'),
+    (16, 'EPS', 'eps_ttm'),
+    (24, 'Outstanding', 'shares_outstanding'),
+    (25, 'Float', 'shares_float'),
+    (26, 'Insider Own', 'insider_own'),
+    (28, 'Inst Own', 'inst_own'),
+    (30, 'Float Short', 'short_float'),
+    (32, 'ROA', 'roa'),
+    (33, 'ROE', 'roe'),
+    (38, 'Debt/Eq', 'debt_eq'),
+    (39, 'Gross M', 'gross_margin'),
+    (40, 'Oper M', 'operating_margin'),
+    (41, 'Profit M', 'profit_margin'),
+    (48, 'Beta', 'beta'),
+    (49, 'ATR', 'atr'),
+    (59, 'RSI', 'rsi'),
+    (63, 'Avg Volume', 'avg_volume'),
+    (65, 'Price', 'price'),
+    (66, 'Change', 'change_pct'),
+    (67, 'Volume', 'volume'),
+    (69, 'Target Price', 'target_price'),
+]
+
+# Finviz 不同版本頁面的表頭別名
+HEADER_ALIASES = {
+    'Forward P/E': 'forward_pe',
+    'Dividend %': 'dividend_yield',
+    'Dividend Yield': 'dividend_yield',
+    'EPS (ttm)': 'eps_ttm',
+    'Short Float': 'short_float',
+    'Shs Outstand': 'shares_outstanding',
+    'Shs Float': 'shares_float',
+    'Gross Margin': 'gross_margin',
+    'Oper. Margin': 'operating_margin',
+    'Profit Margin': 'profit_margin',
+    'ATR (14)': 'atr',
+    'RSI (14)': 'rsi',
+}
+
+HEADER_FIELDS = {header: field for _, header, field in SCREENER_COLUMNS}
+HEADER_FIELDS.update(HEADER_ALIASES)
+
+TEXT_FIELDS = ('ticker', 'company_name', 'sector', 'industry', 'country')
+# 快照表的數值列
+NUMERIC_FIELDS = tuple(field for _, _, field in SCREENER_COLUMNS if field not in TEXT_FIELDS)
+# 盤中變化的字段：get_fundamentals 返回 None，由實時來源提供
+# （eps_next_y 只有個股頁面提供，Screener 沒有對應列）
+LIVE_FIELDS = ('price', 'change_pct', 'volume', 'rsi', 'atr', 'eps_next_y')
+
+SCREENER_VIEW = 'v=152&c=0,' + ','.join(str(column) for column, _, _ in SCREENER_COLUMNS)
+PAGE_SIZE = 20  # 免費版每頁行數
+
+# 盤中變化的篩選條件（結果不能按天快照）
+INTRADAY_FILTER_PREFIXES = ('ta_change', 'ta_gap', 'ta_perf_d', 'sh_relvol', 'sh_curvol')
+
+_ROW_RE = re.compile(r'<tr\b[^>]*>((?:(?!<tr\b).)*?)</tr>', re.S | re.I)
+_CELL_RE = re.compile(r'<t[dh]\b[^>]*>(.*?)</t[dh]>', re.S | re.I)
+_TAG_RE = re.compile(r'<[^>]+>')
+
+
+def parse_screener_table(html: str) -> List[Dict[str, str]]:
+    """
+    定向解析 Screener 表格
+
+    只截取從表頭行（含 "No." 單元格）到表格結束的片段，逐行用正則提取單元格文本。
+
+    返回:
+        List[Dict[str, str]]: 每行 {表頭: 原始文本}，只包含序號列為數字的數據行
+    """
+    anchor = html.find('>No.<')
+    if anchor < 0:
+        return []
+    start = html.rfind('<tr', 0, anchor)
+    end = html.find('</table>', anchor)
+    fragment = html[start if start >= 0 else anchor:end if end >= 0 else len(html)]
+
+    header: Optional[List[str]] = None
+    rows = []
+    for row_match in _ROW_RE.finditer(fragment):
+        cells = [unescape(_TAG_RE.sub('', cell)).strip() for cell in _CELL_RE.findall(row_match.group(1))]
+        if header is None:
+            if 'No.' in cells and 'Ticker' in cells:
+                header = cells
+            continue
+        if len(cells) != len(header) or not cells[0].isdigit():
+            continue
+        rows.append(dict(zip(header, cells)))
+    return rows
+
+
+def to_fundamentals(row: Dict[str, str], parse_value: Callable[[str], Optional[float]]) -> Dict[str, Any]:
+    """
+    將 Screener 原始行轉換為 get_stock_fundamentals 格式的字段
+
+    參數:
+        row: parse_screener_table 返回的一行
+        parse_value: 數值解析函數（FinvizScraper._parse_value）
+    """
+    result: Dict[str, Any] = {field: None for field in TEXT_FIELDS + NUMERIC_FIELDS}
+    for header, raw in row.items():
+        field = HEADER_FIELDS.get(header)
+        if field is None:
+            continue
+        if field in TEXT_FIELDS:
+            result[field] = raw if raw and raw != '-' else None
+        else:
+            result[field] = parse_value(raw)
+    if result['ticker']:
+        result['ticker'] = result['ticker'].upper()
+    return result
+
+
+def is_intraday_screen(filters: str) -> bool:
+    """篩選條件是否依賴盤中數據（信號或盤中指標）"""
+    for part in filters.split('&'):
+        key, _, value = part.partition('=')
+        if key == 's' and value:
+            return True
+        if key == 'f' and any(token.startswith(INTRADAY_FILTER_PREFIXES) for token in value.split(',')):
+            return True
+    return False
+
+
+def screener_query(filters: str) -> str:
+    """去掉視圖 / 列 / 分頁參數，只保留篩選與排序部分（作為快照鍵和請求參數）"""
+    parts = [p for p in filters.split('&') if p and p.partition('=')[0] not in ('v', 'c', 'r')]
+    return '&'.join(parts)
+
+
+class FinvizSnapshotStore:
+    """
+    按日期保存的 Finviz 基本面快照（SQLite 單文件）
+
+    表結構:
+    - fundamentals: (snapshot_date, ticker) → 各基本面字段
+    - screens: (snapshot_date, filters) → 當天篩選結果的股票清單（保持 Finviz 排序）
+    """
+
+    def __init__(self, db_path: str, max_age_days: int = 3):
+        """
+        參數:
+            db_path: SQLite 文件路徑
+            max_age_days: 讀取基本面時可接受的快照天數（覆蓋週末和當天尚未抓取的情況）
+        """
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.db_path = db_path
+        self.max_age_days = max_age_days
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._stats = {'hits': 0, 'misses': 0, 'screen_hits': 0, 'screen_misses': 0, 'rows_saved': 0}
+        self._init_db()
+
+    def _init_db(self):
+        columns = ', '.join(
+            [f"{field} TEXT" for field in TEXT_FIELDS if field != 'ticker']
+            + [f"{field} REAL" for field in NUMERIC_FIELDS]
+        )
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS fundamentals ("
+                f"snapshot_date TEXT NOT NULL, ticker TEXT NOT NULL, {columns}, fetched_at REAL NOT NULL, "
+                f"PRIMARY KEY (snapshot_date, ticker))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_fundamentals_ticker ON fundamentals (ticker, snapshot_date)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS screens ("
+                "snapshot_date TEXT NOT NULL, filters TEXT NOT NULL, tickers TEXT NOT NULL, "
+                "pages INTEGER NOT NULL, fetched_at REAL NOT NULL, "
+                "PRIMARY KEY (snapshot_date, filters))"
+            )
+
+    def save(self, snapshot_date: str, filters: str, rows: List[Dict[str, Any]], pages: int = 1):
+        """
+        保存一次 Screener 抓取的結果（基本面行 + 篩選清單，同一事務）
+
+        參數:
+            snapshot_date: 快照日期（YYYY-MM-DD）
+            filters: 篩選條件
+            rows: to_fundamentals 格式的行
+            pages: 抓取的頁數
+        """
+        fields = TEXT_FIELDS + NUMERIC_FIELDS
+        placeholders = ', '.join('?' for _ in range(len(fields) + 2))
+        now = time.time()
+        rows = [r for r in rows if r.get('ticker')]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO fundamentals (snapshot_date, {', '.join(fields)}, fetched_at) "
+                f"VALUES ({placeholders})",
+                [(snapshot_date, *(r.get(f) for f in fields), now) for r in rows]
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO screens (snapshot_date, filters, tickers, pages, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (snapshot_date, screener_query(filters), json.dumps([r['ticker'] for r in rows]), pages, now)
+            )
+            self._stats['rows_saved'] += len(rows)
+
+    def _row_to_dict(self, cursor, row) -> Dict[str, Any]:
+        result = {desc[0]: value for desc, value in zip(cursor.description, row)}
+        result.pop('fetched_at', None)
+        result['data_source'] = 'Finviz'
+        return result
+
+    def get_fundamentals(self, ticker: str, max_age_days: Optional[int] = None,
+                         today: Optional[date] = None) -> Optional[Dict[str, Any]]:
+        """
+        讀取股票最近一次快照（只含慢變基本面，LIVE_FIELDS 為 None）
+
+        返回:
+            dict: get_stock_fundamentals 格式的字段 + snapshot_date；無足夠新的快照時返回 None
+        """
+        max_age = self.max_age_days if max_age_days is None else max_age_days
+        oldest = ((today or date.today()) - timedelta(days=max_age)).isoformat()
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT * FROM fundamentals WHERE ticker = ? AND snapshot_date >= ? "
+                "ORDER BY snapshot_date DESC LIMIT 1",
+                (ticker.upper(), oldest)
+            )
+            row = cursor.fetchone()
+            self._stats['hits' if row else 'misses'] += 1
+            if row is None:
+                return None
+            result = self._row_to_dict(cursor, row)
+        result.update(dict.fromkeys(LIVE_FIELDS))
+        return result
+
+    def has_screen(self, filters: str, snapshot_date: Optional[str] = None) -> bool:
+        """指定日期（默認今天）是否已抓取該篩選條件"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM screens WHERE snapshot_date = ? AND filters = ?",
+                (snapshot_date or date.today().isoformat(), screener_query(filters))
+            ).fetchone()
+        return row is not None
+
+    def get_screen(self, filters: str, snapshot_date: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        讀取指定日期（默認今天）的篩選結果（與 get_fundamentals 相同，LIVE_FIELDS 為 None）
+
+        返回:
+            List[Dict]: 按 Finviz 排序的基本面行；當天未抓取時返回 None
+        """
+        snapshot_date = snapshot_date or date.today().isoformat()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT tickers FROM screens WHERE snapshot_date = ? AND filters = ?",
+                (snapshot_date, screener_query(filters))
+            ).fetchone()
+            if row is None:
+                self._stats['screen_misses'] += 1
+                return None
+            self._stats['screen_hits'] += 1
+            tickers = json.loads(row[0])
+            if not tickers:
+                return []
+            cursor = self._conn.execute(
+                f"SELECT * FROM fundamentals WHERE snapshot_date = ? AND ticker IN ({', '.join('?' for _ in tickers)})",
+                (snapshot_date, *tickers)
+            )
+            by_ticker = {r['ticker']: r for r in (self._row_to_dict(cursor, row) for row in cursor.fetchall())}
+        rows = [by_ticker[t] for t in tickers if t in by_ticker]
+        for row in rows:
+            row.update(dict.fromkeys(LIVE_FIELDS))
+        return rows
+
+    def prune(self, keep_days: int, today: Optional[date] = None) -> int:
+        """刪除早於 keep_days 天的快照，返回刪除的基本面行數"""
+        oldest = ((today or date.today()) - timedelta(days=keep_days)).isoformat()
+        with self._lock, self._conn:
+            deleted = self._conn.execute("DELETE FROM fundamentals WHERE snapshot_date < ?", (oldest,)).rowcount
+            self._conn.execute("DELETE FROM screens WHERE snapshot_date < ?", (oldest,))
+        return deleted
+
+    def stats(self) -> Dict[str, Any]:
+        """快照命中統計與最新快照信息"""
+        with self._lock:
+            latest, tickers = self._conn.execute(
+                "SELECT snapshot_date, COUNT(*) FROM fundamentals "
+                "WHERE snapshot_date = (SELECT MAX(snapshot_date) FROM fundamentals)"
+            ).fetchone()
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats.update({
+            'latest_snapshot': latest,
+            'latest_tickers': tickers,
+            'hit_rate': round(stats['hits'] / lookups, 4) if lookups else 0.0
+        })
+        return stats
+
+
+def ingest_daily(scraper, filters_list: Iterable[str], store: Optional[FinvizSnapshotStore] = None,
+                 max_pages: Optional[int] = None, force: bool = False) -> Dict[str, int]:
+    """
+    每日批量抓取：對每個篩選條件分頁抓取 Screener 並寫入今天的快照
+
+    參數:
+        scraper: FinvizScraper 實例
+        filters_list: 篩選條件列表（盤中信號類會被跳過）
+        store: 快照存儲（默認使用進程共享實例）
+        max_pages: 每個篩選條件最多抓取的頁數（默認讀取設置）
+        force: 今天已抓取過也重新抓取
+
+    返回:
+        Dict[str, int]: {篩選條件: 寫入行數}（已是最新或跳過的條件不出現）
+    """
+    store = store or get_finviz_snapshot_store()
+    if max_pages is None:
+        from config.settings import settings
+        max_pages = settings.FINVIZ_SNAPSHOT_MAX_PAGES
+    today = date.today().isoformat()
+    ingested = {}
+    for filters in dict.fromkeys(screener_query(f) for f in filters_list):
+        if is_intraday_screen(filters):
+            logger.debug(f"跳過盤中篩選條件的快照: {filters}")
+            continue
+        if not force and store.has_screen(filters, today):
+            continue
+        started = time.monotonic()
+        rows, pages = scraper.get_screener_table(filters, max_pages=max_pages)
+        if not rows:
+            logger.warning(f"! Finviz 快照抓取無結果: {filters}")
+            continue
+        store.save(today, filters, rows, pages)
+        ingested[filters] = len(rows)
+        logger.info(f"* Finviz 快照 [{filters}] 完成: {len(rows)} 隻股票 / {pages} 頁，"
+                    f"耗時 {time.monotonic() - started:.1f}s")
+    return ingested
+
+
+_default_store: Optional[FinvizSnapshotStore] = None
+_default_lock = threading.Lock()
+
+
+def get_finviz_snapshot_store() -> FinvizSnapshotStore:
+    """進程內共享的 Finviz 快照存儲"""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            from config.settings import settings
+            _default_store = FinvizSnapshotStore(
+                os.path.join(settings.CACHE_DIR, 'finviz_snapshot.db'),
+                max_age_days=settings.FINVIZ_SNAPSHOT_MAX_AGE_DAYS
+            )
+        return _default_store
+
+
+if __name__ == "__main__":
+    # 每日任務入口（可由 cron 在盤前調用）
+    logging.basicConfig(level=logging.INFO)
+    from config.settings import settings
+    from config.strategy_profiles import ALL_PROFILES
+    from data_layer.finviz_scraper import FinvizScraper
+
+    screens = [settings.FINVIZ_SNAPSHOT_UNIVERSE] + [p.criteria.finviz_filters for p in ALL_PROFILES.values()]
+    result = ingest_daily(FinvizScraper(), screens)
+    store = get_finviz_snapshot_store()
+    store.prune(settings.FINVIZ_SNAPSHOT_KEEP_DAYS)
+    print(json.dumps({'ingested': result, 'stats': store.stats()}, indent=2, ensure_ascii=False))
@@ -0,0 +1,272 @@
+# data_layer/http_session.py
+"""
+共享 HTTP 連接池
+
+各 REST 客戶端原本直接調用模塊級 requests.get（每次新建 TCP + TLS 連接），
+Yahoo 客戶端出錯時整個重建 requests.Session（連接池一併丟棄）。
+
+本模塊提供:
+- HTTPSessionFactory: 按連接池名稱共享 HTTPAdapter（每個主機一個 keep-alive 連接池、
+  urllib3 重試、默認超時）。shared() 返回共享 Session；new_session() 返回擁有獨立
+  cookies 的新 Session，但底層連接仍來自共享連接池（刷新 cookies 不需要重新握手）
+- AsyncHTTPSessionFactory: aiohttp 對應實現（每個事件循環一個 ClientSession）
+- 連接復用統計：新建連接數 / 請求數，用於驗證負載下節省的握手次數
+
+使用示例:
+    >>> from data_layer.http_session import http_sessions
+    >>> session = http_sessions.shared('rapidapi')
+    >>> response = session.get(url, params=params)
+    >>> http_sessions.stats()['rapidapi']['reuse_ratio']
+"""
+
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from data_layer.utils import ConnectionConfig, DEFAULT_CONNECTION_CONFIG
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    aiohttp = None
+    AIOHTTP_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class _ConnectionStats:
+    """線程安全的請求 / 新建連接計數"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+
+    def add(self, requests_: int = 0, connections: int = 0):
+        with self._lock:
+            self.requests += requests_
+            self.connections += connections
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            requests_, connections = self.requests, self.connections
+        reused = max(0, requests_ - connections)
+        return {
+            'requests': requests_,
+            'new_connections': connections,
+            'reused_connections': reused,
+            'reuse_ratio': round(reused / requests_, 4) if requests_ else 0.0
+        }
+
+
+def _counting_pool(base, stats: _ConnectionStats):
+    """返回在新建連接時計數的連接池類"""
+    class CountingPool(base):
+        def _new_conn(self):
+            stats.add(connections=1)
+            return super()._new_conn()
+    CountingPool.__name__ = f"Counting{base.__name__}"
+    return CountingPool
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """帶默認超時與連接統計的 HTTPAdapter"""
+
+    def __init__(self, timeout, stats: _ConnectionStats, **kwargs):
+        self.timeout = timeout
+        self.connection_stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _counting_pool(HTTPConnectionPool, self.connection_stats),
+            'https': _counting_pool(HTTPSConnectionPool, self.connection_stats),
+        }
+
+    def send(self, request, timeout=None, **kwargs):
+        self.connection_stats.add(requests_=1)
+        return super().send(request, timeout=timeout if timeout is not None else self.timeout, **kwargs)
+
+
+class PooledSession(requests.Session):
+    """
+    使用共享連接池的 Session
+
+    close() 只清除 cookies，不關閉共享連接池（其他 Session 仍在使用）。
+    """
+
+    def close(self):
+        self.cookies.clear()
+
+
+class HTTPSessionFactory:
+    """按連接池名稱共享 keep-alive 連接池的 Session 工廠"""
+
+    RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._adapters: Dict[str, PooledHTTPAdapter] = {}
+        self._shared: Dict[str, PooledSession] = {}
+
+    def _adapter(self, name: str, connection_config: Optional[ConnectionConfig] = None,
+                 retries: Optional[int] = None) -> PooledHTTPAdapter:
+        adapter = self._adapters.get(name)
+        if adapter is None:
+            config = connection_config or DEFAULT_CONNECTION_CONFIG
+            total = config.max_retries if retries is None else retries
+            retry = Retry(
+                total=total, connect=total, read=total, status=total,
+                backoff_factor=0.5,
+                status_forcelist=self.RETRY_STATUS_CODES,
+                allowed_methods=frozenset(['GET', 'HEAD']),
+                raise_on_status=False,
+                respect_retry_after_header=True
+            ) if total else Retry(0, read=False)
+            adapter = PooledHTTPAdapter(
+                timeout=config.timeout,
+                stats=_ConnectionStats(),
+                pool_connections=config.pool_connections,
+                pool_maxsize=config.pool_maxsize,
+                max_retries=retry,
+                pool_block=False
+            )
+            self._adapters[name] = adapter
+            logger.debug(f"創建連接池 [{name}]: {config.pool_connections} 個主機 × {config.pool_maxsize} 個連接")
+        return adapter
+
+    def new_session(self, name: str, connection_config: Optional[ConnectionConfig] = None,
+                    headers: Optional[Dict[str, str]] = None, retries: Optional[int] = None) -> PooledSession:
+        """
+        創建新 Session（獨立 cookies，共享連接池）
+
+        參數:
+            name: 連接池名稱（同名 Session 共用 TCP/TLS 連接）
+            connection_config: 連接配置（僅首次創建連接池時生效）
+            headers: 默認請求頭
+            retries: urllib3 層重試次數（None 使用 connection_config.max_retries；
+                     自行處理重試的客戶端傳 0）
+        """
+        with self._lock:
+            adapter = self._adapter(name, connection_config, retries)
+        session = PooledSession()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        if headers:
+            session.headers.update(headers)
+        return session
+
+    def shared(self, name: str, connection_config: Optional[ConnectionConfig] = None,
+               headers: Optional[Dict[str, str]] = None, retries: Optional[int] = None) -> PooledSession:
+        """返回按名稱共享的 Session（無狀態 REST 客戶端使用）"""
+        with self._lock:
+            session = self._shared.get(name)
+        if session is None:
+            created = self.new_session(name, connection_config, headers, retries)
+            with self._lock:
+                session = self._shared.setdefault(name, created)
+        return session
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各連接池的連接復用統計"""
+        with self._lock:
+            adapters = dict(self._adapters)
+        return {name: adapter.connection_stats.to_dict() for name, adapter in adapters.items()}
+
+    def close_all(self):
+        """關閉所有連接池（進程退出前調用）"""
+        with self._lock:
+            adapters = list(self._adapters.values())
+            self._adapters.clear()
+            self._shared.clear()
+        for adapter in adapters:
+            adapter.close()
+
+
+class AsyncHTTPSessionFactory:
+    """
+    aiohttp 版本的共享連接池
+
+    aiohttp.ClientSession 綁定事件循環，因此按 (名稱, 事件循環) 緩存。
+    """
+
+    def __init__(self, limit: int = 100, limit_per_host: int = 10, keepalive_timeout: float = 30.0):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self._sessions: Dict[tuple, Any] = {}
+        self._stats: Dict[str, _ConnectionStats] = {}
+        self._lock = threading.Lock()
+
+    def _trace_config(self, stats: _ConnectionStats):
+        trace = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            stats.add(requests_=1)
+
+        async def on_connection_create_end(session, context, params):
+            stats.add(connections=1)
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        return trace
+
+    def get(self, name: str, connection_config: Optional[ConnectionConfig] = None,
+            headers: Optional[Dict[str, str]] = None):
+        """
+        返回當前事件循環中按名稱共享的 aiohttp.ClientSession
+
+        必須在協程內調用。
+        """
+        if not AIOHTTP_AVAILABLE:
+            raise RuntimeError("aiohttp 未安裝，無法使用異步連接池")
+        loop = asyncio.get_running_loop()
+        key = (name, id(loop))
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None and not session.closed:
+                return session
+            config = connection_config or DEFAULT_CONNECTION_CONFIG
+            stats = self._stats.setdefault(name, _ConnectionStats())
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300
+            )
+            session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(sock_connect=config.connect_timeout, sock_read=config.read_timeout),
+                headers=headers,
+                trace_configs=[self._trace_config(stats)]
+            )
+            self._sessions[key] = session
+            return session
+
+    async def close_all(self):
+        """關閉當前事件循環中的所有 Session"""
+        loop_id = id(asyncio.get_running_loop())
+        with self._lock:
+            keys = [k for k in self._sessions if k[1] == loop_id]
+            sessions = [self._sessions.pop(k) for k in keys]
+        for session in sessions:
+            await session.close()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各連接池的連接復用統計"""
+        with self._lock:
+            stats = dict(self._stats)
+        return {name: s.to_dict() for name, s in stats.items()}
+
+
+# 進程內共享的工廠
+http_sessions = HTTPSessionFactory()
+async_http_sessions = AsyncHTTPSessionFactory()
@@ -12,6 +12,7 @@ Interactive Brokers (IBKR) API 客戶端
 - 增強錯誤處理
 """
 
+import asyncio
 import logging
 import time
 import os
@@ -142,6 +143,7 @@ ET_TIMEZONE = pytz.timezone('America/New_York')
 GREEKS_INITIAL_TIMEOUT = 10      # 初始等待時間（秒）
 GREEKS_STABILIZATION_TIMEOUT = 3 # 穩定等待時間（秒）
 GREEKS_STABILITY_TOLERANCE = 0.001  # Greeks 穩定性容差
+GREEKS_SETTLE_SECONDS = 1.0      # Greeks 無變化多久即視為收斂（原輪詢 2 × 0.5 秒）
 
 # ============================================================================
 # 價格驗證參數
@@ -345,7 +347,8 @@ class IBKRClient:
         
         self.client_id = client_id
         self.mode = mode
-        self.ib = ib_instance if ib_instance else IB() # Use existing or create new
+        from data_layer.ibkr_recorder import create_ib
+        self.ib = ib_instance if ib_instance else create_ib() # Use existing or create new (錄製 / 回放按配置)
         self.connected = ib_instance.isConnected() if ib_instance else False
         self.last_error = None
         self.connection_attempts = 0
@@ -362,6 +365,40 @@ class IBKRClient:
         # 為股票準備完整的 tick list（包含新聞）
         self._stock_tick_list = build_generic_tick_list(contract_type='stock')
         
+        # 合約驗證 / 期權鏈定義緩存（與 ScannerService 共用，按交易日失效）
+        from data_layer.ibkr_contract_cache import get_contract_cache
+        self.contract_cache = get_contract_cache()
+        
+        # 共享歷史數據調度隊列（pacing 感知；IBKRClient 服務深度分析，默認最高優先級）
+        from data_layer.ibkr_historical_scheduler import PRIORITY_INTERACTIVE, get_historical_scheduler
+        self.historical = get_historical_scheduler()
+        self.historical_priority = PRIORITY_INTERACTIVE
+        
+        # 共享行情線預算（所有 reqMktData 經此申請，LRU 復用熱線）
+        from data_layer.ibkr_market_data_lines import get_market_data_lines
+        self.market_data_lines = get_market_data_lines()
+        
+        # Tick 環形緩衝區採集管道（get_tick_pipeline 懶創建）
+        self._tick_pipeline = None
+        
+        # 事件驅動的期權鏈快照引擎（在途窗口從行情線預算中申請）
+        from config.settings import settings
+        from data_layer.ibkr_snapshot_engine import ChainSnapshotEngine
+        self.snapshot_engine = ChainSnapshotEngine(
+            self.ib,
+            generic_tick_list=self._generic_tick_list,
+            max_in_flight=settings.IBKR_SNAPSHOT_MAX_IN_FLIGHT,
+            contract_timeout=settings.IBKR_SNAPSHOT_CONTRACT_TIMEOUT,
+            stability_tolerance=GREEKS_STABILITY_TOLERANCE,
+            lines=self.market_data_lines
+        )
+        
+        # 自適應行使價規劃（按歷史流動性 / 模塊使用預測快照需要的行使價）
+        self.strike_planner = None
+        if settings.STRIKE_PLANNER_ENABLED:
+            from data_layer.smart_option_chain_fetcher import SmartOptionChainFetcher, get_strike_usage_history
+            self.strike_planner = SmartOptionChainFetcher(history=get_strike_usage_history())
+        
         # 新增: 錯誤追蹤
         self._recent_errors: List[Dict] = []
         
@@ -673,70 +710,95 @@ class IBKRClient:
         """
         等待 Greeks 數據收斂
         
-        IBKR 的 Greeks 計算需要時間收斂，此方法會等待數據穩定後再返回
+        IBKR 的 Greeks 計算需要時間收斂，此方法在 Ticker 的 updateEvent 上判斷：
+        連續兩次更新在容差內，或 GREEKS_SETTLE_SECONDS 內沒有新的變化，即視為收斂
         
         參數:
-            option_contract: 期權合約
+            option_contract: 期權合約（必須已調用 reqMktData）
             timeout: 最大等待時間（秒）
         
         返回:
             dict: 包含 greeks, converged, convergence_time, warnings
         """
         start_time = time.time()
-        last_greeks = None
-        stable_count = 0
-        warnings = []
-        
-        while time.time() - start_time < timeout:
-            ticker_data = self.ib.ticker(option_contract)
-            
-            if ticker_data and ticker_data.modelGreeks:
-                current_greeks = {
-                    'delta': ticker_data.modelGreeks.delta,
-                    'gamma': ticker_data.modelGreeks.gamma,
-                    'theta': ticker_data.modelGreeks.theta,
-                    'vega': ticker_data.modelGreeks.vega,
-                    'rho': getattr(ticker_data.modelGreeks, 'rho', None),
-                    'impliedVol': ticker_data.modelGreeks.impliedVol,
-                    'undPrice': ticker_data.modelGreeks.undPrice,
-                    'optPrice': ticker_data.modelGreeks.optPrice,
-                }
-                
-                # 檢查核心值是否有效
-                core_values = [current_greeks['delta'], current_greeks['gamma'], 
-                              current_greeks['theta'], current_greeks['vega']]
-                
-                if all(v is not None for v in core_values):
-                    # 檢查是否穩定（與上次相同）
-                    if last_greeks and self._greeks_are_stable(last_greeks, current_greeks):
-                        stable_count += 1
-                        if stable_count >= 2:
-                            elapsed = time.time() - start_time
-                            logger.info(f"  Greeks 收斂完成，耗時 {elapsed:.1f} 秒")
-                            return {
-                                'greeks': current_greeks,
-                                'converged': True,
-                                'convergence_time': elapsed,
-                                'warnings': warnings
-                            }
-                    else:
-                        stable_count = 0
-                    
-                    last_greeks = current_greeks
+        ticker_data = self._ticker(option_contract)
+        state = {'last': None, 'stable_count': 0}
+        
+        async def wait_converged() -> bool:
+            loop = asyncio.get_running_loop()
+            converged = loop.create_future()
+            settle_timer = None
+            
+            def on_update(t):
+                nonlocal settle_timer
+                current_greeks = self._extract_model_greeks(t)
+                if current_greeks is None or converged.done():
+                    return
+                last_greeks = state['last']
+                if last_greeks and self._greeks_are_stable(last_greeks, current_greeks):
+                    state['stable_count'] += 1
+                    if state['stable_count'] >= 2:
+                        converged.set_result(True)
+                    return
+                state['stable_count'] = 0
+                state['last'] = current_greeks
+                if settle_timer is not None:
+                    settle_timer.cancel()
+                settle_timer = loop.call_later(
+                    GREEKS_SETTLE_SECONDS, lambda: converged.done() or converged.set_result(True)
+                )
             
-            time.sleep(0.5)
+            ticker_data.updateEvent += on_update
+            try:
+                on_update(ticker_data)
+                await asyncio.wait_for(converged, timeout)
+                return True
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                ticker_data.updateEvent -= on_update
+                if settle_timer is not None:
+                    settle_timer.cancel()
         
-        # 超時返回部分數據
+        converged = bool(ticker_data) and self.ib.run(wait_converged())
         elapsed = time.time() - start_time
-        warnings.append(f'Greeks 未在 {timeout} 秒內完全收斂')
-        logger.warning(f"  Greeks 收斂超時 ({elapsed:.1f} 秒)")
+        if converged:
+            logger.info(f"  Greeks 收斂完成，耗時 {elapsed:.1f} 秒")
+            return {
+                'greeks': state['last'],
+                'converged': True,
+                'convergence_time': elapsed,
+                'warnings': []
+            }
         
+        # 超時返回部分數據
+        logger.warning(f"  Greeks 收斂超時 ({elapsed:.1f} 秒)")
         return {
-            'greeks': last_greeks,
+            'greeks': state['last'],
             'converged': False,
             'convergence_time': elapsed,
-            'warnings': warnings
+            'warnings': [f'Greeks 未在 {timeout} 秒內完全收斂']
+        }
+    
+    @staticmethod
+    def _extract_model_greeks(ticker_data) -> Optional[Dict]:
+        """從 Ticker 提取 modelGreeks（核心值不完整時返回 None）"""
+        if not ticker_data or not ticker_data.modelGreeks:
+            return None
+        model = ticker_data.modelGreeks
+        greeks = {
+            'delta': model.delta,
+            'gamma': model.gamma,
+            'theta': model.theta,
+            'vega': model.vega,
+            'rho': getattr(model, 'rho', None),
+            'impliedVol': model.impliedVol,
+            'undPrice': model.undPrice,
+            'optPrice': model.optPrice,
         }
+        if any(greeks[k] is None for k in ('delta', 'gamma', 'theta', 'vega')):
+            return None
+        return greeks
     
     def _greeks_are_stable(self, prev: Dict, curr: Dict, tolerance: float = GREEKS_STABILITY_TOLERANCE) -> bool:
         """檢查 Greeks 是否穩定"""
@@ -789,10 +851,29 @@ class IBKRClient:
         
         return result
     
+    def _qualify(self, *contracts) -> List[Any]:
+        """驗證合約（經合約緩存，已知合約不產生往返）"""
+        return self.contract_cache.qualify(self.ib, *contracts)
+    
+    def _subscribe(self, contract, generic_tick_list: str = '') -> Any:
+        """通過共享行情線預算訂閱行情（已訂閱時復用同一個 Ticker）"""
+        return self.market_data_lines.acquire(self.ib, contract, generic_tick_list, owner='ibkr_client')
+    
+    def _unsubscribe(self, contract):
+        """釋放行情線（保持訂閱供下次復用，預算不足時由 LRU 淘汰）"""
+        self.market_data_lines.release(self.ib, contract, owner='ibkr_client')
+    
+    def _ticker(self, contract) -> Any:
+        """已訂閱合約的 Ticker（行情線由管理器持有，合約對象可能不同）"""
+        return self.market_data_lines.peek(self.ib, contract) or self.ib.ticker(contract)
+    
     def disconnect(self):
         """斷開連接"""
         if self.connected and self.ib.isConnected():
             try:
+                self.market_data_lines.clear(self.ib)
+                if self._tick_pipeline is not None:
+                    self._tick_pipeline.close()
                 self.ib.disconnect()
                 self.connected = False
                 logger.info("* IBKR 已斷開連接")
@@ -829,15 +910,10 @@ class IBKRClient:
             
             # 創建股票合約
             stock = Stock(ticker, 'SMART', 'USD')
-            self.ib.qualifyContracts(stock)
+            self._qualify(stock)
             
             # 獲取期權鏈定義
-            chains = self.ib.reqSecDefOptParams(
-                stock.symbol,
-                '',
-                stock.secType,
-                stock.conId
-            )
+            chains = self.contract_cache.option_chains(self.ib, stock)
             
             if not chains:
                 logger.warning(f"! {ticker} 無可用期權鏈定義 (IBKR)")
@@ -869,7 +945,35 @@ class IBKRClient:
             logger.error(f"✗ IBKR 獲取期權到期日失敗: {e}")
             return None
     
-    def get_historical_data(self, ticker: str, period: str = '1mo', interval: str = '1d') -> Optional['pd.DataFrame']:
+    def get_historical_data(self, ticker: str, period: str = '1mo', interval: str = '1d',
+                            use_store: bool = True, adjusted: bool = False) -> Optional['pd.DataFrame']:
+        """
+        獲取歷史 OHLCV 數據（經本地增量 K 線存儲，只向 IBKR 請求缺失區間）
+
+        參數:
+            ticker: 股票代碼
+            period: 時間週期 (yfinance 風格: '1d', '5d', '1mo', '3mo', '6mo', '1y', '2y')
+            interval: K線間隔 (yfinance 風格: '1m', '5m', '15m', '30m', '1h', '1d', '1wk')
+            use_store: 是否使用本地 K 線存儲（False 時直接請求 IBKR）
+            adjusted: True 時請求拆股/除息調整後的 ADJUSTED_LAST，否則為未調整的 TRADES
+
+        返回:
+            pandas DataFrame (Open, High, Low, Close, Volume)，失敗返回 None
+        """
+        from config.settings import settings
+
+        if not use_store or not settings.BAR_STORE_ENABLED:
+            return self._request_historical_data(ticker, period, interval, adjusted)
+
+        from data_layer.bar_store import ADJUSTED, RAW, get_bar_store
+        return get_bar_store().get_bars(
+            ticker, interval, period,
+            lambda fetch_period: self._request_historical_data(ticker, fetch_period, interval, adjusted),
+            adjustment=ADJUSTED if adjusted else RAW
+        )
+
+    def _request_historical_data(self, ticker: str, period: str = '1mo', interval: str = '1d',
+                                 adjusted: bool = False) -> Optional['pd.DataFrame']:
         """
         獲取歷史 OHLCV 數據 (使用 reqHistoricalData)
         
@@ -877,6 +981,7 @@ class IBKRClient:
             ticker: 股票代碼
             period: 時間週期 (yfinance 風格: '1d', '5d', '1mo', '3mo', '6mo', '1y', '2y')
             interval: K線間隔 (yfinance 風格: '1m', '5m', '15m', '30m', '1h', '1d', '1wk')
+            adjusted: True 時使用 ADJUSTED_LAST（拆股/除息調整），否則使用 TRADES
         
         返回:
             pandas DataFrame (Open, High, Low, Close, Volume)，失敗返回 None
@@ -901,6 +1006,7 @@ class IBKRClient:
                 '6mo': '6 M',
                 '1y': '1 Y',
                 '2y': '2 Y',
+                '5y': '5 Y',
             }
             # 也支持 '30d', '60d', '90d', '252d' 這類格式
             duration_str = period_map.get(period)
@@ -931,22 +1037,22 @@ class IBKRClient:
                 logger.warning(f"! 不支持的 interval 格式: {interval}，使用默認 1 day")
                 bar_size = '1 day'
             
-            # 日線以上使用 TRADES，分鐘線也使用 TRADES
-            what_to_show = 'TRADES'
+            # 默認使用未調整的 TRADES；與 Yahoo 等已復權序列混用時請求 ADJUSTED_LAST
+            what_to_show = 'ADJUSTED_LAST' if adjusted else 'TRADES'
             
             # 創建股票合約
             stock = Stock(ticker, 'SMART', 'USD')
-            self.ib.qualifyContracts(stock)
+            self._qualify(stock)
             
-            # 請求歷史數據
-            bars = self.ib.reqHistoricalData(
+            # 請求歷史數據（經調度隊列，遵守 IBKR pacing 限制）
+            bars = self.historical.request_sync(
+                self.ib,
                 stock,
-                endDateTime='',  # 到最新
-                durationStr=duration_str,
-                barSizeSetting=bar_size,
-                whatToShow=what_to_show,
-                useRTH=True,  # 只要常規交易時段
-                formatDate=1  # 日期格式
+                duration_str,
+                bar_size,
+                what_to_show=what_to_show,
+                use_rth=True,  # 只要常規交易時段
+                priority=self.historical_priority
             )
             
             if not bars:
@@ -1048,15 +1154,10 @@ class IBKRClient:
             
             # 創建股票合約
             stock = Stock(ticker, 'SMART', 'USD')
-            self.ib.qualifyContracts(stock)
+            self._qualify(stock)
             
             # 獲取期權鏈定義（不需要市場數據訂閱）
-            chains = self.ib.reqSecDefOptParams(
-                stock.symbol,
-                '',
-                stock.secType,
-                stock.conId
-            )
+            chains = self.contract_cache.option_chains(self.ib, stock)
             
             if not chains:
                 logger.warning(f"! {ticker} 無可用期權鏈")
@@ -1123,14 +1224,13 @@ class IBKRClient:
             
             try:
                 # 獲取所有匹配的期權合約
-                contract_details_list = self.ib.reqContractDetails(option_filter)
+                option_contracts = self.contract_cache.option_contracts(self.ib, option_filter)
                 
-                if contract_details_list:
-                    logger.info(f"  找到 {len(contract_details_list)} 個期權合約")
+                if option_contracts:
+                    logger.info(f"  找到 {len(option_contracts)} 個期權合約")
                     
                     # 過濾行使價範圍，只返回合約基本信息
-                    for cd in contract_details_list:
-                        contract = cd.contract
+                    for contract in option_contracts:
                         strike = contract.strike
                         
                         # 只處理在價格範圍內的行使價
@@ -1240,7 +1340,7 @@ class IBKRClient:
                 exchange='SMART',
                 currency='USD'
             )
-            qualified = self.ib.qualifyContracts(option)
+            qualified = self._qualify(option)
             
             if not qualified:
                 logger.warning(f"! 無法驗證期權合約: {ticker} {strike} {option_type}")
@@ -1249,7 +1349,7 @@ class IBKRClient:
             logger.info(f"  期權合約已驗證: {option.localSymbol}, conId={option.conId}")
             
             # 請求期權市場數據 - 使用完整 Generic Tick Tags
-            self.ib.reqMktData(option, self._generic_tick_list, False, False)  # snapshot=False
+            self._subscribe(option, self._generic_tick_list)
             
             # 初始化結果
             result = {
@@ -1354,12 +1454,10 @@ class IBKRClient:
                     if stock_price is None:
                         # Try to get stock price from IBKR
                         stock = Stock(ticker, 'SMART', 'USD')
-                        self.ib.qualifyContracts(stock)
-                        stock_ticker = self.ib.reqMktData(stock, '', False, False)
-                        self.ib.sleep(2)  # Wait for data
+                        self._qualify(stock)
+                        stock_ticker = self.market_data_lines.snapshot(self.ib, stock, timeout=2)
                         if stock_ticker and stock_ticker.last:
                             stock_price = float(stock_ticker.last)
-                        self.ib.cancelMktData(stock)
                     
                     if stock_price is None:
                         logger.warning("  Cannot get stock price for local Greeks calculation")
@@ -1445,7 +1543,7 @@ class IBKRClient:
                 result['warnings'].extend(convergence_result['warnings'])
             
             # 獲取報價數據
-            ticker_data = self.ib.ticker(option)
+            ticker_data = self._ticker(option)
             if ticker_data:
                 # Bid/Ask/Last
                 if ticker_data.bid is not None and self._is_valid_price(ticker_data.bid):
@@ -1473,10 +1571,7 @@ class IBKRClient:
                 result['warnings'].append('數據獲取於盤外時段，Greeks 可能不準確')
             
             # 取消市場數據訂閱
-            try:
-                self.ib.cancelMktData(option)
-            except:
-                pass
+            self._unsubscribe(option)
             
             # 過濾 None 值（保留重要字段）
             important_fields = ['strike', 'expiration', 'option_type', 'source', 'data_quality', 
@@ -1549,7 +1644,7 @@ class IBKRClient:
             )
             
             try:
-                qualified = self.ib.qualifyContracts(option)
+                qualified = self._qualify(option)
             except Exception as qual_err:
                 logger.debug(f"  合約驗證時出現警告（可忽略）: {qual_err}")
             
@@ -1558,13 +1653,13 @@ class IBKRClient:
                 return None
             
             # 請求期權報價 - 使用完整 Generic Tick Tags
-            self.ib.reqMktData(option, self._generic_tick_list, False, False)
+            self._subscribe(option, self._generic_tick_list)
             
             # 等待數據（增加等待時間以確保數據完整）
             ticker_data = None
             for i in range(10):  # 最多等待 10 秒
                 time.sleep(1)
-                ticker_data = self.ib.ticker(option)
+                ticker_data = self._ticker(option)
                 if ticker_data:
                     has_bid = self._is_valid_price(ticker_data.bid)
                     has_ask = self._is_valid_price(ticker_data.ask)
@@ -1664,8 +1759,8 @@ class IBKRClient:
             if result['outside_rth']:
                 result['warnings'].append('數據獲取於盤外時段')
             
-            # 取消市場數據訂閱
-            self.ib.cancelMktData(option)
+            # 釋放行情線
+            self._unsubscribe(option)
             
             logger.info(f"* 獲取期權報價成功: data_quality={result.get('data_quality')}")
             return result
@@ -1698,11 +1793,12 @@ class IBKRClient:
             exp_formatted = expiration.replace('-', '')
             
             option = Option(ticker, exp_formatted, strike, option_type, 'SMART')
-            self.ib.qualifyContracts(option)
-            self.ib.reqMktData(option, self._generic_tick_list, False, False)
+            self._qualify(option)
+            self._subscribe(option, self._generic_tick_list)
             time.sleep(1)
             
-            ticker_data = self.ib.ticker(option)
+            ticker_data = self._ticker(option)
+            self._unsubscribe(option)
             if ticker_data and ticker_data.bid and ticker_data.ask:
                 spread = ticker_data.ask - ticker_data.bid
                 logger.info(f"* Bid/Ask 價差: ${spread:.2f}")
@@ -1717,10 +1813,11 @@ class IBKRClient:
     def _get_option_data(self, contract: Contract) -> Optional[Dict[str, Any]]:
         """獲取單個期權合約的市場數據"""
         try:
-            self.ib.reqMktData(contract, getattr(self, '_generic_tick_list', ''), False, False)
+            self._subscribe(contract, getattr(self, '_generic_tick_list', ''))
             time.sleep(0.5)  # 等待數據
             
-            ticker_data = self.ib.ticker(contract)
+            ticker_data = self._ticker(contract)
+            self._unsubscribe(contract)
             if not ticker_data:
                 return None
             
@@ -1777,22 +1874,22 @@ class IBKRClient:
             
         try:
             contract = Stock(ticker, 'SMART', 'USD')
-            self.ib.qualifyContracts(contract)
+            self._qualify(contract)
             
-            # 使用 reqMktData (Snapshot)，加入 generic_tick_list
-            self.ib.reqMktData(contract, getattr(self, '_generic_tick_list', ''), True, False)
+            # 通過共享行情線訂閱（熱線已有成交價時無需等待）
+            t = self._subscribe(contract, getattr(self, '_generic_tick_list', ''))
             
             # 等待數據 (最多 4 秒)
             start_time = time.time()
             price = None
             while time.time() - start_time < 4:
-                self.ib.sleep(0.1)
-                t = self.ib.ticker(contract)
                 if t.last and not math.isnan(t.last):
                     price = t.last
                     break
                 elif t.close and not math.isnan(t.close):
                     price = t.close
+                self.ib.sleep(0.1)
+            self._unsubscribe(contract)
                     
             if price:
                 logger.info(f"獲取 {ticker} 股價成功: {price}")
@@ -1814,8 +1911,10 @@ class IBKRClient:
         策略：
         1. 獲取所有合約
         2. 過濾（如果指定了 center_strike，只獲取附近的合約，例如 +/- 25%）
-        3. 批量請求快照數據
-        4. 收集結果並轉換為統一 schema
+        3. 行使價規劃（strike_planner 啟用時，按歷史只取預測需要的行使價）
+        4. 事件驅動批量快照（ChainSnapshotEngine，在途訂閱數受行情線配額限制）
+        5. 計劃邊緣仍有流動性時補取一次，並記錄本次觀察到的流動性
+        6. 收集結果並轉換為統一 schema
         
         參數:
             ticker: 股票代碼
@@ -1825,7 +1924,10 @@ class IBKRClient:
         返回:
             dict: {
                 'calls': List[OptionSnapshotSchema],
-                'puts': List[OptionSnapshotSchema]
+                'puts': List[OptionSnapshotSchema],
+                'columns': {'calls': {字段: 值列表}, 'puts': {字段: 值列表}},
+                'capture_stats': 快照引擎統計（耗時、超時合約數、在途峰值）,
+                'strike_plan': 行使價計劃統計（未使用規劃時為 None）
             }
         
         Ref: option-data-review.md Section III.4, data_policy.py OptionSnapshotSchema
@@ -1833,8 +1935,8 @@ class IBKRClient:
         if not self.is_connected() and not self.connect():
             return None
             
-        import math
-        from data_layer.data_policy import DataSource
+        from data_layer.ibkr_snapshot_engine import to_columns
+        from data_layer.smart_option_chain_fetcher import days_until
             
         try:
             logger.info(f"正在獲取 {ticker} {expiration} 期權鏈快照（統一 Schema）...")
@@ -1856,6 +1958,17 @@ class IBKRClient:
             puts = chain_structure.get('puts', [])
             
             all_contracts = []
+            plan = None
+            
+            def to_contracts(rows, right, strikes=None):
+                contracts = []
+                for row in rows:
+                    if strikes is not None and row['strike'] not in strikes:
+                        continue
+                    contract = Option(ticker, exp_formatted, row['strike'], right, 'SMART')
+                    contract.conId = row.get('conId', 0)
+                    contracts.append(contract)
+                return contracts
             
             # 過濾邏輯 (如果提供了 center_strike)
             if center_strike:
@@ -1868,75 +1981,79 @@ class IBKRClient:
                 
                 logger.info(f"過濾合約: Calls {len(calls)}->{len(valid_calls)}, Puts {len(puts)}->{len(valid_puts)}")
                 
+                # 行使價規劃：只取歷史上有流動性或被分析模塊使用的區間
+                planned = None
+                if self.strike_planner is not None:
+                    plan = self.strike_planner.plan_strikes(
+                        ticker, expiration, center_strike,
+                        [c['strike'] for c in valid_calls + valid_puts]
+                    )
+                    planned = set(plan.strikes)
+                    if plan.source == 'history':
+                        logger.info(f"行使價規劃: {len(plan.candidates)}->{len(plan.strikes)} 個行使價")
+                
                 # 轉換為 Contract 對象
-                for c in valid_calls:
+                all_contracts = to_contracts(valid_calls, 'C', planned) + to_contracts(valid_puts, 'P', planned)
+            else:
+                # 全部獲取 (注意流量控制)
+                logger.warning("未指定 center_strike，將獲取完整期權鏈（可能較慢）")
+                for c in calls:
                     contract = Option(ticker, exp_formatted, c['strike'], 'C', 'SMART')
                     contract.conId = c.get('conId', 0)
                     all_contracts.append(contract)
-                    
-                for p in valid_puts:
+                for p in puts:
                     contract = Option(ticker, exp_formatted, p['strike'], 'P', 'SMART')
                     contract.conId = p.get('conId', 0)
                     all_contracts.append(contract)
-            else:
-                # 全部獲取 (注意流量控制)
-                logger.warning("未指定 center_strike，將獲取完整期權鏈（可能較慢）")
-                for c in calls:
-                    all_contracts.append(Option(ticker, exp_formatted, c['strike'], 'C', 'SMART'))
-                for p in puts:
-                    all_contracts.append(Option(ticker, exp_formatted, p['strike'], 'P', 'SMART'))
 
             if not all_contracts:
                 return {'calls': [], 'puts': []}
 
-            # 2. 批量請求數據
-            logger.info(f"請求 {len(all_contracts)} 個合約的快照數據...")
-            
-            # 使用流式訂閱 + 短暫等待 + 取消訂閱 (Streaming Burst)
-            for contract in all_contracts:
-                self.ib.reqMktData(contract, self._generic_tick_list, False, False) 
-            
-            # 3. 等待數據填充（最多 8 秒）
-            start_time = time.time()
-            while time.time() - start_time < 8:
-                self.ib.sleep(0.2)
-                pending = 0
-                for c in all_contracts:
-                    t = self.ib.ticker(c)
-                    has_data = (t.last and not math.isnan(t.last)) or \
-                               (t.bid and not math.isnan(t.bid)) or \
-                               (t.modelGreeks and t.modelGreeks.impliedVol)
-                    if not has_data:
-                        pending += 1
-                
-                if pending == 0:
-                    break
-                    
-            # 4. 收集結果並轉換為統一 schema
             call_data = []
             put_data = []
             
-            for contract in all_contracts:
+            def capture(contracts):
+                # 事件驅動批量快照：在途訂閱數受行情線配額限制，合約在數據穩定後立即完成並釋放行情線
+                logger.info(f"請求 {len(contracts)} 個合約的快照數據 (在途窗口 {self.snapshot_engine.max_in_flight})...")
+                tickers = self.snapshot_engine.capture(contracts)
+                
                 # 轉換為統一 schema
-                option_snapshot = self._convert_ticker_to_option_snapshot(
-                    contract, ticker, expiration
+                for contract, ticker_data in zip(contracts, tickers):
+                    if ticker_data is None:
+                        continue
+                    option_snapshot = self._convert_ticker_to_option_snapshot(
+                        contract, ticker, expiration, ticker_data=ticker_data
+                    )
+                    
+                    if option_snapshot:
+                        if contract.right == 'C':
+                            call_data.append(option_snapshot)
+                        else:
+                            put_data.append(option_snapshot)
+            
+            capture(all_contracts)
+            
+            if plan is not None:
+                # 第二輪：計劃邊緣仍有流動性時向外補取一次
+                extra = self.strike_planner.refine_strikes(plan, self._strike_liquidity(call_data, put_data))
+                if extra:
+                    plan.refined = extra
+                    capture(to_contracts(valid_calls, 'C', set(extra)) + to_contracts(valid_puts, 'P', set(extra)))
+                    call_data.sort(key=lambda row: row['strike'])
+                    put_data.sort(key=lambda row: row['strike'])
+                self.strike_planner.history.record_liquidity(
+                    ticker, days_until(expiration), center_strike, self._strike_liquidity(call_data, put_data)
                 )
-                
-                if option_snapshot:
-                    if contract.right == 'C':
-                        call_data.append(option_snapshot)
-                    else:
-                        put_data.append(option_snapshot)
             
-            # 取消訂閱
-            for contract in all_contracts:
-                self.ib.cancelMktData(contract)
-                
             logger.info(f"快照獲取完成。Calls: {len(call_data)}, Puts: {len(put_data)}")
             
             return {
                 'calls': call_data,
-                'puts': put_data
+                'puts': put_data,
+                # 列式視圖（{字段: 值列表}），可直接構建 DataFrame
+                'columns': {'calls': to_columns(call_data), 'puts': to_columns(put_data)},
+                'capture_stats': dict(self.snapshot_engine.last_stats),
+                'strike_plan': plan.to_dict() if plan is not None else None
             }
         except Exception as e:
             logger.error(f"獲取期權鏈快照失敗: {e}")
@@ -1944,11 +2061,22 @@ class IBKRClient:
             logger.error(traceback.format_exc())
             return None
     
+    @staticmethod
+    def _strike_liquidity(call_data: List[Dict[str, Any]], put_data: List[Dict[str, Any]]) -> Dict[float, Dict[str, Any]]:
+        """{strike: {'volume', 'openInterest'}}，同一行使價的 Call / Put 取較大值"""
+        liquidity: Dict[float, Dict[str, Any]] = {}
+        for row in call_data + put_data:
+            entry = liquidity.setdefault(row['strike'], {'volume': 0, 'openInterest': 0})
+            for key in ('volume', 'openInterest'):
+                entry[key] = max(entry[key], row.get(key) or 0)
+        return liquidity
+    
     def _convert_ticker_to_option_snapshot(
         self, 
         contract: Contract, 
         ticker: str, 
-        expiration: str
+        expiration: str,
+        ticker_data=None
     ) -> Optional[Dict[str, Any]]:
         """
         將 IBKR Ticker 數據轉換為統一的 OptionSnapshotSchema
@@ -1959,6 +2087,7 @@ class IBKRClient:
             contract: IBKR 合約對象
             ticker: 股票代碼
             expiration: 到期日 (YYYY-MM-DD)
+            ticker_data: 已捕獲的 Ticker（None 時從 ib.ticker 讀取）
         
         返回:
             Dict: OptionSnapshotSchema 格式的數據
@@ -1968,7 +2097,7 @@ class IBKRClient:
         import math
         from data_layer.data_policy import DataSource, VOLATILITY_UNIT_STANDARD
         
-        t = self.ib.ticker(contract)
+        t = ticker_data if ticker_data is not None else self._ticker(contract)
         
         if not t:
             return None
@@ -2119,18 +2248,18 @@ class IBKRClient:
             self.refresh_market_data_type()
 
             stock = Stock(ticker, 'SMART', 'USD')
-            self.ib.qualifyContracts(stock)
+            self._qualify(stock)
 
             # 使用包含 Tick 104/456 的完整 tick list（含 STOCK_ONLY 的新聞 Tick 292）
             stock_tick_list = self._stock_tick_list  # 包含 104, 106, 232, 456
 
-            self.ib.reqMktData(stock, stock_tick_list, False, False)
+            self._subscribe(stock, stock_tick_list)
 
             # 等待數據（最多 8 秒，確保 Tick 104/456 到達）
             ticker_data = None
             for i in range(8):
                 time.sleep(1)
-                ticker_data = self.ib.ticker(stock)
+                ticker_data = self._ticker(stock)
                 if ticker_data:
                     # 等到至少有 price 和 hv
                     has_price = (
@@ -2222,11 +2351,8 @@ class IBKRClient:
                 except (ValueError, IndexError):
                     pass
 
-            # 取消訂閱
-            try:
-                self.ib.cancelMktData(stock)
-            except Exception:
-                pass
+            # 釋放行情線
+            self._unsubscribe(stock)
 
             logger.info(f"* Fix 11: {ticker} 完整數據獲取成功 "
                         f"(HV={'有' if 'historical_volatility' in result else '無'}, "
@@ -2245,6 +2371,7 @@ class IBKRClient:
         min_block_size: int      = DARK_POOL_BLOCK_SIZE,
         include_vwap: bool       = True,
         method: str              = 'both',   # 'diff' | 'exchange' | 'both'
+        avg_volume_baseline: Optional[int] = None,
     ) -> Optional[Dict[str, Any]]:
         """
         獲取 Dark Pool 訊號數據（雙方法交叉驗證）
@@ -2254,8 +2381,9 @@ class IBKRClient:
           rtTradeVolume (Tick 77, tag 375) = 只含可回報交易所成交量
           DP Volume = rtVolume_total - rtTradeVolume_total
 
-        方法 B（Exchange 過濾法）── reqTickByTickData(AllLast) + exchange=='D'
+        方法 B（Exchange 過濾法）── Tick 採集管道（reqTickByTickData AllLast 寫入環形緩衝區）+ exchange=='D'
           exchange=='D' 代表 FINRA ADF，即 Dark Pool 成交回報
+          採集在方法 A 之前開始，兩方法共用同一窗口；股票已在管道中跟蹤時直接讀取緩衝區
 
         VWAP 來源（優先序）：
           1. Tick 48 rtVolume 字串第 5 欄（方法 A 附帶，最即時）
@@ -2267,6 +2395,7 @@ class IBKRClient:
             min_block_size:   大單門檻（股數），預設 10,000
             include_vwap:     是否解析 VWAP（略增 CPU）
             method:           'diff'（僅差值法）| 'exchange'（僅交易所過濾）| 'both'（雙重驗證）
+            avg_volume_baseline: 10 分鐘成交量基準（傳給模塊 36；None 時跳過流動性分析）
 
         返回:
             {
@@ -2281,7 +2410,8 @@ class IBKRClient:
               'dp_ratio_exchange':    float,  # DP 比例（交易所過濾法）0-100%
               'dp_block_count':       int,    # 大單筆數（size >= min_block_size）
               'dp_block_volume':      int,    # 大單總量
-              'dp_ticks':             List[TickByTickData],  # 原始 DP tick list
+              'dp_ticks':             List[Dict],   # DP 成交 {'time', 'price', 'size'}
+              'tick_flow':            Optional[Dict],  # get_tick_flow_analysis（模塊 35/36/38 + VWAP）
 
               # ── VWAP ─────────────────────────────────────────
               'vwap':                 float,  # 當前 VWAP（Tick 48 解析）
@@ -2328,6 +2458,7 @@ class IBKRClient:
             'dp_block_count':        0,
             'dp_block_volume':       0,
             'dp_ticks':              [],
+            'tick_flow':             None,
             # VWAP
             'vwap':                  None,
             # 交叉驗證
@@ -2335,9 +2466,18 @@ class IBKRClient:
             'dp_ratio_consensus':    None,
         }
 
+        run_exchange = method in ('exchange', 'both')
+        pipeline = self.get_tick_pipeline() if run_exchange else None
+        adopted = False   # 本次調用開始跟蹤的股票，結束時取消訂閱（tick-by-tick 線數很少）
+
         try:
             stock = Stock(ticker, 'SMART', 'USD')
-            self.ib.qualifyContracts(stock)
+            self._qualify(stock)
+
+            # 方法 B 的 Tick 採集先於方法 A 開始：兩個方法覆蓋同一採樣窗口，且不再串行等待兩次
+            if run_exchange:
+                adopted = ticker not in pipeline.symbols()
+                pipeline.follow(stock)
 
             # ════════════════════════════════════════════════════
             # 方法 A：reqMktData + Tick 48 (233) + Tick 77 (375)
@@ -2355,7 +2495,7 @@ class IBKRClient:
                     tags_to_use = DARK_POOL_TICK_TAGS + ',' + DARK_POOL_VWAP_TAG  # '233,258,375'
 
                 logger.info(f"  方法 A：reqMktData with genericTickList='{tags_to_use}'")
-                mkt_ticker = self.ib.reqMktData(stock, tags_to_use, False, False)
+                mkt_ticker = self._subscribe(stock, tags_to_use)
 
                 # 等待 Tick 48 / 77 資料填入
                 start_a = time.time()
@@ -2407,11 +2547,8 @@ class IBKRClient:
                             except (TypeError, ValueError):
                                 pass
 
-                # 取消訂閱
-                try:
-                    self.ib.cancelMktData(stock)
-                except Exception:
-                    pass
+                # 釋放行情線
+                self._unsubscribe(stock)
 
                 # 填入差值法結果
                 dp_diff = max(0, int(rt_volume_accum - rt_trade_vol_accum))
@@ -2432,53 +2569,47 @@ class IBKRClient:
                 )
 
             # ════════════════════════════════════════════════════
-            # 方法 B：reqTickByTickData + exchange=='D' 過濾
+            # 方法 B：Tick 環形緩衝區（AllLast）+ exchange=='D' 標誌
             # ════════════════════════════════════════════════════
-            run_exchange = method in ('exchange', 'both')
-
-            dp_ticks_b:  list = []
-            dp_vol_b:    int  = 0
-            total_vol_b: int  = 0
-            block_count  = 0
-            block_vol    = 0
-
             if run_exchange:
-                logger.info(f"  方法 B：reqTickByTickData AllLast, exchange_filter='D'")
-
-                all_ticks_b:  list = []
+                logger.info(f"  方法 B：Tick 採集管道 AllLast, exchange='D'")
 
-                # 使用修正後的 req_tick_by_tick_data（注意：不傳 exchange_filter，自己篩）
-                for tick in self.req_tick_by_tick_data(
-                    contract=stock,
-                    tick_type='AllLast',
-                    exchange_filter=None,      # 先不過濾，讓所有 tick 流入以計算分母
-                    timeout=float(duration_seconds),
-                    max_ticks=None
-                ):
-                    all_ticks_b.append(tick)
-                    total_vol_b += tick.size
+                # 緩衝區只含跟蹤以來的完整數據，不足 duration 時補足等待
+                remaining = duration_seconds - pipeline.following_for(ticker)
+                if remaining > 0:
+                    self.ib.sleep(remaining)
 
-                    if tick.exchange == DARK_POOL_EXCHANGE:
-                        dp_ticks_b.append(tick)
-                        dp_vol_b += tick.size
-
-                        if tick.size >= min_block_size:
-                            block_count += 1
-                            block_vol   += tick.size
+                trades = pipeline.buffer(ticker).last(duration_seconds)
+                dark = trades.dark_mask()
+                dark_sizes = trades.size[dark]
+                blocks = dark_sizes >= min_block_size
+                total_vol_b = int(trades.volume())
+                dp_vol_b = int(dark_sizes.sum())
 
                 result['dp_volume_exchange'] = dp_vol_b
                 result['dp_ratio_exchange']  = round(dp_vol_b / total_vol_b * 100, 2) if total_vol_b > 0 else 0.0
-                result['dp_block_count']     = block_count
-                result['dp_block_volume']    = block_vol
-                result['dp_ticks']           = dp_ticks_b   # 原始 DP tick list
+                result['dp_block_count']     = int(blocks.sum())
+                result['dp_block_volume']    = int(dark_sizes[blocks].sum())
+                result['dp_ticks']           = [
+                    {
+                        'time':  datetime.fromtimestamp(ts, timezone.utc).isoformat(),
+                        'price': float(price),
+                        'size':  int(size),
+                    }
+                    for ts, price, size in zip(trades.ts[dark], trades.price[dark], dark_sizes)
+                ]
+                # 同一窗口上的模塊 35/36/38 + VWAP（逐筆向量化）
+                result['tick_flow'] = self.get_tick_flow_analysis(
+                    ticker, window_seconds=duration_seconds, avg_volume_baseline=avg_volume_baseline
+                )
 
                 if total_vol_b == 0:
                     warnings.append("方法 B：duration 期間無 AllLast tick（可能非交易時段或 TWS 未授權）")
 
                 logger.info(
-                    f"  方法 B 完成：allTicks={len(all_ticks_b)}, DP ticks={len(dp_ticks_b)}, "
+                    f"  方法 B 完成：allTicks={len(trades)}, DP ticks={len(dark_sizes)}, "
                     f"DP vol={dp_vol_b} ({result['dp_ratio_exchange']:.1f}%), "
-                    f"block trades={block_count}"
+                    f"block trades={result['dp_block_count']}"
                 )
 
             # ════════════════════════════════════════════════════
@@ -2511,6 +2642,9 @@ class IBKRClient:
             import traceback
             logger.error(traceback.format_exc())
             return None
+        finally:
+            if adopted:
+                pipeline.unfollow(ticker)
 
     def __enter__(self):
         """上下文管理器入口"""
@@ -2535,10 +2669,10 @@ class IBKRClient:
         try:
             from ib_insync import Stock
             contract = Stock(ticker, 'SMART', 'USD')
-            self.ib.qualifyContracts(contract)
+            self._qualify(contract)
             
             # 請求 tick type 59 包含 IB Dividends
-            ticker_data = self.ib.reqMktData(contract, '59', True, False)
+            ticker_data = self._subscribe(contract, '59')
             self.ib.sleep(2)
             
             discrete_divs = []
@@ -2567,7 +2701,7 @@ class IBKRClient:
                     except Exception as e:
                         logger.warning(f"解析 IB 股息日期失敗 {ticker}: {e}")
             
-            self.ib.cancelMktData(contract)
+            self._unsubscribe(contract)
             return discrete_divs
             
         except Exception as e:
@@ -2638,25 +2772,22 @@ class IBKRClient:
                 ticker_data = None
                 try:
                     # IBKR dividends are exposed on generic tick 456 and must be requested as streaming data.
-                    ticker_data = self.ib.reqMktData(contract_to_use, '456', False, False)
+                    ticker_data = self._subscribe(contract_to_use, '456')
                     self.ib.sleep(2)
                     return _extract_discrete_dividends(ticker_data)
                 finally:
                     if ticker_data is not None:
-                        try:
-                            self.ib.cancelMktData(contract_to_use)
-                        except Exception:
-                            pass
+                        self._unsubscribe(contract_to_use)
 
             base_contract = Stock(ticker, 'SMART', 'USD')
-            qualified = self.ib.qualifyContracts(base_contract)
+            qualified = self._qualify(base_contract)
             contract = qualified[0] if qualified else base_contract
 
             contracts_to_try = [contract]
             primary_exchange = getattr(contract, 'primaryExchange', '')
             if primary_exchange and primary_exchange not in {'', 'SMART'}:
                 direct_contract = Stock(ticker, primary_exchange, 'USD')
-                direct_qualified = self.ib.qualifyContracts(direct_contract)
+                direct_qualified = self._qualify(direct_contract)
                 if direct_qualified:
                     contracts_to_try.append(direct_qualified[0])
 
@@ -2725,8 +2856,10 @@ class IBKRClient:
             logger.error("IBKR Gateway not connected")
             return
 
+        ticker = None
+        on_update = None
         try:
-            self.ib.qualifyContracts(contract)
+            self._qualify(contract)
 
             ticker = self.ib.reqTickByTickData(
                 contract=contract,
@@ -2741,6 +2874,12 @@ class IBKRClient:
                 f"timeout={timeout}s, max_ticks={max_ticks})"
             )
 
+            # 在 updateEvent 上收集每批 tickByTicks（ib_insync 每批網絡數據後重置該列表，
+            # 輪詢讀取會丟失兩次讀取之間的批次）
+            pending: List[Any] = []
+            on_update = lambda t: pending.extend(t.tickByTicks)
+            ticker.updateEvent += on_update
+
             start_time = time.time()
             tick_count = 0
 
@@ -2753,21 +2892,13 @@ class IBKRClient:
                     logger.info(f"Max ticks reached: {max_ticks}")
                     break
 
-                # Let ib_insync event loop fill Ticker
-                self.ib.sleep(0.02)
-
-                # Read correct attribute based on tick_type
-                if tick_type in ('AllLast', 'Last', 'BidAsk', 'MidPoint'):
-                    raw_ticks = ticker.tickByTicks
-                else:
-                    raw_ticks = ticker.tickByTicks
-
-                if not raw_ticks:
+                if not pending:
+                    remaining = timeout - (time.time() - start_time)
+                    self.ib.waitOnUpdate(timeout=max(remaining, 0.001))
                     continue
 
-                # Process and clear list to avoid duplicates
-                batch = list(raw_ticks)
-                raw_ticks.clear()  # Critical: clear processed ticks
+                batch = pending[:]
+                pending.clear()
 
                 for tick in batch:
                     exchange = getattr(tick, 'exchange', '') or ''
@@ -2793,6 +2924,8 @@ class IBKRClient:
             logger.error(f"req_tick_by_tick_data error: {e}")
             self._record_error(0, str(e), f'req_tick_by_tick_data({contract.symbol})')
         finally:
+            if ticker is not None and on_update is not None:
+                ticker.updateEvent -= on_update
             # cancelTickByTickData needs contract + tickType, not req_id
             try:
                 self.ib.cancelTickByTickData(contract, tick_type)
@@ -2800,6 +2933,62 @@ class IBKRClient:
             except Exception as e:
                 logger.warning(f"Cancel tick-by-tick failed: {e}")
 
+    def get_tick_pipeline(self):
+        """
+        事件驅動的 Tick 採集管道（懶創建，每個連接一個）
+
+        返回:
+            TickPipeline: follow(contract) 後，成交 / 報價寫入該股票的環形緩衝區
+        """
+        if self._tick_pipeline is None:
+            from config.settings import settings
+            from data_layer.tick_ring_buffer import TickPipeline
+            self._tick_pipeline = TickPipeline(self.ib, capacity=settings.TICK_BUFFER_CAPACITY)
+        return self._tick_pipeline
+
+    def get_tick_flow_analysis(
+        self,
+        ticker: str,
+        window_seconds: float = 600.0,
+        avg_volume_baseline: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        基於 Tick 環形緩衝區的資金流分析（大單 / 短期流動性 / 暗池 / VWAP）
+
+        參數:
+            ticker: 股票代碼（需已 follow）
+            window_seconds: 分析窗口（秒）
+            avg_volume_baseline: 10 分鐘成交量基準（None 時跳過流動性分析）
+
+        返回:
+            Dict: 各模塊結果（to_dict），窗口內無成交時返回 None
+        """
+        if self._tick_pipeline is None or ticker not in self._tick_pipeline.symbols():
+            logger.warning(f"! {ticker} 未在 Tick 採集管道中")
+            return None
+        trades = self._tick_pipeline.buffer(ticker).last(window_seconds)
+        if len(trades) < 2 or trades.volume() <= 0:
+            return None
+
+        from calculation_layer.module35_large_orders import LargeOrderDetector
+        from calculation_layer.module36_liquidity import LiquidityMonitor
+        from calculation_layer.module38_dark_pool import DarkPoolDetector
+        from calculation_layer.module_vwap_intraday import VWAPIntradayAnalyzer
+
+        result: Dict[str, Any] = {
+            'ticker': ticker,
+            'trades': len(trades),
+            'large_orders': [s.to_dict() for s in LargeOrderDetector().detect_from_trades(ticker, trades)],
+            'dark_pool': DarkPoolDetector().detect_from_trades(ticker, trades).to_dict(),
+            'vwap': VWAPIntradayAnalyzer().calculate_from_trades(ticker, trades).to_dict(),
+            'liquidity': None
+        }
+        if avg_volume_baseline:
+            result['liquidity'] = LiquidityMonitor().calculate_from_trades(
+                ticker, trades, avg_volume_baseline
+            ).to_dict()
+        return result
+
 
 
 
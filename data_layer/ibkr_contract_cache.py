@@ -0,0 +1,319 @@
+# data_layer/ibkr_contract_cache.py
+"""
+IBKR 合約驗證與期權參數持久化緩存
+
+掃描器每個週期、每隻股票都要調用 qualifyContractsAsync（股票與每個期權合約）和
+reqSecDefOptParamsAsync（期權鏈定義）；scan_for_unusual_activity、analyze_options、
+analyze_short_options 對同一隻股票還會各自重複一遍。這些往返佔了掃描耗時的大部分，
+而合約 conId 與到期日 / 行使價列表在一個交易日內不會變化。
+
+本模塊緩存三類數據，按美東交易日失效（新的一天重新驗證一次），並持久化到 JSON 文件:
+- 合約驗證結果（conId 及 IBKR 補全的字段），按請求合約的關鍵字段索引
+- 每個標的的 secdef（OptionChain：交易所、到期日、行使價）
+- 每個 (標的, 到期日) 的期權合約列表（reqContractDetails 結果）
+
+IBKRClient 與 ScannerService 共用同一個實例；掃描器啟動時用觀察清單預熱，
+熱路徑上已知合約不再產生任何驗證往返。
+
+使用示例:
+    >>> cache = get_contract_cache()
+    >>> await cache.qualify_async(ib, Stock('AAPL', 'SMART', 'USD'))
+    >>> chains = await cache.option_chains_async(ib, stock)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import pytz
+
+try:
+    from ib_insync import Contract, OptionChain, Stock
+except ImportError:  # ib_insync 未安裝時僅模塊可導入，IBKR 功能不可用
+    Contract = OptionChain = Stock = None
+
+logger = logging.getLogger(__name__)
+
+ET_TIMEZONE = pytz.timezone('America/New_York')
+
+# 持久化的合約字段（IBKR 驗證後補全）
+CONTRACT_FIELDS = (
+    'secType', 'conId', 'symbol', 'lastTradeDateOrContractMonth', 'strike', 'right',
+    'multiplier', 'exchange', 'primaryExchange', 'currency', 'localSymbol', 'tradingClass'
+)
+
+
+def contract_key(contract) -> str:
+    """請求合約的緩存鍵（只使用調用方填寫的識別字段；未填幣種按 USD，本系統只交易美元合約）"""
+    strike = getattr(contract, 'strike', 0.0) or 0.0
+    return '|'.join([
+        contract.secType, contract.symbol, contract.lastTradeDateOrContractMonth or '',
+        f"{strike:g}", contract.right or '', contract.exchange or '', contract.currency or 'USD'
+    ])
+
+
+def _contract_to_dict(contract) -> Dict[str, Any]:
+    return {name: getattr(contract, name) for name in CONTRACT_FIELDS}
+
+
+def _trade_date() -> str:
+    return datetime.now(ET_TIMEZONE).date().isoformat()
+
+
+class IBKRContractCache:
+    """
+    按交易日失效的合約 / secdef 緩存
+
+    參數:
+        path: JSON 持久化文件路徑（None 時只在內存中緩存）
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._contracts: Dict[str, Dict[str, Any]] = {}
+        self._secdefs: Dict[str, Dict[str, Any]] = {}
+        self._option_contracts: Dict[str, Dict[str, Any]] = {}
+        self._stats = {'hits': 0, 'misses': 0, 'secdef_hits': 0, 'secdef_misses': 0, 'round_trips': 0}
+        self._load()
+
+    # ------------------------------------------------------------------
+    # 持久化
+    # ------------------------------------------------------------------
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.debug(f"合約緩存讀取失敗: {e}")
+            return
+        today = _trade_date()
+        # 只載入當天的條目（過期條目隨下一次保存清除）
+        for attr, section in (('_contracts', 'contracts'), ('_secdefs', 'secdefs'),
+                              ('_option_contracts', 'option_contracts')):
+            entries = {k: v for k, v in data.get(section, {}).items() if v.get('date') == today}
+            setattr(self, attr, entries)
+        logger.info(f"* 載入 IBKR 合約緩存: {len(self._contracts)} 個合約, {len(self._secdefs)} 個期權鏈定義")
+
+    def _save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = {
+                'contracts': dict(self._contracts),
+                'secdefs': dict(self._secdefs),
+                'option_contracts': dict(self._option_contracts)
+            }
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.debug(f"合約緩存保存失敗: {e}")
+
+    def _fresh(self, entry: Optional[Dict[str, Any]]) -> bool:
+        return entry is not None and entry.get('date') == _trade_date()
+
+    # ------------------------------------------------------------------
+    # 合約驗證
+    # ------------------------------------------------------------------
+
+    def _apply_cached(self, contracts) -> List[Any]:
+        """用緩存補全合約（原地更新），返回未命中的合約"""
+        misses = []
+        with self._lock:
+            for contract in contracts:
+                entry = self._contracts.get(contract_key(contract))
+                if self._fresh(entry):
+                    contract.__dict__.update(entry['contract'])
+                    self._stats['hits'] += 1
+                else:
+                    misses.append(contract)
+                    self._stats['misses'] += 1
+        return misses
+
+    def _store_qualified(self, pairs):
+        today = _trade_date()
+        stored = 0
+        with self._lock:
+            for key, contract in pairs:
+                if contract.conId:
+                    self._contracts[key] = {'contract': _contract_to_dict(contract), 'date': today}
+                    stored += 1
+        if stored:
+            self._save()
+
+    def qualify(self, ib, *contracts) -> List[Any]:
+        """
+        qualifyContracts 的緩存版本（同步）
+
+        返回:
+            List[Contract]: 驗證成功的合約（與 ib.qualifyContracts 一致，原地更新）
+        """
+        misses = self._apply_cached(contracts)
+        if misses:
+            keys = [contract_key(c) for c in misses]
+            with self._lock:
+                self._stats['round_trips'] += 1
+            ib.qualifyContracts(*misses)
+            self._store_qualified(zip(keys, misses))
+        return [c for c in contracts if c.conId]
+
+    async def qualify_async(self, ib, *contracts) -> List[Any]:
+        """qualifyContractsAsync 的緩存版本（未命中的合約合併為一次請求）"""
+        misses = self._apply_cached(contracts)
+        if misses:
+            keys = [contract_key(c) for c in misses]
+            with self._lock:
+                self._stats['round_trips'] += 1
+            await ib.qualifyContractsAsync(*misses)
+            self._store_qualified(zip(keys, misses))
+        return [c for c in contracts if c.conId]
+
+    # ------------------------------------------------------------------
+    # 期權鏈定義（secdef）
+    # ------------------------------------------------------------------
+
+    def _cached_chains(self, symbol: str) -> Optional[List[Any]]:
+        with self._lock:
+            entry = self._secdefs.get(symbol)
+            if self._fresh(entry):
+                self._stats['secdef_hits'] += 1
+                return [OptionChain(**chain) for chain in entry['chains']]
+            self._stats['secdef_misses'] += 1
+            self._stats['round_trips'] += 1
+        return None
+
+    def _store_chains(self, symbol: str, chains) -> List[Any]:
+        if chains:
+            with self._lock:
+                self._secdefs[symbol] = {
+                    'chains': [{
+                        'exchange': c.exchange,
+                        'underlyingConId': c.underlyingConId,
+                        'tradingClass': c.tradingClass,
+                        'multiplier': c.multiplier,
+                        'expirations': sorted(c.expirations),
+                        'strikes': sorted(c.strikes)
+                    } for c in chains],
+                    'date': _trade_date()
+                }
+            self._save()
+        return list(chains or [])
+
+    def option_chains(self, ib, underlying) -> List[Any]:
+        """reqSecDefOptParams 的緩存版本（underlying 需已驗證）"""
+        cached = self._cached_chains(underlying.symbol)
+        if cached is not None:
+            return cached
+        chains = ib.reqSecDefOptParams(underlying.symbol, '', underlying.secType, underlying.conId)
+        return self._store_chains(underlying.symbol, chains)
+
+    async def option_chains_async(self, ib, underlying) -> List[Any]:
+        """reqSecDefOptParamsAsync 的緩存版本（underlying 需已驗證）"""
+        cached = self._cached_chains(underlying.symbol)
+        if cached is not None:
+            return cached
+        chains = await ib.reqSecDefOptParamsAsync(underlying.symbol, '', underlying.secType, underlying.conId)
+        return self._store_chains(underlying.symbol, chains)
+
+    # ------------------------------------------------------------------
+    # 到期日的期權合約列表（reqContractDetails）
+    # ------------------------------------------------------------------
+
+    def option_contracts(self, ib, option_filter) -> List[Any]:
+        """
+        reqContractDetails 的緩存版本（只緩存合約本身）
+
+        參數:
+            option_filter: 只填寫 symbol / 到期日的 Option 過濾合約
+
+        返回:
+            List[Contract]: 該到期日的全部期權合約
+        """
+        key = contract_key(option_filter)
+        with self._lock:
+            entry = self._option_contracts.get(key)
+            if self._fresh(entry):
+                self._stats['hits'] += 1
+                return [Contract.create(**c) for c in entry['contracts']]
+            self._stats['misses'] += 1
+            self._stats['round_trips'] += 1
+
+        details = ib.reqContractDetails(option_filter)
+        contracts = [cd.contract for cd in details or []]
+        if contracts:
+            today = _trade_date()
+            with self._lock:
+                self._option_contracts[key] = {
+                    'contracts': [_contract_to_dict(c) for c in contracts], 'date': today
+                }
+                # 同時作為單個期權合約的驗證結果（Option(symbol, 到期日, 行使價, 方向, 'SMART')）
+                for c in contracts:
+                    request = Contract.create(
+                        secType=c.secType, symbol=c.symbol,
+                        lastTradeDateOrContractMonth=option_filter.lastTradeDateOrContractMonth,
+                        strike=c.strike, right=c.right, exchange=option_filter.exchange,
+                        currency=option_filter.currency
+                    )
+                    self._contracts[contract_key(request)] = {'contract': _contract_to_dict(c), 'date': today}
+            self._save()
+        return contracts
+
+    # ------------------------------------------------------------------
+    # 預熱與統計
+    # ------------------------------------------------------------------
+
+    async def prewarm_async(self, ib, symbols: Iterable[str], with_secdefs: bool = True) -> int:
+        """
+        預熱觀察清單：批量驗證股票合約並並發獲取期權鏈定義
+
+        返回:
+            int: 預熱的股票數
+        """
+        stocks = [Stock(symbol, 'SMART', 'USD') for symbol in dict.fromkeys(symbols)]
+        if not stocks:
+            return 0
+        qualified = await self.qualify_async(ib, *stocks)
+        if with_secdefs:
+            results = await asyncio.gather(
+                *(self.option_chains_async(ib, stock) for stock in qualified), return_exceptions=True
+            )
+            failures = sum(1 for r in results if isinstance(r, Exception))
+            if failures:
+                logger.warning(f"! {failures} 個期權鏈定義預熱失敗")
+        logger.info(f"* IBKR 合約緩存預熱完成: {len(qualified)}/{len(stocks)} 隻股票")
+        return len(qualified)
+
+    def stats(self) -> Dict[str, Any]:
+        """緩存命中統計"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({'contracts': len(self._contracts), 'secdefs': len(self._secdefs)})
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+_default_cache: Optional[IBKRContractCache] = None
+_default_lock = threading.Lock()
+
+
+def get_contract_cache() -> IBKRContractCache:
+    """進程內共享的合約緩存（IBKRClient 與 ScannerService 共用）"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            from config.settings import settings
+            path = os.path.join(settings.CACHE_DIR, 'ibkr_contracts.json') if settings.IBKR_CONTRACT_CACHE_ENABLED else None
+            _default_cache = IBKRContractCache(path)
+        return _default_cache
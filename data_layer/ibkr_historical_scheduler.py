@@ -0,0 +1,336 @@
+# data_layer/ibkr_historical_scheduler.py
+"""
+IBKR 歷史數據請求調度器（Pacing 感知）
+
+IBKR 對歷史數據請求有 pacing 限制，違反時返回錯誤 162 並暫停該連接的歷史數據:
+- 15 秒內不得重複完全相同的請求
+- 2 秒內對同一合約 / 交易所 / 數據類型的請求不得超過 6 個
+- 任意 10 分鐘內不得超過 60 個請求（只針對 30 秒及以下的小週期 K 線；日線等不受此限制）
+
+原先掃描器逐隻股票內聯調用 reqHistoricalDataAsync，IBKRClient.get_historical_data /
+get_intraday_bars 同步調用 reqHistoricalData，各自為政，違規時表現為零星失敗與卡頓。
+
+本模塊提供進程內共享的調度隊列:
+- 優先級：深度分析（PRIORITY_INTERACTIVE）先於掃描（PRIORITY_SCAN）先於後台預熱（PRIORITY_WARMUP）
+- 去重：相同請求在途時共享同一個 Future；15 秒內的相同請求直接返回上次結果
+- Pacing 窗口：跟蹤 10 分鐘全局窗口（僅小週期 K 線）、每合約 2 秒窗口與並發上限，按優先級放行
+- 調用方 await 自己的 Future，等待時不阻塞事件循環；同步調用方經 ib.run 運行
+
+多個線程（各自的 IB 連接與事件循環）共用同一份 pacing 狀態。
+
+使用示例:
+    >>> scheduler = get_historical_scheduler()
+    >>> bars = await scheduler.request(ib, contract, '1 Y', '1 day', priority=PRIORITY_SCAN)
+    >>> bars = scheduler.request_sync(ib, contract, '1 M', '1 day')   # 同步版本
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = 0    # 深度分析 / Web 請求
+PRIORITY_SCAN = 10          # 掃描器
+PRIORITY_WARMUP = 20        # 後台預熱
+
+# IBKR 歷史數據 pacing 規則
+MAX_REQUESTS_PER_WINDOW = 60
+WINDOW_SECONDS = 600.0
+IDENTICAL_INTERVAL = 15.0
+SAME_CONTRACT_LIMIT = 6
+SAME_CONTRACT_WINDOW = 2.0
+SMALL_BAR_MAX_SECONDS = 30      # 10 分鐘窗口只適用於 ≤30 秒的 K 線
+
+
+def is_small_bar(bar_size: str) -> bool:
+    """是否為受 10 分鐘 / 60 次窗口限制的小週期 K 線（'1 secs' … '30 secs'）"""
+    amount, _, unit = bar_size.strip().partition(' ')
+    return unit.startswith('sec') and amount.isdigit() and int(amount) <= SMALL_BAR_MAX_SECONDS
+
+
+def request_key(contract, end: str, duration: str, bar_size: str, what_to_show: str, use_rth: bool) -> Tuple:
+    """完全相同請求的判定鍵"""
+    ident = getattr(contract, 'conId', 0) or (contract.secType, contract.symbol, contract.exchange)
+    return (ident, str(end), duration, bar_size, what_to_show, bool(use_rth))
+
+
+@dataclass(order=True)
+class _Ticket:
+    """排隊中的請求"""
+    priority: int
+    seq: int
+    pace_key: Tuple = field(compare=False)
+    small_bar: bool = field(compare=False, default=False)
+    loop: Any = field(compare=False, default=None)
+    event: Any = field(compare=False, default=None)
+
+
+class HistoricalDataScheduler:
+    """
+    歷史數據請求調度器
+
+    參數:
+        max_requests: 全局窗口內的最大小週期 K 線請求數
+        window_seconds: 全局窗口長度（秒）
+        max_concurrent: 同時在途的請求數
+        identical_interval: 相同請求結果的復用秒數（IBKR 禁止 15 秒內重複請求）
+        same_contract_limit: 同一合約在 same_contract_window 秒內的最大請求數
+        same_contract_window: 同一合約窗口長度（秒）
+    """
+
+    def __init__(
+        self,
+        max_requests: int = MAX_REQUESTS_PER_WINDOW,
+        window_seconds: float = WINDOW_SECONDS,
+        max_concurrent: int = 6,
+        identical_interval: float = IDENTICAL_INTERVAL,
+        same_contract_limit: int = SAME_CONTRACT_LIMIT,
+        same_contract_window: float = SAME_CONTRACT_WINDOW
+    ):
+        self.max_requests = max(1, int(max_requests))
+        self.window_seconds = window_seconds
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.identical_interval = identical_interval
+        self.same_contract_limit = max(1, int(same_contract_limit))
+        self.same_contract_window = same_contract_window
+
+        self._lock = threading.Lock()
+        self._queue: List[_Ticket] = []
+        self._seq = itertools.count()
+        self._sent: Deque[float] = deque()
+        self._sent_by_contract: Dict[Tuple, Deque[float]] = {}
+        self._in_flight = 0
+        self._pending: Dict[Tuple, Tuple[Any, asyncio.Future]] = {}   # key -> (loop, future)
+        self._recent: Dict[Tuple, Tuple[float, Any]] = {}             # key -> (完成時間, bars)
+        self._stats = {
+            'requests': 0, 'dispatched': 0, 'deduplicated': 0, 'reused': 0,
+            'failed': 0, 'paced': 0, 'wait_seconds': 0.0, 'peak_queue': 0
+        }
+
+    # ------------------------------------------------------------------
+    # 公共接口
+    # ------------------------------------------------------------------
+
+    async def request(
+        self,
+        ib,
+        contract,
+        duration: str,
+        bar_size: str,
+        what_to_show: str = 'TRADES',
+        use_rth: bool = True,
+        end: str = '',
+        priority: int = PRIORITY_SCAN,
+        timeout: float = 60.0
+    ) -> List[Any]:
+        """
+        經調度隊列請求歷史 K 線（參數同 reqHistoricalDataAsync）
+
+        返回:
+            List[BarData]: K 線列表（失敗或無數據時為空列表）
+        """
+        key = request_key(contract, end, duration, bar_size, what_to_show, use_rth)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._stats['requests'] += 1
+            recent = self._recent.get(key)
+            if recent is not None and time.monotonic() - recent[0] < self.identical_interval:
+                self._stats['reused'] += 1
+                return list(recent[1])
+            pending = self._pending.get(key)
+            if pending is not None and pending[0] is loop:
+                self._stats['deduplicated'] += 1
+                future = pending[1]
+            else:
+                future = loop.create_future()
+                self._pending[key] = (loop, future)
+                pending = None
+
+        if pending is not None:
+            return list(await asyncio.shield(future))
+
+        try:
+            bars = await self._execute(ib, contract, key, duration, bar_size, what_to_show,
+                                       use_rth, end, priority, timeout)
+            future.set_result(bars)
+            return list(bars)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # 避免無人等待時的 "exception was never retrieved"
+            raise
+        finally:
+            with self._lock:
+                if self._pending.get(key, (None, None))[1] is future:
+                    del self._pending[key]
+
+    def request_sync(self, ib, contract, duration: str, bar_size: str, **kwargs) -> List[Any]:
+        """同步版本（在 IB 事件循環上運行 request）"""
+        return ib.run(self.request(ib, contract, duration, bar_size, **kwargs))
+
+    def stats(self) -> Dict[str, Any]:
+        """調度與 pacing 狀態"""
+        with self._lock:
+            self._expire(time.monotonic())
+            stats = dict(self._stats)
+            stats.update({
+                'queued': len(self._queue),
+                'in_flight': self._in_flight,
+                'window_used': len(self._sent),
+                'window_limit': self.max_requests,
+            })
+        stats['wait_seconds'] = round(stats['wait_seconds'], 3)
+        return stats
+
+    # ------------------------------------------------------------------
+    # 調度
+    # ------------------------------------------------------------------
+
+    async def _execute(self, ib, contract, key, duration, bar_size, what_to_show, use_rth, end,
+                       priority, timeout) -> List[Any]:
+        pace_key = (key[0], what_to_show)
+        ticket = _Ticket(priority=priority, seq=next(self._seq), pace_key=pace_key,
+                         small_bar=is_small_bar(bar_size),
+                         loop=asyncio.get_running_loop(), event=asyncio.Event())
+        started = time.monotonic()
+        with self._lock:
+            heapq.heappush(self._queue, ticket)
+            self._stats['peak_queue'] = max(self._stats['peak_queue'], len(self._queue))
+        try:
+            await self._wait_turn(ticket)
+        except BaseException:
+            with self._lock:
+                if ticket in self._queue:
+                    self._queue.remove(ticket)
+                    heapq.heapify(self._queue)
+            raise
+
+        waited = time.monotonic() - started
+        with self._lock:
+            self._stats['wait_seconds'] += waited
+            if waited > 0.05:
+                self._stats['paced'] += 1
+        try:
+            bars = await ib.reqHistoricalDataAsync(
+                contract, endDateTime=end, durationStr=duration, barSizeSetting=bar_size,
+                whatToShow=what_to_show, useRTH=use_rth, formatDate=1, timeout=timeout
+            )
+            bars = list(bars or [])
+            with self._lock:
+                self._recent[key] = (time.monotonic(), bars)
+            return bars
+        except Exception:
+            with self._lock:
+                self._stats['failed'] += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._notify()
+
+    async def _wait_turn(self, ticket: _Ticket):
+        while True:
+            with self._lock:
+                delay = self._try_grant(ticket)
+            if delay == 0:
+                self._notify()
+                return
+            ticket.event.clear()
+            try:
+                await asyncio.wait_for(ticket.event.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _try_grant(self, ticket: _Ticket) -> Optional[float]:
+        """
+        嘗試放行（需持有鎖）
+
+        返回:
+            0: 已放行；float: 需等待的秒數；None: 等待其他請求完成後的通知
+        """
+        now = time.monotonic()
+        self._expire(now)
+        if self._in_flight >= self.max_concurrent:
+            return None
+        window_wait = self._sent[0] + self.window_seconds - now if len(self._sent) >= self.max_requests else 0.0
+
+        # 按優先級找第一個不受同合約窗口（小週期 K 線還有全局窗口）限制的請求
+        shortest = None
+        for candidate in sorted(self._queue):
+            wait = self._contract_wait(candidate.pace_key, now)
+            if candidate.small_bar:
+                wait = max(wait, window_wait)
+            if wait <= 0:
+                if candidate is not ticket:
+                    # 讓更高優先級的請求先走（喚醒它以免雙方都在等待通知）
+                    candidate.loop.call_soon_threadsafe(candidate.event.set)
+                    return None
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._record_sent(ticket, now)
+                self._in_flight += 1
+                self._stats['dispatched'] += 1
+                return 0
+            if candidate is ticket:
+                shortest = wait
+        return shortest
+
+    def _contract_wait(self, pace_key: Tuple, now: float) -> float:
+        sent = self._sent_by_contract.get(pace_key)
+        if not sent or len(sent) < self.same_contract_limit:
+            return 0.0
+        return sent[0] + self.same_contract_window - now
+
+    def _record_sent(self, ticket: _Ticket, now: float):
+        if ticket.small_bar:
+            self._sent.append(now)
+        self._sent_by_contract.setdefault(ticket.pace_key, deque()).append(now)
+
+    def _expire(self, now: float):
+        while self._sent and now - self._sent[0] >= self.window_seconds:
+            self._sent.popleft()
+        for pace_key in list(self._sent_by_contract):
+            sent = self._sent_by_contract[pace_key]
+            while sent and now - sent[0] >= self.same_contract_window:
+                sent.popleft()
+            if not sent:
+                del self._sent_by_contract[pace_key]
+        for key in [k for k, (done_at, _) in self._recent.items() if now - done_at >= self.identical_interval]:
+            del self._recent[key]
+
+    def _notify(self):
+        """喚醒所有排隊中的請求重新檢查（跨線程安全）"""
+        with self._lock:
+            waiting = list(self._queue)
+        for ticket in waiting:
+            try:
+                ticket.loop.call_soon_threadsafe(ticket.event.set)
+            except RuntimeError:
+                pass  # 事件循環已關閉
+
+
+_default_scheduler: Optional[HistoricalDataScheduler] = None
+_default_lock = threading.Lock()
+
+
+def get_historical_scheduler() -> HistoricalDataScheduler:
+    """進程內共享的歷史數據調度器（IBKRClient 與 ScannerService 共用 pacing 狀態）"""
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None:
+            from config.settings import settings
+            _default_scheduler = HistoricalDataScheduler(
+                max_requests=settings.IBKR_HIST_MAX_REQUESTS,
+                window_seconds=settings.IBKR_HIST_WINDOW_SECONDS,
+                max_concurrent=settings.IBKR_HIST_MAX_CONCURRENT
+            )
+        return _default_scheduler
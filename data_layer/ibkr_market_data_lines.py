@@ -0,0 +1,346 @@
+# data_layer/ibkr_market_data_lines.py
+"""
+IBKR 行情線（market data lines）預算管理
+
+IBKR 帳戶同時可訂閱的 reqMktData 數量有上限（默認 100 條行情線），超出時新訂閱被拒絕
+（錯誤 101 "Max number of tickers has been reached"）。原先 IBKRClient 與 ScannerService 的
+reqMktData 調用各自為政：掃描器的期權訂閱從不取消，股票報價每個週期重新請求快照；
+StreamManager 只按股票代碼跟蹤 tick-by-tick 流（MAX_CONCURRENT_STREAMS = 15），管不到這些行情線。
+
+本模塊統一持有所有串流行情線:
+- 按 (IB 連接, 合約) 區分線路：Ticker 綁定訂閱它的連接與事件循環，不跨連接共享；
+  行情線總數預算由所有連接共享（IBKR 配額按帳戶計算）
+- 引用計數：同一連接上的多個使用方共享同一條線，最後一個釋放後線路保持訂閱（熱線）
+- 復用：熱線已有數據時直接返回 Ticker，不再請求新的快照
+- LRU 淘汰：預算用盡時取消同一連接上最久未使用的空閒線；沒有可淘汰的線時拋出 MarketDataLineError
+- 空閒超時：空閒超過 idle_ttl 秒的線路在該連接下一次申請時取消
+  （cancelMktData 必須在訂閱連接的事件循環線程上調用，淘汰與超時從不跨連接取消）
+- Generic Tick 合併：同一合約請求新的 tick 標籤時以並集重新訂閱（Ticker 對象不變）
+- 實時利用率指標（metrics），供 DataFetcher 狀態報告 / Web API 使用
+
+掃描器、深度分析與 Web API 應通過 get_market_data_lines() 共享同一實例（即使各自持有不同的 IB 連接）。
+
+使用示例:
+    >>> lines = get_market_data_lines()
+    >>> ticker = lines.acquire(ib, contract, '100,101,106', owner='scanner')
+    >>> ...
+    >>> lines.release(ib, contract, owner='scanner')   # 線路保持訂閱，供下次復用
+    >>> ticker = await lines.snapshot_async(ib, contract, timeout=1.0)
+"""
+
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LINE_BUDGET = 100       # IBKR 默認行情線配額
+DEFAULT_IDLE_TTL = 600.0        # 空閒線保持訂閱的秒數
+
+
+class MarketDataLineError(RuntimeError):
+    """行情線預算已被佔滿（沒有可淘汰的空閒線）"""
+
+
+def _valid(value) -> bool:
+    return value is not None and not math.isnan(value) and value > 0
+
+
+def quote_ready(ticker) -> bool:
+    """默認就緒條件：有成交價 / 收盤價，或有效的 bid/ask"""
+    return (_valid(ticker.last) or _valid(ticker.close)
+            or (_valid(ticker.bid) and _valid(ticker.ask)))
+
+
+def price_ready(ticker) -> bool:
+    """股票就緒條件：有成交價或收盤價"""
+    return _valid(ticker.last) or _valid(ticker.close)
+
+
+def line_key(ib, contract) -> Tuple[int, str]:
+    """行情線鍵：(IB 連接, 合約)；已驗證合約用 conId，否則用識別字段"""
+    if getattr(contract, 'conId', 0):
+        return id(ib), str(contract.conId)
+    from data_layer.ibkr_contract_cache import contract_key
+    return id(ib), contract_key(contract)
+
+
+def _merge_ticks(current: str, requested: str) -> str:
+    tags = [t for t in current.split(',') if t]
+    tags += [t for t in requested.split(',') if t and t not in tags]
+    return ','.join(tags)
+
+
+@dataclass
+class MarketDataLine:
+    """一條串流行情線（記錄所屬的 IB 連接，淘汰時在原連接上取消）"""
+    key: Tuple[int, str]
+    ib: Any
+    contract: Any
+    ticker: Any
+    generic_tick_list: str
+    refcount: int = 0
+    owners: Dict[str, int] = field(default_factory=dict)
+    subscribed_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+    uses: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            'symbol': getattr(self.contract, 'localSymbol', '') or self.contract.symbol,
+            'sec_type': self.contract.secType,
+            'generic_tick_list': self.generic_tick_list,
+            'refcount': self.refcount,
+            'owners': dict(self.owners),
+            'uses': self.uses,
+            'age_seconds': round(now - self.subscribed_at, 1),
+            'idle_seconds': round(now - self.last_used, 1) if self.refcount == 0 else 0.0
+        }
+
+
+class MarketDataLineManager:
+    """
+    行情線預算管理器
+
+    參數:
+        budget: 可用行情線總數
+        idle_ttl: 空閒線保持訂閱的秒數（超過後取消）
+    """
+
+    def __init__(self, budget: int = DEFAULT_LINE_BUDGET, idle_ttl: float = DEFAULT_IDLE_TTL):
+        self.budget = max(1, int(budget))
+        self.idle_ttl = idle_ttl
+        self._lines: 'OrderedDict[Tuple[int, str], MarketDataLine]' = OrderedDict()  # LRU 順序：最舊在前
+        self._lock = threading.RLock()
+        self._stats = {
+            'acquires': 0, 'reuses': 0, 'subscriptions': 0, 'resubscriptions': 0,
+            'evictions': 0, 'expired': 0, 'rejections': 0, 'peak_lines': 0
+        }
+
+    # ------------------------------------------------------------------
+    # 申請與釋放
+    # ------------------------------------------------------------------
+
+    def acquire(self, ib, contract, generic_tick_list: str = '', owner: str = '') -> Any:
+        """
+        申請一條行情線（同一連接已訂閱時復用並增加引用計數）
+
+        返回:
+            Ticker: 該合約的串流 Ticker
+
+        異常:
+            MarketDataLineError: 預算已滿且沒有空閒線可淘汰
+        """
+        key = line_key(ib, contract)
+        with self._lock:
+            self._expire_idle(ib)
+            self._stats['acquires'] += 1
+            line = self._lines.get(key)
+            if line is not None:
+                self._stats['reuses'] += 1
+                merged = _merge_ticks(line.generic_tick_list, generic_tick_list)
+                if merged != line.generic_tick_list:
+                    # 同一合約對象重新訂閱，ib_insync 返回同一個 Ticker
+                    self._cancel(line)
+                    line.ticker = line.ib.reqMktData(line.contract, merged, False, False)
+                    line.generic_tick_list = merged
+                    self._stats['resubscriptions'] += 1
+            else:
+                if len(self._lines) >= self.budget and not self._evict_lru(ib):
+                    self._stats['rejections'] += 1
+                    raise MarketDataLineError(
+                        f"行情線預算已滿 ({len(self._lines)}/{self.budget})，無法訂閱 {contract.symbol}"
+                    )
+                ticker = ib.reqMktData(contract, generic_tick_list, False, False)
+                line = MarketDataLine(key=key, ib=ib, contract=contract, ticker=ticker,
+                                      generic_tick_list=generic_tick_list)
+                self._lines[key] = line
+                self._stats['subscriptions'] += 1
+                self._stats['peak_lines'] = max(self._stats['peak_lines'], len(self._lines))
+
+            line.refcount += 1
+            line.owners[owner] = line.owners.get(owner, 0) + 1
+            line.uses += 1
+            line.last_used = time.monotonic()
+            self._lines.move_to_end(key)
+            return line.ticker
+
+    def release(self, ib, contract, owner: str = '') -> bool:
+        """
+        釋放一次引用（引用歸零後線路保持訂閱，成為可淘汰的熱線）
+
+        返回:
+            bool: 是否找到對應的行情線
+        """
+        key = line_key(ib, contract)
+        with self._lock:
+            line = self._lines.get(key)
+            if line is None or line.refcount <= 0:
+                return False
+            line.refcount -= 1
+            if line.owners.get(owner, 0) > 1:
+                line.owners[owner] -= 1
+            else:
+                line.owners.pop(owner, None)
+            line.last_used = time.monotonic()
+            return True
+
+    def peek(self, ib, contract) -> Optional[Any]:
+        """該連接上已訂閱合約的 Ticker（不申請線路）"""
+        with self._lock:
+            line = self._lines.get(line_key(ib, contract))
+            return line.ticker if line is not None else None
+
+    def available(self, ib) -> int:
+        """該連接可立即使用的線路數（未佔用 + 該連接上可淘汰的空閒線）"""
+        with self._lock:
+            idle = sum(1 for line in self._lines.values() if line.refcount == 0 and line.ib is ib)
+            return self.budget - len(self._lines) + idle
+
+    # ------------------------------------------------------------------
+    # 快照（復用熱線）
+    # ------------------------------------------------------------------
+
+    async def snapshot_async(
+        self,
+        ib,
+        contract,
+        generic_tick_list: str = '',
+        timeout: float = 2.0,
+        ready: Callable[[Any], bool] = quote_ready,
+        owner: str = 'snapshot'
+    ) -> Any:
+        """
+        獲取合約的當前行情（替代 reqMktData snapshot=True）
+
+        熱線已有數據時立即返回；否則在 updateEvent 上等待 ready 條件，最多 timeout 秒。
+        返回後線路保持訂閱，下一次請求直接復用。
+
+        返回:
+            Ticker: 行情數據（超時時為現有數據）
+        """
+        ticker = self.acquire(ib, contract, generic_tick_list, owner=owner)
+        try:
+            if not ready(ticker):
+                loop = asyncio.get_running_loop()
+                done = loop.create_future()
+
+                def on_update(t):
+                    if not done.done() and ready(t):
+                        done.set_result(True)
+
+                ticker.updateEvent += on_update
+                try:
+                    await asyncio.wait_for(done, timeout)
+                except asyncio.TimeoutError:
+                    pass
+                finally:
+                    ticker.updateEvent -= on_update
+            return ticker
+        finally:
+            self.release(ib, contract, owner=owner)
+
+    def snapshot(self, ib, contract, generic_tick_list: str = '', timeout: float = 2.0,
+                 ready: Callable[[Any], bool] = quote_ready, owner: str = 'snapshot') -> Any:
+        """同步版本（在 IB 事件循環上運行 snapshot_async）"""
+        return ib.run(self.snapshot_async(ib, contract, generic_tick_list, timeout, ready, owner))
+
+    # ------------------------------------------------------------------
+    # 淘汰
+    # ------------------------------------------------------------------
+
+    def _cancel(self, line: MarketDataLine):
+        try:
+            line.ib.cancelMktData(line.contract)
+        except Exception as e:
+            logger.debug(f"取消行情線失敗 {line.key}: {e}")
+
+    def _evict_lru(self, ib) -> bool:
+        """淘汰該連接上最久未使用的空閒線（其他連接的線只能在其自己的線程上取消）"""
+        for key, line in self._lines.items():
+            if line.refcount == 0 and line.ib is ib:
+                self._cancel(line)
+                del self._lines[key]
+                self._stats['evictions'] += 1
+                logger.debug(f"淘汰行情線: {line.contract.symbol} (key={key})")
+                return True
+        return False
+
+    def _expire_idle(self, ib):
+        if self.idle_ttl is None:
+            return
+        cutoff = time.monotonic() - self.idle_ttl
+        expired = [key for key, line in self._lines.items()
+                   if line.refcount == 0 and line.ib is ib and line.last_used < cutoff]
+        for key in expired:
+            self._cancel(self._lines.pop(key))
+        self._stats['expired'] += len(expired)
+
+    def clear(self, ib=None) -> int:
+        """取消某個 IB 連接的全部行情線（斷開連接前調用；ib 為 None 時取消所有連接的行情線）"""
+        with self._lock:
+            keys = [key for key, line in self._lines.items() if ib is None or line.ib is ib]
+            for key in keys:
+                self._cancel(self._lines.pop(key))
+            count = len(keys)
+        if count:
+            logger.info(f"* 已釋放 {count} 條行情線")
+        return count
+
+    # ------------------------------------------------------------------
+    # 指標
+    # ------------------------------------------------------------------
+
+    def metrics(self, include_lines: bool = False) -> Dict[str, Any]:
+        """
+        行情線利用率
+
+        返回:
+            dict: budget / active_lines / held_lines / idle_lines / utilization / 復用與淘汰計數
+        """
+        with self._lock:
+            held = sum(1 for line in self._lines.values() if line.refcount > 0)
+            metrics = dict(self._stats)
+            metrics.update({
+                'budget': self.budget,
+                'active_lines': len(self._lines),
+                'held_lines': held,
+                'idle_lines': len(self._lines) - held,
+                'available': self.budget - held,
+                'utilization': round(len(self._lines) / self.budget, 4),
+                'held_utilization': round(held / self.budget, 4),
+            })
+            metrics['reuse_rate'] = (round(metrics['reuses'] / metrics['acquires'], 4)
+                                     if metrics['acquires'] else 0.0)
+            if include_lines:
+                metrics['lines'] = [line.to_dict() for line in reversed(self._lines.values())]
+        return metrics
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    def __repr__(self) -> str:
+        return f"MarketDataLineManager(active={len(self._lines)}/{self.budget})"
+
+
+_default_manager: Optional[MarketDataLineManager] = None
+_default_lock = threading.Lock()
+
+
+def get_market_data_lines() -> MarketDataLineManager:
+    """進程內共享的行情線管理器（IBKRClient、ScannerService 與 Web API 共用）"""
+    global _default_manager
+    with _default_lock:
+        if _default_manager is None:
+            from config.settings import settings
+            _default_manager = MarketDataLineManager(
+                budget=settings.IBKR_MARKET_DATA_LINES,
+                idle_ttl=settings.IBKR_LINE_IDLE_TTL
+            )
+        return _default_manager
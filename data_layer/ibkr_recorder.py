@@ -0,0 +1,601 @@
+# data_layer/ibkr_recorder.py
+"""
+IBKR 行情錄製與確定性回放
+
+IBKRClient、ScannerService 及其共用組件（合約緩存、行情線預算、快照引擎、歷史數據調度器、
+Tick 採集管道）都只通過 ib_insync.IB 實例與 Gateway 交互。本模塊在這一層錄製與回放:
+
+- RecordingIB：包裝真實 IB 實例，把收到的數據寫入追加式二進制日誌
+  * 請求 / 響應：qualifyContracts、reqSecDefOptParams、reqContractDetails、reqHistoricalData
+    （按請求鍵記錄結果與往返延遲）
+  * 訂閱流：reqMktData / reqTickByTickData 的每次 Ticker.updateEvent（變化字段 + 本批 tickByTicks，
+    時間為相對訂閱開始的秒數）
+- MarketDataLog：讀取日誌並按請求鍵 / 合約建立索引
+- ReplayIB：實現與 IB 相同的接口子集，按錄製順序返回響應、按相對時間推送 Ticker 更新
+  * speed=1 實時；speed>1 加速；speed=0 最高速（ib.sleep 不等待，更新逐個在事件循環中推送，順序確定）
+
+日誌格式（追加寫入，多次錄製可寫入同一文件）:
+    文件頭 b'IBKRLOG1'，之後每條記錄為 struct '<BdI'（類型, 時間, 長度）+ pickle 負載
+
+使用示例:
+    # 錄製（IBKRClient / ScannerService 經 create_ib 創建 IB 實例）
+    $ IBKR_RECORD_PATH=logs/session.ibkrlog python scanner_service.py
+
+    # 離線回放（無需 TWS / Gateway）
+    $ IBKR_REPLAY_PATH=logs/session.ibkrlog IBKR_REPLAY_SPEED=0 python -c \\
+        "import asyncio, scanner_service as s; asyncio.run(s.ScannerService().run_loop(single_pass=True))"
+
+注意:
+- 日誌使用 pickle，只應回放本系統自己錄製的文件
+- 以牆鐘計時的等待（如 req_tick_by_tick_data 的 timeout）在回放時仍按牆鐘時間結束
+"""
+
+import asyncio
+import logging
+import math
+import os
+import pickle
+import struct
+import threading
+import time
+from collections import defaultdict
+from dataclasses import fields as dataclass_fields
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from data_layer.ibkr_contract_cache import contract_key
+from data_layer.ibkr_historical_scheduler import request_key
+
+logger = logging.getLogger(__name__)
+
+LOG_HEADER = b'IBKRLOG1'
+_RECORD = struct.Struct('<BdI')
+
+REC_RESPONSE = 1   # (method, key, result)，時間字段為往返延遲
+REC_UPDATE = 2     # (stream_key, segment_id, fields, ticks)，時間字段為相對訂閱開始的秒數
+
+# Ticker 中不錄製的字段（合約由訂閱方提供；ticks / 深度數據本系統未使用）
+_SKIPPED_TICKER_FIELDS = frozenset({'contract', 'ticks', 'tickByTicks', 'domBids', 'domAsks', 'domTicks'})
+
+
+def _ticker_fields() -> List[str]:
+    try:
+        from ib_insync import Ticker
+        return [f.name for f in dataclass_fields(Ticker) if f.name not in _SKIPPED_TICKER_FIELDS]
+    except ImportError:
+        return []
+
+
+def _same(a, b) -> bool:
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b):
+        return True
+    try:
+        return bool(a == b)
+    except Exception:
+        return False
+
+
+# ----------------------------------------------------------------------
+# 日誌讀寫
+# ----------------------------------------------------------------------
+
+class MarketDataRecorder:
+    """
+    追加式二進制日誌寫入器（線程安全，多個 RecordingIB 可共用）
+
+    參數:
+        path: 日誌文件路徑（不存在時創建）
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._file = open(path, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(LOG_HEADER)
+        self.session = os.urandom(4).hex()   # 區分同一文件中不同次錄製的訂閱段
+        self.records = 0
+        self.bytes = 0
+
+    def write(self, kind: int, t: float, payload: Any):
+        data = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(_RECORD.pack(kind, t, len(data)))
+            self._file.write(data)
+            self.records += 1
+            self.bytes += _RECORD.size + len(data)
+
+    def flush(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+        logger.info(f"* 行情錄製完成: {self.path} ({self.records} 條記錄, {self.bytes / 1024:.1f} KB)")
+
+
+def read_log(path: str) -> Iterator[Tuple[int, float, Any]]:
+    """逐條讀取日誌記錄 (kind, t, payload)；文件末尾不完整的記錄被忽略"""
+    with open(path, 'rb') as f:
+        if f.read(len(LOG_HEADER)) != LOG_HEADER:
+            raise ValueError(f"不是 IBKR 行情日誌: {path}")
+        while True:
+            head = f.read(_RECORD.size)
+            if len(head) < _RECORD.size:
+                return
+            kind, t, length = _RECORD.unpack(head)
+            data = f.read(length)
+            if len(data) < length:
+                logger.warning(f"! 日誌末尾記錄不完整，已忽略: {path}")
+                return
+            yield kind, t, pickle.loads(data)
+
+
+class MarketDataLog:
+    """
+    已錄製日誌的索引（path 為 None 時為空索引）
+
+    responses: (method, key) -> [(latency, result), ...]（按錄製順序）
+    segments:  stream_key -> [[(dt, fields, ticks), ...], ...]（每次訂閱一段，按首次出現順序）
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.responses: Dict[Tuple, List[Tuple[float, Any]]] = defaultdict(list)
+        self.segments: Dict[str, List[List[Tuple[float, Dict[str, Any], list]]]] = defaultdict(list)
+        segment_index: Dict[Tuple[str, str], int] = {}
+        for kind, t, payload in (read_log(path) if path else ()):
+            if kind == REC_RESPONSE:
+                method, key, result = payload
+                self.responses[(method, key)].append((t, result))
+            elif kind == REC_UPDATE:
+                stream_key, segment_id, values, ticks = payload
+                index = segment_index.get((stream_key, segment_id))
+                if index is None:
+                    index = segment_index[(stream_key, segment_id)] = len(self.segments[stream_key])
+                    self.segments[stream_key].append([])
+                self.segments[stream_key][index].append((t, values, ticks))
+
+    def summary(self) -> Dict[str, Any]:
+        methods: Dict[str, int] = defaultdict(int)
+        for (method, _), entries in self.responses.items():
+            methods[method] += len(entries)
+        updates = [len(seg) for segs in self.segments.values() for seg in segs]
+        ticks = sum(len(ticks) for segs in self.segments.values() for seg in segs for _, _, ticks in seg)
+        return {
+            'path': self.path,
+            'responses': dict(methods),
+            'streams': len(self.segments),
+            'segments': len(updates),
+            'updates': sum(updates),
+            'tick_by_ticks': ticks
+        }
+
+
+# ----------------------------------------------------------------------
+# 錄製
+# ----------------------------------------------------------------------
+
+class RecordingIB:
+    """
+    錄製包裝器：接口與 ib_insync.IB 相同，未覆蓋的屬性直接委託給被包裝實例
+
+    參數:
+        ib: 真實 IB 實例
+        recorder: 日誌寫入器
+    """
+
+    def __init__(self, ib, recorder: MarketDataRecorder):
+        self._ib = ib
+        self._recorder = recorder
+        self._fields = _ticker_fields()
+        self._streams: Dict[str, Dict[str, Any]] = {}
+        self._segments = 0
+
+    def __getattr__(self, name):
+        return getattr(self._ib, name)
+
+    # -- 請求 / 響應 ---------------------------------------------------
+
+    def _record(self, method: str, key, started: float, result):
+        self._recorder.write(REC_RESPONSE, time.monotonic() - started, (method, key, result))
+
+    def _record_qualified(self, keys: List[str], contracts, started: float):
+        for key, contract in zip(keys, contracts):
+            self._record('qualify', key, started, contract if getattr(contract, 'conId', 0) else None)
+
+    def qualifyContracts(self, *contracts):
+        keys, started = [contract_key(c) for c in contracts], time.monotonic()
+        result = self._ib.qualifyContracts(*contracts)
+        self._record_qualified(keys, contracts, started)
+        return result
+
+    async def qualifyContractsAsync(self, *contracts):
+        keys, started = [contract_key(c) for c in contracts], time.monotonic()
+        result = await self._ib.qualifyContractsAsync(*contracts)
+        self._record_qualified(keys, contracts, started)
+        return result
+
+    def reqSecDefOptParams(self, underlyingSymbol, futFopExchange, underlyingSecType, underlyingConId):
+        key, started = (underlyingSymbol, futFopExchange, underlyingSecType, underlyingConId), time.monotonic()
+        result = self._ib.reqSecDefOptParams(*key)
+        self._record('secdef', key, started, list(result))
+        return result
+
+    async def reqSecDefOptParamsAsync(self, underlyingSymbol, futFopExchange, underlyingSecType, underlyingConId):
+        key, started = (underlyingSymbol, futFopExchange, underlyingSecType, underlyingConId), time.monotonic()
+        result = await self._ib.reqSecDefOptParamsAsync(*key)
+        self._record('secdef', key, started, list(result))
+        return result
+
+    def reqContractDetails(self, contract):
+        key, started = contract_key(contract), time.monotonic()
+        result = self._ib.reqContractDetails(contract)
+        self._record('details', key, started, list(result))
+        return result
+
+    async def reqContractDetailsAsync(self, contract):
+        key, started = contract_key(contract), time.monotonic()
+        result = await self._ib.reqContractDetailsAsync(contract)
+        self._record('details', key, started, list(result))
+        return result
+
+    def reqHistoricalData(self, contract, endDateTime, durationStr, barSizeSetting, whatToShow, useRTH,
+                          formatDate=1, keepUpToDate=False, chartOptions=[], timeout=60):
+        key = request_key(contract, endDateTime, durationStr, barSizeSetting, whatToShow, useRTH)
+        started = time.monotonic()
+        bars = self._ib.reqHistoricalData(contract, endDateTime, durationStr, barSizeSetting, whatToShow,
+                                          useRTH, formatDate, keepUpToDate, chartOptions, timeout)
+        self._record('historical', key, started, list(bars or []))
+        return bars
+
+    async def reqHistoricalDataAsync(self, contract, endDateTime, durationStr, barSizeSetting, whatToShow,
+                                     useRTH, formatDate=1, keepUpToDate=False, chartOptions=[], timeout=60):
+        key = request_key(contract, endDateTime, durationStr, barSizeSetting, whatToShow, useRTH)
+        started = time.monotonic()
+        bars = await self._ib.reqHistoricalDataAsync(contract, endDateTime, durationStr, barSizeSetting,
+                                                     whatToShow, useRTH, formatDate, keepUpToDate,
+                                                     chartOptions, timeout)
+        self._record('historical', key, started, list(bars or []))
+        return bars
+
+    # -- 訂閱流 ---------------------------------------------------------
+
+    def reqMktData(self, contract, genericTickList='', snapshot=False, regulatorySnapshot=False,
+                   mktDataOptions=None):
+        ticker = self._ib.reqMktData(contract, genericTickList, snapshot, regulatorySnapshot, mktDataOptions)
+        self._attach(contract, ticker, 'mkt')
+        return ticker
+
+    def cancelMktData(self, contract):
+        self._ib.cancelMktData(contract)
+        self._detach(contract, 'mkt')
+
+    def reqTickByTickData(self, contract, tickType, numberOfTicks=0, ignoreSize=False):
+        ticker = self._ib.reqTickByTickData(contract, tickType, numberOfTicks, ignoreSize)
+        self._attach(contract, ticker, tickType)
+        return ticker
+
+    def cancelTickByTickData(self, contract, tickType):
+        self._ib.cancelTickByTickData(contract, tickType)
+        self._detach(contract, tickType)
+
+    def _attach(self, contract, ticker, ref: str):
+        key = contract_key(contract)
+        stream = self._streams.get(key)
+        if stream is None:
+            self._segments += 1
+            stream = self._streams[key] = {
+                'ticker': ticker,
+                'segment': f"{self._recorder.session}:{self._segments}",
+                'started': time.monotonic(),
+                'last': {},
+                'refs': set()
+            }
+            stream['handler'] = lambda t, s=stream, k=key: self._on_update(k, s, t)
+            ticker.updateEvent += stream['handler']
+        stream['refs'].add(ref)
+
+    def _detach(self, contract, ref: str):
+        key = contract_key(contract)
+        stream = self._streams.get(key)
+        if stream is None:
+            return
+        stream['refs'].discard(ref)
+        if not stream['refs']:
+            stream['ticker'].updateEvent -= stream['handler']
+            del self._streams[key]
+
+    def _on_update(self, key: str, stream: Dict[str, Any], ticker):
+        last = stream['last']
+        changed = {}
+        for name in self._fields:
+            value = getattr(ticker, name, None)
+            if name not in last or not _same(value, last[name]):
+                changed[name] = last[name] = value
+        ticks = list(ticker.tickByTicks or [])
+        if changed or ticks:
+            self._recorder.write(REC_UPDATE, time.monotonic() - stream['started'],
+                                 (key, stream['segment'], changed, ticks))
+
+    def disconnect(self):
+        for stream in self._streams.values():
+            stream['ticker'].updateEvent -= stream['handler']
+        self._streams.clear()
+        self._recorder.flush()
+        return self._ib.disconnect()
+
+
+# ----------------------------------------------------------------------
+# 回放
+# ----------------------------------------------------------------------
+
+class ReplayIB:
+    """
+    回放數據源：實現本系統使用的 IB 接口子集，數據來自 MarketDataLog
+
+    參數:
+        log: MarketDataLog 或日誌路徑
+        speed: 回放速度（1 實時，>1 加速，0 最高速）
+    """
+
+    def __init__(self, log, speed: float = 1.0):
+        from eventkit import Event
+        self.log = log if isinstance(log, MarketDataLog) else MarketDataLog(log)
+        self.speed = max(0.0, float(speed))
+        self.errorEvent = Event('errorEvent')
+        self.updateEvent = Event('updateEvent')
+        self.pendingTickersEvent = Event('pendingTickersEvent')
+        self._connected = False
+        self._cursors: Dict[Tuple, int] = defaultdict(int)
+        self._segment_cursors: Dict[str, int] = defaultdict(int)
+        self._streams: Dict[str, Dict[str, Any]] = {}
+        self.stats = {'responses': 0, 'missing': 0, 'updates': 0}
+
+    # -- 連接與事件循環 --------------------------------------------------
+
+    def connect(self, host='127.0.0.1', port=7497, clientId=1, timeout=4, readonly=False, account=''):
+        self._connected = True
+        logger.info(f"* 回放數據源已連接: {self.log.path} (speed={self.speed or 'max'})")
+        return self
+
+    async def connectAsync(self, host='127.0.0.1', port=7497, clientId=1, timeout=4, readonly=False, account=''):
+        return self.connect(host, port, clientId, timeout, readonly, account)
+
+    def disconnect(self):
+        for stream in self._streams.values():
+            if stream['handle'] is not None:
+                stream['handle'].cancel()
+        self._streams.clear()
+        self._connected = False
+
+    def isConnected(self) -> bool:
+        return self._connected
+
+    def reqMarketDataType(self, marketDataType: int):
+        pass
+
+    @staticmethod
+    def run(*awaitables, timeout: Optional[float] = None):
+        from ib_insync import util
+        return util.run(*awaitables, timeout=timeout)
+
+    def sleep(self, secs: float = 0.02) -> bool:
+        from ib_insync import util
+        return util.sleep(self._scaled(secs))
+
+    def waitOnUpdate(self, timeout: float = 0) -> bool:
+        try:
+            if timeout:
+                # 最高速模式下仍需讓事件循環運行一次，推送已排隊的更新
+                self.run(asyncio.wait_for(self.updateEvent, max(self._scaled(timeout), 0.001)))
+            else:
+                self.run(self.updateEvent)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def _scaled(self, seconds: float) -> float:
+        return seconds / self.speed if self.speed else 0.0
+
+    # -- 請求 / 響應 ---------------------------------------------------
+
+    def _response(self, method: str, key, default=None, request=None):
+        entries = self.log.responses.get((method, key))
+        if not entries:
+            return self._missing(method, key, default, request)
+        index = self._cursors[(method, key)]
+        self._cursors[(method, key)] = index + 1
+        self.stats['responses'] += 1
+        latency, result = entries[min(index, len(entries) - 1)]   # 超出錄製次數時重複最後一次
+        return self._scaled(latency), result
+
+    def _missing(self, method: str, key, default, request) -> Tuple[float, Any]:
+        """日誌中沒有的請求（子類可覆蓋以生成數據）"""
+        self.stats['missing'] += 1
+        logger.warning(f"! 回放日誌中無響應: {method} {key}")
+        return 0.0, default
+
+    def _qualify(self, contracts) -> Tuple[float, List[Any]]:
+        from ib_insync import util
+        qualified, delay = [], 0.0
+        for contract in contracts:
+            latency, result = self._response('qualify', contract_key(contract), request=contract)
+            delay = max(delay, latency)
+            if result is not None:
+                util.dataclassUpdate(contract, result)
+                qualified.append(contract)
+        return delay, qualified
+
+    def qualifyContracts(self, *contracts):
+        return self.run(self.qualifyContractsAsync(*contracts))
+
+    async def qualifyContractsAsync(self, *contracts):
+        delay, qualified = self._qualify(contracts)
+        await asyncio.sleep(delay)
+        return qualified
+
+    def reqSecDefOptParams(self, underlyingSymbol, futFopExchange, underlyingSecType, underlyingConId):
+        return self.run(self.reqSecDefOptParamsAsync(underlyingSymbol, futFopExchange,
+                                                     underlyingSecType, underlyingConId))
+
+    async def reqSecDefOptParamsAsync(self, underlyingSymbol, futFopExchange, underlyingSecType, underlyingConId):
+        key = (underlyingSymbol, futFopExchange, underlyingSecType, underlyingConId)
+        delay, result = self._response('secdef', key, [], request=key)
+        await asyncio.sleep(delay)
+        return list(result)
+
+    def reqContractDetails(self, contract):
+        return self.run(self.reqContractDetailsAsync(contract))
+
+    async def reqContractDetailsAsync(self, contract):
+        delay, result = self._response('details', contract_key(contract), [], request=contract)
+        await asyncio.sleep(delay)
+        return list(result)
+
+    def reqHistoricalData(self, contract, endDateTime, durationStr, barSizeSetting, whatToShow, useRTH,
+                          formatDate=1, keepUpToDate=False, chartOptions=[], timeout=60):
+        return self.run(self.reqHistoricalDataAsync(contract, endDateTime, durationStr, barSizeSetting,
+                                                    whatToShow, useRTH))
+
+    async def reqHistoricalDataAsync(self, contract, endDateTime, durationStr, barSizeSetting, whatToShow,
+                                     useRTH, formatDate=1, keepUpToDate=False, chartOptions=[], timeout=60):
+        key = request_key(contract, endDateTime, durationStr, barSizeSetting, whatToShow, useRTH)
+        delay, bars = self._response('historical', key, [], request=(contract, durationStr, barSizeSetting))
+        await asyncio.sleep(delay)
+        return list(bars)
+
+    # -- 訂閱流 ---------------------------------------------------------
+
+    def reqMktData(self, contract, genericTickList='', snapshot=False, regulatorySnapshot=False,
+                   mktDataOptions=None):
+        return self._subscribe(contract, 'mkt')
+
+    def cancelMktData(self, contract):
+        self._unsubscribe(contract, 'mkt')
+
+    def reqTickByTickData(self, contract, tickType, numberOfTicks=0, ignoreSize=False):
+        return self._subscribe(contract, tickType)
+
+    def cancelTickByTickData(self, contract, tickType):
+        self._unsubscribe(contract, tickType)
+
+    def ticker(self, contract):
+        stream = self._streams.get(contract_key(contract))
+        return stream['ticker'] if stream else None
+
+    def tickers(self) -> List[Any]:
+        return [stream['ticker'] for stream in self._streams.values()]
+
+    def _subscribe(self, contract, ref: str):
+        from ib_insync import Ticker, util
+        key = contract_key(contract)
+        stream = self._streams.get(key)
+        if stream is None:
+            stream = self._streams[key] = {
+                'ticker': Ticker(contract=contract),
+                'updates': self._stream_updates(key, contract),
+                'handle': None,
+                'refs': set()
+            }
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = util.getLoop()
+            self._schedule(key, stream, loop, 0.0)
+        stream['refs'].add(ref)
+        return stream['ticker']
+
+    def _stream_updates(self, key: str, contract) -> Iterator[Tuple[float, Dict[str, Any], list]]:
+        """一次訂閱的更新序列 (dt, fields, ticks)：第 n 次訂閱回放該合約錄製的第 n 段"""
+        segments = self.log.segments.get(key) or [[]]
+        index = self._segment_cursors[key]
+        self._segment_cursors[key] = index + 1
+        return iter(segments[min(index, len(segments) - 1)])
+
+    def _unsubscribe(self, contract, ref: str):
+        key = contract_key(contract)
+        stream = self._streams.get(key)
+        if stream is None:
+            return
+        stream['refs'].discard(ref)
+        if not stream['refs']:
+            if stream['handle'] is not None:
+                stream['handle'].cancel()
+            del self._streams[key]
+
+    def _schedule(self, key: str, stream: Dict[str, Any], loop, previous: float):
+        update = next(stream['updates'], None)
+        if update is None:
+            stream['handle'] = None
+            return
+        delay = self._scaled(update[0] - previous)
+        callback = lambda: self._deliver(key, stream, loop, update)
+        stream['handle'] = loop.call_later(delay, callback) if delay > 0 else loop.call_soon(callback)
+
+    def _deliver(self, key: str, stream: Dict[str, Any], loop, update):
+        if self._streams.get(key) is not stream:
+            return
+        dt, values, ticks = update
+        ticker = stream['ticker']
+        for name, value in values.items():
+            setattr(ticker, name, value)
+        ticker.tickByTicks = list(ticks)
+        self.stats['updates'] += 1
+        ticker.updateEvent.emit(ticker)
+        self.pendingTickersEvent.emit({ticker})
+        self.updateEvent.emit()
+        self._schedule(key, stream, loop, dt)
+
+
+# ----------------------------------------------------------------------
+# 工廠
+# ----------------------------------------------------------------------
+
+_recorders: Dict[str, MarketDataRecorder] = {}
+_recorders_lock = threading.Lock()
+
+
+def get_recorder(path: str) -> MarketDataRecorder:
+    """同一路徑共用一個寫入器（IBKRClient 與 ScannerService 錄製到同一日誌）"""
+    path = os.path.abspath(path)
+    with _recorders_lock:
+        recorder = _recorders.get(path)
+        if recorder is None:
+            recorder = _recorders[path] = MarketDataRecorder(path)
+        return recorder
+
+
+def create_ib():
+    """
+    按配置創建 IB 實例
+
+    IBKR_SIMULATOR 開啟時返回模擬 Gateway；IBKR_REPLAY_PATH 非空時返回 ReplayIB；
+    IBKR_RECORD_PATH 非空時返回包裝真實 IB 的 RecordingIB；否則返回 ib_insync.IB。
+    """
+    from config.settings import settings
+    if settings.IBKR_SIMULATOR:
+        from data_layer.ibkr_simulator import SimulatedIB, SimulatorConfig
+        return SimulatedIB(SimulatorConfig.from_settings())
+    if settings.IBKR_REPLAY_PATH:
+        return ReplayIB(settings.IBKR_REPLAY_PATH, speed=settings.IBKR_REPLAY_SPEED)
+    from ib_insync import IB
+    if settings.IBKR_RECORD_PATH:
+        logger.info(f"* IBKR 行情錄製: {settings.IBKR_RECORD_PATH}")
+        return RecordingIB(IB(), get_recorder(settings.IBKR_RECORD_PATH))
+    return IB()
+
+
+if __name__ == '__main__':
+    import json
+    import sys
+
+    if len(sys.argv) < 2:
+        print("用法: python -m data_layer.ibkr_recorder <日誌路徑>")
+        sys.exit(1)
+    print(json.dumps(MarketDataLog(sys.argv[1]).summary(), indent=2, ensure_ascii=False))
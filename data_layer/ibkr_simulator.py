@@ -0,0 +1,382 @@
+# data_layer/ibkr_simulator.py
+"""
+本地模擬 IBKR Gateway（負載測試用）
+
+ScannerService 的 MOCK_MODE 只跳過 Finviz，IBKR 部分仍需要真實 TWS / Gateway。
+SimulatedIB 在進程內實現本系統使用的 IB 接口子集（與 ReplayIB 相同），數據優先取自錄製日誌，
+日誌中沒有的請求按股票代碼確定性地生成:
+
+- qualifyContracts：分配穩定的 conId
+- reqSecDefOptParams / reqContractDetails：每週到期日（120 天內）與現價 ±50% 的行使價
+- reqHistoricalData：幾何布朗運動日線 / 分鐘線
+- reqMktData / reqTickByTickData：按 tick_interval 推送的報價、期權 Greeks（Black-Scholes）與逐筆成交
+
+並模擬 Gateway 的限制:
+- 每個請求的往返延遲（latency ± jitter）
+- 行情線上限：超出時發出錯誤 101，Ticker 不會更新
+- 歷史數據 pacing：窗口內請求數超限或 15 秒內重複請求時發出錯誤 162 並返回空列表
+
+使用示例:
+    >>> ib = SimulatedIB(SimulatorConfig(latency=0.02, max_market_data_lines=100))
+    >>> ib.connect()
+    >>> ib.qualifyContracts(Stock('AAPL', 'SMART', 'USD'))
+    >>> ib.metrics()
+
+    # 讓 IBKRClient / ScannerService 連接模擬器
+    $ IBKR_SIMULATOR=true python run_cli_scanner.py
+"""
+
+import copy
+import itertools
+import logging
+import math
+import random
+import time
+import zlib
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from calculation_layer.module15_black_scholes import BlackScholesCalculator
+from data_layer.ibkr_contract_cache import contract_key
+from data_layer.ibkr_recorder import MarketDataLog, ReplayIB
+
+logger = logging.getLogger(__name__)
+
+RISK_FREE_RATE = 0.045
+TRADING_DAYS = 252
+EXPIRATION_HORIZON_DAYS = 120
+
+
+@dataclass
+class SimulatorConfig:
+    """模擬 Gateway 配置"""
+    latency: float = 0.05               # 請求往返延遲（秒）
+    jitter: float = 0.5                 # 延遲抖動比例（latency × (1 ± jitter)）
+    tick_interval: float = 1.0          # 訂閱流推送間隔（秒）
+    max_market_data_lines: int = 100    # 同時訂閱的行情線上限
+    hist_max_requests: int = 60         # 歷史數據 pacing 窗口內的最大請求數
+    hist_window_seconds: float = 600.0  # 歷史數據 pacing 窗口（秒）
+    identical_interval: float = 15.0    # 相同歷史數據請求的最小間隔（秒）
+    seed: int = 7                       # 合成數據隨機種子
+    data_path: str = ''                 # 錄製日誌（有數據時優先使用）
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_settings(cls) -> 'SimulatorConfig':
+        from config.settings import settings
+        return cls(
+            latency=settings.IBKR_SIM_LATENCY,
+            tick_interval=settings.IBKR_SIM_TICK_INTERVAL,
+            max_market_data_lines=settings.IBKR_SIM_MARKET_DATA_LINES,
+            hist_max_requests=settings.IBKR_HIST_MAX_REQUESTS,
+            hist_window_seconds=settings.IBKR_HIST_WINDOW_SECONDS,
+            data_path=settings.IBKR_SIM_DATA_PATH
+        )
+
+
+@dataclass(frozen=True)
+class _Profile:
+    """合成股票參數"""
+    symbol: str
+    con_id: int
+    price: float
+    volatility: float
+
+
+def _stable_id(text: str, base: int) -> int:
+    return base + zlib.crc32(text.encode()) % 90_000_000
+
+
+def _bar_seconds(bar_size: str) -> int:
+    count, unit = bar_size.split()[:2]
+    unit = unit.rstrip('s')
+    return int(count) * {'sec': 1, 'min': 60, 'hour': 3600, 'day': 86400, 'week': 604800}.get(unit, 86400)
+
+
+def _duration_days(duration: str) -> int:
+    count, unit = duration.split()[:2]
+    return int(count) * {'S': 0, 'D': 1, 'W': 7, 'M': 30, 'Y': 365}.get(unit.upper(), 1) or 1
+
+
+def _black_scholes(spot: float, strike: float, years: float, vol: float, right: str) -> Tuple[float, ...]:
+    """(價格, delta, gamma, vega, theta)；vega / theta 為每 1% 波動率 / 每日"""
+    years = max(years, 1 / 365)
+    sqrt_t = math.sqrt(years)
+    d1 = (math.log(spot / strike) + (RISK_FREE_RATE + vol * vol / 2) * years) / (vol * sqrt_t)
+    d2 = d1 - vol * sqrt_t
+    cdf, pdf = BlackScholesCalculator.normal_cdf, BlackScholesCalculator.normal_pdf
+    discount = math.exp(-RISK_FREE_RATE * years)
+    if right == 'C':
+        price = spot * cdf(d1) - strike * discount * cdf(d2)
+        delta = cdf(d1)
+        theta = -spot * pdf(d1) * vol / (2 * sqrt_t) - RISK_FREE_RATE * strike * discount * cdf(d2)
+    else:
+        price = strike * discount * cdf(-d2) - spot * cdf(-d1)
+        delta = cdf(d1) - 1
+        theta = -spot * pdf(d1) * vol / (2 * sqrt_t) + RISK_FREE_RATE * strike * discount * cdf(-d2)
+    gamma = pdf(d1) / (spot * vol * sqrt_t)
+    vega = spot * pdf(d1) * sqrt_t / 100
+    return max(float(price), 0.01), float(delta), float(gamma), float(vega), float(theta) / 365
+
+
+class SimulatedIB(ReplayIB):
+    """
+    模擬 Gateway（接口與 ReplayIB / ib_insync.IB 相同）
+
+    參數:
+        config: 模擬配置（默認 SimulatorConfig()）
+    """
+
+    def __init__(self, config: Optional[SimulatorConfig] = None):
+        self.config = config or SimulatorConfig()
+        super().__init__(MarketDataLog(self.config.data_path or None), speed=1.0)
+        self._rng = random.Random(self.config.seed)
+        self._profiles: Dict[str, _Profile] = {}
+        self._req_ids = itertools.count(1)
+        self._hist_sent: deque = deque()
+        self._hist_recent: Dict[Tuple, float] = {}
+        self.stats.update({
+            'synthetic': 0, 'pacing_violations': 0, 'line_rejections': 0, 'peak_lines': 0, 'requests': 0
+        })
+
+    def connect(self, host='127.0.0.1', port=7497, clientId=1, timeout=4, readonly=False, account=''):
+        self._connected = True
+        logger.info(f"* 模擬 Gateway 已連接 (latency={self.config.latency}s, "
+                    f"lines={self.config.max_market_data_lines}, data={self.config.data_path or 'synthetic'})")
+        return self
+
+    def metrics(self) -> Dict[str, Any]:
+        """請求計數、限制觸發次數與當前行情線"""
+        return {
+            **self.stats,
+            'active_lines': self._active_lines(),
+            'streams': len(self._streams),
+            'config': self.config.to_dict()
+        }
+
+    # -- 限制 -----------------------------------------------------------
+
+    def _latency(self) -> float:
+        jitter = self.config.jitter * self._rng.uniform(-1.0, 1.0)
+        return max(0.0, self.config.latency * (1.0 + jitter))
+
+    def _error(self, code: int, message: str, contract=None):
+        req_id = next(self._req_ids)
+        logger.debug(f"模擬 Gateway 錯誤 {code}: {message}")
+        self.errorEvent.emit(req_id, code, message, contract)
+
+    def _active_lines(self) -> int:
+        return sum(1 for stream in self._streams.values() if 'mkt' in stream['refs'])
+
+    def _hist_pacing_violation(self, key: Tuple) -> bool:
+        now = time.monotonic()
+        while self._hist_sent and now - self._hist_sent[0] >= self.config.hist_window_seconds:
+            self._hist_sent.popleft()
+        last = self._hist_recent.get(key)
+        if len(self._hist_sent) >= self.config.hist_max_requests or (
+                last is not None and now - last < self.config.identical_interval):
+            return True
+        self._hist_sent.append(now)
+        self._hist_recent[key] = now
+        return False
+
+    def reqMktData(self, contract, genericTickList='', snapshot=False, regulatorySnapshot=False,
+                   mktDataOptions=None):
+        from ib_insync import Ticker
+        stream = self._streams.get(contract_key(contract))
+        if (stream is None or 'mkt' not in stream['refs']) and \
+                self._active_lines() >= self.config.max_market_data_lines:
+            self.stats['line_rejections'] += 1
+            self._error(101, 'Max number of tickers has been reached', contract)
+            return Ticker(contract=contract)
+        ticker = super().reqMktData(contract, genericTickList, snapshot, regulatorySnapshot, mktDataOptions)
+        self.stats['peak_lines'] = max(self.stats['peak_lines'], self._active_lines())
+        return ticker
+
+    async def reqHistoricalDataAsync(self, contract, endDateTime, durationStr, barSizeSetting, whatToShow,
+                                     useRTH, formatDate=1, keepUpToDate=False, chartOptions=[], timeout=60):
+        from data_layer.ibkr_historical_scheduler import request_key
+        key = request_key(contract, endDateTime, durationStr, barSizeSetting, whatToShow, useRTH)
+        if self._hist_pacing_violation(key):
+            self.stats['pacing_violations'] += 1
+            self._error(162, 'Historical Market Data Service error message:Pacing violation', contract)
+            return []
+        return await super().reqHistoricalDataAsync(contract, endDateTime, durationStr, barSizeSetting,
+                                                    whatToShow, useRTH, formatDate, keepUpToDate,
+                                                    chartOptions, timeout)
+
+    # -- 合成數據 ---------------------------------------------------------
+
+    def _response(self, method: str, key, default=None, request=None):
+        self.stats['requests'] += 1
+        return super()._response(method, key, default, request)
+
+    def _missing(self, method: str, key, default, request) -> Tuple[float, Any]:
+        self.stats['synthetic'] += 1
+        if method == 'qualify':
+            result = self._qualified(request)
+        elif method == 'secdef':
+            result = self._chains(request[0], request[3])
+        elif method == 'details':
+            result = self._details(request)
+        elif method == 'historical':
+            result = self._bars(*request)
+        else:
+            result = default
+        return self._latency(), result
+
+    def _profile(self, symbol: str) -> _Profile:
+        profile = self._profiles.get(symbol)
+        if profile is None:
+            rng = random.Random(f"{self.config.seed}:{symbol}")
+            profile = self._profiles[symbol] = _Profile(
+                symbol=symbol,
+                con_id=_stable_id(symbol, 1_000_000),
+                price=round(math.exp(rng.uniform(math.log(5), math.log(600))), 2),
+                volatility=rng.uniform(0.2, 0.9)
+            )
+        return profile
+
+    def _qualified(self, contract):
+        result = copy.copy(contract)
+        if contract.secType == 'OPT':
+            result.conId = _stable_id(contract_key(contract), 100_000_000)
+            result.multiplier = '100'
+            result.tradingClass = contract.symbol
+            result.localSymbol = f"{contract.symbol:<6}{contract.lastTradeDateOrContractMonth[2:]}" \
+                                 f"{contract.right}{int(contract.strike * 1000):08d}"
+        else:
+            result.conId = self._profile(contract.symbol).con_id
+            result.primaryExchange = result.primaryExchange or 'NASDAQ'
+        result.currency = result.currency or 'USD'
+        return result
+
+    def _expirations(self) -> List[str]:
+        today = datetime.now().date()
+        friday = today + timedelta(days=(4 - today.weekday()) % 7)
+        return [(friday + timedelta(weeks=i)).strftime('%Y%m%d')
+                for i in range(EXPIRATION_HORIZON_DAYS // 7 + 1)]
+
+    def _strikes(self, price: float) -> List[float]:
+        step = 1.0 if price < 50 else 2.5 if price < 200 else 5.0
+        low, high = math.ceil(price * 0.5 / step), math.floor(price * 1.5 / step)
+        return [round(i * step, 2) for i in range(max(low, 1), high + 1)]
+
+    def _chains(self, symbol: str, con_id: int) -> List[Any]:
+        from ib_insync import OptionChain
+        profile = self._profile(symbol)
+        return [OptionChain('SMART', con_id, symbol, '100', self._expirations(), self._strikes(profile.price))]
+
+    def _details(self, option_filter) -> List[Any]:
+        from ib_insync import ContractDetails, Option
+        expiries = [option_filter.lastTradeDateOrContractMonth] if option_filter.lastTradeDateOrContractMonth \
+            else self._expirations()
+        rights = [option_filter.right] if option_filter.right else ['C', 'P']
+        strikes = [option_filter.strike] if option_filter.strike else self._strikes(
+            self._profile(option_filter.symbol).price)
+        details = []
+        for expiry in expiries:
+            for strike in strikes:
+                for right in rights:
+                    option = self._qualified(Option(option_filter.symbol, expiry, strike, right, 'SMART'))
+                    details.append(ContractDetails(contract=option, minTick=0.01))
+        return details
+
+    def _bars(self, contract, duration: str, bar_size: str) -> List[Any]:
+        from ib_insync import BarData
+        profile = self._profile(contract.symbol)
+        seconds = _bar_seconds(bar_size)
+        days = _duration_days(duration)
+        trading_days = max(1, days * 5 // 7)
+        count = trading_days if seconds >= 86400 else max(1, trading_days * 23400 // seconds)
+        rng = random.Random(f"{self.config.seed}:{contract.symbol}:{bar_size}")
+        sigma = profile.volatility * math.sqrt(seconds / (TRADING_DAYS * 23400) if seconds < 86400 else 1 / TRADING_DAYS)
+
+        # 從現價向前回推，最後一根 K 線收於現價
+        closes = [profile.price]
+        for _ in range(count - 1):
+            closes.append(closes[-1] / math.exp(rng.gauss(0, sigma)))
+        closes.reverse()
+        end = datetime.now().replace(second=0, microsecond=0)
+        bars = []
+        for i, close in enumerate(closes):
+            open_ = closes[i - 1] if i else close
+            spread = abs(rng.gauss(0, sigma)) * close
+            when = end - timedelta(seconds=seconds * (count - 1 - i)) if seconds < 86400 \
+                else (end - timedelta(days=(count - 1 - i) * 7 // 5)).date()
+            bars.append(BarData(
+                date=when, open=round(open_, 2), high=round(max(open_, close) + spread, 2),
+                low=round(min(open_, close) - spread, 2), close=round(close, 2),
+                volume=max(1, rng.randint(100_000, 5_000_000) * min(seconds, 23400) // 23400),
+                average=round((open_ + close) / 2, 2), barCount=rng.randint(100, 10_000)
+            ))
+        return bars
+
+    def _stream_updates(self, key: str, contract) -> Iterator[Tuple[float, Dict[str, Any], list]]:
+        if self.log.segments.get(key):
+            return super()._stream_updates(key, contract)
+        self.stats['synthetic'] += 1
+        if contract.secType == 'OPT':
+            return self._option_stream(contract)
+        return self._stock_stream(contract)
+
+    def _stock_stream(self, contract) -> Iterator[Tuple[float, Dict[str, Any], list]]:
+        from ib_insync import TickAttribBidAsk, TickAttribLast, TickByTickAllLast, TickByTickBidAsk
+        profile = self._profile(contract.symbol)
+        rng = random.Random(f"{self.config.seed}:{contract_key(contract)}:{self.stats['synthetic']}")
+        interval = self.config.tick_interval
+        sigma = profile.volatility * math.sqrt(interval / (TRADING_DAYS * 23400))
+        spot, volume, high, low = profile.price, rng.randint(100_000, 2_000_000), profile.price, profile.price
+        t = self._latency()
+        while True:
+            half_spread = max(0.01, round(spot * 0.0002, 2))
+            size = rng.choice((100, 100, 200, 300, 500, 1_000, 5_000, 20_000))
+            volume += size
+            high, low = max(high, spot), min(low, spot)
+            now = datetime.now(timezone.utc)
+            yield t, {
+                'time': now, 'last': round(spot, 2), 'lastSize': size, 'close': profile.price,
+                'open': profile.price, 'high': round(high, 2), 'low': round(low, 2), 'volume': volume,
+                'bid': round(spot - half_spread, 2), 'ask': round(spot + half_spread, 2),
+                'bidSize': rng.randint(1, 50) * 100, 'askSize': rng.randint(1, 50) * 100
+            }, [
+                TickByTickAllLast(1, now, round(spot, 2), size, TickAttribLast(),
+                                  'D' if rng.random() < 0.3 else 'NASDAQ', ''),
+                TickByTickBidAsk(now, round(spot - half_spread, 2), round(spot + half_spread, 2),
+                                 rng.randint(1, 50) * 100, rng.randint(1, 50) * 100, TickAttribBidAsk())
+            ]
+            t += interval
+            spot *= math.exp(rng.gauss(0, sigma))
+
+    def _option_stream(self, contract) -> Iterator[Tuple[float, Dict[str, Any], list]]:
+        from ib_insync import OptionComputation
+        profile = self._profile(contract.symbol)
+        rng = random.Random(f"{self.config.seed}:{contract_key(contract)}")
+        expiry = datetime.strptime(contract.lastTradeDateOrContractMonth, '%Y%m%d')
+        strike, right = float(contract.strike), contract.right
+        # 簡單的波動率微笑：價外越深 IV 越高
+        iv = profile.volatility * (1 + 0.3 * abs(math.log(strike / profile.price)))
+        open_interest = rng.randint(50, 20_000)
+        volume = rng.randint(0, open_interest)
+        spot = profile.price
+        sigma = profile.volatility * math.sqrt(self.config.tick_interval / (TRADING_DAYS * 23400))
+        t = self._latency()
+        while True:
+            years = (expiry - datetime.now()).total_seconds() / (365 * 86400)
+            price, delta, gamma, vega, theta = _black_scholes(spot, strike, years, iv, right)
+            half_spread = max(0.01, round(price * 0.02, 2))
+            greeks = OptionComputation(0, iv, delta, price, 0.0, gamma, vega, theta, spot)
+            volume += rng.choice((0, 0, 1, 5, 10))
+            yield t, {
+                'time': datetime.now(timezone.utc), 'bid': round(max(price - half_spread, 0.01), 2),
+                'ask': round(price + half_spread, 2), 'last': round(price, 2), 'close': round(price, 2),
+                'volume': volume, 'impliedVolatility': iv, 'modelGreeks': greeks,
+                'bidGreeks': greeks, 'askGreeks': greeks, 'lastGreeks': greeks,
+                'callOpenInterest' if right == 'C' else 'putOpenInterest': open_interest
+            }, []
+            t += self.config.tick_interval
+            spot *= math.exp(rng.gauss(0, sigma))
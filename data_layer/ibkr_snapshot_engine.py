@@ -0,0 +1,320 @@
+# data_layer/ibkr_snapshot_engine.py
+"""
+事件驅動的 IBKR 期權鏈快照引擎
+
+原實現一次性為所有合約調用 reqMktData，再以 ib.sleep(0.2) 輪詢全部 Ticker，
+最長固定等待 8 秒；Greeks 收斂則每 0.5 秒輪詢一次 ib.ticker()。
+合約數超過行情線（market data lines）配額時，多出的訂閱會被 IBKR 拒絕。
+
+本引擎:
+- 批量驗證缺少 conId 的合約（一次 qualifyContractsAsync）
+- 維持一個大小等於行情線配額的在途訂閱窗口，完成一個合約就取消訂閱並補入下一個
+- 在每個 Ticker 的 updateEvent 上判斷完成：bid/ask 有效且 modelGreeks 穩定
+  （連續兩次更新在容差內）；Greeks 在 settle_seconds 內沒有新的變化時直接完成
+  （只有 Greeks / 延遲數據、沒有雙邊報價時不必等到單合約超時）
+- 非常規交易時段不要求 bid/ask：有最新價、收盤價或 IV 即完成
+- 單個合約超時後以現有數據完成，不拖住整條鏈
+- 最後一個合約完成時立即返回
+- 傳入 lines（MarketDataLineManager）時，窗口從共享行情線預算中申請：
+  窗口不超過本連接當前可用的線路（其他連接的空閒線不計入），完成的合約釋放為熱線，下次捕獲同一條鏈時直接復用
+
+整條鏈的耗時約為 ceil(合約數 / 窗口) × 單合約收斂時間，隨配額而不是合約數線性增長。
+
+使用示例:
+    >>> engine = ChainSnapshotEngine(ib, generic_tick_list='100,101,106', max_in_flight=80)
+    >>> tickers = engine.capture(contracts)   # 與 contracts 一一對應
+    >>> engine.last_stats['elapsed']
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from data_layer.ibkr_market_data_lines import MarketDataLineError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STABILITY_TOLERANCE = 0.001  # 與 ibkr_client.GREEKS_STABILITY_TOLERANCE 一致
+
+
+def _valid_price(value) -> bool:
+    return value is not None and not math.isnan(value) and value > 0
+
+
+def _fallback_ready(ticker) -> bool:
+    """沒有雙邊報價時可接受的數據：最新價、收盤價或 IV"""
+    greeks = getattr(ticker, 'modelGreeks', None)
+    return (
+        _valid_price(getattr(ticker, 'last', None))
+        or _valid_price(getattr(ticker, 'close', None))
+        or _valid_price(getattr(ticker, 'impliedVolatility', None))
+        or (greeks is not None and _valid_price(greeks.impliedVol))
+    )
+
+
+def _greeks_tuple(ticker) -> Optional[tuple]:
+    greeks = getattr(ticker, 'modelGreeks', None)
+    if greeks is None or greeks.delta is None or greeks.impliedVol is None:
+        return None
+    return (greeks.delta, greeks.gamma, greeks.theta, greeks.vega, greeks.impliedVol)
+
+
+@dataclass
+class _Pending:
+    """在途合約狀態"""
+    index: int
+    ticker: Any = None
+    handler: Any = None
+    timer: Any = None
+    settle_timer: Any = None
+    last_greeks: Optional[tuple] = None
+    started_at: float = 0.0
+
+
+@dataclass
+class _Capture:
+    """一次 capture 的共享狀態"""
+    contracts: List[Any]
+    results: List[Any]
+    queue: deque
+    done: asyncio.Future
+    in_flight: Dict[int, _Pending] = field(default_factory=dict)
+    remaining: int = 0
+    completed: int = 0
+    timed_out: int = 0
+    skipped: int = 0
+    window: int = 0
+    primary: bool = True
+    peak_in_flight: int = 0
+    durations: List[float] = field(default_factory=list)
+
+
+class ChainSnapshotEngine:
+    """
+    期權鏈快照引擎
+
+    參數:
+        ib: ib_insync.IB 實例
+        generic_tick_list: reqMktData 的 Generic Tick Tags
+        max_in_flight: 同時在途的訂閱數（行情線配額）
+        contract_timeout: 單個合約的最長等待秒數（超時以現有數據完成）
+        settle_seconds: Greeks 首次出現後無變化多久即視為穩定
+        total_timeout: 整條鏈的最長等待秒數
+        stability_tolerance: Greeks 穩定容差
+        require_greeks: 是否要求 modelGreeks（False 時只要求 bid/ask）
+        lines: 共享的行情線管理器（None 時直接 reqMktData / cancelMktData）
+        is_primary_session: 判斷當前是否常規交易時段（默認 session_utils.is_primary_session）
+    """
+
+    def __init__(
+        self,
+        ib,
+        generic_tick_list: str = '',
+        max_in_flight: int = 80,
+        contract_timeout: float = 4.0,
+        settle_seconds: float = 0.5,
+        total_timeout: float = 60.0,
+        stability_tolerance: float = DEFAULT_STABILITY_TOLERANCE,
+        require_greeks: bool = True,
+        lines=None,
+        is_primary_session: Optional[Callable[[], bool]] = None
+    ):
+        self.ib = ib
+        self.generic_tick_list = generic_tick_list
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.contract_timeout = contract_timeout
+        self.settle_seconds = settle_seconds
+        self.total_timeout = total_timeout
+        self.stability_tolerance = stability_tolerance
+        self.require_greeks = require_greeks
+        self.lines = lines
+        if is_primary_session is None:
+            from data_layer.session_utils import is_primary_session
+        self.is_primary_session = is_primary_session
+        self.last_stats: Dict[str, Any] = {}
+
+    # ------------------------------------------------------------------
+    # 公共接口
+    # ------------------------------------------------------------------
+
+    def capture(self, contracts: Sequence[Any]) -> List[Any]:
+        """同步版本（在 IB 事件循環上運行 capture_async）"""
+        return self.ib.run(self.capture_async(contracts))
+
+    async def capture_async(self, contracts: Sequence[Any]) -> List[Any]:
+        """
+        捕獲一組合約的行情快照
+
+        返回:
+            List[Ticker]: 與 contracts 一一對應（無法驗證的合約為 None）
+        """
+        contracts = list(contracts)
+        started = time.monotonic()
+        results: List[Any] = [None] * len(contracts)
+        if not contracts:
+            self.last_stats = self._stats(None, 0, started)
+            return results
+
+        unqualified = [c for c in contracts if not getattr(c, 'conId', 0)]
+        if unqualified:
+            await self.ib.qualifyContractsAsync(*unqualified)
+
+        valid = [i for i, c in enumerate(contracts) if getattr(c, 'conId', 0)]
+        if len(valid) < len(contracts):
+            logger.warning(f"! {len(contracts) - len(valid)} 個合約無法驗證，已跳過")
+
+        loop = asyncio.get_running_loop()
+        state = _Capture(contracts=contracts, results=results, queue=deque(valid),
+                         done=loop.create_future(), remaining=len(valid), window=self._window(),
+                         primary=self.is_primary_session())
+        if not valid:
+            self.last_stats = self._stats(state, len(contracts), started)
+            return results
+
+        self._fill(state)
+
+        try:
+            await asyncio.wait_for(asyncio.shield(state.done), self.total_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"! 期權鏈快照超過 {self.total_timeout:.0f}s，以現有數據返回")
+            state.queue.clear()
+            for pending in list(state.in_flight.values()):
+                self._finish(state, pending.index, timed_out=True)
+
+        self.last_stats = self._stats(state, len(contracts), started)
+        logger.info(
+            f"* 期權鏈快照完成: {state.completed}/{len(contracts)} 個合約，"
+            f"超時 {state.timed_out} 個，耗時 {self.last_stats['elapsed']:.2f}s "
+            f"(窗口 {state.window}，峰值 {state.peak_in_flight})"
+        )
+        return results
+
+    # ------------------------------------------------------------------
+    # 窗口調度
+    # ------------------------------------------------------------------
+
+    def _window(self) -> int:
+        if self.lines is None:
+            return self.max_in_flight
+        return max(1, min(self.max_in_flight, self.lines.available(self.ib)))
+
+    def _fill(self, state: _Capture):
+        """補滿在途窗口（共享預算被其他使用方佔滿時等待下一個合約完成）"""
+        while state.queue and len(state.in_flight) < state.window:
+            index = state.queue.popleft()
+            try:
+                self._start(state, index)
+            except MarketDataLineError as e:
+                if state.in_flight:
+                    state.queue.appendleft(index)
+                    break
+                logger.warning(f"! {e}")
+                state.skipped += 1
+                state.remaining -= 1
+        if state.remaining <= 0 and not state.done.done():
+            state.done.set_result(True)
+
+    def _start(self, state: _Capture, index: int):
+        contract = state.contracts[index]
+        if self.lines is not None:
+            ticker = self.lines.acquire(self.ib, contract, self.generic_tick_list, owner='chain_snapshot')
+        else:
+            ticker = self.ib.reqMktData(contract, self.generic_tick_list, False, False)
+        pending = _Pending(index=index, ticker=ticker, started_at=time.monotonic())
+        state.in_flight[index] = pending
+        state.peak_in_flight = max(state.peak_in_flight, len(state.in_flight))
+
+        loop = asyncio.get_running_loop()
+        pending.timer = loop.call_later(self.contract_timeout, self._finish, state, index, True)
+        pending.handler = lambda ticker: self._on_update(state, index, ticker)
+        pending.ticker.updateEvent += pending.handler
+        # 緩存中已有完整數據時下一輪事件循環即可完成（避免在 _finish 中遞歸補位）
+        loop.call_soon(self._on_update, state, index, pending.ticker)
+
+    def _on_update(self, state: _Capture, index: int, ticker):
+        pending = state.in_flight.get(index)
+        if pending is None:
+            return
+        quote_ready = _valid_price(ticker.bid) and _valid_price(ticker.ask)
+        # 非常規時段沒有可靠的雙邊報價：最新價 / 收盤價 / IV 到達即完成
+        if (quote_ready and not self.require_greeks) or (not state.primary and _fallback_ready(ticker)):
+            self._finish(state, index)
+            return
+        if not self.require_greeks:
+            return
+
+        greeks = _greeks_tuple(ticker)
+        if greeks is None:
+            return
+        stable = pending.last_greeks is not None and self._stable(pending.last_greeks, greeks)
+        if stable and quote_ready:
+            self._finish(state, index)
+            return
+        if not stable:
+            pending.last_greeks = greeks
+            # Greeks 有變化：重新計時，settle_seconds 內無新變化即視為穩定
+            if pending.settle_timer is not None:
+                pending.settle_timer.cancel()
+            pending.settle_timer = asyncio.get_running_loop().call_later(
+                self.settle_seconds, self._on_settled, state, index
+            )
+
+    def _on_settled(self, state: _Capture, index: int):
+        # Greeks 已穩定：雙邊報價若尚未到達（只有 Greeks / 延遲數據），繼續等待也不會更好
+        if index in state.in_flight:
+            state.in_flight[index].settle_timer = None
+            self._finish(state, index)
+
+    def _stable(self, prev: tuple, curr: tuple) -> bool:
+        return all(
+            a is None or b is None or abs(a - b) <= self.stability_tolerance
+            for a, b in zip(prev, curr)
+        )
+
+    def _finish(self, state: _Capture, index: int, timed_out: bool = False):
+        pending = state.in_flight.pop(index, None)
+        if pending is None:
+            return
+        for timer in (pending.timer, pending.settle_timer):
+            if timer is not None:
+                timer.cancel()
+        pending.ticker.updateEvent -= pending.handler
+        if self.lines is not None:
+            # 釋放為熱線（不取消訂閱），預算不足時由 LRU 淘汰
+            self.lines.release(self.ib, state.contracts[index], owner='chain_snapshot')
+        else:
+            try:
+                self.ib.cancelMktData(state.contracts[index])
+            except Exception as e:
+                logger.debug(f"取消訂閱失敗: {e}")
+
+        state.results[index] = pending.ticker
+        state.completed += 1
+        state.timed_out += int(timed_out)
+        state.durations.append(time.monotonic() - pending.started_at)
+        state.remaining -= 1
+        self._fill(state)
+
+    def _stats(self, state: Optional[_Capture], total: int, started: float) -> Dict[str, Any]:
+        durations = sorted(state.durations) if state else []
+        return {
+            'contracts': total,
+            'completed': state.completed if state else 0,
+            'timed_out': state.timed_out if state else 0,
+            'skipped': state.skipped if state else 0,
+            'max_in_flight': state.window if state else self.max_in_flight,
+            'peak_in_flight': state.peak_in_flight if state else 0,
+            'elapsed': round(time.monotonic() - started, 3),
+            'median_contract_seconds': round(durations[len(durations) // 2], 3) if durations else 0.0
+        }
+
+
+def to_columns(rows: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """將記錄列表轉為列式字典 {字段: 值列表}（可直接構建 DataFrame）"""
+    if not rows:
+        return {}
+    return {key: [row.get(key) for row in rows] for key in rows[0]}
@@ -20,6 +20,9 @@ import time
 from datetime import datetime, timedelta
 from typing import Dict, Optional, Any, List
 
+from data_layer.http_session import http_sessions
+from data_layer.utils.rate_limiter import rate_limiters
+
 logger = logging.getLogger(__name__)
 
 
@@ -52,6 +55,7 @@ class MassiveAPIClient:
         self.api_key = api_key
         self.request_delay = max(request_delay, self.MIN_REQUEST_INTERVAL)
         self.last_request_time = 0
+        self.session = http_sessions.shared('massive')
         self.request_count = 0
         
         if not api_key:
@@ -61,13 +65,8 @@ class MassiveAPIClient:
             logger.info(f"  請求間隔: {self.request_delay}秒")
     
     def _rate_limit(self):
-        """速率限制"""
-        elapsed = time.time() - self.last_request_time
-        if elapsed < self.request_delay:
-            sleep_time = self.request_delay - elapsed
-            logger.debug(f"  速率限制延遲: {sleep_time:.2f}秒")
-            time.sleep(sleep_time)
-        
+        """速率限制（共享令牌桶）"""
+        rate_limiters.get('massive', default_interval=self.request_delay).acquire()
         self.last_request_time = time.time()
         self.request_count += 1
     
@@ -102,20 +101,21 @@ class MassiveAPIClient:
             logger.debug(f"  請求 Massive API: {endpoint}")
             
             if method == 'GET':
-                response = requests.get(
+                response = self.session.get(
                     url,
                     headers=headers,
                     params=params,
                     timeout=30
                 )
             else:
-                response = requests.post(
+                response = self.session.post(
                     url,
                     headers=headers,
                     json=params,
                     timeout=30
                 )
             
+            rate_limiters.get('massive').on_response(response.status_code)
             response.raise_for_status()
             data = response.json()
             
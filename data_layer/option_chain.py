@@ -0,0 +1,363 @@
+# data_layer/option_chain.py
+"""
+緊湊、不可變的期權鏈容器（按列存儲）
+
+main.py 與 Module 22 / 25 / 26 / 32 原先各自轉換同一條期權鏈:
+- DataFrame.to_dict('records') → list of dicts（Module 22、25、用戶行使價查找各一次）
+- 由 list of dicts 重建 DataFrame（Module 22 內 UOA / 高級指標、Module 32）
+- 逐行線性掃描找最接近 / 指定行使價（next(...)、idxmin、dict 遍歷）
+
+OptionChain 在 DataFetcher 輸出之後構建一次，各模塊共用:
+- 每列一個只讀 NumPy 數組：行使價 float64，價格 / IV / Greeks float32，成交量 / OI int32，
+  其他列（contractSymbol、data_quality 等）保持原樣
+- 行按 (right, expiry, strike) 排序，按 right / 到期日取子鏈都是連續切片（零拷貝視圖）
+- 精確行使價查找為 dict 查表，最近行使價查找為 searchsorted
+- to_frame() 直接包裝列數組構建 DataFrame（不複製），records() 只轉換需要的行
+
+使用示例:
+    >>> chain = OptionChain.coerce(analysis_data['option_chain'], ticker='SPY', expiration='2026-03-20')
+    >>> calls = chain.select('C')
+    >>> atm = calls.nearest(current_price)
+    >>> calls.row(atm)['bid']
+    >>> calls.to_frame()
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+RIGHTS = ('C', 'P')
+SIDE_KEYS = {'C': 'calls', 'P': 'puts'}
+
+# 行使價保持 float64（作為查找鍵），其餘數值列按精度需要壓縮
+STRIKE_COLUMN = 'strike'
+FLOAT32_COLUMNS = (
+    'lastPrice', 'bid', 'ask', 'markPrice', 'mid', 'change', 'percentChange',
+    'impliedVolatility', 'delta', 'gamma', 'theta', 'vega',
+)
+INT32_COLUMNS = ('volume', 'openInterest')
+
+# 行使價查找鍵精度（與原先 abs(strike - x) < 0.01 的匹配一致）
+STRIKE_DECIMALS = 2
+
+
+def _right_code(value: Any) -> str:
+    """'call' / 'C' / 'calls' → 'C'，'put' / 'P' / 'puts' → 'P'"""
+    text = str(value or '').strip().upper()
+    if text.startswith('C'):
+        return 'C'
+    if text.startswith('P'):
+        return 'P'
+    raise ValueError(f"無效的期權類型: {value!r}")
+
+
+def _frame(data: Any) -> pd.DataFrame:
+    if data is None:
+        return pd.DataFrame()
+    if isinstance(data, pd.DataFrame):
+        return data
+    return pd.DataFrame(list(data))
+
+
+def _compact(name: str, series: pd.Series) -> np.ndarray:
+    """按列名選擇存儲類型（無法解析的數值置為 NaN / 0）"""
+    if name == STRIKE_COLUMN:
+        return pd.to_numeric(series, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    if name in FLOAT32_COLUMNS:
+        return pd.to_numeric(series, errors='coerce').to_numpy(dtype=np.float32, na_value=np.nan)
+    if name in INT32_COLUMNS:
+        values = pd.to_numeric(series, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        values = np.nan_to_num(values, nan=0.0, posinf=0.0, neginf=0.0)
+        info = np.iinfo(np.int32)
+        return np.clip(values, info.min, info.max).astype(np.int32)
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(object)
+    return series.to_numpy()
+
+
+def _py(value: Any) -> Any:
+    """NumPy 標量 → Python 標量（float32 取最短表示，0.35 不會變成 0.3499999940395355）"""
+    if isinstance(value, np.float32):
+        return float(str(value))
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _readonly(array: np.ndarray) -> np.ndarray:
+    array.flags.writeable = False
+    return array
+
+
+@dataclass(frozen=True, eq=False)
+class OptionChain:
+    """
+    不可變期權鏈
+
+    屬性:
+        columns: 列名 → 只讀數組（與原 DataFrame 的列名相同，不含 right / expiry）
+        rights: 每行的期權類型 'C' / 'P'
+        expiries: 每行的到期日 YYYY-MM-DD（未知時為空字符串）
+        ticker: 股票代碼
+    """
+    columns: Mapping[str, np.ndarray]
+    rights: np.ndarray
+    expiries: np.ndarray
+    ticker: str = ''
+    _groups: Dict[Tuple[str, str], Tuple[int, int]] = field(init=False, repr=False)
+    _index: Dict[Tuple[str, Optional[str], float], int] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        groups: Dict[Tuple[str, str], Tuple[int, int]] = {}
+        index: Dict[Tuple[str, Optional[str], float], int] = {}
+        n = len(self.rights)
+        if n:
+            keys = np.char.add(self.rights.astype('U1'), self.expiries.astype('U10'))
+            change = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+            bounds = np.concatenate(([0], change, [n]))
+            for start, stop in zip(bounds[:-1], bounds[1:]):
+                groups[(str(self.rights[start]), str(self.expiries[start]))] = (int(start), int(stop))
+
+            strikes = np.round(self.strikes, STRIKE_DECIMALS).tolist()
+            for i, (right, expiry, strike) in enumerate(zip(self.rights.tolist(), self.expiries.tolist(), strikes)):
+                index.setdefault((right, expiry, strike), i)
+                index.setdefault((right, None, strike), i)
+        object.__setattr__(self, '_groups', groups)
+        object.__setattr__(self, '_index', index)
+
+    # ------------------------------------------------------------------
+    # 構建
+    # ------------------------------------------------------------------
+    @classmethod
+    def from_frames(
+        cls,
+        calls: Any = None,
+        puts: Any = None,
+        ticker: str = '',
+        expiration: str = ''
+    ) -> 'OptionChain':
+        """
+        由 calls / puts（DataFrame 或 list of dicts）構建
+
+        帶 'expiration' 列的數據按行使用該列，否則使用 expiration 參數。
+        行使價缺失的行被丟棄。
+        """
+        parts = []
+        for right, data in (('C', calls), ('P', puts)):
+            df = _frame(data)
+            if df.empty or STRIKE_COLUMN not in df.columns:
+                continue
+            if 'expiration' in df.columns:
+                expiries = df['expiration'].astype(str).str.slice(0, 10).to_numpy(dtype='U10')
+                df = df.drop(columns=['expiration'])
+            else:
+                expiries = np.full(len(df), str(expiration or '')[:10], dtype='U10')
+            parts.append((right, df, expiries))
+
+        names: List[str] = []
+        for _, df, _ in parts:
+            names.extend(str(c) for c in df.columns if str(c) not in names)
+
+        if not parts:
+            return cls.empty(ticker)
+
+        arrays: Dict[str, List[np.ndarray]] = {name: [] for name in names}
+        rights, expiries = [], []
+        for right, df, side_expiries in parts:
+            df = df.rename(columns=str)
+            for name in names:
+                if name in df.columns:
+                    arrays[name].append(_compact(name, df[name]))
+                else:
+                    arrays[name].append(_compact(name, pd.Series(np.nan, index=df.index)))
+            rights.append(np.full(len(df), right, dtype='U1'))
+            expiries.append(side_expiries)
+
+        merged = {name: np.concatenate(chunks) if len(chunks) > 1 else chunks[0] for name, chunks in arrays.items()}
+        rights = np.concatenate(rights)
+        expiries = np.concatenate(expiries)
+
+        strikes = merged[STRIKE_COLUMN]
+        keep = ~np.isnan(strikes)
+        order = np.lexsort((strikes, expiries, rights))
+        order = order[keep[order]]
+        columns = {name: _readonly(values[order]) for name, values in merged.items()}
+        return cls(columns=columns, rights=_readonly(rights[order]), expiries=_readonly(expiries[order]), ticker=ticker)
+
+    @classmethod
+    def empty(cls, ticker: str = '') -> 'OptionChain':
+        return cls(
+            columns={STRIKE_COLUMN: _readonly(np.empty(0, dtype=np.float64))},
+            rights=_readonly(np.empty(0, dtype='U1')),
+            expiries=_readonly(np.empty(0, dtype='U10')),
+            ticker=ticker
+        )
+
+    @classmethod
+    def coerce(cls, option_chain: Any, ticker: str = '', expiration: str = '') -> 'OptionChain':
+        """
+        接受 OptionChain 或舊格式 {'calls': ..., 'puts': ...}（DataFrame / list of dicts）
+        """
+        if isinstance(option_chain, OptionChain):
+            return option_chain
+        if not option_chain:
+            return cls.empty(ticker)
+        return cls.from_frames(
+            option_chain.get('calls'),
+            option_chain.get('puts'),
+            ticker=ticker or option_chain.get('ticker', '') or '',
+            expiration=expiration or option_chain.get('expiration', '') or ''
+        )
+
+    def _derive(self, rows: Any, columns: Optional[Mapping[str, np.ndarray]] = None) -> 'OptionChain':
+        """切片 rows 為視圖，索引數組會複製"""
+        source = columns if columns is not None else self.columns
+        return OptionChain(
+            columns={name: _readonly(values[rows]) for name, values in source.items()},
+            rights=_readonly(self.rights[rows]),
+            expiries=_readonly(self.expiries[rows]),
+            ticker=self.ticker
+        )
+
+    def with_columns(self, **arrays: Any) -> 'OptionChain':
+        """
+        返回替換 / 新增列後的新鏈（數組須按本鏈行順序對齊），其他列共用內存
+        """
+        columns = dict(self.columns)
+        for name, values in arrays.items():
+            values = np.asarray(values)
+            if len(values) != len(self):
+                raise ValueError(f"列 {name} 長度 {len(values)} 與期權鏈 {len(self)} 不一致")
+            columns[name] = _readonly(_compact(name, pd.Series(values)))
+        return OptionChain(columns=columns, rights=self.rights, expiries=self.expiries, ticker=self.ticker)
+
+    # ------------------------------------------------------------------
+    # 視圖
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self.rights)
+
+    @property
+    def strikes(self) -> np.ndarray:
+        return self.columns[STRIKE_COLUMN]
+
+    @property
+    def expirations(self) -> List[str]:
+        return sorted({expiry for _, expiry in self._groups})
+
+    @property
+    def calls(self) -> 'OptionChain':
+        return self.select('C')
+
+    @property
+    def puts(self) -> 'OptionChain':
+        return self.select('P')
+
+    def count(self, right: Optional[str] = None, expiry: Optional[str] = None) -> int:
+        return self._size(self._rows(right, expiry))
+
+    def _size(self, rows) -> int:
+        return len(range(*rows.indices(len(self)))) if isinstance(rows, slice) else len(rows)
+
+    def _rows(self, right: Optional[str] = None, expiry: Optional[str] = None):
+        """slice（連續行）或行號數組"""
+        if right is None and expiry is None:
+            return slice(0, len(self))
+        code = _right_code(right) if right is not None else None
+        spans = [span for (r, e), span in self._groups.items()
+                 if (code is None or r == code) and (expiry is None or e == expiry)]
+        if not spans:
+            return slice(0, 0)
+        spans.sort()
+        if all(spans[i][1] == spans[i + 1][0] for i in range(len(spans) - 1)):
+            return slice(spans[0][0], spans[-1][1])
+        return np.concatenate([np.arange(start, stop) for start, stop in spans])
+
+    def select(self, right: Optional[str] = None, expiry: Optional[str] = None) -> 'OptionChain':
+        """
+        按期權類型 / 到期日取子鏈
+
+        right 單獨或與 expiry 一起指定時行連續，子鏈共用內存；
+        只指定 expiry 時 calls 與 puts 不連續，列會被複製。
+        """
+        rows = self._rows(right, expiry)
+        if isinstance(rows, slice) and rows == slice(0, len(self)):
+            return self
+        return self._derive(rows)
+
+    def column(self, name: str, right: Optional[str] = None, expiry: Optional[str] = None) -> np.ndarray:
+        """取列（視圖）；不存在的列返回 NaN 數組"""
+        rows = self._rows(right, expiry)
+        values = self.columns.get(name)
+        if values is None:
+            return np.full(self._size(rows), np.nan, dtype=np.float32)
+        return values[rows]
+
+    # ------------------------------------------------------------------
+    # 查找
+    # ------------------------------------------------------------------
+    def index(self, strike: float, right: str, expiry: Optional[str] = None) -> Optional[int]:
+        """精確行使價（到 0.01）的行號；未指定 expiry 時取最近到期日"""
+        return self._index.get((_right_code(right), expiry, round(float(strike), STRIKE_DECIMALS)))
+
+    def nearest(self, strike: float, right: Optional[str] = None, expiry: Optional[str] = None) -> Optional[int]:
+        """最接近 strike 的行號（距離相同時取較低行使價）；無數據時返回 None"""
+        rows = self.nearest_many([strike], right, expiry)
+        return int(rows[0]) if len(rows) else None
+
+    def nearest_many(self, targets: Iterable[float], right: Optional[str] = None,
+                     expiry: Optional[str] = None) -> np.ndarray:
+        """向量化最近行使價查找，返回每個目標的行號"""
+        targets = np.asarray(list(targets), dtype=np.float64)
+        rows = self._rows(right, expiry)
+        if isinstance(rows, slice):
+            start, stop, _ = rows.indices(len(self))
+            rows = np.arange(start, stop)
+        if not len(rows) or not len(targets):
+            return np.empty(0, dtype=np.intp)
+
+        strikes = self.strikes[rows]
+        if len(strikes) > 1 and np.any(np.diff(strikes) < 0):
+            # 跨到期日時行使價不單調，按行使價重排
+            order = np.argsort(strikes, kind='stable')
+            rows, strikes = rows[order], strikes[order]
+
+        upper = np.clip(np.searchsorted(strikes, targets, side='left'), 0, len(strikes) - 1)
+        lower = np.clip(upper - 1, 0, len(strikes) - 1)
+        take_lower = np.abs(targets - strikes[lower]) <= np.abs(strikes[upper] - targets)
+        return rows[np.where(take_lower, lower, upper)]
+
+    # ------------------------------------------------------------------
+    # 轉換
+    # ------------------------------------------------------------------
+    def row(self, i: int) -> Dict[str, Any]:
+        """單行 → dict（與 DataFrame.to_dict('records') 的鍵相同）"""
+        return {name: _py(values[i]) for name, values in self.columns.items()}
+
+    def records(self, start: int = 0, stop: Optional[int] = None) -> List[Dict[str, Any]]:
+        """行 [start, stop) → list of dicts；只轉換需要的行"""
+        stop = len(self) if stop is None else min(stop, len(self))
+        return [self.row(i) for i in range(max(0, start), stop)]
+
+    def to_frame(self, right: Optional[str] = None, expiry: Optional[str] = None) -> pd.DataFrame:
+        """
+        構建 DataFrame（right 單獨或與 expiry 一起指定時不複製列數組）
+
+        列數組只讀；pandas Copy-on-Write 下對返回的 DataFrame 寫入會先複製該列。
+        """
+        chain = self.select(right, expiry)
+        return pd.DataFrame(dict(chain.columns), copy=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """舊格式 {'calls': DataFrame, 'puts': DataFrame}"""
+        return {
+            'calls': self.to_frame('C'),
+            'puts': self.to_frame('P'),
+            'ticker': self.ticker,
+            'expirations': self.expirations,
+        }
@@ -0,0 +1,263 @@
+# data_layer/option_chain_normalizer.py
+"""
+期權鏈向量化標準化管道
+
+DataFetcher.get_option_chain 原先逐行處理期權鏈:
+- IV 標準化：Series.apply(IVNormalizer.normalize)，每行一次函數調用與一條日誌
+- bid/ask 估算：_fill_missing_bid_ask 以 iterrows() 逐行調用 BidAskEstimator
+- 夜盤 / 盤前流動性檢查：逐行調用 quote_passes_liquidity_check
+- IBKR OPRA 報價整合：_merge_ibkr_opra_with_yahoo 以 iterrows() 逐行寫回
+
+SPY / QQQ 等大型期權鏈（數百至上千行）上這些步驟耗時以數十至數百毫秒計。
+OptionChainNormalizer 把它們合併為一次列運算:
+1. IV 單位識別與縮放（0 < IV < 1 視為小數，×100；負數 / NaN 置為 NaN）
+2. IBKR 報價整合：按 (strike, right) 索引對齊後按列覆蓋（bid/ask > 0 才覆蓋）
+3. bid/ask 估算：缺失或 ≤0 的行按 BidAskEstimator 規則向量化填補
+4. 時段流動性檢查：夜盤 / 盤前不合格的行標記 data_quality = 'low_liquidity'
+
+每條抓取到的期權鏈只經過一次 normalize_chain()，處理統計見 NormalizationReport。
+
+使用示例:
+    >>> normalizer = OptionChainNormalizer(iv_format='auto', fill_bid_ask=True)
+    >>> calls, puts, reports = normalizer.normalize_chain(calls, puts, ticker='SPY', quotes=opra_quotes)
+    >>> reports['calls'].to_dict()
+"""
+
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+try:
+    from utils.validation import BidAskEstimator
+except ImportError:
+    BidAskEstimator = None
+
+try:
+    from data_layer.session_utils import get_session_type, liquidity_check_mask
+    SESSION_UTILS_AVAILABLE = True
+except ImportError:
+    SESSION_UTILS_AVAILABLE = False
+
+# IV 單位識別（與 IVNormalizer.normalize 相同）
+IV_DECIMAL_THRESHOLD = 1.0
+IV_ABNORMAL_THRESHOLD = 100.0
+
+# 需要做流動性檢查的時段
+STRICT_SESSIONS = ('overnight', 'premarket')
+
+QUOTE_COLUMNS = ('bid', 'ask', 'volume', 'mid')
+
+
+@dataclass
+class NormalizationReport:
+    """單側期權鏈的標準化統計"""
+    side: str
+    rows: int = 0
+    iv_scaled: int = 0            # 小數格式轉為百分比的行數
+    iv_invalid: int = 0           # 負數 / 無法解析的 IV（置為 NaN）
+    iv_abnormal: int = 0          # > 100% 的 IV（保留原值）
+    quotes_merged: int = 0        # 由 IBKR 報價覆蓋 bid/ask 的行數
+    bid_ask_estimated: int = 0    # 估算填補 bid/ask 的行數
+    low_liquidity: int = 0        # 標記 low_liquidity 的行數
+    elapsed_ms: float = 0.0
+    warnings: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def normalize_iv_values(values) -> Tuple[np.ndarray, Dict[str, int]]:
+    """
+    向量化 IV 標準化（規則同 IVNormalizer.normalize）
+
+    返回:
+        (百分比格式數組, {'scaled', 'invalid', 'abnormal'} 計數)
+    """
+    raw = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=np.float64)
+    missing = np.isnan(raw)
+    invalid = ~missing & (raw < 0)
+    decimal = (raw > 0) & (raw < IV_DECIMAL_THRESHOLD)
+    iv = np.where(decimal, raw * 100, raw)
+    iv[invalid] = np.nan
+    counts = {
+        'scaled': int(decimal.sum()),
+        'invalid': int(invalid.sum()),
+        'abnormal': int((iv > IV_ABNORMAL_THRESHOLD).sum())
+    }
+    return iv, counts
+
+
+def _float_column(df: pd.DataFrame, name: str) -> np.ndarray:
+    if name not in df.columns:
+        return np.full(len(df), np.nan)
+    return pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=np.float64)
+
+
+def _label(df: pd.DataFrame, column: str, mask: np.ndarray, value: str):
+    """按掩碼寫入標籤列（兼容 _optimize_dataframe_memory 轉成的 categorical 列）"""
+    if column not in df.columns:
+        df[column] = None
+    elif isinstance(df[column].dtype, pd.CategoricalDtype) and value not in df[column].cat.categories:
+        df[column] = df[column].cat.add_categories([value])
+    df.loc[mask, column] = value
+
+
+def merge_quotes(df: pd.DataFrame, quotes: Optional[pd.DataFrame], right: str) -> np.ndarray:
+    """
+    用 IBKR 報價按 (strike, right) 覆蓋期權鏈的 bid/ask/volume/mid（原地修改）
+
+    bid / ask 只在報價 > 0 時覆蓋；volume / mid 非空即覆蓋。
+    返回被覆蓋 bid 或 ask 的行掩碼（這些行標記 bid_ask_source = 'ibkr_opra'）。
+    """
+    merged = np.zeros(len(df), dtype=bool)
+    if quotes is None or quotes.empty or df.empty or 'strike' not in df.columns:
+        return merged
+
+    quotes = quotes.assign(strike=quotes['strike'].astype(float).round(4))
+    if 'right' not in quotes.columns:
+        quotes = quotes.assign(right=right)
+    indexed = quotes.drop_duplicates(['strike', 'right'], keep='last').set_index(['strike', 'right'])
+    keys = pd.MultiIndex.from_arrays([df['strike'].astype(float).round(4).to_numpy(), np.full(len(df), right)])
+    aligned = indexed.reindex(keys)
+
+    for column in QUOTE_COLUMNS:
+        if column not in aligned.columns:
+            continue
+        incoming = pd.to_numeric(aligned[column], errors='coerce').to_numpy(dtype=np.float64)
+        use = np.nan_to_num(incoming) > 0 if column in ('bid', 'ask') else ~np.isnan(incoming)
+        if not use.any():
+            continue
+        df[column] = np.where(use, incoming, _float_column(df, column))
+        if column in ('bid', 'ask'):
+            merged |= use
+
+    if merged.any():
+        _label(df, 'bid_ask_source', merged, 'ibkr_opra')
+    return merged
+
+
+class OptionChainNormalizer:
+    """
+    期權鏈標準化管道（一次列運算完成 IV / 報價整合 / bid-ask 估算 / 流動性檢查）
+
+    參數:
+        iv_format: 'auto' 按值識別小數 / 百分比（Yahoo 等）；'percentage' 已是百分比不縮放（IBKR）
+        fill_bid_ask: 是否估算缺失的 bid/ask
+        session: 市場時段（None 時按當前時間判斷）；夜盤 / 盤前才做流動性檢查
+        liquidity_check: 是否做時段流動性檢查
+    """
+
+    def __init__(self, iv_format: str = 'auto', fill_bid_ask: bool = True,
+                 session: Optional[str] = None, liquidity_check: bool = True):
+        self.iv_format = iv_format
+        self.fill_bid_ask = fill_bid_ask and BidAskEstimator is not None
+        if session is None:
+            session = get_session_type() if SESSION_UTILS_AVAILABLE else 'primary'
+        self.session = session
+        self.liquidity_check = liquidity_check and SESSION_UTILS_AVAILABLE
+
+    def normalize(self, df: pd.DataFrame, option_type: str, ticker: str = '',
+                  quotes: Optional[pd.DataFrame] = None) -> Tuple[pd.DataFrame, NormalizationReport]:
+        """
+        標準化單側期權鏈
+
+        參數:
+            df: 期權 DataFrame（不修改原對象）
+            option_type: 'call' 或 'put'
+            ticker: 股票代碼（日誌用）
+            quotes: IBKR 報價（列: strike, bid, ask, volume, mid，可選 right）
+
+        返回:
+            (標準化後的 DataFrame, NormalizationReport)
+        """
+        started = time.perf_counter()
+        side = 'calls' if option_type.lower().startswith('c') else 'puts'
+        report = NormalizationReport(side=side, rows=len(df))
+        if df.empty:
+            return df, report
+        df = df.copy()
+        right = 'C' if side == 'calls' else 'P'
+
+        # 1. IV 單位識別與縮放
+        if self.iv_format == 'auto' and 'impliedVolatility' in df.columns:
+            iv, counts = normalize_iv_values(df['impliedVolatility'])
+            df['impliedVolatility'] = iv
+            report.iv_scaled, report.iv_invalid, report.iv_abnormal = \
+                counts['scaled'], counts['invalid'], counts['abnormal']
+            if counts['invalid'] or counts['abnormal']:
+                logger.warning(f"! {ticker} {side} IV: {counts['invalid']} 個無效值, "
+                               f"{counts['abnormal']} 個 > {IV_ABNORMAL_THRESHOLD:.0f}%")
+
+        # 2. IBKR 報價整合
+        report.quotes_merged = int(merge_quotes(df, quotes, right).sum())
+
+        # 3. bid/ask 估算
+        if self.fill_bid_ask:
+            report.bid_ask_estimated = self._fill_bid_ask(df)
+
+        # 4. 時段流動性檢查
+        if self.liquidity_check and self.session in STRICT_SESSIONS \
+                and 'bid' in df.columns and 'ask' in df.columns:
+            passed = liquidity_check_mask(
+                _float_column(df, 'bid'), _float_column(df, 'ask'),
+                np.nan_to_num(_float_column(df, 'bidSize')), np.nan_to_num(_float_column(df, 'askSize')),
+                session=self.session
+            )
+            low = ~passed
+            report.low_liquidity = int(low.sum())
+            if report.low_liquidity:
+                _label(df, 'data_quality', low, 'low_liquidity')
+                opt_label = 'Call' if side == 'calls' else 'Put'
+                report.warnings.append(
+                    f"{opt_label}: {report.low_liquidity}/{len(df)} 個行使價在 {self.session} 時段"
+                    f"報價質量不足 (Spread>1%)，已標記 low_liquidity"
+                )
+
+        report.elapsed_ms = round((time.perf_counter() - started) * 1000, 3)
+        return df, report
+
+    def _fill_bid_ask(self, df: pd.DataFrame) -> int:
+        bid, ask = _float_column(df, 'bid'), _float_column(df, 'ask')
+        needs = ~(np.nan_to_num(bid) > 0) | ~(np.nan_to_num(ask) > 0)
+        if not needs.any():
+            return 0
+        price = _float_column(df, 'lastPrice')
+        if 'last' in df.columns:
+            price = np.where(np.nan_to_num(price) > 0, price, _float_column(df, 'last'))
+        estimated = BidAskEstimator.estimate_bid_ask_arrays(
+            price, _float_column(df, 'openInterest'), _float_column(df, 'volume')
+        )
+        fill = needs & estimated['valid']
+        if fill.any():
+            df['bid'] = np.where(fill, estimated['bid'], bid)
+            df['ask'] = np.where(fill, estimated['ask'], ask)
+            df['bid_ask_estimated'] = fill if 'bid_ask_estimated' not in df.columns \
+                else df['bid_ask_estimated'].fillna(False).astype(bool).to_numpy() | fill
+        return int(fill.sum())
+
+    def normalize_chain(self, calls: pd.DataFrame, puts: pd.DataFrame, ticker: str = '',
+                        quotes: Optional[Dict[str, pd.DataFrame]] = None
+                        ) -> Tuple[pd.DataFrame, pd.DataFrame, Dict[str, NormalizationReport]]:
+        """
+        標準化整條期權鏈（calls 與 puts 各一次）
+
+        參數:
+            quotes: {'calls': DataFrame, 'puts': DataFrame} IBKR 報價（可選）
+        """
+        quotes = quotes or {}
+        calls, call_report = self.normalize(calls, 'call', ticker, quotes.get('calls'))
+        puts, put_report = self.normalize(puts, 'put', ticker, quotes.get('puts'))
+        reports = {'calls': call_report, 'puts': put_report}
+        changed = {name: sum(getattr(r, name) for r in reports.values())
+                   for name in ('iv_scaled', 'quotes_merged', 'bid_ask_estimated', 'low_liquidity')}
+        logger.info(f"* {ticker} 期權鏈標準化完成: {len(calls)}+{len(puts)} 行, "
+                    f"IV 縮放 {changed['iv_scaled']}, IBKR 報價 {changed['quotes_merged']}, "
+                    f"估算 bid/ask {changed['bid_ask_estimated']}, 低流動性 {changed['low_liquidity']} "
+                    f"({call_report.elapsed_ms + put_report.elapsed_ms:.1f} ms)")
+        return calls, puts, reports
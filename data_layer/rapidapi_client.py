@@ -18,6 +18,9 @@ import pandas as pd
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 
+from data_layer.http_session import http_sessions
+from data_layer.utils.rate_limiter import rate_limiters
+
 logger = logging.getLogger(__name__)
 
 
@@ -96,6 +99,7 @@ class RapidAPIClient:
         self.host = host
         self.request_delay = request_delay
         self.last_request_time = 0
+        self.session = http_sessions.shared('rapidapi')
         
         # 初始化速率限制追蹤器
         self.rate_limiter = RateLimitTracker(limit=monthly_limit)
@@ -109,10 +113,8 @@ class RapidAPIClient:
         logger.info(f"* RapidAPI 客戶端已初始化 (限制: {monthly_limit}/月)")
     
     def _rate_limit_delay(self) -> None:
-        """請求速率限制"""
-        elapsed = time.time() - self.last_request_time
-        if elapsed < self.request_delay:
-            time.sleep(self.request_delay - elapsed)
+        """請求速率限制（共享令牌桶）"""
+        rate_limiters.get('rapidapi', default_interval=self.request_delay).acquire()
         self.last_request_time = time.time()
     
     def _make_request(
@@ -144,12 +146,13 @@ class RapidAPIClient:
         
         try:
             logger.debug(f"RapidAPI request: {url}")
-            response = requests.get(
+            response = self.session.get(
                 url,
                 headers=self.headers,
                 params=params,
                 timeout=10
             )
+            rate_limiters.get('rapidapi').on_response(response.status_code)
             response.raise_for_status()
             
             # 記錄請求
@@ -13,6 +13,7 @@ Session Definitions (Eastern Time):
 """
 
 from datetime import datetime, time
+import numpy as np
 import pytz
 from typing import Literal, Optional, Union
 
@@ -151,6 +152,46 @@ def quote_passes_liquidity_check(
     return True, ""
 
 
+def liquidity_check_mask(
+    bid,
+    ask,
+    bid_size=0,
+    ask_size=0,
+    dt: Optional[datetime] = None,
+    min_size: int = 5,
+    session: Optional[SessionType] = None,
+) -> np.ndarray:
+    """
+    Vectorized ``quote_passes_liquidity_check`` over whole quote columns.
+
+    ``session`` overrides the session derived from ``dt`` (for chains
+    captured earlier than they are checked).
+
+    Returns
+    -------
+    np.ndarray[bool]
+        True where the quote passes. Missing (NaN) prices count as invalid
+        quotes; missing sizes count as zero.
+    """
+    session = session or get_session_type(dt)
+    threshold = PRIMARY_SPREAD_THRESHOLD if session == "primary" else OVERNIGHT_SPREAD_THRESHOLD
+    bid = np.nan_to_num(np.asarray(bid, dtype=np.float64))
+    ask = np.nan_to_num(np.asarray(ask, dtype=np.float64))
+
+    passed = (bid > 0) & (ask > 0) & (ask >= bid)
+    mid = (bid + ask) / 2.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        spread_pct = np.where(passed, (ask - bid) / mid, 0.0)
+    passed &= spread_pct <= threshold
+
+    if session in ("premarket", "overnight"):
+        bid_size = np.nan_to_num(np.broadcast_to(np.asarray(bid_size, dtype=np.float64), bid.shape))
+        ask_size = np.nan_to_num(np.broadcast_to(np.asarray(ask_size, dtype=np.float64), bid.shape))
+        passed &= (bid_size >= min_size) & (ask_size >= min_size)
+
+    return passed
+
+
 def label_data_with_session(data: dict, dt: Optional[datetime] = None) -> dict:
     """
     Inject ``session_type`` and ``is_overnight`` keys into an existing data dict.
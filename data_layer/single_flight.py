@@ -0,0 +1,215 @@
+# data_layer/single_flight.py
+"""
+相同數據請求合併（single-flight）
+
+Web API、掃描器自動觸發的深度分析與 CLI 同時分析同一隻股票時，
+各自的 DataFetcher 實例會重複請求相同的報價、期權鏈與歷史數據。
+
+本模塊在進程內按 (數據類型, 股票代碼, 參數) 合併並發請求:
+- 第一個調用者（leader）實際執行請求
+- 同一時間的其他調用者（線程或 asyncio 協程）等待並共享 leader 的結果
+- 完成後在短暫的新鮮窗口內直接返回該結果
+- 每個調用者（包括 leader）拿到的是 dict / list / DataFrame 的淺拷貝，修改頂層不影響其他調用者
+- 異常會傳遞給所有等待者，且不會進入新鮮窗口
+
+合併比例 = 被合併的請求數 / 總請求數，可通過 stats() 查看。
+"""
+
+import asyncio
+import functools
+import inspect
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def _share(result: Any) -> Any:
+    """返回給調用者的淺拷貝，避免調用方修改頂層結構互相影響"""
+    if isinstance(result, dict):
+        return dict(result)
+    if isinstance(result, list):
+        return list(result)
+    if isinstance(result, (pd.DataFrame, pd.Series)):
+        # Copy-on-Write 下淺拷貝共享底層數據，寫入時才複製
+        return result.copy(deep=False)
+    return result
+
+
+class SingleFlight:
+    """
+    進程內請求合併器（線程與 asyncio 通用）
+
+    使用示例:
+    >>> flight = SingleFlight(freshness_seconds=2.0)
+    >>> quote = flight.do(('quote', 'AAPL'), lambda: client.get_quote('AAPL'))
+    >>> bars = await flight.do_async(('bars', 'AAPL'), lambda: client.get_bars_async('AAPL'))
+    """
+
+    def __init__(self, freshness_seconds: float = 2.0):
+        self.freshness_seconds = freshness_seconds
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._fresh: Dict[Hashable, Tuple[float, Any]] = {}
+        self._stats = {'requests': 0, 'executions': 0, 'joined': 0, 'fresh_hits': 0}
+
+    def _claim(self, key: Hashable) -> Tuple[Optional[Future], bool, Any]:
+        """
+        返回 (future, 是否 leader, 新鮮結果)；新鮮結果命中時 future 為 None
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._stats['requests'] += 1
+            fresh = self._fresh.get(key)
+            if fresh is not None:
+                if now - fresh[0] <= self.freshness_seconds:
+                    self._stats['fresh_hits'] += 1
+                    return None, False, fresh[1]
+                del self._fresh[key]
+
+            future = self._inflight.get(key)
+            if future is not None:
+                self._stats['joined'] += 1
+                return future, False, None
+
+            future = Future()
+            self._inflight[key] = future
+            self._stats['executions'] += 1
+            return future, True, None
+
+    def _settle(self, key: Hashable, future: Future, result: Any = None, error: BaseException = None):
+        with self._lock:
+            self._inflight.pop(key, None)
+            if error is None and result is not None and self.freshness_seconds > 0:
+                self._fresh[key] = (time.monotonic(), result)
+                if len(self._fresh) > 1024:
+                    self._purge_expired()
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _purge_expired(self):
+        cutoff = time.monotonic() - self.freshness_seconds
+        for key in [k for k, (ts, _) in self._fresh.items() if ts < cutoff]:
+            del self._fresh[key]
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """
+        同步執行（或加入正在進行的）請求
+
+        參數:
+            key: 請求鍵，例如 ('option_chain', 'AAPL', '2026-01-16')
+            func: 無參數的數據獲取函數
+
+        返回:
+            請求結果（每個調用者得到頂層淺拷貝）
+        """
+        future, leader, fresh = self._claim(key)
+        if future is None:
+            return _share(fresh)
+        if not leader:
+            return _share(future.result())
+
+        try:
+            result = func()
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, result)
+        return _share(result)
+
+    async def do_async(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        異步執行（或加入正在進行的）請求，等待時不阻塞事件循環
+
+        可以加入由其他線程發起的同鍵請求，反之亦然。
+        """
+        future, leader, fresh = self._claim(key)
+        if future is None:
+            return _share(fresh)
+        if not leader:
+            return _share(await asyncio.wrap_future(future))
+
+        try:
+            result = await func()
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, result)
+        return _share(result)
+
+    def forget(self, key: Hashable):
+        """丟棄某個鍵的新鮮結果（例如數據已知過期）"""
+        with self._lock:
+            self._fresh.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """請求合併統計"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['inflight'] = len(self._inflight)
+        coalesced = stats['joined'] + stats['fresh_hits']
+        stats['coalesced'] = coalesced
+        stats['coalescing_ratio'] = round(coalesced / stats['requests'], 4) if stats['requests'] else 0.0
+        return stats
+
+
+_default_flight: Optional[SingleFlight] = None
+_default_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """進程內共享的請求合併器（所有 DataFetcher 實例共用）"""
+    global _default_flight
+    with _default_lock:
+        if _default_flight is None:
+            from config.settings import settings
+            _default_flight = SingleFlight(settings.SINGLE_FLIGHT_FRESHNESS_SECONDS)
+        return _default_flight
+
+
+def coalesced(data_type: str):
+    """
+    方法裝飾器：按 (data_type, 參數) 合併並發的相同請求
+
+    被裝飾的方法以綁定後的參數（默認值已補齊、ticker 統一為大寫）組成請求鍵（不包含 self），
+    因此 'aapl' 與 'AAPL'、位置與關鍵字傳參，以及不同 DataFetcher 實例的相同請求都會被合併。
+    """
+    def wrap(method):
+        signature = inspect.signature(method)
+
+        def key_for(*args, **kwargs) -> Tuple:
+            bound = signature.bind(None, *args, **kwargs)
+            bound.apply_defaults()
+            arguments = []
+            for name, value in list(bound.arguments.items())[1:]:
+                if signature.parameters[name].kind is inspect.Parameter.VAR_KEYWORD:
+                    arguments.extend(sorted(value.items()))
+                else:
+                    arguments.append((name, value))
+            return (data_type,) + tuple(
+                (name, value.strip().upper() if name == 'ticker' and isinstance(value, str) else value)
+                for name, value in arguments
+            )
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            from config.settings import settings
+            if not settings.SINGLE_FLIGHT_ENABLED:
+                return method(self, *args, **kwargs)
+            try:
+                key = key_for(*args, **kwargs)
+                hash(key)
+            except TypeError:
+                # 參數不可哈希（例如傳入 DataFrame）或與簽名不符時不合併
+                return method(self, *args, **kwargs)
+            return get_single_flight().do(key, lambda: method(self, *args, **kwargs))
+
+        return wrapper
+    return wrap
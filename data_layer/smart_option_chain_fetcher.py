@@ -7,19 +7,265 @@
 - simple: 簡單策略（Long Call/Put, Short Call/Put）- 只獲取ATM
 - spread: 價差策略（Bull/Bear Spread, Iron Condor）- 獲取ATM ± 10%
 - advanced: 高級分析（Greeks分析, Option Flow）- 獲取所有流動性好的期權
+- adaptive: 自適應 - 按歷史記錄預測每個到期日實際需要的行使價（見 plan_strikes）
 
 性能提升:
 - simple策略：減少90%的API調用（1個行使價 vs 50個）
 - spread策略：減少70%的API調用（5-10個 vs 50個）
 - advanced策略：減少30%的API調用（只獲取流動性好的）
+
+自適應規劃:
+StrikeUsageHistory 按 (標的, 到期天數分組) 記錄每個 moneyness 區間（log(K/S)，2.5% 一格）
+- 被觀察次數 / 有成交量或未平倉量的次數（IBKR 快照後 record_liquidity）
+- 被分析模塊實際使用的次數（Module 22/25/26 完成後 record_usage）
+計數按指數衰減，記錄持久化到 JSON。長期未被獲取的分桶觀察計數衰減到 min_evidence 以下後
+視為「未知」：不再憑舊的流動性比例撐大區間；緊鄰區間的未知分桶會被順帶探測一次以重新確認。
+plan_strikes 取「有流動性或被使用過」的連續區間，
+加上 ATM 核心行使價與邊緣餘量；沒有足夠歷史時返回全部候選行使價（與原行為相同）。
+第一輪快照後 refine_strikes 檢查邊緣：邊緣行使價仍有流動性時向外補取一次。
 """
 
+import json
 import logging
-from typing import List, Dict, Optional, Tuple
-from dataclasses import dataclass
+import math
+import os
+import threading
+from datetime import datetime
+from typing import Any, Iterable, List, Dict, Optional, Tuple
+from dataclasses import dataclass, field
 
 logger = logging.getLogger(__name__)
 
+# moneyness 分桶寬度（log(K/S)）
+MONEYNESS_BIN_WIDTH = 0.025
+
+# 到期天數分組：週期權 / 月期權 / 遠期（遠月期權的流動性區間更寬）
+DTE_BUCKETS = ((10, 'weekly'), (60, 'monthly'))
+
+
+def dte_bucket(days_to_expiration: Optional[float]) -> str:
+    """到期天數 → 分組名"""
+    if days_to_expiration is None:
+        return 'monthly'
+    for limit, name in DTE_BUCKETS:
+        if days_to_expiration <= limit:
+            return name
+    return 'leaps'
+
+
+def days_until(expiration: str) -> Optional[int]:
+    """YYYY-MM-DD / YYYYMMDD → 距今自然日數（無法解析時返回 None）"""
+    text = str(expiration or '').replace('-', '')[:8]
+    try:
+        return (datetime.strptime(text, '%Y%m%d').date() - datetime.now().date()).days
+    except ValueError:
+        return None
+
+
+def moneyness_bin(strike: float, spot: float) -> int:
+    return int(round(math.log(strike / spot) / MONEYNESS_BIN_WIDTH))
+
+
+class StrikeUsageHistory:
+    """
+    每個標的的行使價流動性與使用歷史（moneyness 分桶）
+
+    參數:
+        path: JSON 持久化文件路徑（None 時只在內存中記錄）
+        decay: 每次新記錄前舊計數的衰減係數
+        min_volume / min_oi: 視為有流動性的門檻（任一達標即可，與 Module 22 相同）
+    """
+
+    def __init__(self, path: Optional[str] = None, decay: float = 0.9,
+                 min_volume: int = 10, min_oi: int = 100):
+        self.path = path
+        self.decay = decay
+        self.min_volume = min_volume
+        self.min_oi = min_oi
+        self._lock = threading.Lock()
+        # key -> {'bins': {bin: [observed, liquid, used]}, 'observations': float, 'updated': str}
+        # observed / liquid 按快照計：每次快照每個分桶 observed +1，liquid + 桶內有流動性行使價的比例
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._load()
+
+    # ------------------------------------------------------------------
+    # 持久化
+    # ------------------------------------------------------------------
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.debug(f"行使價使用歷史讀取失敗: {e}")
+            return
+        logger.info(f"* 載入行使價使用歷史: {len(self._entries)} 個標的/到期分組")
+
+    def _save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = json.dumps(self._entries)
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.debug(f"行使價使用歷史保存失敗: {e}")
+
+    @staticmethod
+    def _key(ticker: str, days_to_expiration: Optional[float]) -> str:
+        return f"{ticker.upper()}|{dte_bucket(days_to_expiration)}"
+
+    def _entry(self, key: str) -> Dict[str, Any]:
+        return self._entries.setdefault(key, {'bins': {}, 'observations': 0.0, 'updated': ''})
+
+    # ------------------------------------------------------------------
+    # 記錄
+    # ------------------------------------------------------------------
+
+    def record_liquidity(self, ticker: str, days_to_expiration: Optional[float], spot: float,
+                         quotes: Dict[float, Dict[str, Any]]):
+        """
+        記錄一次快照觀察到的各行使價流動性
+
+        參數:
+            quotes: {strike: {'volume': ..., 'openInterest': ...}}（Call/Put 取較大值）
+        """
+        if spot <= 0 or not quotes:
+            return
+        key = self._key(ticker, days_to_expiration)
+        with self._lock:
+            entry = self._entry(key)
+            for counts in entry['bins'].values():
+                counts[0] *= self.decay
+                counts[1] *= self.decay
+            entry['observations'] = entry['observations'] * self.decay + 1
+            # 每個分桶每次快照記一次觀察，流動性記為該桶內有流動性行使價的比例，
+            # 觀察計數因此等於「衰減後看到該分桶的快照數」，與行使價密度無關
+            seen: Dict[str, List[int]] = {}
+            for strike, quote in quotes.items():
+                if strike <= 0:
+                    continue
+                tally = seen.setdefault(str(moneyness_bin(strike, spot)), [0, 0])
+                tally[0] += 1
+                tally[1] += self.is_liquid(quote)
+            for name, (total, liquid) in seen.items():
+                counts = entry['bins'].setdefault(name, [0.0, 0.0, 0.0])
+                counts[0] += 1
+                counts[1] += liquid / total
+            entry['updated'] = datetime.now().isoformat(timespec='seconds')
+        self._save()
+
+    def record_usage(self, ticker: str, days_to_expiration: Optional[float], spot: float,
+                     strikes: Iterable[float]):
+        """記錄分析模塊實際使用的行使價"""
+        strikes = {float(k) for k in strikes if k and k > 0}
+        if spot <= 0 or not strikes:
+            return
+        key = self._key(ticker, days_to_expiration)
+        with self._lock:
+            entry = self._entry(key)
+            for counts in entry['bins'].values():
+                counts[2] *= self.decay
+            for strike in strikes:
+                counts = entry['bins'].setdefault(str(moneyness_bin(strike, spot)), [0.0, 0.0, 0.0])
+                counts[2] += 1
+            entry['updated'] = datetime.now().isoformat(timespec='seconds')
+        self._save()
+
+    def is_liquid(self, quote: Dict[str, Any]) -> bool:
+        def number(value):
+            try:
+                value = float(value or 0)
+            except (TypeError, ValueError):
+                return 0.0
+            return 0.0 if math.isnan(value) else value
+        return number(quote.get('volume')) >= self.min_volume or number(quote.get('openInterest')) >= self.min_oi
+
+    # ------------------------------------------------------------------
+    # 查詢
+    # ------------------------------------------------------------------
+
+    def band(self, ticker: str, days_to_expiration: Optional[float], min_observations: float = 2,
+             min_liquid_rate: float = 0.3, min_usage: float = 0.5,
+             min_evidence: float = 0.5) -> Optional[Tuple[float, float]]:
+        """
+        需要獲取的 moneyness 區間 (log(K/S) 下限, 上限)
+
+        區間覆蓋所有「流動性比例 ≥ min_liquid_rate」或「衰減後使用次數 ≥ min_usage」的分桶
+        （包括 ATM），中間不留空缺。觀察計數衰減到 min_evidence 以下的分桶視為未知：
+        不參與流動性判斷；緊鄰區間兩端的未知分桶併入區間以便重新觀察。
+        觀察次數不足時返回 None。
+        """
+        with self._lock:
+            entry = self._entries.get(self._key(ticker, days_to_expiration))
+            if not entry or entry['observations'] < min_observations:
+                return None
+            wanted = [0]
+            unknown = set()
+            for name, (observed, liquid, used) in entry['bins'].items():
+                if used >= min_usage or (observed >= min_evidence and liquid / observed >= min_liquid_rate):
+                    wanted.append(int(name))
+                elif observed < min_evidence:
+                    unknown.add(int(name))
+        low, high = min(wanted), max(wanted)
+        low -= (low - 1) in unknown
+        high += (high + 1) in unknown
+        return (low - 0.5) * MONEYNESS_BIN_WIDTH, (high + 0.5) * MONEYNESS_BIN_WIDTH
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'tickers': len({key.split('|')[0] for key in self._entries}),
+            }
+
+
+_default_history: Optional[StrikeUsageHistory] = None
+_default_lock = threading.Lock()
+
+
+def get_strike_usage_history() -> StrikeUsageHistory:
+    """進程內共享的行使價使用歷史（IBKRClient 記錄流動性，main.py 記錄模塊使用）"""
+    global _default_history
+    with _default_lock:
+        if _default_history is None:
+            from config.settings import settings
+            path = os.path.join(settings.CACHE_DIR, 'strike_usage.json') if settings.STRIKE_PLANNER_ENABLED else None
+            _default_history = StrikeUsageHistory(path)
+        return _default_history
+
+
+@dataclass
+class StrikePlan:
+    """單個到期日的行使價獲取計劃"""
+    ticker: str
+    expiration: str
+    spot: float
+    strikes: List[float]  # 第一輪獲取的行使價
+    candidates: List[float]  # 全部候選行使價（已排序）
+    source: str  # 'history' | 'cold_start'
+    band: Optional[Tuple[float, float]] = None  # 預測的 moneyness 區間
+    refined: List[float] = field(default_factory=list)  # 第二輪補取的行使價
+
+    def to_dict(self) -> Dict:
+        fetched = len(self.strikes) + len(self.refined)
+        return {
+            'ticker': self.ticker,
+            'expiration': self.expiration,
+            'source': self.source,
+            'candidates': len(self.candidates),
+            'planned': len(self.strikes),
+            'refined': len(self.refined),
+            'band': [round(b, 4) for b in self.band] if self.band else None,
+            'reduction_percentage': round((1 - fetched / len(self.candidates)) * 100, 2) if self.candidates else 0.0
+        }
+
 
 @dataclass
 class OptionChainConfig:
@@ -79,19 +325,43 @@ class SmartOptionChainFetcher:
             'min_volume': 10,
             'min_oi': 100,
             'expected_reduction': 30
+        },
+        'adaptive': {
+            'description': '自適應（按歷史流動性與模塊使用預測）',
+            'method': 'history',
+            'core_strikes': 5,  # ATM 上下各至少保留的行使價數
+            'margin_strikes': 2,  # 預測區間外各多取的行使價數
+            'refine_strikes': 4,  # 邊緣仍有流動性時每側補取的行使價數
+            'min_observations': 2,  # 啟用預測所需的（衰減後）觀察次數
+            'min_liquid_rate': 0.3,
+            'expected_reduction': 50
         }
     }
     
-    def __init__(self):
-        """初始化智能期權鏈獲取器"""
+    def __init__(self, history: Optional[StrikeUsageHistory] = None):
+        """
+        初始化智能期權鏈獲取器
+        
+        參數:
+            history: 行使價使用歷史（adaptive 策略使用；None 時使用進程內共享實例）
+        """
+        self._history = history
         logger.info("* 智能期權鏈獲取器已初始化")
     
+    @property
+    def history(self) -> StrikeUsageHistory:
+        if self._history is None:
+            self._history = get_strike_usage_history()
+        return self._history
+    
     def get_strikes_config(
         self,
         current_price: float,
         all_strikes: List[float],
         strategy_type: str = 'simple',
-        option_data: Optional[Dict] = None
+        option_data: Optional[Dict] = None,
+        ticker: Optional[str] = None,
+        expiration: Optional[str] = None
     ) -> OptionChainConfig:
         """
         獲取期權鏈配置
@@ -99,8 +369,10 @@ class SmartOptionChainFetcher:
         參數:
             current_price: 當前股價
             all_strikes: 所有可用的行使價列表
-            strategy_type: 策略類型（'simple' | 'spread' | 'advanced'）
+            strategy_type: 策略類型（'simple' | 'spread' | 'advanced' | 'adaptive'）
             option_data: 期權數據（用於advanced策略的流動性篩選）
+            ticker: 股票代碼（adaptive 策略，或 advanced 策略缺少期權數據時按歷史預測）
+            expiration: 到期日 YYYY-MM-DD（adaptive 策略）
         
         返回:
             OptionChainConfig: 包含要獲取的行使價列表和統計信息
@@ -127,6 +399,11 @@ class SmartOptionChainFetcher:
                     range_pct=self.STRATEGY_CONFIGS['spread']['range_pct']
                 )
             
+            elif strategy_type == 'adaptive' or (strategy_type == 'advanced' and option_data is None and ticker):
+                strikes_to_fetch = self.plan_strikes(
+                    ticker or '', expiration or '', current_price, all_strikes
+                ).strikes
+            
             elif strategy_type == 'advanced':
                 strikes_to_fetch = self._fetch_liquid_only(
                     all_strikes,
@@ -267,6 +544,80 @@ class SmartOptionChainFetcher:
         
         return sorted(liquid_strikes)
     
+    def plan_strikes(
+        self,
+        ticker: str,
+        expiration: str,
+        current_price: float,
+        all_strikes: Iterable[float],
+        days_to_expiration: Optional[float] = None
+    ) -> StrikePlan:
+        """
+        策略4: 按歷史預測本次需要的最小行使價集合
+        
+        計劃 = 預測 moneyness 區間內的行使價 ∪ ATM 上下各 core_strikes 個，
+        區間外每側再多取 margin_strikes 個。歷史不足時返回全部候選（cold_start）。
+        
+        返回: StrikePlan
+        """
+        config = self.STRATEGY_CONFIGS['adaptive']
+        candidates = sorted({float(s) for s in all_strikes if s and s > 0})
+        if days_to_expiration is None:
+            days_to_expiration = days_until(expiration)
+        
+        band = None
+        if ticker and current_price > 0 and candidates:
+            band = self.history.band(
+                ticker, days_to_expiration,
+                min_observations=config['min_observations'],
+                min_liquid_rate=config['min_liquid_rate']
+            )
+        if band is None:
+            return StrikePlan(ticker, expiration, current_price, list(candidates), candidates, 'cold_start')
+        
+        lo = current_price * math.exp(band[0])
+        hi = current_price * math.exp(band[1])
+        inside = [i for i, strike in enumerate(candidates) if lo <= strike <= hi]
+        atm = min(range(len(candidates)), key=lambda i: abs(candidates[i] - current_price))
+        first = min([atm - config['core_strikes']] + inside[:1]) - config['margin_strikes']
+        last = max([atm + config['core_strikes']] + inside[-1:]) + config['margin_strikes']
+        strikes = candidates[max(0, first):last + 1]
+        
+        logger.debug(f"  自適應策略: {ticker} {expiration} ${lo:.2f} ~ ${hi:.2f}，"
+                     f"{len(candidates)} -> {len(strikes)} 個行使價")
+        return StrikePlan(ticker, expiration, current_price, strikes, candidates, 'history', band)
+    
+    def refine_strikes(self, plan: StrikePlan, quotes: Dict[float, Dict[str, Any]]) -> List[float]:
+        """
+        第一輪結果的邊緣檢查：計劃兩端的行使價仍有流動性時，向外補取 refine_strikes 個
+        
+        參數:
+            plan: plan_strikes 的結果
+            quotes: 第一輪獲取到的 {strike: {'volume', 'openInterest'}}
+        
+        返回: 需要第二輪獲取的行使價（不需要時為空列表）
+        """
+        if plan.source != 'history' or not plan.strikes:
+            return []
+        step = self.STRATEGY_CONFIGS['adaptive']['refine_strikes']
+        index = {strike: i for i, strike in enumerate(plan.candidates)}
+        extra: List[float] = []
+        
+        for edge, direction in ((plan.strikes[0], -1), (plan.strikes[-1], 1)):
+            quote = quotes.get(edge)
+            # 邊緣行使價無數據或無流動性：區間已足夠
+            if not quote or not self.history.is_liquid(quote):
+                continue
+            i = index[edge]
+            if direction < 0:
+                extra.extend(plan.candidates[max(0, i - step):i])
+            else:
+                extra.extend(plan.candidates[i + 1:i + 1 + step])
+        
+        if extra:
+            logger.info(f"  行使價計劃邊緣仍有流動性，補取 {len(extra)} 個行使價")
+        return sorted(extra)
+    
     def estimate_api_calls(
         self,
         strategy_type: str,
@@ -292,6 +643,8 @@ class SmartOptionChainFetcher:
             calls_after = max(5, int(total_strikes * 0.3))  # 約30%
         elif strategy_type == 'advanced':
             calls_after = max(30, int(total_strikes * 0.7))  # 約70%
+        elif strategy_type == 'adaptive':
+            calls_after = max(1, int(total_strikes * (1 - self.STRATEGY_CONFIGS['adaptive']['expected_reduction'] / 100)))
         else:
             calls_after = 1
         
@@ -0,0 +1,309 @@
+# data_layer/tick_ring_buffer.py
+"""
+Tick 環形緩衝區與事件驅動的 Tick 採集管道
+
+IBKRClient.req_tick_by_tick_data 是以 ib.sleep(0.02) 輪詢、逐個 yield Python 對象的生成器；
+LargeOrderDetector（模塊 35）、LiquidityMonitor（模塊 36）、DarkPoolDetector（模塊 38）
+各自維護按股票的列表與歷史。跟蹤十幾隻股票的全速 tick 時，對象分配與輪詢開銷隨 tick 數線性增長。
+
+本模塊:
+- TickRingBuffer：每隻股票預分配的 NumPy 列式環形緩衝區（成交：時間戳 / 價格 / 數量 / 交易所標誌；
+  報價：時間戳 / bid / ask / bid 量 / ask 量）。數組長度為容量的兩倍，每筆數據同時寫入 i 與 i+容量，
+  任意不超過容量的最近窗口都是一段連續切片——讀取是零拷貝視圖，寫入不分配內存
+- TradeView / QuoteView：窗口視圖，提供成交量、VWAP、暗池量等向量化統計，
+  供模塊 35/36/38 與 VWAP 分析器直接使用
+- TickPipeline：在 ib_insync Ticker.updateEvent 上把每批 tickByTicks 寫入緩衝區（不輪詢）
+
+內存固定為 股票數 × 容量 × 每筆字節數（默認 32768 筆 × 約 130 字節（含雙倍存儲）≈ 每隻股票 4 MB）。
+
+使用示例:
+    >>> pipeline = TickPipeline(ib, capacity=32768)
+    >>> pipeline.follow(Stock('NVDA', 'SMART', 'USD'))
+    >>> trades = pipeline.buffer('NVDA').last(seconds=300)
+    >>> trades.vwap(), trades.dark_volume()
+    >>> LargeOrderDetector().detect_from_trades('NVDA', trades)
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CAPACITY = 32768
+
+# 成交標誌位
+FLAG_DARK = 1            # FINRA ADF（exchange == 'D'），暗池 / 場外成交
+FLAG_UNREPORTED = 2      # tickAttribLast.unreported
+FLAG_PAST_LIMIT = 4      # tickAttribLast.pastLimit
+DARK_EXCHANGES = frozenset({'D'})
+
+
+def _epoch(value) -> float:
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if value is None:
+        return time.time()
+    return float(value)
+
+
+class _Columns:
+    """雙倍長度的列式環形存儲（寫入 i 與 i+capacity，窗口讀取恆為連續切片）"""
+
+    def __init__(self, capacity: int, dtypes: Dict[str, Any]):
+        self.capacity = int(capacity)
+        self.arrays = {name: np.zeros(2 * self.capacity, dtype=dtype) for name, dtype in dtypes.items()}
+        self.head = 0          # 下一個寫入位置（0..capacity-1）
+        self.count = 0         # 有效筆數（≤ capacity）
+        self.total = 0         # 累計寫入筆數
+
+    def append(self, values: tuple):
+        i = self.head
+        j = i + self.capacity
+        for array, value in zip(self.arrays.values(), values):
+            array[i] = value
+            array[j] = value
+        self.head = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self.total += 1
+
+    def span(self, n: Optional[int] = None) -> slice:
+        """最近 n 筆（默認全部有效數據）的連續切片"""
+        n = self.count if n is None else max(0, min(int(n), self.count))
+        # [head+capacity-n, head+capacity) 對應最近 n 次寫入（後半段是前半段的副本）
+        end = self.head + self.capacity
+        return slice(end - n, end)
+
+
+@dataclass(frozen=True)
+class TradeView:
+    """成交窗口視圖（numpy 切片，零拷貝；緩衝區寫滿一圈後舊視圖的最早數據會被覆蓋，應即取即用）"""
+    ts: np.ndarray
+    price: np.ndarray
+    size: np.ndarray
+    flags: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def since(self, ts: float) -> 'TradeView':
+        """時間戳 ≥ ts 的子視圖（時間戳單調，二分查找）"""
+        start = int(np.searchsorted(self.ts, ts, side='left'))
+        return TradeView(self.ts[start:], self.price[start:], self.size[start:], self.flags[start:])
+
+    def volume(self) -> float:
+        return float(self.size.sum())
+
+    def notional(self) -> np.ndarray:
+        return self.price * self.size
+
+    def vwap(self) -> float:
+        volume = self.size.sum()
+        return float(np.dot(self.price, self.size) / volume) if volume > 0 else 0.0
+
+    def dark_mask(self) -> np.ndarray:
+        return (self.flags & FLAG_DARK) != 0
+
+    def dark_volume(self) -> float:
+        return float(self.size[self.dark_mask()].sum())
+
+    def last_price(self) -> float:
+        return float(self.price[-1]) if len(self.price) else 0.0
+
+
+@dataclass(frozen=True)
+class QuoteView:
+    """報價窗口視圖"""
+    ts: np.ndarray
+    bid: np.ndarray
+    ask: np.ndarray
+    bid_size: np.ndarray
+    ask_size: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def since(self, ts: float) -> 'QuoteView':
+        start = int(np.searchsorted(self.ts, ts, side='left'))
+        return QuoteView(self.ts[start:], self.bid[start:], self.ask[start:],
+                         self.bid_size[start:], self.ask_size[start:])
+
+    def spread(self) -> np.ndarray:
+        return self.ask - self.bid
+
+    def mid(self) -> np.ndarray:
+        return (self.ask + self.bid) / 2
+
+
+class TickRingBuffer:
+    """
+    單隻股票的成交 / 報價環形緩衝區
+
+    參數:
+        symbol: 股票代碼
+        capacity: 成交與報價各自的容量（筆）
+    """
+
+    TRADE_DTYPES = {'ts': np.float64, 'price': np.float64, 'size': np.float64, 'flags': np.uint8}
+    QUOTE_DTYPES = {'ts': np.float64, 'bid': np.float64, 'ask': np.float64,
+                    'bid_size': np.float64, 'ask_size': np.float64}
+
+    def __init__(self, symbol: str, capacity: int = DEFAULT_CAPACITY):
+        self.symbol = symbol
+        self._trades = _Columns(capacity, self.TRADE_DTYPES)
+        self._quotes = _Columns(capacity, self.QUOTE_DTYPES)
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return self._trades.capacity
+
+    def add_trade(self, ts: float, price: float, size: float, flags: int = 0):
+        with self._lock:
+            self._trades.append((ts, price, size, flags))
+
+    def add_quote(self, ts: float, bid: float, ask: float, bid_size: float = 0.0, ask_size: float = 0.0):
+        with self._lock:
+            self._quotes.append((ts, bid, ask, bid_size, ask_size))
+
+    def trades(self, n: Optional[int] = None) -> TradeView:
+        """最近 n 筆成交（默認全部）"""
+        with self._lock:
+            s = self._trades.span(n)
+            a = self._trades.arrays
+            return TradeView(a['ts'][s], a['price'][s], a['size'][s], a['flags'][s])
+
+    def quotes(self, n: Optional[int] = None) -> QuoteView:
+        with self._lock:
+            s = self._quotes.span(n)
+            a = self._quotes.arrays
+            return QuoteView(a['ts'][s], a['bid'][s], a['ask'][s], a['bid_size'][s], a['ask_size'][s])
+
+    def last(self, seconds: float, now: Optional[float] = None) -> TradeView:
+        """最近 seconds 秒的成交"""
+        now = time.time() if now is None else now
+        return self.trades().since(now - seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'symbol': self.symbol,
+            'capacity': self.capacity,
+            'trades': self._trades.count,
+            'quotes': self._quotes.count,
+            'trades_total': self._trades.total,
+            'quotes_total': self._quotes.total,
+            'bytes': sum(a.nbytes for a in self._trades.arrays.values())
+                     + sum(a.nbytes for a in self._quotes.arrays.values())
+        }
+
+
+def trade_flags(tick) -> int:
+    """由 TickByTickAllLast 計算標誌位"""
+    flags = FLAG_DARK if (getattr(tick, 'exchange', '') or '') in DARK_EXCHANGES else 0
+    attrib = getattr(tick, 'tickAttribLast', None)
+    if attrib is not None:
+        if getattr(attrib, 'unreported', False):
+            flags |= FLAG_UNREPORTED
+        if getattr(attrib, 'pastLimit', False):
+            flags |= FLAG_PAST_LIMIT
+    return flags
+
+
+class TickPipeline:
+    """
+    事件驅動的 Tick 採集管道
+
+    每隻股票訂閱 reqTickByTickData（AllLast 與 BidAsk），在 Ticker.updateEvent 上
+    把本批 tickByTicks 寫入該股票的環形緩衝區。
+
+    參數:
+        ib: ib_insync.IB 實例
+        capacity: 每隻股票緩衝區容量
+        with_quotes: 是否同時訂閱 BidAsk
+    """
+
+    def __init__(self, ib, capacity: int = DEFAULT_CAPACITY, with_quotes: bool = True):
+        self.ib = ib
+        self.capacity = capacity
+        self.with_quotes = with_quotes
+        self._buffers: Dict[str, TickRingBuffer] = {}
+        self._subscriptions: Dict[str, Any] = {}   # symbol -> (contract, ticker, handler)
+        self._followed_at: Dict[str, float] = {}   # symbol -> 開始跟蹤的時間戳
+
+    def buffer(self, symbol: str) -> TickRingBuffer:
+        """股票的緩衝區（不存在時創建）"""
+        buf = self._buffers.get(symbol)
+        if buf is None:
+            buf = self._buffers[symbol] = TickRingBuffer(symbol, self.capacity)
+        return buf
+
+    def follow(self, contract) -> TickRingBuffer:
+        """開始跟蹤一隻股票（重複調用無副作用）"""
+        symbol = contract.symbol
+        buf = self.buffer(symbol)
+        if symbol in self._subscriptions:
+            return buf
+        ticker = self.ib.reqTickByTickData(contract, 'AllLast', 0, False)
+        if self.with_quotes:
+            self.ib.reqTickByTickData(contract, 'BidAsk', 0, False)
+        handler = lambda t, b=buf: self.ingest(b, t.tickByTicks)
+        ticker.updateEvent += handler
+        self._subscriptions[symbol] = (contract, ticker, handler)
+        self._followed_at[symbol] = time.time()
+        logger.info(f"* 開始 Tick 採集: {symbol} (容量 {self.capacity})")
+        return buf
+
+    def unfollow(self, symbol: str):
+        entry = self._subscriptions.pop(symbol, None)
+        self._followed_at.pop(symbol, None)
+        if entry is None:
+            return
+        contract, ticker, handler = entry
+        ticker.updateEvent -= handler
+        for tick_type in ('AllLast', 'BidAsk') if self.with_quotes else ('AllLast',):
+            try:
+                self.ib.cancelTickByTickData(contract, tick_type)
+            except Exception as e:
+                logger.debug(f"取消 Tick 訂閱失敗 {symbol}: {e}")
+
+    def close(self):
+        for symbol in list(self._subscriptions):
+            self.unfollow(symbol)
+
+    @staticmethod
+    def ingest(buf: TickRingBuffer, ticks) -> int:
+        """把一批 ib_insync tick 對象寫入緩衝區，返回寫入筆數"""
+        written = 0
+        for tick in ticks:
+            if hasattr(tick, 'bidPrice'):
+                buf.add_quote(_epoch(tick.time), tick.bidPrice, tick.askPrice, tick.bidSize, tick.askSize)
+            elif hasattr(tick, 'price'):
+                buf.add_trade(_epoch(tick.time), tick.price, tick.size, trade_flags(tick))
+            else:
+                continue
+            written += 1
+        return written
+
+    def symbols(self) -> List[str]:
+        return list(self._subscriptions)
+
+    def following_for(self, symbol: str, now: Optional[float] = None) -> float:
+        """已跟蹤的秒數（未跟蹤時為 0；緩衝區內只有這段時間的完整數據）"""
+        started = self._followed_at.get(symbol)
+        if started is None:
+            return 0.0
+        now = time.time() if now is None else now
+        return max(0.0, now - started)
+
+    def stats(self) -> Dict[str, Any]:
+        buffers = [buf.stats() for buf in self._buffers.values()]
+        return {
+            'followed': len(self._subscriptions),
+            'buffers': buffers,
+            'bytes': sum(b['bytes'] for b in buffers)
+        }
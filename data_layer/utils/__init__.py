@@ -5,6 +5,7 @@
 包含:
 - UserAgentRotator: User-Agent 輪換器
 - RetryHandler: 重試處理器
+- TokenBucket / rate_limiters: 按數據源共享的令牌桶速率限制
 - ConnectionConfig: 連接配置
 """
 
@@ -13,6 +14,7 @@ from typing import Tuple
 
 from .user_agent_rotator import UserAgentRotator
 from .retry_handler import RetryHandler, RetryConfig
+from .rate_limiter import RateLimiterRegistry, TokenBucket, rate_limiters
 
 
 @dataclass
@@ -64,6 +66,9 @@ __all__ = [
     'UserAgentRotator', 
     'RetryHandler', 
     'RetryConfig',
+    'TokenBucket',
+    'RateLimiterRegistry',
+    'rate_limiters',
     'ConnectionConfig',
     'DEFAULT_CONNECTION_CONFIG',
     'YAHOO_CONNECTION_CONFIG',
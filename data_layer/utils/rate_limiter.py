@@ -0,0 +1,246 @@
+# data_layer/utils/rate_limiter.py
+"""
+共享令牌桶速率限制器
+
+各 HTTP 客戶端原本各自用固定 time.sleep 控制請求間隔，
+既阻塞調用線程，也無法在多個線程 / 多個客戶端實例之間協調。
+
+本模塊按數據源（provider）維護一個進程內共享的令牌桶:
+- 速率與突發量來自 config/api_config.py 的 RATE_LIMITS
+- 預約式取令牌：每個調用者只等待自己的時間槽，多個線程並行等待而不是排隊串行睡眠
+- acquire_async() 供 asyncio 調用方使用，等待時不阻塞事件循環
+- on_response() 根據 RetryHandler 的狀態碼策略自適應退避：
+  429 時速率減半並暫停發放令牌，成功請求逐步恢復到配置速率
+
+使用示例:
+    >>> from data_layer.utils.rate_limiter import rate_limiters
+    >>> limiter = rate_limiters.get('finnhub')
+    >>> limiter.acquire()
+    >>> response = requests.get(url)
+    >>> limiter.on_response(response.status_code)
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from .retry_handler import RetryConfig, RetryHandler
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    線程與 asyncio 安全的令牌桶
+
+    參數:
+        provider: 數據源名稱（用於日誌與統計）
+        rate: 每秒補充的令牌數
+        burst: 桶容量（允許的突發請求數）
+        jitter: 每次等待額外加入的隨機抖動（以請求間隔的比例表示，0 表示不抖動）
+        min_rate: 自適應退避時的速率下限
+        retry_handler: 計算退避延遲的重試處理器
+    """
+
+    RECOVERY_STEP = 0.1  # 每次成功請求恢復配置速率的比例
+
+    def __init__(
+        self,
+        provider: str,
+        rate: float,
+        burst: int = 1,
+        jitter: float = 0.0,
+        min_rate: Optional[float] = None,
+        retry_handler: Optional[RetryHandler] = None
+    ):
+        if rate <= 0:
+            raise ValueError("令牌補充速率必須大於0")
+        self.provider = provider
+        self.base_rate = float(rate)
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self.jitter = max(0.0, float(jitter))
+        self.min_rate = float(min_rate) if min_rate else self.base_rate / 8
+        self.retry_handler = retry_handler or RetryHandler()
+
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._penalties = 0
+        self._stats = {'acquired': 0, 'waited': 0, 'wait_seconds': 0.0, 'rejected': 0, 'backoffs': 0}
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _reserve(self, tokens: float, timeout: Optional[float]) -> Optional[float]:
+        """預約令牌，返回需要等待的秒數；超過 timeout 時不預約並返回 None"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(0.0, (tokens - self._tokens) / self.rate, self._blocked_until - now)
+            if timeout is not None and wait > timeout:
+                self._stats['rejected'] += 1
+                return None
+            # 允許令牌為負：後來者的等待時間自然順延，各自並行等待
+            self._tokens -= tokens
+            self._stats['acquired'] += 1
+            if wait > 0:
+                if self.jitter:
+                    wait += random.uniform(0, self.jitter / self.rate)
+                self._stats['waited'] += 1
+                self._stats['wait_seconds'] += wait
+            return wait
+
+    def acquire(self, tokens: float = 1, timeout: Optional[float] = None) -> bool:
+        """
+        取得令牌（必要時等待自己的時間槽）
+
+        返回:
+            bool: 是否取得令牌（僅在指定 timeout 且需要等待更久時為 False）
+        """
+        wait = self._reserve(tokens, timeout)
+        if wait is None:
+            return False
+        if wait > 0:
+            logger.debug(f"速率限制 [{self.provider}]: 等待 {wait:.2f}s")
+            time.sleep(wait)
+        return True
+
+    async def acquire_async(self, tokens: float = 1, timeout: Optional[float] = None) -> bool:
+        """acquire 的異步版本，等待時讓出事件循環"""
+        wait = self._reserve(tokens, timeout)
+        if wait is None:
+            return False
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return True
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """非阻塞取令牌：只有當前就有可用令牌時才成功"""
+        return self._reserve(tokens, timeout=0.0) is not None
+
+    def on_response(self, status_code: Optional[int], retry_after: Optional[float] = None) -> float:
+        """
+        根據響應狀態碼調整速率
+
+        參數:
+            status_code: HTTP 狀態碼（None 表示網絡錯誤，不調整）
+            retry_after: 服務器返回的 Retry-After 秒數（可選）
+
+        返回:
+            float: 暫停發放令牌的秒數（0 表示未退避）
+        """
+        if status_code is None:
+            return 0.0
+        with self._lock:
+            if status_code < 400:
+                self._penalties = 0
+                if self.rate < self.base_rate:
+                    self.rate = min(self.base_rate, self.rate + self.base_rate * self.RECOVERY_STEP)
+                return 0.0
+
+            if not self.retry_handler.should_retry(status_code, 0):
+                return 0.0
+
+            self._penalties += 1
+            strategy = self.retry_handler.get_strategy_for_status(status_code)
+            delay = float(retry_after) if retry_after else self.retry_handler.calculate_delay(self._penalties, strategy)
+            if status_code == 429:
+                self.rate = max(self.min_rate, self.rate / 2)
+
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens = min(self._tokens, 0.0)
+            self._blocked_until = max(self._blocked_until, now + delay)
+            self._stats['backoffs'] += 1
+            self.retry_handler.record_attempt(self._penalties, status_code, delay, False)
+
+        logger.warning(
+            f"! {self.provider} 返回 HTTP {status_code}，暫停 {delay:.1f}s，速率調整為 {self.rate:.3f}/s"
+        )
+        return delay
+
+    def backoff(self, seconds: float):
+        """手動暫停發放令牌（例如重試前的退避）"""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + max(0.0, seconds))
+
+    def stats(self) -> Dict[str, Any]:
+        """令牌桶統計"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'rate': round(self.rate, 4),
+                'base_rate': self.base_rate,
+                'burst': self.burst,
+                'blocked_for': round(max(0.0, self._blocked_until - time.monotonic()), 2)
+            })
+        stats['wait_seconds'] = round(stats['wait_seconds'], 2)
+        return stats
+
+
+class RateLimiterRegistry:
+    """
+    按數據源共享的令牌桶註冊表
+
+    配置優先於客戶端傳入的默認間隔，確保同一數據源的所有客戶端實例共用一個配額。
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, Any]]] = None):
+        if limits is None:
+            from config.api_config import api_config
+            limits = api_config.RATE_LIMITS
+        self._limits = limits
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str, default_interval: Optional[float] = None) -> TokenBucket:
+        """
+        獲取數據源的令牌桶（首次調用時創建）
+
+        參數:
+            provider: 數據源名稱（RATE_LIMITS 的鍵）
+            default_interval: 未配置時使用的請求間隔（秒）
+        """
+        with self._lock:
+            bucket = self._buckets.get(provider)
+            if bucket is None:
+                bucket = self._create(provider, default_interval)
+                self._buckets[provider] = bucket
+            return bucket
+
+    def _create(self, provider: str, default_interval: Optional[float]) -> TokenBucket:
+        config = dict(self._limits.get(provider, {}))
+        if 'rate' not in config:
+            interval = default_interval if default_interval and default_interval > 0 else 1.0
+            config['rate'] = 1.0 / interval
+        backoff = config.get('backoff', {})
+        retry_handler = RetryHandler(RetryConfig(
+            initial_delay=backoff.get('initial_delay', 2.0),
+            max_delay=backoff.get('max_delay', 60.0),
+            retryable_status_codes=backoff.get('status_codes', [429, 500, 502, 503, 504])
+        ))
+        logger.debug(f"創建令牌桶 [{provider}]: {config['rate']:.3f}/s, 突發 {config.get('burst', 1)}")
+        return TokenBucket(
+            provider,
+            rate=config['rate'],
+            burst=config.get('burst', 1),
+            jitter=config.get('jitter', 0.0),
+            min_rate=config.get('min_rate'),
+            retry_handler=retry_handler
+        )
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """所有令牌桶的統計"""
+        with self._lock:
+            buckets = dict(self._buckets)
+        return {name: bucket.stats() for name, bucket in buckets.items()}
+
+
+# 進程內共享的註冊表
+rate_limiters = RateLimiterRegistry()
@@ -10,6 +10,8 @@ import requests
 from datetime import datetime
 from typing import Optional, Dict, Any
 
+from data_layer.http_session import http_sessions
+
 logger = logging.getLogger(__name__)
 
 
@@ -17,7 +19,7 @@ class YahooFinanceQuickClient:
     """快速修復版 Yahoo Finance 客戶端"""
     
     def __init__(self):
-        self.session = requests.Session()
+        self.session = http_sessions.new_session('yahoo', retries=0)
         self.last_request_time = 0
         self.request_delay = 8.0  # 8秒間隔
         
@@ -61,7 +63,7 @@ class YahooFinanceQuickClient:
         if self._request_count % 5 == 0:
             logger.info("  定期刷新 session...")
             self.session.close()
-            self.session = requests.Session()
+            self.session = http_sessions.new_session('yahoo', retries=0)
             self.session.headers.update({
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
                 'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -86,7 +88,7 @@ class YahooFinanceQuickClient:
                 logger.error("x 429 錯誤，清除 session 並重試")
                 self.session.close()
                 time.sleep(20)
-                self.session = requests.Session()
+                self.session = http_sessions.new_session('yahoo', retries=0)
                 response = self.session.get(url, timeout=15)
             
             response.raise_for_status()
@@ -123,7 +125,7 @@ class YahooFinanceQuickClient:
                 logger.error("x 429 錯誤，清除 session 並重試")
                 self.session.close()
                 time.sleep(20)
-                self.session = requests.Session()
+                self.session = http_sessions.new_session('yahoo', retries=0)
                 response = self.session.get(url, params=params, timeout=15)
             
             response.raise_for_status()
@@ -160,7 +162,7 @@ class YahooFinanceQuickClient:
                 logger.error("x 429 錯誤，清除 session 並重試")
                 self.session.close()
                 time.sleep(20)
-                self.session = requests.Session()
+                self.session = http_sessions.new_session('yahoo', retries=0)
                 response = self.session.get(url, params=params, timeout=15)
             
             response.raise_for_status()
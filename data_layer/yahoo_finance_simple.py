@@ -9,6 +9,8 @@ import requests
 from datetime import datetime
 from typing import Optional, Dict, Any
 
+from data_layer.http_session import http_sessions
+
 logger = logging.getLogger(__name__)
 
 
@@ -19,7 +21,7 @@ class YahooFinanceSimpleClient:
     """
     
     def __init__(self):
-        self.session = requests.Session()
+        self.session = http_sessions.new_session('yahoo', retries=0)
         self.last_request_time = 0
         self.request_delay = 8.0  # 8秒間隔
         
@@ -59,7 +61,7 @@ class YahooFinanceSimpleClient:
             if self._request_count % 5 == 0:
                 logger.info("  定期刷新 session...")
                 self.session.close()
-                self.session = requests.Session()
+                self.session = http_sessions.new_session('yahoo', retries=0)
                 self.session.headers.update({
                     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
                     'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -100,7 +102,7 @@ class YahooFinanceSimpleClient:
                 # 強制清除 session
                 self.session.close()
                 time.sleep(20)  # 等待更長時間
-                self.session = requests.Session()
+                self.session = http_sessions.new_session('yahoo', retries=0)
                 
                 # 重試一次
                 response = self.session.get(url, params=params, timeout=15)
@@ -122,7 +124,7 @@ class YahooFinanceSimpleClient:
                 logger.info("  檢測到 429，清除 session")
                 self.session.close()
                 time.sleep(20)
-                self.session = requests.Session()
+                self.session = http_sessions.new_session('yahoo', retries=0)
             return None
         except Exception as e:
             logger.error(f"Unexpected error for {symbol}: {e}")
@@ -154,7 +156,7 @@ class YahooFinanceSimpleClient:
                 logger.error("x 429 錯誤 - 強制清除 session")
                 self.session.close()
                 time.sleep(20)
-                self.session = requests.Session()
+                self.session = http_sessions.new_session('yahoo', retries=0)
                 
                 response = self.session.get(url, params=params, timeout=15)
             
@@ -173,7 +175,7 @@ class YahooFinanceSimpleClient:
             if "429" in str(e):
                 self.session.close()
                 time.sleep(20)
-                self.session = requests.Session()
+                self.session = http_sessions.new_session('yahoo', retries=0)
             return None
         except Exception as e:
             logger.error(f"Unexpected error for {symbol}: {e}")
@@ -200,7 +202,7 @@ class YahooFinanceSimpleClient:
                 logger.error("x 429 錯誤 - 強制清除 session")
                 self.session.close()
                 time.sleep(20)
-                self.session = requests.Session()
+                self.session = http_sessions.new_session('yahoo', retries=0)
                 
                 response = self.session.get(url, params=params, timeout=15)
             
@@ -219,7 +221,7 @@ class YahooFinanceSimpleClient:
             if "429" in str(e):
                 self.session.close()
                 time.sleep(20)
-                self.session = requests.Session()
+                self.session = http_sessions.new_session('yahoo', retries=0)
             return None
         except Exception as e:
             logger.error(f"Unexpected error for {symbol}: {e}")
@@ -16,11 +16,13 @@ import re
 from typing import Optional, Dict, Any, List
 from datetime import datetime, timedelta
 import requests
-from requests.adapters import HTTPAdapter
 
 # 導入優化工具
 from .utils.user_agent_rotator import UserAgentRotator
 from .utils.retry_handler import RetryHandler, RetryConfig
+from .utils.rate_limiter import rate_limiters
+from .http_session import http_sessions
+from .crumb_store import CrumbStore
 from .utils import ConnectionConfig, YAHOO_CONNECTION_CONFIG
 
 # 配置日志
@@ -38,25 +40,32 @@ class CrumbManager:
     2. 從頁面提取 (finance.yahoo.com/quote/AAPL)
     3. 從 consent 頁面獲取
     
+    配置 CrumbStore 時，有效的 crumb 與 cookies 會持久化並在進程間共享，
+    新進程可以直接使用而不必重新獲取。
+    
     Requirements: 2.1, 2.2, 2.3
     """
     
     # Crumb 有效期（默認 5 分鐘 - 避免 429 錯誤）
     CRUMB_TTL_MINUTES = 5
     
-    def __init__(self, session: requests.Session, ua_rotator: UserAgentRotator):
+    def __init__(self, session: requests.Session, ua_rotator: UserAgentRotator,
+                 store: Optional[CrumbStore] = None):
         """
         初始化 Crumb 管理器
         
         參數:
             session: requests.Session 實例（用於保持 cookies）
             ua_rotator: UserAgentRotator 實例
+            store: Crumb 持久化存儲（可選）
         """
         self.session = session
         self.ua_rotator = ua_rotator
+        self.store = store
         self._crumb: Optional[str] = None
         self._crumb_timestamp: Optional[datetime] = None
         self._consecutive_failures = 0
+        self._from_store = False
         
         logger.debug("CrumbManager 初始化完成")
     
@@ -90,6 +99,38 @@ class CrumbManager:
             logger.debug(f"使用緩存的 Crumb")
             return self._crumb
         
+        if self.store is None:
+            return self._fetch_crumb()
+        
+        if not force_refresh and self._load_from_store(lock=True):
+            return self._crumb
+        
+        # 持有文件鎖刷新：其他進程等待後直接使用本進程保存的結果
+        with self.store.locked():
+            if not force_refresh and self._load_from_store(lock=False):
+                return self._crumb
+            crumb = self._fetch_crumb()
+            if crumb:
+                self.store.save(crumb, self.session.cookies,
+                                self.session.headers.get('User-Agent'), lock=False)
+            return crumb
+    
+    def _load_from_store(self, lock: bool) -> bool:
+        """從持久化存儲載入 crumb 與 cookies（不發網絡請求，401 時再作廢）"""
+        entry = self.store.load(lock=lock)
+        if entry is None:
+            return False
+        CrumbStore.apply_cookies(self.session.cookies, entry)
+        if entry.get('user_agent'):
+            self.session.headers['User-Agent'] = entry['user_agent']
+        self._crumb = entry['crumb']
+        self._crumb_timestamp = datetime.now()
+        self._from_store = True
+        logger.info("* 使用持久化的 Crumb（跳過獲取流程）")
+        return True
+    
+    def _fetch_crumb(self) -> Optional[str]:
+        """依次嘗試各種方法獲取新的 Crumb"""
         logger.info("正在獲取新的 Crumb...")
         
         # 依次嘗試三種方法
@@ -106,6 +147,7 @@ class CrumbManager:
                     self._crumb = crumb
                     self._crumb_timestamp = datetime.now()
                     self._consecutive_failures = 0
+                    self._from_store = False
                     logger.info(f"* Crumb 獲取成功（方法: {method_name}）")
                     return crumb
                 else:
@@ -261,7 +303,12 @@ class CrumbManager:
         return True
     
     def invalidate(self) -> None:
-        """使當前 Crumb 失效（強制下次重新獲取）"""
+        """使當前 Crumb 失效（強制下次重新獲取，同時作廢持久化存儲中的同一 Crumb）"""
+        if self.store is not None and self._crumb:
+            try:
+                self.store.invalidate(self._crumb)
+            except OSError as e:
+                logger.debug(f"Crumb 存儲作廢失敗: {e}")
         self._crumb = None
         self._crumb_timestamp = None
         logger.debug("Crumb 已失效")
@@ -272,6 +319,7 @@ class CrumbManager:
             'has_crumb': self._crumb is not None,
             'is_expired': self._is_crumb_expired(),
             'consecutive_failures': self._consecutive_failures,
+            'from_store': self._from_store,
             'crumb_age_minutes': (
                 (datetime.now() - self._crumb_timestamp).total_seconds() / 60
                 if self._crumb_timestamp else None
@@ -322,20 +370,14 @@ class YahooFinanceV2Client:
         self.max_retries = max_retries
         self.last_request_time = 0
         
+        # 共享令牌桶（所有 Yahoo V2 客戶端共用配額）
+        self.rate_limiter = rate_limiters.get('yahoo_v2', default_interval=request_delay)
+        
         # 連接配置
         self.connection_config = connection_config or YAHOO_CONNECTION_CONFIG
         
-        # 创建 Session 以保持 cookies（配置連接池）
-        self.session = requests.Session()
-        
-        # 配置連接適配器（連接池復用）
-        adapter = HTTPAdapter(
-            pool_connections=self.connection_config.pool_connections,
-            pool_maxsize=self.connection_config.pool_maxsize,
-            max_retries=0  # 我們使用自己的重試邏輯
-        )
-        self.session.mount('http://', adapter)
-        self.session.mount('https://', adapter)
+        # 创建 Session 以保持 cookies（共享 keep-alive 連接池，我們使用自己的重試邏輯）
+        self.session = http_sessions.new_session('yahoo', self.connection_config, retries=0)
         
         # 會話創建時間（用於過期檢測）
         self._session_created_at = datetime.now()
@@ -377,7 +419,7 @@ class YahooFinanceV2Client:
         self.session.headers.update(self.headers)
         
         # 初始化 Crumb 管理器
-        self.crumb_manager = CrumbManager(self.session, self.ua_rotator)
+        self.crumb_manager = CrumbManager(self.session, self.ua_rotator, store=CrumbStore.default())
         
         # 兼容舊代碼的 crumb 屬性
         self.cookies = None
@@ -415,52 +457,30 @@ class YahooFinanceV2Client:
     
     def _rate_limit_delay(self) -> None:
         """
-        请求速率限制（帶隨機抖動）
+        请求速率限制（共享令牌桶，帶隨機抖動）
         
         添加隨機延遲可以避免被識別為爬蟲，因為真實用戶的請求間隔是不規則的。
-        這是避免 Yahoo Finance 429 錯誤的關鍵策略之一。
+        這是避免 Yahoo Finance 429 錯誤的關鍵策略之一（抖動比例見 api_config.RATE_LIMITS）。
         """
-        import random
-        
-        elapsed = time.time() - self.last_request_time
-        
-        # 基礎延遲 + 隨機抖動 (0-50% 的額外延遲)
-        jitter = random.uniform(0, self.request_delay * 0.5)
-        total_delay = self.request_delay + jitter
-        
-        if elapsed < total_delay:
-            sleep_time = total_delay - elapsed
-            logger.debug(f"速率限制: 等待 {sleep_time:.2f}s (基礎={self.request_delay}s, 抖動={jitter:.2f}s)")
-            time.sleep(sleep_time)
-        
+        self.rate_limiter.acquire()
         self.last_request_time = time.time()
     
     def _refresh_session(self) -> None:
         """
-        刷新 Session（清除 cookies 並重新建立連接）
+        刷新 Session（清除 cookies 與追蹤 headers）
+        
+        新 Session 仍使用共享連接池，已建立的 TCP/TLS 連接繼續復用。
         
         Requirements: 2.1
         """
         logger.info("刷新 Session...")
         
         try:
-            # 關閉舊的 session
+            # 清除舊 session 的 cookies（不關閉共享連接池）
             self.session.close()
             
             # 創建全新的 session（徹底清除所有 cookies）
-            self.session = requests.Session()
-            
-            # 清除所有可能的 cookies
-            self.session.cookies.clear()
-            
-            # 重新配置連接池
-            adapter = HTTPAdapter(
-                pool_connections=self.connection_config.pool_connections,
-                pool_maxsize=self.connection_config.pool_maxsize,
-                max_retries=self.connection_config.max_retries
-            )
-            self.session.mount('http://', adapter)
-            self.session.mount('https://', adapter)
+            self.session = http_sessions.new_session('yahoo', self.connection_config, retries=0)
             
             # 重新設置 headers（使用默認 User-Agent）
             self.session.headers.update(self.headers)
@@ -502,8 +522,8 @@ class YahooFinanceV2Client:
         # 強制刷新 session
         self._refresh_session()
         
-        # 等待更長時間
-        time.sleep(15)
+        # 暫停發放令牌（不阻塞當前線程，下一次 acquire 時等待）
+        self.rate_limiter.backoff(15)
         
         logger.info("  Session 已刷新，可以重試請求")
     
@@ -528,14 +548,8 @@ class YahooFinanceV2Client:
         base_delay = 2.0  # Base delay for exponential backoff
         
         try:
-            # 設置請求間隔以避免 429
-            elapsed = time.time() - getattr(self, '_last_request_time', 0)
-            if elapsed < 8.0:  # 8秒間隔
-                wait_time = 8.0 - elapsed
-                logger.info(f"  等待 {wait_time:.1f} 秒避免 429 錯誤...")
-                time.sleep(wait_time)
-            
-            self._last_request_time = time.time()
+            # 設置請求間隔以避免 429（共享令牌桶）
+            self._rate_limit_delay()
             
             # 添加 crumb 到參數（所有 V1/V2 API 都需要）
             if hasattr(self, 'crumb_manager'):
@@ -561,21 +575,27 @@ class YahooFinanceV2Client:
             )
             
             # Task 16.2: Handle 429 errors with exponential backoff
+            retry_after = response.headers.get('Retry-After')
+            self.rate_limiter.on_response(
+                response.status_code,
+                float(retry_after) if isinstance(retry_after, str) and retry_after.isdigit() else None
+            )
+            # 401: crumb / cookies 已失效（包括持久化的），作廢後重新獲取並重試
+            if response.status_code == 401 and hasattr(self, 'crumb_manager') and retry_count < self.max_retries:
+                logger.warning("! HTTP 401 - Crumb 已失效，重新獲取後重試")
+                self.crumb_manager.invalidate()
+                return self._make_request(endpoint, params, retry_count + 1, use_v2)
+            
             if response.status_code == 429:
                 logger.error(f"x HTTP 429 - Too Many Requests: {endpoint}")
                 
                 if retry_count < self.max_retries:
-                    # Calculate exponential backoff delay
-                    delay = min(base_delay * (2 ** retry_count), 60)
-                    logger.warning(f"Rate limit hit, retrying in {delay}s... (attempt {retry_count + 1}/{self.max_retries})")
+                    logger.warning(f"Rate limit hit, retrying after limiter backoff... (attempt {retry_count + 1}/{self.max_retries})")
                     
                     # Refresh session to clear tracking
                     self._handle_429_error(endpoint)
                     
-                    # Wait with exponential backoff
-                    time.sleep(delay)
-                    
-                    # Retry
+                    # Retry（令牌桶已暫停發放，重試時自動等待）
                     return self._make_request(endpoint, params, retry_count + 1, use_v2)
                 else:
                     logger.error("x 已達到最大重試次數，放棄請求")
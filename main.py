@@ -63,9 +63,12 @@ if sys.platform == 'win32':
 logger = logging.getLogger(__name__)
 
 # 導入模塊
+import numpy as np
+
 from config.settings import settings
 from data_layer.data_fetcher import DataFetcher
 from data_layer.data_validator import DataValidator
+from data_layer.option_chain import OptionChain
 from calculation_layer.module1_support_resistance import SupportResistanceCalculator
 from calculation_layer.module2_fair_value import FairValueCalculator
 from calculation_layer.module3_arbitrage_spread import ArbitrageSpreadCalculator
@@ -98,6 +101,7 @@ from calculation_layer.module23_dynamic_iv_threshold import DynamicIVThresholdCa
 from calculation_layer.module24_technical_direction import TechnicalDirectionAnalyzer
 # Module 25: 波動率微笑分析
 from calculation_layer.module25_volatility_smile import VolatilitySmileAnalyzer
+from calculation_layer.sabr_calibrator import SABRCalibrator
 # Module 26: Long 期權成本效益分析
 from calculation_layer.module26_long_option_analysis import LongOptionAnalyzer
 # Module 27: 多到期日比較
@@ -162,6 +166,9 @@ class OptionsAnalysisSystem:
         # 初始化歷史管理器和差異分析器
         self.history_manager = HistoryManager(self.output_manager)
         self.delta_analyzer = DeltaAnalyzer()
+        
+        # SABR 校準器（Module 22/25 共用，參數持久化到緩存目錄）
+        self.sabr_calibrator = SABRCalibrator()
         self.analysis_results = {}
     
     def validate_data_completeness(self, data: dict, required_fields: list) -> dict:
@@ -567,26 +574,15 @@ class OptionsAnalysisSystem:
             selected_strike = atm_strike
             
             option_chain = analysis_data.get('option_chain', {})
-            calls_df = option_chain.get('calls', [])
-            puts_df = option_chain.get('puts', [])
+            # 期權鏈只轉換一次為按列存儲的 OptionChain，後續 Module 22/25/26/32 共用
+            chain_arrays = OptionChain.coerce(option_chain, ticker=ticker, expiration=expiration or '')
             
             if strike is not None and strike > 0:
                 logger.info(f"  用戶指定行使價: ${strike}")
-                # 轉換為列表格式以便搜尋
-                import pandas as pd
-                calls_list = calls_df.to_dict('records') if hasattr(calls_df, 'to_dict') else (list(calls_df) if calls_df else [])
-                puts_list = puts_df.to_dict('records') if hasattr(puts_df, 'to_dict') else (list(puts_df) if puts_df else [])
-                
-                # 確保每個元素都是字典
-                if calls_list and isinstance(calls_list[0], dict):
-                    found_call = next((c for c in calls_list if abs(c.get('strike', 0) - strike) < 0.01), None)
-                else:
-                    found_call = None
-                
-                if puts_list and isinstance(puts_list[0], dict):
-                    found_put = next((p for p in puts_list if abs(p.get('strike', 0) - strike) < 0.01), None)
-                else:
-                    found_put = None
+                call_row = chain_arrays.index(strike, 'C')
+                put_row = chain_arrays.index(strike, 'P')
+                found_call = chain_arrays.row(call_row) if call_row is not None else None
+                found_put = chain_arrays.row(put_row) if put_row is not None else None
                 
                 if found_call and found_put:
                     selected_call = found_call
@@ -2201,13 +2197,9 @@ class OptionsAnalysisSystem:
                                 if iv_rank_value is not None and (iv_rank_value > 70 or iv_rank_value < 30):
                                     module14_result['total_alerts'] = module14_result.get('total_alerts', 0) + 1
                                     # 重新計算風險等級
-                                    alerts = module14_result['total_alerts']
-                                    if alerts >= 4:
-                                        module14_result['risk_level'] = "高風險"
-                                    elif alerts >= 2:
-                                        module14_result['risk_level'] = "中風險"
-                                    else:
-                                        module14_result['risk_level'] = "低風險"
+                                    module14_result['risk_level'] = MonitoringPostsCalculator.risk_level_from_alerts(
+                                        module14_result['total_alerts']
+                                    )
                                 
                                 logger.info(f"  崗位13整合完成: IV Rank {iv_rank_value}% - {iv_rank_result['status']}")
                         except Exception as e:
@@ -2687,10 +2679,31 @@ class OptionsAnalysisSystem:
                     'reason': str(exc)
                 }
             
+            # 當前到期日的 SABR 先於 Module 22 校準：Module 22 查詢的模型 IV 來自本次期權鏈，
+            # Module 25 使用同一分析器實例，直接復用校準結果。
+            # 校準使用原始 IV（缺失時由 _extract_iv_data 按買賣中間價估算或剔除），
+            # 以波動率估計填充的 smile_chain 只用於 Module 25 展示
+            # （返回新的 OptionChain，其他列共用內存，chain_arrays 不變）
+            chain_iv = chain_arrays.column('impliedVolatility')
+            smile_chain = chain_arrays.with_columns(
+                impliedVolatility=np.where(np.isnan(chain_iv) | (chain_iv == 0), volatility_estimate, chain_iv)
+            )
+            smile_analyzer = VolatilitySmileAnalyzer(sabr_calibrator=self.sabr_calibrator)
+            if chain_arrays.count('C') and chain_arrays.count('P'):
+                try:
+                    smile_analyzer.calibrate_sabr(
+                        chain_arrays, current_price,
+                        time_to_expiration=days_to_expiration / 365.0 if days_to_expiration else 0.05,
+                        risk_free_rate=analysis_data.get('risk_free_rate', 0.045),
+                        ticker=ticker, expiration=expiration
+                    )
+                except Exception as exc:
+                    logger.warning(f"! SABR 校準失敗: {exc}")
+            
             # ========== 模塊22: 最佳行使價分析 (整合 Module 23 IV 環境) ==========
             report_progress(23, "分析最佳行使價...", "Module 22: 最佳行使價")
             logger.info("\n→ 運行 Module 22: 最佳行使價分析...")
-            option_chain_converted = {'calls': [], 'puts': []}
+            strategy_chain = None
 
             # ── 非交易時段自動降級 ─────────────────────────────────────────────
             # Module 22 依賴成交量 (Volume) 和未平倉量 (OI) 進行流動性評分
@@ -2713,43 +2726,14 @@ class OptionsAnalysisSystem:
                 }
             else:
                 try:
-                    # 獲取期權鏈數據
-                    option_chain_raw = analysis_data.get('option_chain', {})
+                    # 期權鏈數據（共用 chain_arrays，不再轉換為 list of dicts）
                     iv_rank_value = self.analysis_results.get('module18_historical_volatility', {}).get('iv_rank', 50.0)
+                    strategy_chain = chain_arrays
+                    logger.info(f"  期權鏈: {strategy_chain.count('C')} 個 Call, {strategy_chain.count('P')} 個 Put")
                     
-                    # 轉換 DataFrame 為 list of dicts（Module 22 期望的格式）
-                    option_chain_converted = {'calls': [], 'puts': []}
-                    calls_data = option_chain_raw.get('calls')
-                    puts_data = option_chain_raw.get('puts')
-                    
-                    # 檢查並轉換 calls
-                    if calls_data is not None:
-                        import pandas as pd
-                        if isinstance(calls_data, pd.DataFrame) and not calls_data.empty:
-                            option_chain_converted['calls'] = calls_data.to_dict('records')
-                            logger.info(f"  轉換 calls DataFrame: {len(option_chain_converted['calls'])} 個行使價")
-                        elif isinstance(calls_data, list):
-                            option_chain_converted['calls'] = calls_data
-                        else:
-                            option_chain_converted['calls'] = []
-                    else:
-                        option_chain_converted['calls'] = []
-                    
-                    # 檢查並轉換 puts
-                    if puts_data is not None:
-                        import pandas as pd
-                        if isinstance(puts_data, pd.DataFrame) and not puts_data.empty:
-                            option_chain_converted['puts'] = puts_data.to_dict('records')
-                            logger.info(f"  轉換 puts DataFrame: {len(option_chain_converted['puts'])} 個行使價")
-                        elif isinstance(puts_data, list):
-                            option_chain_converted['puts'] = puts_data
-                        else:
-                            option_chain_converted['puts'] = []
-                    else:
-                        option_chain_converted['puts'] = []
-                    
-                    if option_chain_converted['calls'] or option_chain_converted['puts']:
+                    if len(strategy_chain):
                         optimal_strike_calc = OptimalStrikeCalculator()
+                        optimal_strike_calc.set_sabr_calibrator(self.sabr_calibrator)
                         
                         # 分析四種策略的最佳行使價
                         strategies = ['long_call', 'long_put', 'short_call', 'short_put']
@@ -2770,12 +2754,13 @@ class OptionsAnalysisSystem:
                             result = optimal_strike_calc.analyze_strikes(
                                 ticker=ticker,
                                 current_price=current_price,
-                                option_chain=option_chain_converted,
+                                option_chain=strategy_chain,
                                 strategy_type=strategy,
                                 days_to_expiration=int(days_to_expiration) if days_to_expiration else 30,
                                 iv_rank=iv_rank_value,
                                 support_resistance_data=support_resistance_data,  # 新增: 支持阻力位數據
-                                enable_max_profit_analysis=True  # 新增: 啟用 Long/Short 策略增強
+                                enable_max_profit_analysis=True,  # 新增: 啟用 Long/Short 策略增強
+                                expiration=expiration
                             )
                             
                             # 整合 Module 23 IV 環境信息
@@ -2826,17 +2811,16 @@ class OptionsAnalysisSystem:
             report_progress(24, "分析高級組合策略...", "Module 32: 組合策略")
             logger.info("\n→ 運行 Module 32: 高級組合策略分析...")
             try:
-                import pandas as pd
                 complex_analyzer = ComplexStrategyAnalyzer()
                 
-                # 準備 DataFrames (從 option_chain_converted 重建)
+                # 準備 DataFrames（直接包裝 Module 22 使用的 OptionChain 列數組，不複製）
                 calls_df_complex = None
                 puts_df_complex = None
                 
-                if option_chain_converted.get('calls'):
-                    calls_df_complex = pd.DataFrame(option_chain_converted['calls'])
-                if option_chain_converted.get('puts'):
-                    puts_df_complex = pd.DataFrame(option_chain_converted['puts'])
+                if strategy_chain is not None and strategy_chain.count('C'):
+                    calls_df_complex = strategy_chain.to_frame('C')
+                if strategy_chain is not None and strategy_chain.count('P'):
+                    puts_df_complex = strategy_chain.to_frame('P')
                     
                 if calls_df_complex is not None and not calls_df_complex.empty and \
                    puts_df_complex is not None and not puts_df_complex.empty:
@@ -2930,24 +2914,16 @@ class OptionsAnalysisSystem:
             report_progress(26, "分析波動率微笑...", "Module 25: 波動率微笑")
             logger.info("\n→ 運行 Module 25: 波動率微笑分析...")
             try:
-                if option_chain and 'calls' in option_chain and 'puts' in option_chain:
-                    # 準備期權鏈數據
-                    calls_list = option_chain['calls'].to_dict('records') if hasattr(option_chain['calls'], 'to_dict') else option_chain['calls']
-                    puts_list = option_chain['puts'].to_dict('records') if hasattr(option_chain['puts'], 'to_dict') else option_chain['puts']
-                    
-                    import math
+                if chain_arrays.count('C') and chain_arrays.count('P'):
                     # Fix: Inject actual IV if missing, preventing 1.2% fallback bugs
-                    for opt in calls_list + puts_list:
-                        iv_val = opt.get('impliedVolatility')
-                        if iv_val is None or iv_val == "" or iv_val == 0 or (isinstance(iv_val, float) and math.isnan(iv_val)):
-                            opt['impliedVolatility'] = volatility_estimate
-                    
-                    smile_analyzer = VolatilitySmileAnalyzer()
+                    # （smile_chain / smile_analyzer 已在 Module 22 之前準備並完成 SABR 校準）
                     smile_result = smile_analyzer.analyze_smile(
-                        option_chain={'calls': calls_list, 'puts': puts_list},
+                        option_chain=smile_chain,
                         current_price=current_price,
                         time_to_expiration=days_to_expiration / 365.0 if days_to_expiration else 0.05,
-                        risk_free_rate=analysis_data.get('risk_free_rate', 0.045)
+                        risk_free_rate=analysis_data.get('risk_free_rate', 0.045),
+                        ticker=ticker,
+                        expiration=expiration
                     )
                     
                     self.analysis_results['module25_volatility_smile'] = smile_result.to_dict()
@@ -2987,24 +2963,17 @@ class OptionsAnalysisSystem:
                 target_call = None
                 target_put = None
                 
-                if option_chain and 'calls' in option_chain and 'puts' in option_chain:
-                    calls_df = option_chain['calls']
-                    puts_df = option_chain['puts']
-                    
-                    # 找到指定行使價的期權（用戶指定或 ATM）
-                    if hasattr(calls_df, 'iloc') and len(calls_df) > 0:
-                        calls_df = calls_df.copy()  # BR-02 Fix: 創建副本避免污染原始數據
-                        calls_df['distance'] = abs(calls_df['strike'] - target_strike)
-                        atm_idx = calls_df['distance'].idxmin()
-                        target_call = calls_df.loc[atm_idx].to_dict()
+                if target_strike is not None:
+                    # 找到指定行使價的期權（用戶指定或 ATM），二分查找最近行使價
+                    call_row = chain_arrays.nearest(target_strike, 'C')
+                    if call_row is not None:
+                        target_call = chain_arrays.row(call_row)
                         logger.info(f"  使用 Call 行使價: ${target_call.get('strike', target_strike)}" + 
                                   (" (用戶指定)" if strike and strike > 0 else " (ATM)"))
                     
-                    if hasattr(puts_df, 'iloc') and len(puts_df) > 0:
-                        puts_df = puts_df.copy()  # BR-02 Fix: 創建副本避免污染原始數據
-                        puts_df['distance'] = abs(puts_df['strike'] - target_strike)
-                        atm_idx = puts_df['distance'].idxmin()
-                        target_put = puts_df.loc[atm_idx].to_dict()
+                    put_row = chain_arrays.nearest(target_strike, 'P')
+                    if put_row is not None:
+                        target_put = chain_arrays.row(put_row)
                         logger.info(f"  使用 Put 行使價: ${target_put.get('strike', target_strike)}" +
                                   (" (用戶指定)" if strike and strike > 0 else " (ATM)"))
                 
@@ -3066,6 +3035,9 @@ class OptionsAnalysisSystem:
                     'reason': str(exc)
                 }
             
+            # 記錄本次分析實際使用的行使價（期權鏈快照的自適應行使價規劃據此學習）
+            self._record_strike_usage(ticker, expiration, current_price, [atm_strike, strike])
+            
             # Module 27: 多到期日比較分析（增強版 - 所有到期日 + 四種策略）
             report_progress(28, "比較多個到期日...", "Module 27: 多到期日比較")
             logger.info("\n→ 運行 Module 27: 多到期日比較分析（增強版）...")
@@ -3377,6 +3349,13 @@ class OptionsAnalysisSystem:
                         else:
                             result_dict = adv_result
                         
+                        # 曝險地圖（Gamma/Vanna/Charm × 行使價 × 到期日，按快照緩存共用）
+                        exposure_map = adv_analyzer.calculate_exposure_map(
+                            ticker,
+                            {expiration or 'unknown': {'calls': calls_df_pd, 'puts': puts_df_pd}},
+                            current_price
+                        )
+                        
                         self.analysis_results['module31_advanced_metrics'] = {
                             'status': 'success',
                             'put_call_ratio': {
@@ -3390,8 +3369,9 @@ class OptionsAnalysisSystem:
                             },
                             'gamma_exposure': {
                                 'net_gex': result_dict.get('total_gex', 0),
-                                'zero_gamma_point': None  # 需額外計算
-                            }
+                                'zero_gamma_point': exposure_map.zero_gamma_level if exposure_map else None
+                            },
+                            'exposure_map': exposure_map.to_dict() if exposure_map else None
                         }
                         
                         logger.info(f"  Put/Call Ratio (OI): {result_dict.get('pcr_oi', 'N/A')}")
@@ -3540,6 +3520,7 @@ class OptionsAnalysisSystem:
             # ========== Phase 8: 日內交易模組 (VWAP / ORB / 0DTE) ==========
             # 設計: 可選執行 — 無日內數據時自動跳過，不影響現有分析
             logger.info("\n→ Phase 8: 日內交易分析 (VWAP / ORB / 0DTE)...")
+            flow_volume_baseline = None  # 10 分鐘成交量基準（模塊 36），由 1 分鐘 K 線推算
             try:
                 # 獲取 1 分鐘 K 線（直接從 IBKR 取得）
                 intraday_df = None
@@ -3551,6 +3532,8 @@ class OptionsAnalysisSystem:
                 if intraday_df is not None and len(intraday_df) >= 10:
                     current_price = analysis_data.get('current_price', 0)
                     logger.info(f"  * 獲取 {len(intraday_df)} 條 1 分鐘 K 線，開始日內分析...")
+                    if 'Volume' in intraday_df.columns:
+                        flow_volume_baseline = int(intraday_df['Volume'].mean() * 10) or None
                     
                     # ── VWAP 分析 ──
                     try:
@@ -3606,6 +3589,29 @@ class OptionsAnalysisSystem:
             except Exception as e:
                 logger.warning(f"! Phase 8 日內分析整體失敗: {e}")
 
+            # ── 逐筆資金流（模塊 35/36/38）：Dark Pool 採樣窗口的 Tick 環形緩衝區 ──
+            # 會話 VWAP 仍以 1 分鐘 K 線計算；緩衝區只覆蓋採樣窗口，tick_flow 內的 VWAP 為窗口 VWAP
+            if include_dark_pool and self.fetcher.ibkr_client and self.fetcher.ibkr_client.is_connected():
+                logger.info("\n→ 逐筆資金流分析 (模塊 35/36/38，需時~30秒)...")
+                try:
+                    dp_info = self.fetcher.get_dark_pool_data(
+                        ticker=ticker, duration_seconds=30, avg_volume_baseline=flow_volume_baseline
+                    )
+                    if dp_info:
+                        self.analysis_results['module38_dark_pool'] = dp_info
+                        flow = dp_info.get('tick_flow')
+                        if flow:
+                            self.analysis_results['module35_large_orders'] = flow['large_orders']
+                            if flow.get('liquidity'):
+                                self.analysis_results['module36_liquidity'] = flow['liquidity']
+                            logger.info(
+                                f"  * {flow['trades']} 筆成交: 大單 {len(flow['large_orders'])} 筆 | "
+                                f"DP ratio {dp_info['dp_ratio']}%"
+                            )
+                        logger.info("* 逐筆資金流分析完成")
+                except Exception as e:
+                    logger.warning(f"! 逐筆資金流分析失敗: {e}")
+
             # 第4步: 生成報告
             logger.info("\n→ 第4步: 生成分析報告...")
             # 歷史記錄對比
@@ -3721,6 +3727,29 @@ class OptionsAnalysisSystem:
                 'message': str(e)
             }
     
+    def _record_strike_usage(self, ticker: str, expiration: str, current_price: float, extra_strikes: list):
+        """
+        收集 Module 22（分析過的行使價）、Module 25（Moneyness 分層）、Module 26（ATM / 用戶行使價）
+        使用的行使價，寫入行使價使用歷史
+        """
+        if not settings.STRIKE_PLANNER_ENABLED or not expiration:
+            return
+        try:
+            from data_layer.smart_option_chain_fetcher import days_until, get_strike_usage_history
+            
+            strikes = [k for k in extra_strikes if k]
+            optimal = self.analysis_results.get('module22_optimal_strike') or {}
+            for result in optimal.values():
+                if isinstance(result, dict):
+                    strikes.extend(item.get('strike') for item in result.get('analyzed_strikes', []))
+            smile = self.analysis_results.get('module25_volatility_smile') or {}
+            for bucket in smile.get('moneyness_buckets', []) or []:
+                strikes.extend(bucket.get('strikes', []))
+            
+            get_strike_usage_history().record_usage(ticker, days_until(expiration), current_price, strikes)
+        except Exception as e:
+            logger.debug(f"記錄行使價使用失敗: {e}")
+    
     def _run_module11_with_parity_context(
         self,
         parity_result: dict,
@@ -6054,6 +6054,17 @@ class ReportGenerator:
                 report += f"│   淨 GEX: {self._safe_format(gex.get('net_gex'), fmt='.2e')}\n"
                 report += f"│   零點: {self._safe_format(gex.get('zero_gamma_point'), prefix='$')}\n│\n"
             
+            # 曝險地圖關鍵價位
+            exposure = data.get('exposure_map') or {}
+            if exposure:
+                levels = exposure.get('key_levels', {})
+                report += "│ 🗺️ 做市商曝險地圖:\n"
+                report += f"│   淨 Vanna 曝險: {self._safe_format(exposure.get('total_vanna'), fmt='.2e')}\n"
+                report += f"│   淨 Charm 曝險: {self._safe_format(exposure.get('total_charm'), fmt='.2e')}\n"
+                report += f"│   最大 Vanna 行使價: {self._safe_format(levels.get('max_vanna_strike'), prefix='$')}\n"
+                report += f"│   Call Gamma 牆: {self._safe_format(levels.get('call_wall'), prefix='$')}\n"
+                report += f"│   Put Gamma 牆: {self._safe_format(levels.get('put_wall'), prefix='$')}\n│\n"
+            
             report += "└────────────────────────────────────────────┘\n"
             return report
             
@@ -20,12 +20,17 @@ from ib_insync import *
 from config.settings import settings as SETTINGS
 from config.strategy_profiles import ALL_PROFILES, StrategyProfile
 from data_layer.finviz_scraper import FinvizScraper
+from data_layer.finviz_snapshot import ingest_daily
 from calculation_layer.module26_long_option_analysis import LongOptionAnalyzer
 from calculation_layer.module29_short_option_analysis import ShortOptionAnalyzer
 from calculation_layer.module30_unusual_activity import UnusualActivityAnalyzer
 from calculation_layer.module24_technical_direction import TechnicalDirectionAnalyzer
 from calculation_layer.module34_volume_profile import VolumeProfileAnalyzer
 from data_layer.ibkr_client import IBKRClient # Import Client Wrapper
+from data_layer.ibkr_contract_cache import get_contract_cache
+from data_layer.ibkr_historical_scheduler import PRIORITY_SCAN, get_historical_scheduler
+from data_layer.ibkr_market_data_lines import get_market_data_lines, price_ready, quote_ready
+from data_layer.ibkr_recorder import create_ib
 from data_layer.sqlite_manager import SQLiteManager
 from main import OptionsAnalysisSystem # Import System
 
@@ -57,9 +62,18 @@ SCAN_INTERVAL = 900 # 15 Minutes
 OUTPUT_FILE = "hot_options.json"
 MOCK_MODE = False # 設置為 False 以啟用真實連接
 
+# Finviz 不可用時的靜態候選清單（同時用於啟動時預熱合約緩存）
+STATIC_WATCHLISTS = {
+    "The_Titans": ["NVDA", "TSLA", "AAPL", "AMD", "MSFT", "AMZN", "GOOGL", "META", "ASML", "AVGO", "AMAT"],
+    "Momentum_Growth": ["PLTR", "COIN", "MARA", "MSTR", "SMCI", "ARM", "CVNA"],
+    "Catalysts_News": ["NVDA", "TSLA"],
+    # 中小型股: AI / 量子計算 / 無人機 / 創新科技
+    "Small_Cap_Movers": ["SOUN", "IONQ", "RGTI", "QBTS", "BBAI", "KULR", "ACHR", "RXRX", "RCAT", "ASTS"],
+}
+
 class ScannerService:
     def __init__(self):
-        self.ib = IB()
+        self.ib = create_ib()  # 真實連接，或按配置錄製 / 回放
         self.ib.errorEvent += self.on_error
         self.finviz = FinvizScraper()
         self.analyzer = LongOptionAnalyzer()
@@ -68,10 +82,14 @@ class ScannerService:
         self.tech_analyzer = TechnicalDirectionAnalyzer()
         self.volume_profile = VolumeProfileAnalyzer()
         self.db = SQLiteManager()
+        self.contract_cache = get_contract_cache()  # 與 IBKRClient 共用的合約 / 期權鏈定義緩存
+        self.market_data_lines = get_market_data_lines()  # 與 IBKRClient 共用的行情線預算
+        self.historical = get_historical_scheduler()  # 與 IBKRClient 共用的歷史數據 pacing 隊列
         self.is_connected = False
         self.running = False
         self.latest_opportunities = []
         self._loop_task = None
+        self._snapshot_task = None
         self.last_scan_time = None
         self.status_message = "Ready"
         self.analysis_system = None # Lazy init to avoid circular import/config issues
@@ -139,6 +157,9 @@ class ScannerService:
                     if ticker in dp_results:
                         opp['dark_pool'] = dp_results[ticker]
                         opp['dp_ratio'] = dp_results[ticker].get('dp_ratio', 0)
+                        # 同一採樣窗口的逐筆大單（模塊 35，Tick 環形緩衝區）
+                        flow = dp_results[ticker].get('tick_flow')
+                        opp['large_order_count'] = len(flow['large_orders']) if flow else 0
                         logger.info(f"  ✅ 成功附加 {ticker} 暗池數據 (DP Ratio: {opp['dp_ratio']}%)")
         except Exception as e:
             logger.warning(f"Dark Pool 背景掃描失敗: {e}")
@@ -160,6 +181,63 @@ class ScannerService:
                 return None
         return data
         
+    async def get_daily_bars(self, contract, ticker: str, period: str = '1y'):
+        """
+        讀取日線（經本地增量 K 線存儲，只向 IBKR 請求缺失區間）
+        """
+        import pandas as pd
+        from data_layer.bar_store import RAW, get_bar_store, ib_duration
+        from data_layer.single_flight import get_single_flight
+
+        async def fetch(fetch_period):
+            bars = await self.historical.request(
+                self.ib, contract, ib_duration(fetch_period), '1 day', priority=PRIORITY_SCAN
+            )
+            if not bars:
+                return None
+            df = pd.DataFrame([{
+                'Date': b.date, 'Open': b.open, 'High': b.high,
+                'Low': b.low, 'Close': b.close, 'Volume': b.volume
+            } for b in bars])
+            return df.set_index('Date')
+
+        async def load():
+            if not SETTINGS.BAR_STORE_ENABLED:
+                return await fetch(period)
+            # TRADES 日線未復權，與 DataFetcher 的已復權序列分開存儲
+            return await get_bar_store().get_bars_async(ticker, '1d', period, fetch, adjustment=RAW)
+
+        if not SETTINGS.SINGLE_FLIGHT_ENABLED:
+            return await load()
+        # 與同時運行的其他掃描任務 / 深度分析共享同一次請求
+        return await get_single_flight().do_async(('daily_bars', ticker, period), load)
+
+    async def _qualify(self, *contracts):
+        """驗證合約（經合約緩存，已知合約不產生往返）"""
+        return await self.contract_cache.qualify_async(self.ib, *contracts)
+
+    async def _option_chains(self, contract):
+        """期權鏈定義（經合約緩存，每個標的每個交易日只請求一次）"""
+        return await self.contract_cache.option_chains_async(self.ib, contract)
+
+    async def _market_data(self, contract, generic_tick_list: str = '', timeout: float = 1.0, ready=quote_ready):
+        """當前行情（經共享行情線，熱線已有數據時立即返回；不再每次請求新快照）"""
+        return await self.market_data_lines.snapshot_async(
+            self.ib, contract, generic_tick_list, timeout=timeout, ready=ready, owner='scanner'
+        )
+
+    def _disconnect(self):
+        """取消本連接持有的行情線並斷開"""
+        self.market_data_lines.clear(self.ib)
+        self.ib.disconnect()
+
+    async def _prewarm_contracts(self, tickers):
+        """批量預熱股票合約與期權鏈定義（已緩存的不產生往返）"""
+        try:
+            await self.contract_cache.prewarm_async(self.ib, sorted(tickers))
+        except Exception as e:
+            logger.warning(f"合約緩存預熱失敗: {e}")
+
     def on_error(self, reqId, errorCode, errorString, contract):
         if errorCode not in [200, 2104, 2106, 2108, 2119, 2158]: # 忽略常見的市場數據連接與查無合約提示
             logger.error(f"IBKR Error {errorCode}: {errorString}")
@@ -174,6 +252,7 @@ class ScannerService:
             await self.ib.connectAsync(SETTINGS.IBKR_HOST, port, clientId=CLIENT_ID)
             self.is_connected = True
             logger.info("IBKR Connected!")
+            await self._prewarm_contracts(set().union(*STATIC_WATCHLISTS.values()))
             return True
         except Exception as e:
             logger.error(f"Connection failed: {e}")
@@ -208,10 +287,30 @@ class ScannerService:
             self._loop_task = None
             
         if self.ib.isConnected():
-             self.ib.disconnect()
+             self._disconnect()
              self.is_connected = False
         logger.info("Scanner Service Stopped properly.")
 
+    def _ensure_finviz_snapshot(self, profiles: List[StrategyProfile]):
+        """
+        後台刷新 Finviz 每日快照（當天已抓取的篩選條件直接跳過）
+        
+        快照完成前 get_screener_results 仍走實時抓取；完成後候選清單與
+        深度分析的基本面都從本地快照讀取。
+        """
+        if MOCK_MODE or self.finviz.snapshot_store is None:
+            return
+        if self._snapshot_task is not None and not self._snapshot_task.done():
+            return
+        screens = [SETTINGS.FINVIZ_SNAPSHOT_UNIVERSE] + [p.criteria.finviz_filters for p in profiles]
+        self._snapshot_task = asyncio.create_task(self._refresh_finviz_snapshot(screens))
+
+    async def _refresh_finviz_snapshot(self, screens: List[str]):
+        try:
+            await asyncio.to_thread(ingest_daily, self.finviz, screens, self.finviz.snapshot_store)
+        except Exception as e:
+            logger.warning(f"Finviz 快照刷新失敗: {e}")
+
     async def get_candidates_for_profile(self, profile_name: str, profile: StrategyProfile) -> List[str]:
         """
         Get list of ticker candidates for a given profile.
@@ -232,14 +331,6 @@ class ScannerService:
             logger.warning(f"[{profile.name}] Finviz 搜索失敗: {e}")
             
         # 2. Fallback to Static List 
-        STATIC_WATCHLISTS = {
-            "The_Titans": ["NVDA", "TSLA", "AAPL", "AMD", "MSFT", "AMZN", "GOOGL", "META", "ASML", "AVGO", "AMAT"],
-            "Momentum_Growth": ["PLTR", "COIN", "MARA", "MSTR", "SMCI", "ARM", "CVNA"],
-            "Catalysts_News": ["NVDA", "TSLA"],
-            # 中小型股: AI / 量子計算 / 無人機 / 創新科技
-            "Small_Cap_Movers": ["SOUN", "IONQ", "RGTI", "QBTS", "BBAI", "KULR", "ACHR", "RXRX", "RCAT", "ASTS"],
-        }
-        
         if not candidates:
             candidates = STATIC_WATCHLISTS.get(profile_name, [])
             logger.info(f"[{profile.name}] 使用靜態默認清單: {candidates}")
@@ -262,21 +353,13 @@ class ScannerService:
         
         # 1. Get Market Data (Price, Gap, Volume)
         contract = Stock(ticker, 'SMART', 'USD')
-        await self.ib.qualifyContractsAsync(contract)
+        await self._qualify(contract)
         
         # Set Market Data Type to 4 (Delayed Frozen) to support offline/weekend data
         self.ib.reqMarketDataType(4)
         
-        # Request Snapshot
-        ticker_data = self.ib.reqMktData(contract, '', True, False)
-        # Wait for data (IBKR snapshot is async but usually fast, looping a bit safely)
-        for _ in range(10):
-            await asyncio.sleep(0.5)
-            # Check if we have either last or close available and not nan
-            has_last = ticker_data.last is not None and not math.isnan(ticker_data.last) and ticker_data.last > 0
-            has_close = ticker_data.close is not None and not math.isnan(ticker_data.close) and ticker_data.close > 0
-            if has_last or has_close:
-                break
+        # Request quote (reuses the hot line from the previous cycle when available)
+        ticker_data = await self._market_data(contract, timeout=5.0, ready=price_ready)
                 
         has_last = ticker_data.last is not None and not math.isnan(ticker_data.last) and ticker_data.last > 0
         has_close = ticker_data.close is not None and not math.isnan(ticker_data.close) and ticker_data.close > 0
@@ -453,9 +536,9 @@ class ScannerService:
         """
         # Get Option Chain (Next Weekly or Monthly)
         contract = Stock(ticker, 'SMART', 'USD')
-        await self.ib.qualifyContractsAsync(contract)
+        await self._qualify(contract)
         
-        chains = await self.ib.reqSecDefOptParamsAsync(contract.symbol, '', contract.secType, contract.conId)
+        chains = await self._option_chains(contract)
         if not chains:
             return None
             
@@ -511,23 +594,15 @@ class ScannerService:
         
         # Get Option Market Data
         opt_contract = Option(ticker, expiry, target_strike, right, 'SMART')
-        await self.ib.qualifyContractsAsync(opt_contract)
+        await self._qualify(opt_contract)
         
         # Set Market Data Type to 4 (Delayed Frozen) for options as well
         self.ib.reqMarketDataType(4)
         
         # Request snapshot
         # Request snapshot with Generic Ticks for IV and Greeks (100: Option Vol, 101: OI, 106: IV)
-        opt_data = self.ib.reqMktData(opt_contract, '100,101,106', False, False)
-        # Only wait briefly but check if stopped
-        for _ in range(10): 
-            if not self.running: return None
-            await asyncio.sleep(0.1)
-            has_bid = opt_data.bid is not None and not math.isnan(opt_data.bid) and opt_data.bid > 0
-            has_ask = opt_data.ask is not None and not math.isnan(opt_data.ask) and opt_data.ask > 0
-            has_close = opt_data.close is not None and not math.isnan(opt_data.close) and opt_data.close > 0
-            if (has_bid and has_ask) or has_close:
-                break
+        opt_data = await self._market_data(opt_contract, '100,101,106', timeout=1.0)
+        if not self.running: return None
         
         has_bid = opt_data.bid is not None and not math.isnan(opt_data.bid) and opt_data.bid > 0
         has_ask = opt_data.ask is not None and not math.isnan(opt_data.ask) and opt_data.ask > 0
@@ -587,8 +662,8 @@ class ScannerService:
         """
         # Get Option Chain
         contract = Stock(ticker, 'SMART', 'USD')
-        await self.ib.qualifyContractsAsync(contract)
-        chains = await self.ib.reqSecDefOptParamsAsync(contract.symbol, '', contract.secType, contract.conId)
+        await self._qualify(contract)
+        chains = await self._option_chains(contract)
         if not chains: return None
         chain = next((c for c in chains if c.exchange == 'SMART'), chains[0])
         
@@ -616,18 +691,10 @@ class ScannerService:
         
         # Get Data
         opt_contract = Option(ticker, expiry, target_strike, right, 'SMART')
-        await self.ib.qualifyContractsAsync(opt_contract)
+        await self._qualify(opt_contract)
         self.ib.reqMarketDataType(4)
-        opt_data = self.ib.reqMktData(opt_contract, '100,101,106', False, False)
-        
-        for _ in range(10): 
-            if not self.running: return None
-            await asyncio.sleep(0.1)
-            has_bid = opt_data.bid is not None and not math.isnan(opt_data.bid) and opt_data.bid > 0
-            has_ask = opt_data.ask is not None and not math.isnan(opt_data.ask) and opt_data.ask > 0
-            has_close = opt_data.close is not None and not math.isnan(opt_data.close) and opt_data.close > 0
-            if (has_bid and has_ask) or has_close:
-                break
+        opt_data = await self._market_data(opt_contract, '100,101,106', timeout=1.0)
+        if not self.running: return None
             
         has_bid = opt_data.bid is not None and not math.isnan(opt_data.bid) and opt_data.bid > 0
         has_ask = opt_data.ask is not None and not math.isnan(opt_data.ask) and opt_data.ask > 0
@@ -688,8 +755,8 @@ class ScannerService:
             from datetime import datetime
             
             contract = Stock(ticker, 'SMART', 'USD')
-            await self.ib.qualifyContractsAsync(contract)
-            chains = await self.ib.reqSecDefOptParamsAsync(contract.symbol, '', contract.secType, contract.conId)
+            await self._qualify(contract)
+            chains = await self._option_chains(contract)
             if not chains:
                 return []
             
@@ -709,8 +776,7 @@ class ScannerService:
                 return []
             
             # 獲取股價
-            stk_data = self.ib.reqMktData(contract, '', True, False)
-            await asyncio.sleep(1)
+            stk_data = await self._market_data(contract, timeout=1.0, ready=price_ready)
             current_price = stk_data.last or stk_data.close or 0
             if current_price <= 0:
                 return []
@@ -725,14 +791,17 @@ class ScannerService:
             all_rows_call = []
             all_rows_put = []
             
+            # 一次批量驗證全部期權合約（緩存命中時無往返）
+            options = {(strike, right): Option(ticker, target_exp, strike, right, 'SMART')
+                       for strike in strikes[:10] for right in ('C', 'P')}
+            await self._qualify(*options.values())
+            
             for strike in strikes[:10]:  # 限制 10 個自動計算數，避免超載
                 for right in ('C', 'P'):
-                    opt = Option(ticker, target_exp, strike, right, 'SMART')
+                    opt = options[(strike, right)]
                     try:
-                        await self.ib.qualifyContractsAsync(opt)
                         self.ib.reqMarketDataType(4)
-                        opt_data = self.ib.reqMktData(opt, '100,101', False, False)
-                        await asyncio.sleep(0.2)
+                        opt_data = await self._market_data(opt, '100,101', timeout=0.2)
                         
                         vol = getattr(opt_data, 'volume', None)
                         oi = getattr(opt_data, 'openInterest', None)
@@ -802,6 +871,7 @@ class ScannerService:
                     continue
 
                 all_opportunities = []
+                self._ensure_finviz_snapshot(active_profiles)
                 
                 # Part 1: UOA 首重掃描
                 logger.info("[UOA] 開始從選定策略名單中偵測異動期權...")
@@ -814,6 +884,7 @@ class ScannerService:
                         if t not in profile_mapping:
                             profile_mapping[t] = profile
                 
+                await self._prewarm_contracts(all_tickers)
                 logger.info(f"========== 啟動 UOA 第一階段掃描 ({len(all_tickers)} 支股票) ==========")
                 for ticker in all_tickers:
                     if not self.running: break
@@ -831,27 +902,17 @@ class ScannerService:
                     
                     # 2. 第二層確認: 讀取 K 線進行多重均線與籌碼分析
                     contract = Stock(ticker, 'SMART', 'USD')
-                    await self.ib.qualifyContractsAsync(contract)
+                    await self._qualify(contract)
                     
-                    stk_data = self.ib.reqMktData(contract, '', True, False)
-                    await asyncio.sleep(1)
+                    stk_data = await self._market_data(contract, timeout=1.0, ready=price_ready)
                     current_price = stk_data.last or stk_data.close
                     if not current_price: continue
 
-                    bars = await self.ib.reqHistoricalDataAsync(
-                        contract, endDateTime='', durationStr='1 Y',
-                        barSizeSetting='1 day', whatToShow='TRADES', useRTH=True
-                    )
+                    df = await self.get_daily_bars(contract, ticker)
                     
-                    if not bars or len(bars) < 50:
+                    if df is None or len(df) < 50:
                         logger.warning(f"  {ticker} 歷史數據不足，跳過技術面確認。")
                         continue
-                        
-                    df = pd.DataFrame([{
-                        'Date': b.date, 'Open': b.open, 'High': b.high, 
-                        'Low': b.low, 'Close': b.close, 'Volume': b.volume
-                    } for b in bars])
-                    df.set_index('Date', inplace=True)
                     
                     # 技術面趨勢分析
                     tech_result = self.tech_analyzer.analyze(ticker, df, current_price=current_price)
@@ -987,7 +1048,7 @@ class ScannerService:
             logger.error(f"Scanner Loop Error: {e}")
         finally:
             self.running = False
-            self.ib.disconnect()
+            self._disconnect()
 
     async def run_loop_technical(self, selected_strategies: List[str] = None, single_pass: bool = False):
         """Technical-First Pipeline (RSI, MACD, MA, Vol Profile) - 適用於盤前或無期權即時異動環境"""
@@ -1010,6 +1071,7 @@ class ScannerService:
                     continue
 
                 all_opportunities = []
+                self._ensure_finviz_snapshot(active_profiles)
                 all_tickers = set()
                 profile_mapping = {}
                 for profile in active_profiles:
@@ -1019,31 +1081,22 @@ class ScannerService:
                         if t not in profile_mapping:
                             profile_mapping[t] = profile
 
+                await self._prewarm_contracts(all_tickers)
                 logger.info(f"========== 啟動 Technical-First 掃描 ({len(all_tickers)} 支股票) ==========")
                 for ticker in all_tickers:
                     if not self.running: break
                     
                     try:
                         contract = Stock(ticker, 'SMART', 'USD')
-                        await self.ib.qualifyContractsAsync(contract)
+                        await self._qualify(contract)
                         
-                        stk_data = self.ib.reqMktData(contract, '', True, False)
-                        await asyncio.sleep(1)
+                        stk_data = await self._market_data(contract, timeout=1.0, ready=price_ready)
                         current_price = stk_data.last or stk_data.close
                         if not current_price: continue
                         
-                        bars = await self.ib.reqHistoricalDataAsync(
-                            contract, endDateTime='', durationStr='1 Y',
-                            barSizeSetting='1 day', whatToShow='TRADES', useRTH=True
-                        )
-                        if not bars or len(bars) < 50:
+                        df = await self.get_daily_bars(contract, ticker)
+                        if df is None or len(df) < 50:
                             continue
-                            
-                        df = pd.DataFrame([{
-                            'Date': b.date, 'Open': b.open, 'High': b.high, 
-                            'Low': b.low, 'Close': b.close, 'Volume': b.volume
-                        } for b in bars])
-                        df.set_index('Date', inplace=True)
                         
                         # 1. 技術面趨勢分析 (MA, RSI, MACD)
                         tech_result = self.tech_analyzer.analyze(ticker, df, current_price=current_price)
@@ -1165,7 +1218,7 @@ class ScannerService:
             logger.error(f"Technical Loop Error: {e}")
         finally:
             self.running = False
-            self.ib.disconnect()
+            self._disconnect()
 
     def run(self):
         self.running = True
@@ -5,6 +5,7 @@ import json
 import time
 from typing import Dict, Any, Optional
 from config.settings import settings as SETTINGS
+from data_layer.http_session import async_http_sessions, http_sessions
 
 logger = logging.getLogger(__name__)
 
@@ -182,7 +183,7 @@ class AIAnalysisService:
         }
         
         # Increased timeout to 60s to prevent ReadTimeoutError
-        response = requests.post(self.API_URL, headers=headers, json=payload, timeout=60)
+        response = http_sessions.shared('nvidia').post(self.API_URL, headers=headers, json=payload, timeout=60)
         
         if response.status_code == 200:
             result = response.json()
@@ -208,17 +209,17 @@ class AIAnalysisService:
             "max_tokens": 800
         }
         
-        # Increased timeout to 60s
+        # Increased timeout to 60s; the keep-alive session is shared per event loop
         timeout = aiohttp.ClientTimeout(total=60)
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.post(self.API_URL, headers=headers, json=payload) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    return result['choices'][0]['message']['content']
-                else:
-                    error_text = await response.text()
-                    logger.error(f"NVIDIA API Error (Async): Status {response.status}, Body: {error_text}")
-                    raise Exception(f"Status {response.status}: {error_text}")
+        session = async_http_sessions.get('nvidia')
+        async with session.post(self.API_URL, headers=headers, json=payload, timeout=timeout) as response:
+            if response.status == 200:
+                result = await response.json()
+                return result['choices'][0]['message']['content']
+            else:
+                error_text = await response.text()
+                logger.error(f"NVIDIA API Error (Async): Status {response.status}, Body: {error_text}")
+                raise Exception(f"Status {response.status}: {error_text}")
 
 # Helper to get instance
 _instance = None
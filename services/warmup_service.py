@@ -0,0 +1,463 @@
+# services/warmup_service.py
+"""
+盤前觀察清單預熱服務
+
+每天第一次分析某隻股票時要付出全部冷啟動成本：Yahoo crumb、IBKR 合約驗證、歷史 K 線、
+基本面、派息、業績日曆與期權到期日。本服務在開盤前按觀察清單預先抓取這些慢變數據，
+寫入各自已有的持久化緩存:
+- stock_info: Yahoo crumb 存儲、IBKR 合約緩存、Finviz 基本面快照
+- historical: 本地增量 K 線存儲（1 年日線，較短週期從中切片）
+- 到期日 / 業績 / 派息 / EPS / 無風險利率: DataCache（@persisted；後四者至少保留到當天收盤）
+
+觀察清單 = 最近 N 天分析過的股票（output/{TICKER}/json）∪ hot_options.json ∪ 掃描器靜態清單
+
+用法:
+    python services/warmup_service.py --once                 # 立即預熱一次並輸出覆蓋率報告
+    python services/warmup_service.py --once --tickers AAPL NVDA
+    python services/warmup_service.py                        # 常駐：每個交易日開盤前預熱
+"""
+
+import argparse
+import asyncio
+import contextlib
+import functools
+import json
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dtime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_layer.session_utils import ET_TZ
+from data_layer.utils.rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+MARKET_OPEN = dtime(9, 30)
+TICKER_PATTERN = re.compile(r'^[A-Z][A-Z0-9.\-]{0,9}$')
+REPORT_FILENAME = 'warmup_report.json'
+
+# (步驟名, DataFetcher 方法, 參數)；按股票執行的步驟
+TICKER_STEPS: List[Tuple[str, str, Dict[str, Any]]] = [
+    ('stock_info', 'get_stock_info', {}),
+    ('historical', 'get_historical_data', {'period': '1y', 'interval': '1d'}),
+    ('expirations', 'get_option_expirations', {}),
+    ('earnings_calendar', 'get_earnings_calendar', {}),
+    ('dividend_calendar', 'get_dividend_calendar', {}),
+    ('discrete_dividends', 'get_discrete_dividends', {}),
+    ('eps', 'get_eps', {}),
+]
+# 會調用 IBKR 的步驟：ib_insync 對象只能在創建它的事件循環線程上使用（同 DataFetcher.CALLER_THREAD_SOURCES），
+# 這些步驟依次在持有 IBKR 連接的單一線程上執行，其餘純 HTTP 步驟走 asyncio.to_thread
+IBKR_STEPS = frozenset({'stock_info', 'historical', 'expirations', 'discrete_dividends'})
+# 與股票無關、每輪只執行一次的步驟
+GLOBAL_STEPS: List[Tuple[str, str]] = [
+    ('risk_free_rate', 'get_risk_free_rate'),
+]
+
+
+def _scanner_defaults() -> Tuple[Dict[str, List[str]], str]:
+    """掃描器的靜態清單與輸出文件（導入失敗時返回空清單）"""
+    try:
+        import scanner_service
+        return scanner_service.STATIC_WATCHLISTS, scanner_service.OUTPUT_FILE
+    except Exception as e:
+        logger.warning(f"! 無法載入掃描器靜態清單: {e}")
+        return {}, 'hot_options.json'
+
+
+def _hot_tickers(path: str) -> List[str]:
+    """hot_options.json 中的股票（按分數從高到低）"""
+    if not path or not os.path.exists(path):
+        return []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            rows = json.load(f)
+    except Exception as e:
+        logger.warning(f"! 讀取 {path} 失敗: {e}")
+        return []
+    if not isinstance(rows, list):
+        return []
+    rows = [r for r in rows if isinstance(r, dict) and r.get('ticker')]
+    rows.sort(key=lambda r: r.get('score') or 0, reverse=True)
+    return [str(r['ticker']) for r in rows]
+
+
+def _recent_tickers(output_dir: str, days: int, now: Optional[float] = None) -> List[str]:
+    """最近 days 天內有分析報告的股票（按最近分析時間從新到舊）"""
+    if not output_dir or not os.path.isdir(output_dir) or days <= 0:
+        return []
+    cutoff = (now if now is not None else time.time()) - days * 86400
+    recent = []
+    for name in os.listdir(output_dir):
+        json_dir = os.path.join(output_dir, name, 'json')
+        if not TICKER_PATTERN.match(name) or not os.path.isdir(json_dir):
+            continue
+        mtimes = [entry.stat().st_mtime for entry in os.scandir(json_dir)
+                  if entry.is_file() and entry.name.endswith('.json')]
+        if mtimes and max(mtimes) >= cutoff:
+            recent.append((max(mtimes), name))
+    return [name for _, name in sorted(recent, reverse=True)]
+
+
+def collect_watchlist(
+    static_lists: Optional[Dict[str, Iterable[str]]] = None,
+    hot_file: Optional[str] = None,
+    output_dir: Optional[str] = None,
+    history_days: Optional[int] = None,
+    max_tickers: Optional[int] = None,
+    now: Optional[float] = None
+) -> List[str]:
+    """
+    合併觀察清單並去重
+
+    順序：最近分析過的股票 → hot_options.json → 掃描器靜態清單，
+    超過 max_tickers 時保留靠前的股票（最可能被第一個請求用到）。
+    """
+    from config.settings import settings
+    if static_lists is None or hot_file is None:
+        default_lists, default_hot = _scanner_defaults()
+        static_lists = default_lists if static_lists is None else static_lists
+        hot_file = default_hot if hot_file is None else hot_file
+    output_dir = settings.OUTPUT_DIR if output_dir is None else output_dir
+    history_days = settings.WARMUP_HISTORY_DAYS if history_days is None else history_days
+    max_tickers = settings.WARMUP_MAX_TICKERS if max_tickers is None else max_tickers
+
+    sources = [
+        _recent_tickers(output_dir, history_days, now),
+        _hot_tickers(hot_file),
+        [t for tickers in static_lists.values() for t in tickers],
+    ]
+    watchlist = []
+    seen = set()
+    for tickers in sources:
+        for ticker in tickers:
+            ticker = str(ticker).strip().upper()
+            if ticker and ticker not in seen and TICKER_PATTERN.match(ticker):
+                seen.add(ticker)
+                watchlist.append(ticker)
+    return watchlist[:max_tickers] if max_tickers > 0 else watchlist
+
+
+def _default_trading_day(day: date) -> bool:
+    """NYSE 交易日（交易日曆不可用時按週一至週五判斷）"""
+    if day.weekday() >= 5:
+        return False
+    try:
+        import pandas_market_calendars as mcal
+        return len(mcal.get_calendar('NYSE').valid_days(start_date=day, end_date=day)) > 0
+    except Exception:
+        return True
+
+
+def next_warmup_time(
+    now: datetime,
+    lead_minutes: int,
+    is_trading_day: Callable[[date], bool] = _default_trading_day
+) -> datetime:
+    """
+    下一次預熱時間：下一個交易日美東 09:30 前 lead_minutes 分鐘
+
+    參數:
+        now: 時區感知的當前時間（naive 視為美東時間）
+        lead_minutes: 開盤前提前量（分鐘）
+        is_trading_day: 判斷日期是否為交易日
+    """
+    now_et = ET_TZ.localize(now) if now.tzinfo is None else now.astimezone(ET_TZ)
+    day = now_et.date()
+    for _ in range(14):
+        if is_trading_day(day):
+            start = ET_TZ.localize(datetime.combine(day, MARKET_OPEN)) - timedelta(minutes=lead_minutes)
+            if start > now_et:
+                return start
+        day += timedelta(days=1)
+    raise RuntimeError("未來 14 天內沒有交易日")
+
+
+def _set_thread_loop():
+    """IBKR 線程的初始化：線程自帶（不運行的）事件循環，供 ib_insync 的同步接口使用"""
+    asyncio.set_event_loop(asyncio.new_event_loop())
+
+
+def _is_empty(result: Any) -> bool:
+    if result is None:
+        return True
+    if hasattr(result, 'empty'):
+        return bool(result.empty)
+    if isinstance(result, dict) and result.get('error'):
+        return True
+    return isinstance(result, (list, tuple, dict, str)) and not result
+
+
+@dataclass
+class WarmupReport:
+    """一輪預熱的結果與緩存覆蓋率"""
+    tickers: List[str]
+    started_at: str
+    elapsed_seconds: float = 0.0
+    steps: Dict[str, Dict[str, int]] = field(default_factory=dict)  # 步驟 -> {ok, empty, failed, cached_before}
+    failures: List[Dict[str, str]] = field(default_factory=list)
+    stores: Dict[str, Any] = field(default_factory=dict)  # 各持久化緩存的統計
+
+    def record(self, step: str, outcome: str):
+        counts = self.steps.setdefault(step, {'ok': 0, 'empty': 0, 'failed': 0, 'cached_before': 0})
+        counts[outcome] += 1
+
+    def coverage(self) -> Dict[str, float]:
+        """各步驟成功寫入緩存的比例（%）"""
+        result = {}
+        for step, counts in self.steps.items():
+            total = counts['ok'] + counts['empty'] + counts['failed']
+            result[step] = round(counts['ok'] / total * 100, 2) if total else 0.0
+        return result
+
+    def to_dict(self) -> Dict:
+        ok = sum(c['ok'] for c in self.steps.values())
+        total = sum(c['ok'] + c['empty'] + c['failed'] for c in self.steps.values())
+        return {
+            'started_at': self.started_at,
+            'tickers': len(self.tickers),
+            'elapsed_seconds': round(self.elapsed_seconds, 2),
+            'coverage_percentage': round(ok / total * 100, 2) if total else 0.0,
+            'coverage': self.coverage(),
+            'steps': self.steps,
+            'failures': self.failures[:50],
+            'stores': self.stores,
+            'watchlist': self.tickers,
+        }
+
+
+class WarmupService:
+    """
+    盤前預熱服務
+
+    使用示例:
+    >>> service = WarmupService()
+    >>> report = service.run_once()                  # 按觀察清單立即預熱
+    >>> report.to_dict()['coverage_percentage']
+    >>> asyncio.run(service.run_forever())           # 每個交易日開盤前預熱
+    """
+
+    def __init__(
+        self,
+        fetcher=None,
+        max_concurrent: Optional[int] = None,
+        rate_per_second: Optional[float] = None,
+        lead_minutes: Optional[int] = None,
+        report_path: Optional[str] = None
+    ):
+        from config.settings import settings
+        self._fetcher = fetcher
+        self.max_concurrent = max(1, max_concurrent or settings.WARMUP_MAX_CONCURRENT)
+        self.rate_per_second = rate_per_second or settings.WARMUP_RATE_PER_SECOND
+        self.lead_minutes = settings.WARMUP_LEAD_MINUTES if lead_minutes is None else lead_minutes
+        self.report_path = report_path if report_path is not None else os.path.join(settings.CACHE_DIR, REPORT_FILENAME)
+        self.limiter = TokenBucket('warmup', rate=self.rate_per_second, burst=self.max_concurrent)
+        self.last_report: Optional[WarmupReport] = None
+        self._ibkr_executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def ibkr_executor(self) -> ThreadPoolExecutor:
+        """持有 IBKR 連接的單線程執行器（DataFetcher 在此線程創建並連接，IBKR_STEPS 在此線程執行）"""
+        if self._ibkr_executor is None:
+            self._ibkr_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='warmup-ibkr', initializer=_set_thread_loop
+            )
+        return self._ibkr_executor
+
+    @staticmethod
+    def _build_fetcher():
+        """創建 DataFetcher；IBKR 歷史請求以預熱優先級排在交互 / 掃描請求之後"""
+        from data_layer.data_fetcher import DataFetcher
+        from data_layer.ibkr_historical_scheduler import PRIORITY_WARMUP
+        fetcher = DataFetcher()
+        if getattr(fetcher, 'ibkr_client', None) is not None:
+            fetcher.ibkr_client.historical_priority = PRIORITY_WARMUP
+        return fetcher
+
+    @property
+    def fetcher(self):
+        """
+        延遲創建 DataFetcher
+
+        創建在 IBKR 線程上進行：ib.connect() 在該線程自己的事件循環上完成，
+        不會落在 asyncio.run 正在運行的循環裡（"This event loop is already running"）。
+        在運行中的事件循環裡首次使用前請先 await _ensure_fetcher()。
+        """
+        if self._fetcher is None:
+            self._fetcher = self.ibkr_executor.submit(self._build_fetcher).result()
+        return self._fetcher
+
+    async def _ensure_fetcher(self):
+        if self._fetcher is None:
+            self._fetcher = await asyncio.wrap_future(self.ibkr_executor.submit(self._build_fetcher))
+        return self._fetcher
+
+    def close(self):
+        """在 IBKR 線程上斷開連接並結束該線程"""
+        if self._ibkr_executor is None:
+            return
+        client = getattr(self._fetcher, 'ibkr_client', None)
+        if client is not None and hasattr(client, 'disconnect'):
+            try:
+                self._ibkr_executor.submit(client.disconnect).result()
+            except Exception as e:
+                logger.warning(f"! 斷開 IBKR 失敗: {e}")
+        self._ibkr_executor.shutdown(wait=True)
+        self._ibkr_executor = None
+
+    def _is_cached(self, method_name: str, *args) -> bool:
+        """@persisted 方法的結果是否已在 DataCache 中"""
+        cache_key = getattr(getattr(type(self.fetcher), method_name, None), 'cache_key', None)
+        if cache_key is None:
+            return False
+        from data_layer.data_cache import get_data_cache
+        return get_data_cache().exists(cache_key(*args))
+
+    async def _run_step(self, report: WarmupReport, semaphore: asyncio.Semaphore, ibkr_lane: asyncio.Semaphore,
+                        step: str, method_name: str, args: tuple, kwargs: Dict[str, Any]):
+        label = args[0] if args else '*'
+        on_ibkr = step in IBKR_STEPS
+        # IBKR 步驟先在單線程通道上排隊，排隊期間不佔用並發名額
+        async with ibkr_lane if on_ibkr else contextlib.nullcontext():
+            async with semaphore:
+                if self._is_cached(method_name, *args):
+                    report.record(step, 'cached_before')
+                await self.limiter.acquire_async()
+                call = functools.partial(getattr(self.fetcher, method_name), *args, **kwargs)
+                try:
+                    if on_ibkr:
+                        result = await asyncio.get_running_loop().run_in_executor(self.ibkr_executor, call)
+                    else:
+                        result = await asyncio.to_thread(call)
+                except Exception as e:
+                    logger.warning(f"! 預熱失敗 {step} {label}: {e}")
+                    report.record(step, 'failed')
+                    report.failures.append({'step': step, 'ticker': label, 'error': str(e)})
+                    return
+                report.record(step, 'empty' if _is_empty(result) else 'ok')
+
+    @staticmethod
+    def _store_stats() -> Dict[str, Any]:
+        """各持久化緩存的當前狀態"""
+        from data_layer.crumb_store import CrumbStore
+        from data_layer.data_cache import get_data_cache
+        from data_layer.finviz_snapshot import get_finviz_snapshot_store
+        from data_layer.ibkr_contract_cache import get_contract_cache
+
+        def crumb_status():
+            store = CrumbStore.default()
+            return {'enabled': store is not None, 'valid': store is not None and store.load() is not None}
+
+        probes = {
+            'data_cache': lambda: get_data_cache().get_stats(),
+            'contract_cache': lambda: get_contract_cache().stats(),
+            'finviz_snapshot': lambda: get_finviz_snapshot_store().stats(),
+            'yahoo_crumb': crumb_status,
+        }
+        stores: Dict[str, Any] = {}
+        for name, probe in probes.items():
+            try:
+                stores[name] = probe()
+            except Exception as e:
+                stores[name] = {'error': str(e)}
+        return stores
+
+    async def warm(self, tickers: Optional[List[str]] = None) -> WarmupReport:
+        """
+        預熱一輪
+
+        參數:
+            tickers: 預熱的股票（默認為 collect_watchlist()）
+
+        返回:
+            WarmupReport
+        """
+        tickers = collect_watchlist() if tickers is None else [t.upper() for t in tickers]
+        report = WarmupReport(tickers=tickers, started_at=datetime.now(ET_TZ).isoformat())
+        logger.info(f"開始盤前預熱: {len(tickers)} 隻股票, 並發 {self.max_concurrent}, "
+                    f"速率 {self.rate_per_second}/s")
+        started = time.perf_counter()
+        await self._ensure_fetcher()
+
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+        ibkr_lane = asyncio.Semaphore(1)
+        jobs = [self._run_step(report, semaphore, ibkr_lane, step, method_name, (), {})
+                for step, method_name in GLOBAL_STEPS]
+        # 按股票排列：同一隻股票的 stock_info 先發出，其合約驗證結果供後續步驟復用
+        for ticker in tickers:
+            for step, method_name, kwargs in TICKER_STEPS:
+                jobs.append(self._run_step(report, semaphore, ibkr_lane, step, method_name, (ticker,), kwargs))
+        await asyncio.gather(*jobs)
+
+        report.elapsed_seconds = time.perf_counter() - started
+        report.stores = self._store_stats()
+        self.last_report = report
+        self._save_report(report)
+        summary = report.to_dict()
+        logger.info(f"* 盤前預熱完成: {len(tickers)} 隻股票, 覆蓋率 {summary['coverage_percentage']}%, "
+                    f"耗時 {summary['elapsed_seconds']}s")
+        if report.failures:
+            logger.warning(f"! {len(report.failures)} 個預熱步驟失敗")
+        return report
+
+    def run_once(self, tickers: Optional[List[str]] = None) -> WarmupReport:
+        """同步執行一輪預熱（DataFetcher 在進入 asyncio.run 之前於 IBKR 線程創建）"""
+        if self._fetcher is None:
+            self._fetcher = self.ibkr_executor.submit(self._build_fetcher).result()
+        return asyncio.run(self.warm(tickers))
+
+    async def run_forever(self, now: Callable[[], datetime] = lambda: datetime.now(ET_TZ)):
+        """常駐：每個交易日開盤前 lead_minutes 分鐘預熱一次"""
+        while True:
+            start = next_warmup_time(now(), self.lead_minutes)
+            delay = (start - now()).total_seconds()
+            logger.info(f"下一次盤前預熱: {start.isoformat()}（{delay / 3600:.1f} 小時後）")
+            await asyncio.sleep(max(0.0, delay))
+            try:
+                await self.warm()
+            except Exception as e:
+                logger.error(f"x 盤前預熱失敗: {e}")
+
+    def _save_report(self, report: WarmupReport):
+        if not self.report_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.report_path) or '.', exist_ok=True)
+            tmp_path = self.report_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(report.to_dict(), f, ensure_ascii=False, indent=2, default=str)
+            os.replace(tmp_path, self.report_path)
+        except Exception as e:
+            logger.warning(f"! 保存預熱報告失敗: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="盤前觀察清單預熱")
+    parser.add_argument('--once', action='store_true', help="立即預熱一次後退出")
+    parser.add_argument('--tickers', nargs='*', help="只預熱指定股票（默認為觀察清單）")
+    parser.add_argument('--concurrent', type=int, default=None, help="同時預熱的請求數")
+    parser.add_argument('--rate', type=float, default=None, help="每秒最多發出的預熱請求數")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    service = WarmupService(max_concurrent=args.concurrent, rate_per_second=args.rate)
+    try:
+        if args.once:
+            report = service.run_once(args.tickers or None)
+            print(json.dumps(report.to_dict(), ensure_ascii=False, indent=2, default=str))
+        else:
+            asyncio.run(service.run_forever())
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
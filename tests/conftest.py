@@ -0,0 +1,18 @@
+import pytest
+
+from config.settings import settings
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache_dir(tmp_path_factory, monkeypatch):
+    """測試期間把 CACHE_DIR 指向臨時目錄，並重置按 CACHE_DIR 創建的進程內單例，避免寫入倉庫的 cache/"""
+    from data_layer import bar_store, data_cache, finviz_snapshot, ibkr_contract_cache, smart_option_chain_fetcher
+
+    cache_dir = tmp_path_factory.mktemp('cache')
+    monkeypatch.setattr(settings, 'CACHE_DIR', str(cache_dir))
+    monkeypatch.setattr(smart_option_chain_fetcher, '_default_history', None)
+    monkeypatch.setattr(data_cache, '_default_cache', None)
+    monkeypatch.setattr(ibkr_contract_cache, '_default_cache', None)
+    monkeypatch.setattr(finviz_snapshot, '_default_store', None)
+    monkeypatch.setattr(bar_store, '_default_store', None)
+    return cache_dir
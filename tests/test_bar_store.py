@@ -0,0 +1,125 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_layer.bar_store import ADJUSTED, RAW, LocalBarStore, ib_duration, period_to_days
+
+
+def _bars(days, end=None, scale=1.0):
+    end = pd.Timestamp(end or pd.Timestamp.today().normalize())
+    index = pd.date_range(end=end, periods=days, freq='D', name='Date')
+    close = np.linspace(100, 100 + days, days) * scale
+    return pd.DataFrame({
+        'Open': close - 1, 'High': close + 1, 'Low': close - 2, 'Close': close,
+        'Volume': np.full(days, 1e6)
+    }, index=index)
+
+
+class FakeSource:
+    def __init__(self, history):
+        self.history = history
+        self.calls = []
+
+    def __call__(self, period):
+        self.calls.append(period)
+        days = period_to_days(period)
+        return self.history.iloc[-days:]
+
+
+def test_period_helpers():
+    assert period_to_days('1y') == 366
+    assert period_to_days('200d') == 200
+    assert period_to_days('max') is None
+    assert ib_duration('1y') == '1 Y'
+    assert ib_duration('1mo') == '31 D'
+
+
+def test_second_request_only_fetches_tail(tmp_path):
+    source = FakeSource(_bars(400))
+    store = LocalBarStore(str(tmp_path), refresh_seconds=0)
+
+    first = store.get_bars('AAPL', '1d', '1y', source)
+    second = store.get_bars('AAPL', '1d', '6mo', source)
+
+    assert source.calls == ['1y', '5d']
+    assert store.stats['incremental'] == 1
+    assert len(second) < len(first)
+    assert second.index[-1] == first.index[-1]
+    # 零拷貝只讀視圖
+    assert not second['Close'].to_numpy().flags.writeable
+
+
+def test_fresh_store_is_served_without_fetch(tmp_path):
+    source = FakeSource(_bars(100))
+    store = LocalBarStore(str(tmp_path), refresh_seconds=3600)
+    store.get_bars('MSFT', '1d', '1mo', source)
+    store.get_bars('MSFT', '1d', '1mo', source)
+
+    assert source.calls == ['1mo']
+    assert store.stats['hits'] == 1
+
+    # 新實例從磁盤讀取
+    reopened = LocalBarStore(str(tmp_path), refresh_seconds=3600)
+    df = reopened.get_bars('MSFT', '1d', '1mo', source)
+    assert source.calls == ['1mo']
+    assert list(df.columns) == ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def test_split_adjustment_triggers_full_refetch(tmp_path):
+    source = FakeSource(_bars(100))
+    store = LocalBarStore(str(tmp_path), refresh_seconds=0)
+    store.get_bars('NVDA', '1d', '3mo', source)
+
+    # 拆股：整段歷史價格被調整
+    source.history = _bars(100, scale=0.1)
+    df = store.get_bars('NVDA', '1d', '3mo', source)
+
+    assert store.stats['invalidations'] == 1
+    assert source.calls == ['3mo', '5d', '3mo']
+    assert df['Close'].iloc[0] == pytest.approx(source.history['Close'].iloc[-len(df)])
+
+
+def test_end_date_excludes_future_bars(tmp_path):
+    source = FakeSource(_bars(400))
+    store = LocalBarStore(str(tmp_path), refresh_seconds=3600)
+    end = (pd.Timestamp.today().normalize() - pd.Timedelta(days=60)).strftime('%Y-%m-%d')
+
+    df = store.get_bars('SPY', '1d', '30d', source, end_date=end)
+
+    assert df.index[-1] <= pd.Timestamp(end)
+    assert len(df) >= 29
+
+
+def test_async_fetch(tmp_path):
+    history = _bars(400)
+    calls = []
+
+    async def fetch(period):
+        calls.append(period)
+        return history.iloc[-period_to_days(period):]
+
+    store = LocalBarStore(str(tmp_path), refresh_seconds=0)
+    df = asyncio.run(store.get_bars_async('QQQ', '1d', '1y', fetch))
+    asyncio.run(store.get_bars_async('QQQ', '1d', '1y', fetch))
+
+    assert len(df) > 300
+    assert calls == ['1y', '5d']
+
+
+def test_adjusted_and_raw_series_are_stored_separately(tmp_path):
+    adjusted = FakeSource(_bars(100, scale=0.5))   # 已復權（Yahoo）
+    raw = FakeSource(_bars(100))                   # 未復權（IBKR TRADES）
+    store = LocalBarStore(str(tmp_path), refresh_seconds=0)
+
+    for _ in range(2):
+        yahoo_df = store.get_bars('AAPL', '1d', '3mo', adjusted, adjustment=ADJUSTED)
+        ibkr_df = store.get_bars('AAPL', '1d', '3mo', raw, adjustment=RAW)
+
+    # 兩個來源互不覆蓋，增量抓取不會觸發校驗和不一致
+    assert store.stats['invalidations'] == 0
+    assert adjusted.calls == raw.calls == ['3mo', '5d']
+    assert yahoo_df['Close'].iloc[-1] == pytest.approx(0.5 * ibkr_df['Close'].iloc[-1])
+
+    assert store.invalidate('AAPL', '1d') == 6
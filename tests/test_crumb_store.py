@@ -0,0 +1,89 @@
+import multiprocessing
+import time
+
+import requests
+
+from data_layer.crumb_store import CrumbStore
+from data_layer.utils.user_agent_rotator import UserAgentRotator
+from data_layer.yahoo_finance_v2_client import CrumbManager
+
+
+class CountingCrumbManager(CrumbManager):
+    fetches = 0
+
+    def _fetch_crumb(self):
+        CountingCrumbManager.fetches += 1
+        self.session.cookies.set('A3', 'cookie-value', domain='.yahoo.com', path='/')
+        self._crumb = 'abcdefghijk'
+        self._crumb_timestamp = __import__('datetime').datetime.now()
+        return self._crumb
+
+
+def test_store_round_trip_and_expiry(tmp_path):
+    store = CrumbStore(str(tmp_path / 'crumb.json'), ttl_seconds=60)
+    session = requests.Session()
+    session.cookies.set('A3', 'v', domain='.yahoo.com', path='/')
+    store.save('crumb12345', session.cookies, 'UA/1.0')
+
+    entry = store.load()
+    assert entry['crumb'] == 'crumb12345'
+    assert entry['user_agent'] == 'UA/1.0'
+
+    fresh = requests.Session()
+    CrumbStore.apply_cookies(fresh.cookies, entry)
+    assert fresh.cookies.get('A3', domain='.yahoo.com') == 'v'
+
+    expired = CrumbStore(str(tmp_path / 'crumb.json'), ttl_seconds=-1)
+    expired.save('old-crumb', session.cookies)
+    assert expired.load() is None
+
+
+def test_invalidate_only_matching_crumb(tmp_path):
+    store = CrumbStore(str(tmp_path / 'crumb.json'))
+    store.save('newer-crumb', requests.Session().cookies)
+    store.invalidate('stale-crumb')
+    assert store.load()['crumb'] == 'newer-crumb'
+    store.invalidate('newer-crumb')
+    assert store.load() is None
+
+
+def test_second_manager_uses_persisted_crumb(tmp_path):
+    store = CrumbStore(str(tmp_path / 'crumb.json'))
+    CountingCrumbManager.fetches = 0
+
+    first = CountingCrumbManager(requests.Session(), UserAgentRotator(), store=store)
+    assert first.get_crumb() == 'abcdefghijk'
+
+    session = requests.Session()
+    second = CountingCrumbManager(session, UserAgentRotator(), store=store)
+    assert second.get_crumb() == 'abcdefghijk'
+    assert CountingCrumbManager.fetches == 1
+    assert second.get_stats()['from_store']
+    assert session.cookies.get('A3', domain='.yahoo.com') == 'cookie-value'
+
+    # 401 後作廢，下次重新獲取
+    second.invalidate()
+    assert store.load() is None
+    second.get_crumb()
+    assert CountingCrumbManager.fetches == 2
+
+
+def _hold_lock(path, ready, hold_seconds):
+    store = CrumbStore(path)
+    with store.locked():
+        ready.set()
+        time.sleep(hold_seconds)
+
+
+def test_lock_is_shared_across_processes(tmp_path):
+    path = str(tmp_path / 'crumb.json')
+    ready = multiprocessing.Event()
+    proc = multiprocessing.Process(target=_hold_lock, args=(path, ready, 0.5))
+    proc.start()
+    assert ready.wait(10)
+
+    start = time.monotonic()
+    with CrumbStore(path).locked():
+        waited = time.monotonic() - start
+    proc.join(10)
+    assert waited > 0.2
@@ -0,0 +1,132 @@
+import time
+
+import pandas as pd
+
+from data_layer.data_cache import DataCache
+
+
+def test_round_trip_persists_across_instances(tmp_path):
+    cache = DataCache(cache_dir=str(tmp_path))
+    frame = pd.DataFrame({'strike': [100.0, 105.0], 'bid': [1.2, 0.6]})
+    assert cache.set('option_chain_AAPL_2026-12-18', frame)
+
+    restarted = DataCache(cache_dir=str(tmp_path))
+    pd.testing.assert_frame_equal(restarted.get('option_chain_AAPL_2026-12-18'), frame)
+    assert restarted.get_stats()['disk_hits'] == 1
+    # 第二次讀取命中內存 LRU
+    restarted.get('option_chain_AAPL_2026-12-18')
+    assert restarted.get_stats()['memory_hits'] == 1
+    assert list(tmp_path.glob('*.cache')) == []
+
+
+def test_memory_tier_respects_byte_budget(tmp_path):
+    cache = DataCache(cache_dir=str(tmp_path), memory_budget_bytes=4096)
+    for i in range(10):
+        cache.set(f'historical_T{i}', b'x' * 1000)
+
+    stats = cache.get_stats()
+    assert stats['memory_bytes'] <= 4096
+    assert stats['evictions'] > 0
+    # 被淘汰的條目仍可從磁盤讀取
+    assert cache.get('historical_T0') == b'x' * 1000
+
+
+def test_expiry_and_invalidation(tmp_path):
+    cache = DataCache(cache_dir=str(tmp_path))
+    cache.set('vix', 18.5, ttl=0)
+    cache.set('stock_info_AAPL', {'price': 1})
+    cache.set('stock_info_MSFT', {'price': 2})
+    cache.set('option_chain_AAPL', {'calls': []})
+
+    time.sleep(0.01)
+    assert cache.get('vix') is None
+    assert cache.clear_expired() == 0  # get 已刪除過期記錄
+    cache.set('earnings_AAPL', 'x', ttl=0)
+    assert cache.clear_expired() == 1
+
+    assert cache.invalidate_by_type('stock_info') == 2
+    assert cache.get('stock_info_AAPL') is None
+    assert cache.exists('option_chain_AAPL')
+    assert cache.invalidate_by_pattern(r'^option_') == 1
+    assert not cache.exists('option_chain_AAPL')
+
+    cache.set('stock_info_AAPL', {'price': 3})
+    assert cache.get('stock_info_AAPL') == {'price': 3}
+    assert {info['key'] for info in cache.get_all_cache_info()} == {
+        'stock_info_AAPL', 'stock_info_MSFT', 'option_chain_AAPL'
+    }
+
+
+def test_rows_written_by_another_instance_are_visible(tmp_path):
+    serving = DataCache(cache_dir=str(tmp_path))     # 例如先啟動的 web / 掃描進程
+    assert serving.get('earnings_calendar_AAPL') is None
+
+    warmup = DataCache(cache_dir=str(tmp_path))      # 之後運行的預熱進程
+    warmup.set('earnings_calendar_AAPL', {'next_date': '2026-04-30'})
+    warmup.set('risk_free_rate', 0.042, ttl=1)
+    assert serving.exists('earnings_calendar_AAPL')
+    assert serving.get('earnings_calendar_AAPL') == {'next_date': '2026-04-30'}
+    assert serving.get('risk_free_rate') == 0.042
+
+    # 已過期的索引記錄：回查到其他實例重新寫入的新值，而不是刪除它
+    time.sleep(1.1)
+    warmup.set('risk_free_rate', 0.043)
+    assert serving.get('risk_free_rate') == 0.043
+    assert warmup.get('risk_free_rate') == 0.043
+
+
+def test_persisted_methods_share_results_across_instances(tmp_path, monkeypatch):
+    from data_layer import data_cache
+
+    monkeypatch.setattr(data_cache, '_default_cache', DataCache(cache_dir=str(tmp_path)))
+    calls = []
+
+    class Fetcher:
+        @data_cache.persisted('earnings_calendar_')
+        def get_earnings_calendar(self, ticker, source='auto'):
+            calls.append(ticker)
+            return {'next_date': '2026-04-30'} if ticker != 'NONE' else None
+
+    assert Fetcher().get_earnings_calendar('aapl') == {'next_date': '2026-04-30'}
+    assert Fetcher().get_earnings_calendar('AAPL', source='auto') == {'next_date': '2026-04-30'}
+    assert calls == ['aapl']
+    key = Fetcher.get_earnings_calendar.cache_key('AAPL')
+    assert key == 'earnings_calendar_AAPL_AUTO' and data_cache.get_data_cache().exists(key)
+
+    # 無數據不緩存，下次重新獲取
+    Fetcher().get_earnings_calendar('NONE')
+    Fetcher().get_earnings_calendar('NONE')
+    assert calls.count('NONE') == 2
+
+
+def test_until_close_keeps_premarket_writes_into_the_session(tmp_path, monkeypatch):
+    from datetime import datetime
+    from data_layer import data_cache
+
+    assert data_cache.seconds_until_close(datetime(2026, 3, 9, 8, 45)) == 7 * 3600 + 15 * 60
+    assert data_cache.seconds_until_close(datetime(2026, 3, 9, 17, 0)) == 0
+
+    cache = DataCache(cache_dir=str(tmp_path), type_specific_ttl={'fundamentals': 1800, 'dividend': 3600})
+    monkeypatch.setattr(data_cache, '_default_cache', cache)
+
+    class Fetcher:
+        @data_cache.persisted('fundamentals_eps_', until_close=True)
+        def get_eps(self, ticker):
+            return 6.5
+
+        @data_cache.persisted('dividend_history_')
+        def get_dividends(self, ticker):
+            return 0.96
+
+    # 盤前 08:45 預熱：EPS 保留到 16:00，未標記的鍵仍按類型 TTL
+    monkeypatch.setattr(data_cache, 'seconds_until_close', lambda now=None: 7 * 3600 + 15 * 60)
+    Fetcher().get_eps('AAPL')
+    Fetcher().get_dividends('AAPL')
+    assert cache.get_cache_info('fundamentals_eps_AAPL')['ttl'] == 7 * 3600 + 15 * 60
+    assert cache.get_cache_info('dividend_history_AAPL')['ttl'] == 3600
+
+    # 收盤後寫入：回落到類型 TTL
+    monkeypatch.setattr(data_cache, 'seconds_until_close', lambda now=None: 0)
+    cache.delete('fundamentals_eps_AAPL')
+    Fetcher().get_eps('AAPL')
+    assert cache.get_cache_info('fundamentals_eps_AAPL')['ttl'] == 1800
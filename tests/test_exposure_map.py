@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from calculation_layer.exposure_map import DealerExposureCalculator
+from calculation_layer.module16_greeks import GreeksCalculator
+from calculation_layer.module31_advanced_metrics import AdvancedMetricsAnalyzer
+
+
+AS_OF = datetime(2026, 1, 2)
+
+
+def _chain(strikes, call_oi, put_oi, iv=25.0):
+    calls = pd.DataFrame({'strike': strikes, 'openInterest': call_oi, 'impliedVolatility': iv})
+    puts = pd.DataFrame({'strike': strikes, 'openInterest': put_oi, 'impliedVolatility': iv})
+    return {'calls': calls, 'puts': puts}
+
+
+def test_batch_greeks_match_single_contract():
+    calc = GreeksCalculator()
+    batch = GreeksCalculator.calculate_greeks_batch(
+        100.0, [95.0, 105.0], 0.05, [0.25, 0.5], [0.2, 0.3], ['put', 'call']
+    )
+    for i, (k, t, vol, opt) in enumerate([(95.0, 0.25, 0.2, 'put'), (105.0, 0.5, 0.3, 'call')]):
+        single = calc.calculate_all_greeks(100.0, k, 0.05, t, vol, opt, is_american=False)
+        assert np.isclose(batch['delta'][i], single.delta)
+        assert np.isclose(batch['gamma'][i], single.gamma)
+        assert np.isclose(batch['vanna'][i], calc.calculate_vanna(100.0, k, 0.05, t, vol))
+        assert np.isclose(batch['charm'][i], calc.calculate_charm(100.0, k, 0.05, t, vol, opt))
+
+
+def test_exposure_surface_and_key_levels():
+    DealerExposureCalculator.clear_cache()
+    strikes = [90, 95, 100, 105, 110]
+    chains = {
+        '2026-01-16': _chain(strikes, [0, 0, 500, 2000, 500], [500, 2000, 500, 0, 0]),
+        '2026-02-20': _chain(strikes, [0, 0, 100, 400, 100], [100, 400, 100, 0, 0]),
+    }
+    calc = DealerExposureCalculator()
+    exposure = calc.get_exposure_map('TEST', chains, 100.0, as_of=AS_OF)
+
+    assert list(exposure.gamma_surface.columns) == ['2026-01-16', '2026-02-20']
+    assert exposure.call_wall == 105
+    assert exposure.put_wall == 95
+    # 正負 Gamma 對稱分布時翻轉點應接近股價
+    assert exposure.zero_gamma_level is not None
+    assert 95 < exposure.zero_gamma_level < 105
+    assert exposure.max_vanna_strike in strikes
+    assert exposure.to_dict()['key_levels']['call_wall'] == 105
+
+
+def test_exposure_map_is_cached_per_snapshot():
+    DealerExposureCalculator.clear_cache()
+    expiry = (datetime.now() + timedelta(days=30)).strftime('%Y-%m-%d')
+    chains = {expiry: _chain([95, 100, 105], [10, 20, 30], [30, 20, 10])}
+    analyzer = AdvancedMetricsAnalyzer()
+
+    first = analyzer.calculate_exposure_map('TEST', chains, 100.0)
+    second = DealerExposureCalculator().get_exposure_map('TEST', chains, 100.0)
+
+    assert first is second
+    assert DealerExposureCalculator.get_cached(first.snapshot_key) is first
+    assert DealerExposureCalculator.get_cache_stats()['hits'] == 1
+
+
+def test_batch_cross_greeks_with_dividend_yield():
+    calc = GreeksCalculator()
+    q = 0.03
+    batch = GreeksCalculator.calculate_greeks_batch(
+        100.0, [95.0, 105.0], 0.05, [0.25, 0.5], [0.2, 0.3], ['put', 'call'], dividend_yield=q
+    )
+    for i, (k, t, vol, opt) in enumerate([(95.0, 0.25, 0.2, 'put'), (105.0, 0.5, 0.3, 'call')]):
+        assert np.isclose(batch['vanna'][i], calc.calculate_vanna(100.0, k, 0.05, t, vol, q))
+        assert np.isclose(batch['volga'][i], calc.calculate_volga(100.0, k, 0.05, t, vol, q))
+        assert np.isclose(batch['charm'][i], calc.calculate_charm(100.0, k, 0.05, t, vol, opt, q))
+
+        # 與 Delta 的數值導數一致：Vanna = ∂Δ/∂σ（$/百分點），Charm = -∂Δ/∂T（每日）
+        def delta(s=100.0, t=t, vol=vol):
+            return GreeksCalculator.calculate_greeks_batch(s, k, 0.05, t, vol, opt, dividend_yield=q)['delta']
+        h = 1e-5
+        assert np.isclose(batch['vanna'][i], (delta(vol=vol + h) - delta(vol=vol - h)) / (2 * h) / 100, rtol=1e-4)
+        assert np.isclose(batch['charm'][i], -(delta(t=t + h) - delta(t=t - h)) / (2 * h) / 252, rtol=1e-4)
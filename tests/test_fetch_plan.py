@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pytest
+
+from data_layer.fetch_plan import ConcurrentFetchPlan, FetchStep
+
+
+def _sleeper(value, seconds=0.2):
+    def run(_):
+        time.sleep(seconds)
+        return value
+    return run
+
+
+def test_independent_steps_overlap_and_dependencies_receive_results():
+    plan = ConcurrentFetchPlan([
+        FetchStep('expiration', _sleeper('2026-12-18')),
+        FetchStep('chain', lambda deps: f"chain@{deps['expiration']}", depends_on=('expiration',)),
+        FetchStep('vix', _sleeper(18.0)),
+        FetchStep('rate', _sleeper(4.2)),
+    ], max_workers=4)
+    report = plan.run()
+
+    assert report.results['chain'] == 'chain@2026-12-18'
+    assert report.wall_time < 0.45
+    assert report.sequential_time >= 0.6
+
+
+def test_source_limit_serializes_steps_on_same_source():
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def finviz_call(_):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+
+    steps = [FetchStep(f'f{i}', finviz_call, sources=('finviz',)) for i in range(4)]
+    ConcurrentFetchPlan(steps, source_limits={'finviz': 1}, max_workers=4).run()
+    assert peak[0] == 1
+
+
+def test_caller_affinity_and_required_failure():
+    caller = threading.get_ident()
+    report = ConcurrentFetchPlan([
+        FetchStep('ibkr', lambda _: threading.get_ident(), run_on_caller=True),
+        FetchStep('optional', lambda _: 1 / 0, default='fallback'),
+    ]).run()
+    assert report.results['ibkr'] == caller
+    assert report.results['optional'] == 'fallback'
+    assert 'optional' in report.errors
+
+    with pytest.raises(ValueError):
+        ConcurrentFetchPlan([
+            FetchStep('price', lambda _: (_ for _ in ()).throw(ValueError("no price")), required=True),
+            FetchStep('atm', lambda deps: deps['price'], depends_on=('price',)),
+        ]).run()
+
+
+def test_fetcher_failure_and_fallback_records_are_thread_safe(monkeypatch):
+    import sys
+    from concurrent.futures import ThreadPoolExecutor
+
+    from config.settings import settings
+    from data_layer.data_fetcher import DataFetcher
+
+    monkeypatch.setattr(settings, 'MAX_API_FAILURE_RECORDS', 100000)
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)         # 頻繁切換線程，放大競態
+    fetcher = DataFetcher.__new__(DataFetcher)
+    fetcher.api_failures, fetcher.fallback_used = {}, {}
+    fetcher._fallback_lock = threading.RLock()
+
+    def worker(i):
+        for j in range(200):
+            fetcher._record_api_failure('Yahoo V2', f'timeout {i}-{j}')
+            fetcher._record_fallback(f'type{j % 5}', f'source{i}')
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(worker, range(8)))
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert len(fetcher.api_failures['Yahoo V2']) == 1600
+    assert all(sorted(sources) == [f'source{i}' for i in range(8)] for sources in fetcher.fallback_used.values())
+
+
+def test_ibkr_pins_only_ibkr_capable_steps_to_caller():
+    from data_layer.data_fetcher import DataFetcher
+
+    class ConnectedIBKR:
+        def is_connected(self):
+            return True
+
+    fetcher = DataFetcher.__new__(DataFetcher)
+    fetcher.ibkr_client = ConnectedIBKR()
+    plan = fetcher._build_analysis_fetch_plan('AAPL')
+    parallel = {name for name, step in plan.steps.items() if not step.run_on_caller}
+    assert parallel == {'finviz_supplement', 'eps', 'risk_free_rate', 'vix',
+                        'earnings_calendar', 'dividend_calendar'}
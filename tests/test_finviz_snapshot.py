@@ -0,0 +1,133 @@
+import threading
+from datetime import date, timedelta
+
+from data_layer.finviz_scraper import FinvizScraper
+from data_layer.finviz_snapshot import (
+    FinvizSnapshotStore, ingest_daily, is_intraday_screen, parse_screener_table, to_fundamentals
+)
+
+HEADERS = ['No.', 'Ticker', 'Company', 'Sector', 'Market Cap', 'P/E', 'Fwd P/E', 'Dividend',
+           'Float Short', 'Price', 'Change', 'Volume']
+
+
+def _page(rows):
+    header = ''.join(f'<th class="header">{h}</th>' for h in HEADERS)
+    body = ''.join(
+        '<tr class="styled-row">' + ''.join(f'<td><a href="quote.ashx?t={row[1]}">{cell}</a></td>' for cell in row) + '</tr>'
+        for row in rows
+    )
+    return (
+        '<html><body><table><tr><td><table><tr><td>Filters</td></tr></table></td></tr></table>'
+        f'<table class="screener_table"><tr>{header}</tr>{body}</table>'
+        '<table><tr><td>1</td><td>footer</td></tr></table></body></html>'
+    )
+
+
+ROWS = [
+    ['1', 'AAPL', 'Apple Inc.', 'Technology', '3450.12B', '35.10', '30.00', '0.45%', '0.80%', '240.00', '1.25%', '52,000,000'],
+    ['2', 'MSFT', 'Microsoft Corporation', 'Technology', '3100.00B', '-', '32.00', '0.72%', '0.60%', '420.00', '-0.50%', '20,000,000'],
+]
+
+
+class FakeScraper(FinvizScraper):
+    calls = 0
+
+    def get_screener_table(self, filters, max_pages=100):
+        FakeScraper.calls += 1
+        return [to_fundamentals(r, self._parse_value) for r in parse_screener_table(_page(ROWS))], 1
+
+
+def test_parser_extracts_only_screener_rows():
+    scraper = FinvizScraper(snapshot_store=None)
+    rows = [to_fundamentals(r, scraper._parse_value) for r in parse_screener_table(_page(ROWS))]
+    assert [r['ticker'] for r in rows] == ['AAPL', 'MSFT']
+    aapl = rows[0]
+    assert aapl['company_name'] == 'Apple Inc.'
+    assert aapl['market_cap'] == 3450.12e9
+    assert aapl['dividend_yield'] == 0.45
+    assert aapl['short_float'] == 0.8
+    assert 'eps_next_y' not in aapl      # Screener 沒有 EPS next Y 列，不再用價格推算
+    assert rows[1]['pe'] is None
+    assert rows[1]['change_pct'] == -0.5
+
+
+def test_ingest_once_per_day_and_read_locally(tmp_path):
+    store = FinvizSnapshotStore(str(tmp_path / 'snapshot.db'))
+    scraper = FakeScraper(snapshot_store=store)
+    FakeScraper.calls = 0
+
+    screens = ['f=cap_mega,sh_opt_option', 'v=111&f=cap_mega,sh_opt_option', 's=ta_topgainers&f=sh_opt_option']
+    assert ingest_daily(scraper, screens, store, max_pages=5) == {'f=cap_mega,sh_opt_option': 2}
+    assert ingest_daily(scraper, screens, store, max_pages=5) == {}
+    assert FakeScraper.calls == 1
+
+    data = scraper.get_stock_fundamentals('aapl')
+    assert data['snapshot_date'] == date.today().isoformat()
+    assert data['pe'] == 35.1 and data['market_cap'] == 3450.12e9
+    # 價格與盤中字段不從快照提供
+    assert data['price'] is None and data['volume'] is None and data['change_pct'] is None
+    assert data['data_quality'].data_source == 'Finviz'
+
+    results = scraper.get_screener_results('v=111&f=cap_mega,sh_opt_option', limit=1)
+    # 篩選結果同樣不帶快照中的舊價格 / 漲跌幅 / 成交量
+    assert results == [{'ticker': 'AAPL', 'price': None, 'change_pct': None,
+                        'volume': None, 'source': 'Finviz_Snapshot'}]
+    assert store.get_screen('f=cap_mega,sh_opt_option')[0]['pe'] == 35.1
+    assert store.stats()['latest_tickers'] == 2
+
+
+def test_snapshot_age_and_prune(tmp_path):
+    store = FinvizSnapshotStore(str(tmp_path / 'snapshot.db'), max_age_days=3)
+    old = (date.today() - timedelta(days=10)).isoformat()
+    store.save(old, 'f=cap_mega', [{'ticker': 'AAPL', 'price': 200.0}])
+
+    assert store.get_fundamentals('AAPL') is None
+    assert store.get_fundamentals('AAPL', max_age_days=30)['snapshot_date'] == old
+    assert store.get_screen('f=cap_mega') is None
+    assert store.prune(keep_days=5) == 1
+
+
+def test_intraday_screens_are_not_snapshotted():
+    assert is_intraday_screen('s=ta_topgainers&f=sh_opt_option')
+    assert is_intraday_screen('f=ta_change_u5,sh_opt_option')
+    assert not is_intraday_screen('f=cap_smallover,sh_opt_option,sh_avgvol_o500')
+
+
+def test_stock_info_overlays_live_quote_on_snapshot_fundamentals(tmp_path, monkeypatch):
+    import data_layer.data_fetcher as data_fetcher_module
+    from config.settings import settings
+    from data_layer.data_fetcher import DataFetcher
+
+    monkeypatch.setattr(settings, 'SINGLE_FLIGHT_ENABLED', False)
+    stale_day = (date.today() - timedelta(days=2)).isoformat()
+    store = FinvizSnapshotStore(str(tmp_path / 'snapshot.db'))
+    store.save(stale_day, 'f=cap_mega', [{
+        'ticker': 'AAPL', 'price': 240.0, 'volume': 5e7, 'rsi': 71.0, 'change_pct': 1.2,
+        'pe': 35.1, 'eps_ttm': 6.8, 'forward_pe': 30.0, 'sector': 'Technology'
+    }])
+
+    class FakeFinnhub:
+        def quote(self, ticker):
+            return {'c': 252.5, 'o': 250.0, 'h': 253.0, 'l': 249.0, 'pc': 248.0, 'd': 4.5, 'dp': 1.81}
+
+        def company_profile2(self, symbol):
+            return None
+
+    def no_yfinance(ticker):
+        raise AssertionError('live price is already known')
+
+    monkeypatch.setattr(data_fetcher_module.yf, 'Ticker', no_yfinance)
+    fetcher = DataFetcher.__new__(DataFetcher)
+    fetcher.fallback_used, fetcher.api_failures = {}, {}
+    fetcher._fallback_lock = threading.RLock()
+    fetcher.finnhub_client = FakeFinnhub()
+    fetcher.alpha_vantage_client = None
+    fetcher.finviz_scraper = FinvizScraper(snapshot_store=store)
+    fetcher.use_ibkr = False
+    fetcher._rate_limit_delay = lambda *args, **kwargs: None
+
+    info = fetcher.get_stock_info('AAPL')
+    assert info['current_price'] == 252.5 and info['previous_close'] == 248.0
+    assert info['data_source'] == 'Finnhub'
+    assert info['pe_ratio'] == 35.1 and info['eps'] == 6.8 and info['sector'] == 'Technology'
+    assert info['rsi'] is None and info['volume'] is None and info['eps_next_y'] is None
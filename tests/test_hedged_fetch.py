@@ -0,0 +1,154 @@
+import threading
+import time
+
+from data_layer.data_fetcher import DataFetcher
+
+
+def _fetcher():
+    fetcher = DataFetcher.__new__(DataFetcher)
+    fetcher.fallback_used = {}
+    fetcher.api_failures = {}
+    fetcher._fallback_lock = threading.RLock()
+    fetcher._latency_lock = threading.Lock()
+    fetcher._source_latencies = {}
+    fetcher._hedge_executor = None
+    fetcher.hedged_fetch_enabled = True
+    return fetcher
+
+
+def _slow(value, seconds):
+    def fetch(ticker):
+        time.sleep(seconds)
+        return value
+    return fetch
+
+
+def test_slow_primary_is_hedged_and_backup_wins(monkeypatch):
+    from config.settings import settings
+    monkeypatch.setattr(settings, 'HEDGED_FETCH_DEFAULT_BUDGET', 0.1)
+    fetcher = _fetcher()
+
+    start = time.perf_counter()
+    result = fetcher._fetch_with_fallback(
+        'stock_info', ['yahoo', 'finnhub'],
+        {'yahoo': _slow('slow', 1.0), 'finnhub': _slow('fast', 0.05)}, 'AAPL'
+    )
+    assert result == 'fast'
+    assert time.perf_counter() - start < 0.6
+
+    path = fetcher._attempt_paths['stock_info']['history'][-1]
+    assert [(a['source'], a['success'], a['hedged']) for a in path] == [
+        ('yahoo', False, False), ('finnhub', True, True)
+    ]
+    assert path[0]['cancelled'] and 'won hedged race' in path[0]['error_reason']
+    assert fetcher.fallback_used['stock_info'] == ['finnhub']
+    # 輸掉競速的數據源不算降級失敗
+    recorded = [a for attempts in fetcher._attempt_paths['stock_info']['history'][:-1] for a in attempts]
+    assert recorded and all(a['source'] != 'yahoo' for a in recorded)
+
+
+def test_fast_primary_is_not_hedged_and_histogram_is_exposed():
+    fetcher = _fetcher()
+    calls = []
+
+    def backup(ticker):
+        calls.append(ticker)
+        return 'backup'
+
+    for _ in range(3):
+        assert fetcher._fetch_with_fallback('vix', ['yahoo', 'fred'],
+                                            {'yahoo': _slow(18.0, 0.01), 'fred': backup}, 'VIX') == 18.0
+    assert calls == []
+
+    histogram = fetcher.get_source_latency_histogram('vix')['vix/yahoo']
+    assert histogram['count'] == 3
+    assert histogram['success_rate'] == 1.0
+    assert sum(histogram['buckets'].values()) == 3
+
+
+def test_failed_primary_falls_through_immediately():
+    fetcher = _fetcher()
+
+    def broken(ticker):
+        raise ConnectionError("reset")
+
+    assert fetcher._fetch_with_fallback('eps', ['a', 'b'], {'a': broken, 'b': _slow(1.5, 0.01)}, 'X') == 1.5
+    assert fetcher.api_failures['a']
+
+
+class FakeIBKR:
+    """記錄調用所在線程；到期日返回空列表，歷史數據返回固定 K 線"""
+
+    def __init__(self):
+        self.threads = []
+
+    def is_connected(self):
+        return True
+
+    def get_option_expirations(self, ticker):
+        self.threads.append(threading.get_ident())
+        return []
+
+    def get_historical_data(self, ticker, **kwargs):
+        import pandas as pd
+        self.threads.append(threading.get_ident())
+        return pd.DataFrame({'Close': [1.0, 2.0]}, index=pd.date_range('2026-01-01', periods=2))
+
+
+def _getter_fetcher(monkeypatch):
+    from config.settings import settings
+    monkeypatch.setattr(settings, 'HEDGED_FETCH_DEFAULT_BUDGET', 0.1)
+    monkeypatch.setattr(settings, 'FETCH_CACHE_ENABLED', False)
+    monkeypatch.setattr(settings, 'SINGLE_FLIGHT_ENABLED', False)
+    monkeypatch.setattr(settings, 'BAR_STORE_ENABLED', False)
+    fetcher = _fetcher()
+    fetcher.use_ibkr = True
+    fetcher.ibkr_client = FakeIBKR()
+    fetcher.finnhub_client = None
+    fetcher._rate_limit_delay = lambda *args, **kwargs: None
+    fetcher._normalize_ticker = lambda ticker: ticker
+    return fetcher
+
+
+def test_expirations_getter_hedges_http_sources_but_keeps_ibkr_on_caller_thread(monkeypatch):
+    import data_layer.data_fetcher as data_fetcher_module
+    fetcher = _getter_fetcher(monkeypatch)
+
+    class SlowYahooV2:
+        def get_available_expirations(self, ticker):
+            time.sleep(1.0)
+            return [1767225600]
+
+    class FastTicker:
+        def __init__(self, ticker):
+            self.options = ('2026-03-20', '2026-04-17')
+
+    fetcher.yahoo_v2_client = SlowYahooV2()
+    monkeypatch.setattr(data_fetcher_module.yf, 'Ticker', FastTicker)
+
+    start = time.perf_counter()
+    assert fetcher.get_option_expirations('AAPL') == ['2026-03-20', '2026-04-17']
+    assert time.perf_counter() - start < 0.6
+    assert fetcher.ibkr_client.threads == [threading.get_ident()]
+
+    path = fetcher._attempt_paths['option_expirations']['history'][-1]
+    assert [(a['source'], a['success'], a['hedged']) for a in path] == [
+        ('ibkr', False, False), ('yahoo_v2', False, False), ('yfinance', True, True)
+    ]
+    assert fetcher.get_source_latency_histogram('option_expirations')['option_expirations/ibkr']['count'] == 1
+
+
+def test_historical_getter_uses_ibkr_on_caller_thread_without_racing(monkeypatch):
+    import data_layer.data_fetcher as data_fetcher_module
+    fetcher = _getter_fetcher(monkeypatch)
+    fetcher.yahoo_v2_client = None
+
+    def unexpected(ticker):
+        raise AssertionError('yfinance should not start while IBKR answers')
+
+    monkeypatch.setattr(data_fetcher_module.yf, 'Ticker', unexpected)
+
+    hist = fetcher.get_historical_data('AAPL', period='5d')
+    assert list(hist['Close']) == [1.0, 2.0]
+    assert fetcher.ibkr_client.threads == [threading.get_ident()]
+    assert fetcher.fallback_used['historical_data'] == ['IBKR']
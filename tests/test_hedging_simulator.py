@@ -0,0 +1,57 @@
+import numpy as np
+
+from calculation_layer.hedging_simulator import DeltaHedgingSimulator, HedgePolicy
+from calculation_layer.module6_hedge_quantity import HedgeQuantityCalculator
+
+
+S0, K, T, SIGMA = 100.0, 100.0, 30 / 365, 0.25
+
+
+def _paths(n_steps=60, n_paths=4000):
+    return DeltaHedgingSimulator.simulate_gbm_paths(S0, SIGMA, T, n_steps, n_paths, seed=7)
+
+
+def test_frequent_hedging_reduces_error_variance_without_costs():
+    sim = DeltaHedgingSimulator(risk_free_rate=0.0)
+    policies = [HedgePolicy('every_step', 1), HedgePolicy('every_10', 10), HedgePolicy('band', 1, 0.15)]
+    results = sim.simulate(_paths(), K, T, SIGMA, option_type='put', policies=policies,
+                           commission_per_share=0.0, slippage_bps=0.0)
+
+    by_name = {r.policy: r for r in results}
+    assert by_name['every_step'].hedging_error_variance < by_name['every_10'].hedging_error_variance
+    assert by_name['band'].mean_trades < by_name['every_step'].mean_trades
+    # 公平定價 + 無成本：平均對沖誤差接近 0（相對期權金）
+    assert abs(by_name['every_step'].mean_pnl) < 0.1 * sim._bs_price(S0, K, T, SIGMA, False) * 100
+
+
+def test_costs_are_charged_per_trade_and_historical_path_accepted():
+    sim = DeltaHedgingSimulator(risk_free_rate=0.0)
+    path = _paths(n_paths=1)[0]
+    free, costly = (
+        sim.simulate(path, K, T, SIGMA, option_type='call', commission_per_share=c, slippage_bps=b)[0]
+        for c, b in ((0.0, 0.0), (0.01, 5.0))
+    )
+    assert free.n_paths == 1
+    assert costly.mean_transaction_cost > 0 and costly.mean_slippage > 0
+    assert np.isclose(free.mean_pnl - costly.mean_pnl,
+                      costly.mean_transaction_cost + costly.mean_slippage)
+
+
+def test_module6_entry_point_returns_ranked_table():
+    table = HedgeQuantityCalculator().simulate_dynamic_hedge(
+        _paths(n_paths=500), K, T, SIGMA,
+        policies=[HedgePolicy('every_5', 5), HedgePolicy('every_step', 1)], risk_free_rate=0.0
+    )
+    assert list(table['policy']) == ['every_step', 'every_5']
+
+
+def test_dividend_carry_keeps_fair_hedge_unbiased():
+    q = 0.08
+    paths = DeltaHedgingSimulator.simulate_gbm_paths(S0, SIGMA, T, 60, 4000, drift=-q, seed=11)
+    premium = DeltaHedgingSimulator(0.0, q)._bs_price(S0, K, T, SIGMA, False) * 100
+    table = HedgeQuantityCalculator().simulate_dynamic_hedge(
+        paths, K, T, SIGMA, option_type='put', risk_free_rate=0.0, dividend_yield=q,
+        commission_per_share=0.0, slippage_bps=0.0
+    )
+    # 做空正股對沖賣出的 Put：每步支付股息，公平定價下平均對沖誤差仍接近 0
+    assert abs(table['mean_pnl'].iloc[0]) < 0.02 * premium
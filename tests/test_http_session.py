@@ -0,0 +1,80 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from data_layer.http_session import AIOHTTP_AVAILABLE, AsyncHTTPSessionFactory, HTTPSessionFactory
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_shared_session_reuses_connections(server_url):
+    factory = HTTPSessionFactory()
+    session = factory.shared('demo')
+    assert factory.shared('demo') is session
+
+    for _ in range(10):
+        assert session.get(f"{server_url}/quote").json() == {'ok': True}
+
+    stats = factory.stats()['demo']
+    assert stats['requests'] == 10
+    assert stats['new_connections'] == 1
+    assert stats['reuse_ratio'] == pytest.approx(0.9)
+
+
+def test_new_session_has_fresh_cookies_but_shares_pool(server_url):
+    factory = HTTPSessionFactory()
+    first = factory.new_session('yahoo', retries=0)
+    first.cookies.set('B', 'tracking')
+    first.get(server_url)
+    first.close()
+
+    second = factory.new_session('yahoo', retries=0)
+    assert 'B' not in second.cookies
+    second.get(server_url)
+
+    stats = factory.stats()['yahoo']
+    assert stats['requests'] == 2
+    assert stats['new_connections'] == 1
+
+
+@pytest.mark.skipif(not AIOHTTP_AVAILABLE, reason="aiohttp 未安裝")
+def test_async_session_reuses_connections(server_url):
+    factory = AsyncHTTPSessionFactory()
+
+    async def main():
+        session = factory.get('demo')
+        assert factory.get('demo') is session
+        for _ in range(5):
+            async with session.get(server_url) as response:
+                assert (await response.json()) == {'ok': True}
+        await factory.close_all()
+
+    asyncio.run(main())
+    stats = factory.stats()['demo']
+    assert stats['requests'] == 5
+    assert stats['new_connections'] == 1
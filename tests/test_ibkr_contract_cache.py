@@ -0,0 +1,90 @@
+import asyncio
+from types import SimpleNamespace
+
+from ib_insync import Option, OptionChain, Stock
+
+import data_layer.ibkr_contract_cache as contract_cache_module
+from data_layer.ibkr_contract_cache import IBKRContractCache
+
+
+class FakeIB:
+    """記錄往返次數的 IB 替身"""
+
+    def __init__(self):
+        self.qualify_calls = 0
+        self.secdef_calls = 0
+        self.details_calls = 0
+
+    def _fill(self, contracts):
+        for c in contracts:
+            c.conId = abs(hash((c.symbol, c.lastTradeDateOrContractMonth, c.strike, c.right))) % 10**8
+            c.primaryExchange = 'NASDAQ' if c.secType == 'STK' else ''
+        return list(contracts)
+
+    def qualifyContracts(self, *contracts):
+        self.qualify_calls += 1
+        return self._fill(contracts)
+
+    async def qualifyContractsAsync(self, *contracts):
+        self.qualify_calls += 1
+        return self._fill(contracts)
+
+    async def reqSecDefOptParamsAsync(self, symbol, exchange, sec_type, con_id):
+        self.secdef_calls += 1
+        return [OptionChain('SMART', con_id, symbol, '100', ['20260116', '20260220'], [95.0, 100.0, 105.0])]
+
+    def reqContractDetails(self, option_filter):
+        self.details_calls += 1
+        contracts = [Option(option_filter.symbol, option_filter.lastTradeDateOrContractMonth, k, r, 'SMART',
+                            currency='USD') for k in (95.0, 100.0) for r in ('C', 'P')]
+        return [SimpleNamespace(contract=c) for c in self._fill(contracts)]
+
+
+def test_prewarm_then_hot_path_has_no_round_trips(tmp_path):
+    cache = IBKRContractCache(str(tmp_path / 'contracts.json'))
+    ib = FakeIB()
+
+    async def scan():
+        await cache.prewarm_async(ib, ['AAPL', 'MSFT', 'AAPL'])
+        calls_after_prewarm = (ib.qualify_calls, ib.secdef_calls)
+        for _ in range(3):
+            stock = Stock('AAPL', 'SMART', 'USD')
+            await cache.qualify_async(ib, stock)
+            chains = await cache.option_chains_async(ib, stock)
+        return calls_after_prewarm, stock, chains
+
+    (qualify_calls, secdef_calls), stock, chains = asyncio.run(scan())
+    assert (qualify_calls, secdef_calls) == (1, 2)
+    assert (ib.qualify_calls, ib.secdef_calls) == (1, 2)
+    assert stock.conId and stock.primaryExchange == 'NASDAQ'
+    assert chains[0].expirations == ['20260116', '20260220']
+
+
+def test_persisted_across_instances_and_expires_next_day(tmp_path, monkeypatch):
+    path = str(tmp_path / 'contracts.json')
+    ib = FakeIB()
+    IBKRContractCache(path).qualify(ib, Stock('AAPL', 'SMART', 'USD'))
+
+    reloaded = IBKRContractCache(path)
+    stock = Stock('AAPL', 'SMART', 'USD')
+    reloaded.qualify(ib, stock)
+    assert ib.qualify_calls == 1 and stock.conId
+
+    monkeypatch.setattr(contract_cache_module, '_trade_date', lambda: '2999-01-01')
+    reloaded.qualify(ib, Stock('AAPL', 'SMART', 'USD'))
+    assert ib.qualify_calls == 2
+
+
+def test_option_contract_list_also_qualifies_single_options(tmp_path):
+    cache = IBKRContractCache(str(tmp_path / 'contracts.json'))
+    ib = FakeIB()
+    option_filter = Option(symbol='AAPL', lastTradeDateOrContractMonth='20260116', exchange='SMART', currency='USD')
+
+    assert len(cache.option_contracts(ib, option_filter)) == 4
+    assert len(cache.option_contracts(ib, option_filter)) == 4
+    assert ib.details_calls == 1
+
+    option = Option('AAPL', '20260116', 100.0, 'C', 'SMART')
+    assert cache.qualify(ib, option) == [option]
+    assert option.conId and ib.qualify_calls == 0
+    assert cache.stats()['hits'] >= 2
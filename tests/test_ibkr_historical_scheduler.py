@@ -0,0 +1,132 @@
+import asyncio
+
+from ib_insync import Stock
+
+from data_layer.ibkr_historical_scheduler import (
+    PRIORITY_INTERACTIVE, PRIORITY_SCAN, PRIORITY_WARMUP, HistoricalDataScheduler, is_small_bar
+)
+
+
+class FakeIB:
+    """記錄歷史數據請求順序的 IB 替身"""
+
+    def __init__(self, latency=0.02):
+        self.latency = latency
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+
+    async def reqHistoricalDataAsync(self, contract, endDateTime, durationStr, barSizeSetting,
+                                     whatToShow, useRTH, formatDate=1, timeout=60):
+        self.calls.append((contract.symbol, durationStr))
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(self.latency)
+        self.active -= 1
+        return [f"{contract.symbol}-{durationStr}"]
+
+    def run(self, coro):
+        return asyncio.run(coro)
+
+
+def _stock(symbol, con_id):
+    stock = Stock(symbol, 'SMART', 'USD')
+    stock.conId = con_id
+    return stock
+
+
+def test_identical_requests_share_one_round_trip():
+    ib = FakeIB()
+    scheduler = HistoricalDataScheduler()
+
+    async def run():
+        results = await asyncio.gather(*(scheduler.request(ib, _stock('AAPL', 1), '1 Y', '1 day')
+                                         for _ in range(3)))
+        again = await scheduler.request(ib, _stock('AAPL', 1), '1 Y', '1 day')
+        return results, again
+
+    results, again = asyncio.run(run())
+    assert results == [['AAPL-1 Y']] * 3 and again == ['AAPL-1 Y']
+    assert ib.calls == [('AAPL', '1 Y')]
+    stats = scheduler.stats()
+    assert stats['deduplicated'] == 2 and stats['reused'] == 1 and stats['dispatched'] == 1
+
+
+def test_priority_order_when_concurrency_is_saturated():
+    ib = FakeIB(latency=0.05)
+    scheduler = HistoricalDataScheduler(max_concurrent=1)
+
+    async def run():
+        first = asyncio.ensure_future(scheduler.request(ib, _stock('SPY', 1), '1 Y', '1 day'))
+        await asyncio.sleep(0.01)
+        await asyncio.gather(
+            scheduler.request(ib, _stock('WARM', 2), '1 Y', '1 day', priority=PRIORITY_WARMUP),
+            scheduler.request(ib, _stock('SCAN', 3), '1 Y', '1 day', priority=PRIORITY_SCAN),
+            scheduler.request(ib, _stock('DEEP', 4), '1 Y', '1 day', priority=PRIORITY_INTERACTIVE),
+            first
+        )
+
+    asyncio.run(run())
+    assert [symbol for symbol, _ in ib.calls] == ['SPY', 'DEEP', 'SCAN', 'WARM']
+    assert ib.peak == 1
+
+
+def test_window_limit_paces_requests():
+    ib = FakeIB(latency=0.0)
+    scheduler = HistoricalDataScheduler(max_requests=2, window_seconds=0.3)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.gather(*(scheduler.request(ib, _stock(f'S{i}', 10 + i), '1800 S', '5 secs')
+                               for i in range(3)))
+        return loop.time() - started
+
+    elapsed = asyncio.run(run())
+    assert len(ib.calls) == 3
+    assert elapsed >= 0.25
+    assert scheduler.stats()['paced'] == 1
+
+
+def test_window_limit_only_applies_to_small_bars():
+    ib = FakeIB(latency=0.0)
+    scheduler = HistoricalDataScheduler(max_requests=1, window_seconds=5.0)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await scheduler.request(ib, _stock('TICK', 1), '1800 S', '30 secs')
+        # 窗口已滿：日線 / 分鐘線掃描不受影響，同合約與相同請求規則仍然生效
+        await asyncio.gather(*(scheduler.request(ib, _stock(f'S{i}', 10 + i), '1 Y', '1 day')
+                               for i in range(5)))
+        await scheduler.request(ib, _stock('S0', 10), '1 Y', '1 day')
+        await scheduler.request(ib, _stock('TICK', 1), '1 D', '1 min')
+        return loop.time() - started
+
+    assert asyncio.run(run()) < 1.0
+    assert len(ib.calls) == 7
+    stats = scheduler.stats()
+    assert stats['window_used'] == 1 and stats['reused'] == 1 and stats['paced'] == 0
+    assert is_small_bar('1 secs') and is_small_bar('30 secs')
+    assert not is_small_bar('1 min') and not is_small_bar('1 day')
+
+
+def test_same_contract_window_does_not_block_other_contracts():
+    ib = FakeIB(latency=0.0)
+    scheduler = HistoricalDataScheduler(same_contract_limit=1, same_contract_window=0.3)
+
+    async def run():
+        await asyncio.gather(
+            scheduler.request(ib, _stock('AAPL', 1), '1 M', '1 day'),
+            scheduler.request(ib, _stock('AAPL', 1), '1 Y', '1 day'),
+            scheduler.request(ib, _stock('MSFT', 2), '1 M', '1 day'),
+        )
+
+    asyncio.run(run())
+    assert ib.calls == [('AAPL', '1 M'), ('MSFT', '1 M'), ('AAPL', '1 Y')]
+
+
+def test_request_sync_runs_on_ib_loop():
+    ib = FakeIB()
+    scheduler = HistoricalDataScheduler()
+    assert scheduler.request_sync(ib, _stock('AAPL', 1), '1 M', '1 day') == ['AAPL-1 M']
@@ -0,0 +1,175 @@
+import asyncio
+
+import pytest
+from ib_insync import Option, Stock, Ticker
+
+from data_layer.ibkr_market_data_lines import MarketDataLineError, MarketDataLineManager, price_ready
+from data_layer.ibkr_snapshot_engine import ChainSnapshotEngine
+
+
+class FakeIB:
+    """記錄訂閱與取消的 IB 替身（同一合約對象返回同一個 Ticker）"""
+
+    def __init__(self):
+        self.requests = []
+        self.cancels = []
+        self.tickers = {}
+
+    def reqMktData(self, contract, generic_tick_list, snapshot, regulatory):
+        self.requests.append((contract.symbol, generic_tick_list))
+        return self.tickers.setdefault(id(contract), Ticker(contract=contract))
+
+    def cancelMktData(self, contract):
+        self.cancels.append(contract.symbol)
+
+    def run(self, coro):
+        return asyncio.run(coro)
+
+
+def _stock(symbol, con_id):
+    stock = Stock(symbol, 'SMART', 'USD')
+    stock.conId = con_id
+    return stock
+
+
+def test_refcount_reuse_and_lru_eviction():
+    ib = FakeIB()
+    lines = MarketDataLineManager(budget=2)
+    aapl, msft, nvda = _stock('AAPL', 1), _stock('MSFT', 2), _stock('NVDA', 3)
+
+    first = lines.acquire(ib, aapl, owner='scanner')
+    assert lines.acquire(ib, _stock('AAPL', 1), owner='web') is first
+    lines.acquire(ib, msft)
+    assert len(ib.requests) == 2
+
+    # 全部被佔用：拒絕新訂閱
+    with pytest.raises(MarketDataLineError):
+        lines.acquire(ib, nvda)
+
+    lines.release(ib, msft)
+    lines.release(ib, aapl, owner='scanner')
+    lines.release(ib, aapl, owner='web')
+    lines.acquire(ib, aapl)                 # AAPL 變為最近使用
+    lines.acquire(ib, nvda)                 # 淘汰最久未使用的空閒線 MSFT
+    assert ib.cancels == ['MSFT']
+
+    metrics = lines.metrics()
+    assert metrics['active_lines'] == 2 and metrics['held_lines'] == 2
+    assert metrics['evictions'] == 1 and metrics['rejections'] == 1
+    assert metrics['reuses'] == 2 and metrics['utilization'] == 1.0
+
+
+def test_generic_ticks_are_merged_on_the_same_ticker():
+    ib = FakeIB()
+    lines = MarketDataLineManager(budget=5)
+    option = Option('AAPL', '20260116', 100.0, 'C', 'SMART')
+    option.conId = 10
+
+    ticker = lines.acquire(ib, option, '100,101')
+    assert lines.acquire(ib, option, '101,106') is ticker
+    assert ib.requests[-1] == ('AAPL', '100,101,106') and ib.cancels == ['AAPL']
+    assert lines.acquire(ib, option, '100') is ticker
+    assert len(ib.requests) == 2
+
+
+def test_snapshot_reuses_hot_line_without_new_request():
+    ib = FakeIB()
+    lines = MarketDataLineManager(budget=5)
+    stock = _stock('AAPL', 1)
+
+    async def scan():
+        pending = asyncio.ensure_future(lines.snapshot_async(ib, stock, timeout=1.0, ready=price_ready))
+        await asyncio.sleep(0.01)
+        ticker = lines.peek(ib, stock)
+        ticker.last = 240.0
+        ticker.updateEvent.emit(ticker)
+        first = await pending
+        second = await lines.snapshot_async(ib, _stock('AAPL', 1), timeout=1.0, ready=price_ready)
+        return first, second
+
+    first, second = asyncio.run(scan())
+    assert first is second and second.last == 240.0
+    assert len(ib.requests) == 1 and not ib.cancels
+    assert lines.metrics()['held_lines'] == 0
+
+
+def test_idle_lines_expire_and_clear_cancels_per_connection():
+    ib, other = FakeIB(), FakeIB()
+    lines = MarketDataLineManager(budget=5, idle_ttl=0.0)
+    lines.acquire(ib, _stock('AAPL', 1))
+    lines.release(ib, _stock('AAPL', 1))
+    # 另一個連接申請時不取消本連接的線（只能在訂閱它的線程上取消）
+    lines.acquire(other, _stock('MSFT', 2))
+    assert ib.cancels == [] and lines.metrics()['expired'] == 0
+    lines.acquire(ib, _stock('NVDA', 3))
+    assert ib.cancels == ['AAPL'] and lines.metrics()['expired'] == 1
+
+    assert lines.clear(ib) == 1
+    assert lines.clear(other) == 1 and other.cancels == ['MSFT']
+
+
+def test_lines_are_per_connection_but_budget_is_shared():
+    scanner_ib, analysis_ib = FakeIB(), FakeIB()     # 掃描器在另一個線程 / 事件循環上有自己的連接
+    lines = MarketDataLineManager(budget=3)
+
+    scanner_ticker = lines.acquire(scanner_ib, _stock('AAPL', 1), owner='scanner')
+    analysis_ticker = lines.acquire(analysis_ib, _stock('AAPL', 1), owner='ibkr_client')
+
+    # 第二個連接自己訂閱，拿到的是自己的 Ticker
+    assert analysis_ticker is not scanner_ticker
+    assert scanner_ib.requests == analysis_ib.requests == [('AAPL', '')]
+    assert lines.peek(analysis_ib, _stock('AAPL', 1)) is analysis_ticker
+    assert lines.peek(FakeIB(), _stock('AAPL', 1)) is None
+
+    # 預算按帳戶共享：兩條 AAPL 線 + 一條 MSFT 後已滿
+    lines.acquire(scanner_ib, _stock('MSFT', 2))
+    with pytest.raises(MarketDataLineError):
+        lines.acquire(analysis_ib, _stock('NVDA', 3))
+    assert lines.metrics()['active_lines'] == 3
+
+    # 釋放只作用於對應連接的線路
+    assert not lines.release(analysis_ib, _stock('MSFT', 2))
+    assert lines.release(scanner_ib, _stock('AAPL', 1), owner='scanner')
+    # 其他連接的空閒線既不計入可用數，也不會被跨線程淘汰
+    assert lines.available(analysis_ib) == 0 and lines.available(scanner_ib) == 1
+    with pytest.raises(MarketDataLineError):
+        lines.acquire(analysis_ib, _stock('NVDA', 3))
+    assert scanner_ib.cancels == []
+    # 掃描器自己的連接可以淘汰它
+    lines.acquire(scanner_ib, _stock('NVDA', 3))
+    assert scanner_ib.cancels == ['AAPL'] and analysis_ib.cancels == []
+    assert lines.peek(analysis_ib, _stock('AAPL', 1)) is analysis_ticker
+
+
+class QuotingIB(FakeIB):
+    """訂閱後立即推送 bid/ask 的 IB 替身"""
+
+    async def qualifyContractsAsync(self, *contracts):
+        return contracts
+
+    def reqMktData(self, contract, generic_tick_list, snapshot, regulatory):
+        ticker = super().reqMktData(contract, generic_tick_list, snapshot, regulatory)
+        ticker.bid, ticker.ask = 1.0, 1.1
+        return ticker
+
+
+def test_snapshot_engine_window_draws_from_shared_budget():
+    ib = QuotingIB()
+    lines = MarketDataLineManager(budget=4)
+    held = _stock('AAPL', 1)
+    lines.acquire(ib, held, owner='scanner')
+    engine = ChainSnapshotEngine(ib, max_in_flight=80, require_greeks=False, lines=lines)
+    contracts = []
+    for strike in range(100, 110):
+        option = Option('AAPL', '20260116', strike, 'C', 'SMART')
+        option.conId = 1000 + strike
+        contracts.append(option)
+
+    tickers = engine.capture(contracts)
+
+    assert all(t.bid == 1.0 for t in tickers)
+    assert engine.last_stats['max_in_flight'] == 3
+    assert engine.last_stats['peak_in_flight'] == 3
+    metrics = lines.metrics()
+    assert metrics['active_lines'] == 4 and metrics['held_lines'] == 1
+    assert lines.peek(ib, held) is not None     # 被持有的線不會被淘汰
@@ -0,0 +1,121 @@
+import asyncio
+from datetime import datetime
+
+from ib_insync import Stock, Ticker
+from ib_insync.objects import BarData, OptionChain, TickAttribLast, TickByTickAllLast
+
+from data_layer.ibkr_contract_cache import contract_key
+from data_layer.ibkr_historical_scheduler import HistoricalDataScheduler
+from data_layer.ibkr_market_data_lines import MarketDataLineManager, price_ready
+from data_layer.ibkr_recorder import MarketDataLog, MarketDataRecorder, RecordingIB, ReplayIB
+from data_layer.tick_ring_buffer import TickPipeline
+
+
+class FakeIB:
+    """模擬 Gateway 響應的 IB 替身（被 RecordingIB 包裝）"""
+
+    def __init__(self):
+        self.tickers = {}
+
+    async def qualifyContractsAsync(self, *contracts):
+        for contract in contracts:
+            contract.conId = {'AAPL': 265598, 'NVDA': 4815747}[contract.symbol]
+        return list(contracts)
+
+    async def reqSecDefOptParamsAsync(self, symbol, exchange, sec_type, con_id):
+        return [OptionChain('SMART', con_id, '100', '100', ['20260116'], [100.0, 105.0])]
+
+    async def reqHistoricalDataAsync(self, contract, endDateTime, durationStr, barSizeSetting, whatToShow,
+                                     useRTH, formatDate=1, keepUpToDate=False, chartOptions=[], timeout=60):
+        return [BarData(date=datetime(2026, 1, 2), open=1.0, high=2.0, low=0.5, close=1.5, volume=100)]
+
+    def reqMktData(self, contract, genericTickList='', snapshot=False, regulatorySnapshot=False,
+                   mktDataOptions=None):
+        return self.tickers.setdefault(contract.symbol, Ticker(contract=contract))
+
+    def cancelMktData(self, contract):
+        pass
+
+    def reqTickByTickData(self, contract, tickType, numberOfTicks=0, ignoreSize=False):
+        return self.tickers.setdefault(contract.symbol, Ticker(contract=contract))
+
+    def cancelTickByTickData(self, contract, tickType):
+        pass
+
+
+def _record_session(path):
+    fake = FakeIB()
+    recorder = MarketDataRecorder(str(path))
+    ib = RecordingIB(fake, recorder)
+
+    async def session():
+        aapl, nvda = Stock('AAPL', 'SMART', 'USD'), Stock('NVDA', 'SMART', 'USD')
+        await ib.qualifyContractsAsync(aapl, nvda)
+        await ib.reqSecDefOptParamsAsync('AAPL', '', 'STK', aapl.conId)
+        await ib.reqHistoricalDataAsync(aapl, '', '1 M', '1 day', 'TRADES', True)
+
+        ticker = ib.reqMktData(aapl, '', False, False)
+        for last in (240.0, 240.5):
+            await asyncio.sleep(0.01)
+            ticker.last = last
+            ticker.updateEvent.emit(ticker)
+        ib.cancelMktData(aapl)
+
+        tbt = ib.reqTickByTickData(nvda, 'AllLast')
+        tbt.tickByTicks = [TickByTickAllLast(1, datetime(2026, 1, 2, 15), 130.0, 500, TickAttribLast(), 'D', '')]
+        tbt.updateEvent.emit(tbt)
+        ib.cancelTickByTickData(nvda, 'AllLast')
+
+    asyncio.run(session())
+    recorder.close()
+
+
+def test_log_indexes_responses_and_stream_segments(tmp_path):
+    path = tmp_path / 'session.ibkrlog'
+    _record_session(path)
+
+    log = MarketDataLog(str(path))
+    summary = log.summary()
+    assert summary['responses'] == {'qualify': 2, 'secdef': 1, 'historical': 1}
+    assert summary['streams'] == 2 and summary['updates'] == 3 and summary['tick_by_ticks'] == 1
+
+    updates = log.segments[contract_key(Stock('AAPL', 'SMART', 'USD'))][0]
+    assert [values['last'] for _, values, _ in updates] == [240.0, 240.5]
+    assert updates[0][0] < updates[1][0]
+
+
+def test_replay_serves_shared_components_at_max_speed(tmp_path):
+    path = tmp_path / 'session.ibkrlog'
+    _record_session(path)
+    ib = ReplayIB(str(path), speed=0)
+    lines = MarketDataLineManager(budget=5)
+    scheduler = HistoricalDataScheduler()
+    pipeline = TickPipeline(ib, capacity=8)
+
+    async def replay():
+        await ib.connectAsync('127.0.0.1', 4002, clientId=1)
+        aapl, nvda = Stock('AAPL', 'SMART', 'USD'), Stock('NVDA', 'SMART', 'USD')
+        qualified = await ib.qualifyContractsAsync(aapl, nvda)
+        chains = await ib.reqSecDefOptParamsAsync('AAPL', '', 'STK', aapl.conId)
+        bars = await scheduler.request(ib, aapl, '1 M', '1 day')
+        ticker = await lines.snapshot_async(ib, aapl, timeout=1.0, ready=price_ready)
+        buf = pipeline.follow(nvda)
+        await asyncio.sleep(0)
+        return qualified, chains, bars, ticker, buf
+
+    qualified, chains, bars, ticker, buf = asyncio.run(replay())
+    assert [c.conId for c in qualified] == [265598, 4815747]
+    assert chains[0].strikes == [100.0, 105.0]
+    assert bars[0].close == 1.5
+    assert ticker.last == 240.5          # 最高速：整段更新在等待期間推送完畢
+    assert buf.trades().dark_volume() == 500.0
+    assert ib.stats['missing'] == 0
+
+
+def test_missing_response_returns_empty_result(tmp_path):
+    path = tmp_path / 'session.ibkrlog'
+    _record_session(path)
+    ib = ReplayIB(str(path), speed=0)
+
+    bars = asyncio.run(ib.reqHistoricalDataAsync(Stock('MSFT', 'SMART', 'USD'), '', '1 Y', '1 day', 'TRADES', True))
+    assert bars == [] and ib.stats['missing'] == 1
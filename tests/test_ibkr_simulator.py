@@ -0,0 +1,86 @@
+import asyncio
+
+from ib_insync import Option, Stock
+
+from data_layer.ibkr_historical_scheduler import HistoricalDataScheduler
+from data_layer.ibkr_market_data_lines import MarketDataLineManager, price_ready
+from data_layer.ibkr_simulator import SimulatedIB, SimulatorConfig
+
+
+def _simulator(**overrides):
+    # 同步接口經 ib_insync.util.run 使用當前線程的事件循環（之前的 asyncio.run 會將其清空）
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    config = SimulatorConfig(latency=0.001, tick_interval=0.01, **overrides)
+    ib = SimulatedIB(config)
+    ib.connect()
+    return ib
+
+
+def test_synthesizes_contracts_chains_and_bars_deterministically():
+    ib, other = _simulator(), _simulator()
+    aapl = Stock('AAPL', 'SMART', 'USD')
+    [qualified] = ib.qualifyContracts(aapl)
+    assert qualified.conId > 0
+    assert other.qualifyContracts(Stock('AAPL', 'SMART', 'USD'))[0].conId == qualified.conId
+
+    [chain] = ib.reqSecDefOptParams('AAPL', '', 'STK', aapl.conId)
+    assert chain.underlyingConId == aapl.conId and chain.multiplier == '100'
+    assert len(chain.expirations) >= 16 and chain.strikes == sorted(chain.strikes)
+
+    daily = ib.reqHistoricalData(aapl, '', '1 Y', '1 day', 'TRADES', True)
+    assert len(daily) == 260
+    assert all(b.low <= min(b.open, b.close) and b.high >= max(b.open, b.close) for b in daily)
+    assert len(ib.reqHistoricalData(aapl, '', '1 D', '5 mins', 'TRADES', True)) == 78
+
+    option = Option('AAPL', chain.expirations[4], chain.strikes[len(chain.strikes) // 2], 'C', 'SMART')
+    assert ib.qualifyContracts(option)[0].conId > 0
+    assert ib.stats['missing'] == 0 and ib.stats['synthetic'] == 5
+
+
+def test_historical_pacing_and_line_limit_raise_gateway_errors():
+    ib = _simulator(hist_max_requests=2, max_market_data_lines=1)
+    errors = []
+    ib.errorEvent += lambda req_id, code, message, contract: errors.append(code)
+    aapl, msft = Stock('AAPL', 'SMART', 'USD'), Stock('MSFT', 'SMART', 'USD')
+
+    assert ib.reqHistoricalData(aapl, '', '1 M', '1 day', 'TRADES', True)
+    assert ib.reqHistoricalData(aapl, '', '1 M', '1 day', 'TRADES', True) == []   # 15 秒內重複請求
+    assert ib.reqHistoricalData(msft, '', '1 M', '1 day', 'TRADES', True)
+    assert ib.reqHistoricalData(msft, '', '1 Y', '1 day', 'TRADES', True) == []   # 窗口已滿
+    assert errors == [162, 162]
+
+    ib.reqMktData(aapl)
+    rejected = ib.reqMktData(msft)
+    ib.sleep(0.05)
+    assert errors[-1] == 101 and rejected.last != rejected.last   # 未訂閱，無數據
+    ib.cancelMktData(aapl)
+    ib.reqMktData(msft)
+    metrics = ib.metrics()
+    assert metrics['pacing_violations'] == 2 and metrics['line_rejections'] == 1
+    assert metrics['peak_lines'] == 1 and metrics['active_lines'] == 1
+
+
+def test_streams_feed_shared_components():
+    ib = _simulator()
+    lines = MarketDataLineManager(budget=5)
+    scheduler = HistoricalDataScheduler()
+
+    async def scan():
+        stock = Stock('NVDA', 'SMART', 'USD')
+        await ib.qualifyContractsAsync(stock)
+        [chain] = await ib.reqSecDefOptParamsAsync('NVDA', '', 'STK', stock.conId)
+        bars = await scheduler.request(ib, stock, '1 M', '1 day')
+        quote = await lines.snapshot_async(ib, stock, timeout=1.0, ready=price_ready)
+        option = Option('NVDA', chain.expirations[6], chain.strikes[len(chain.strikes) // 2], 'P', 'SMART')
+        await ib.qualifyContractsAsync(option)
+        greeks = await lines.snapshot_async(ib, option, '100,101', timeout=1.0)
+        tbt = ib.reqTickByTickData(stock, 'AllLast')
+        await asyncio.sleep(0.05)
+        return bars, quote, greeks, tbt
+
+    bars, quote, greeks, tbt = asyncio.run(scan())
+    assert bars[-1].close == quote.close
+    assert quote.bid < quote.ask and quote.last > 0
+    assert greeks.modelGreeks.delta < 0 and greeks.modelGreeks.impliedVol > 0
+    assert greeks.putOpenInterest > 0
+    assert tbt.tickByTicks
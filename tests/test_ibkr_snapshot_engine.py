@@ -0,0 +1,121 @@
+import asyncio
+
+from ib_insync import Option, OptionComputation, Ticker
+
+from data_layer.ibkr_snapshot_engine import ChainSnapshotEngine, to_columns
+
+
+class FakeIB:
+    """按固定延遲推送 quote 與 modelGreeks 更新的 IB 替身"""
+
+    def __init__(self, latency=0.02, silent_strikes=(), unknown_strikes=(), quotes=True):
+        self.latency = latency
+        self.quotes = quotes
+        self.silent_strikes = set(silent_strikes)
+        self.unknown_strikes = set(unknown_strikes)
+        self.active = set()
+        self.peak = 0
+
+    async def qualifyContractsAsync(self, *contracts):
+        for contract in contracts:
+            if contract.strike not in self.unknown_strikes:
+                contract.conId = 1000 + int(contract.strike)
+        return contracts
+
+    def reqMktData(self, contract, generic_tick_list, snapshot, regulatory):
+        self.active.add(id(contract))
+        self.peak = max(self.peak, len(self.active))
+        ticker = Ticker(contract=contract)
+        if contract.strike not in self.silent_strikes:
+            loop = asyncio.get_running_loop()
+            loop.call_later(self.latency, self._push, ticker)
+            loop.call_later(self.latency * 2, self._push, ticker)
+        return ticker
+
+    def _push(self, ticker):
+        if self.quotes:
+            ticker.bid, ticker.ask = 1.0, 1.1
+        else:
+            ticker.close = 1.05
+        ticker.modelGreeks = OptionComputation(
+            tickAttrib=0, impliedVol=0.3, delta=0.5, optPrice=1.05, pvDividend=0.0,
+            gamma=0.02, vega=0.1, theta=-0.05, undPrice=100.0
+        )
+        ticker.updateEvent.emit(ticker)
+
+    def cancelMktData(self, contract):
+        self.active.discard(id(contract))
+
+    def run(self, coro):
+        return asyncio.run(coro)
+
+
+def _contracts(strikes):
+    return [Option('AAPL', '20260116', strike, 'C', 'SMART') for strike in strikes]
+
+
+def test_window_bounds_in_flight_and_completes_on_updates():
+    ib = FakeIB(latency=0.02)
+    engine = ChainSnapshotEngine(ib, max_in_flight=3, contract_timeout=2.0)
+    contracts = _contracts(range(100, 110))
+
+    tickers = engine.capture(contracts)
+
+    assert [t.contract.strike for t in tickers] == [c.strike for c in contracts]
+    assert all(t.bid == 1.0 and t.modelGreeks.delta == 0.5 for t in tickers)
+    assert ib.peak == 3 and not ib.active
+    stats = engine.last_stats
+    assert stats['completed'] == 10 and stats['timed_out'] == 0
+    # 4 批 × 約 2 次更新延遲，遠低於單合約超時
+    assert stats['elapsed'] < 1.0
+
+
+def test_silent_contract_times_out_without_blocking_others():
+    ib = FakeIB(latency=0.01, silent_strikes={103})
+    engine = ChainSnapshotEngine(ib, max_in_flight=2, contract_timeout=0.3)
+
+    tickers = engine.capture(_contracts(range(100, 106)))
+
+    assert engine.last_stats['timed_out'] == 1
+    assert tickers[3].bid != tickers[3].bid  # NaN：沒有數據但仍返回
+    assert all(t.bid == 1.0 for i, t in enumerate(tickers) if i != 3)
+    assert engine.last_stats['elapsed'] < 1.0
+
+
+def test_greeks_only_contracts_finish_when_greeks_settle():
+    # 常規時段但沒有雙邊報價（延遲 / 只有 Greeks）：Greeks 穩定後完成，不等單合約超時
+    ib = FakeIB(latency=0.01, quotes=False)
+    engine = ChainSnapshotEngine(ib, max_in_flight=2, contract_timeout=2.0, settle_seconds=0.05,
+                                 is_primary_session=lambda: True)
+
+    tickers = engine.capture(_contracts(range(100, 106)))
+
+    assert engine.last_stats['timed_out'] == 0 and engine.last_stats['elapsed'] < 1.0
+    assert all(t.modelGreeks.delta == 0.5 for t in tickers)
+
+
+def test_off_session_accepts_close_without_quotes():
+    ib = FakeIB(latency=0.01, quotes=False)
+    engine = ChainSnapshotEngine(ib, max_in_flight=2, contract_timeout=2.0, settle_seconds=5.0,
+                                 require_greeks=False, is_primary_session=lambda: False)
+
+    tickers = engine.capture(_contracts(range(100, 106)))
+
+    assert engine.last_stats['timed_out'] == 0 and engine.last_stats['elapsed'] < 0.5
+    assert all(t.close == 1.05 for t in tickers)
+
+
+def test_unqualified_contracts_are_skipped():
+    ib = FakeIB(unknown_strikes={101})
+    engine = ChainSnapshotEngine(ib, max_in_flight=5)
+
+    tickers = engine.capture(_contracts([100, 101, 102]))
+
+    assert tickers[1] is None
+    assert engine.last_stats['completed'] == 2
+
+
+def test_to_columns():
+    rows = [{'strike': 100.0, 'bid': 1.0}, {'strike': 105.0, 'bid': 0.5}]
+    assert to_columns(rows) == {'strike': [100.0, 105.0], 'bid': [1.0, 0.5]}
+    assert to_columns([]) == {}
@@ -0,0 +1,74 @@
+from datetime import datetime
+
+import pandas as pd
+
+from calculation_layer.module12_annual_yield import IncomeYieldMatrixScreener
+
+
+AS_OF = datetime(2026, 1, 2)
+
+
+def _chain(strikes, bids, asks, volume=500, oi=1000, iv=25.0):
+    rows = [
+        {'strike': k, 'bid': b, 'ask': a, 'volume': volume, 'openInterest': oi, 'impliedVolatility': iv}
+        for k, b, a in zip(strikes, bids, asks)
+    ]
+    return pd.DataFrame(rows)
+
+
+def test_screen_chain_matches_single_contract_formula():
+    chains = {
+        '2026-02-01': {
+            'puts': _chain([90, 95, 100], [0.50, 1.20, 2.50], [0.55, 1.30, 2.60]),
+            'calls': _chain([100, 105], [2.40, 0.90], [2.50, 0.95]),
+        }
+    }
+    table = IncomeYieldMatrixScreener().screen_chain('TEST', 100.0, chains, as_of=AS_OF)
+
+    assert list(table['rank']) == list(range(1, len(table) + 1))
+    assert table['annualized_yield'].is_monotonic_decreasing
+
+    put_95 = table[(table['strategy'] == 'short_put') & (table['strike'] == 95)].iloc[0]
+    # 與 AnnualYieldCalculator 一致: 期權金 / 持倉成本 × 年化
+    assert abs(put_95['annualized_yield'] - round(1.20 / 95 * 365 / 30 * 100, 2)) < 0.01
+    assert put_95['breakeven'] == 93.8
+    assert 0 < put_95['pop'] < 100
+
+
+def test_liquidity_and_otm_masks():
+    chains = {
+        '2026-02-01': {
+            # 105 put 為價內；110 put 流動性不足；85 put spread 過寬
+            'puts': pd.concat([
+                _chain([105], [6.0], [6.2]),
+                _chain([110], [10.0], [10.2], volume=0, oi=0),
+                _chain([85], [0.10], [0.50]),
+                _chain([95], [1.0], [1.05]),
+            ]),
+        }
+    }
+    table = IncomeYieldMatrixScreener().screen_chain('TEST', 100.0, chains, strategies=('short_put',), as_of=AS_OF)
+    assert list(table['strike']) == [95]
+
+
+def test_screen_watchlist_ranks_across_tickers():
+    watchlist = {
+        'AAA': {'stock_price': 100.0, 'chains': {'2026-02-01': {'puts': _chain([95], [1.0], [1.05])}}},
+        'BBB': {'stock_price': 50.0, 'chains': {'2026-02-01': {'puts': _chain([48], [1.0], [1.05])}}},
+        'CCC': {'stock_price': 0, 'chains': {}},
+    }
+    table = IncomeYieldMatrixScreener().screen_watchlist(watchlist, strategies=('short_put',), as_of=AS_OF)
+    assert list(table['ticker']) == ['BBB', 'AAA']
+    assert IncomeYieldMatrixScreener().screen_watchlist({}, as_of=AS_OF).empty
+
+
+def test_far_otm_put_margin_uses_strike_floor():
+    chains = {'2026-02-01': {'puts': _chain([60, 95], [0.10, 1.20], [0.105, 1.30])}}
+    table = IncomeYieldMatrixScreener().screen_chain('TEST', 100.0, chains, strategies=('short_put',), as_of=AS_OF)
+    annualize = 365 / 30 * 100
+
+    far = table[table['strike'] == 60].iloc[0]
+    # Reg T 下限 = 10% × 行使價 + 權利金（而非 10% × 股價）
+    assert abs(far['yield_on_margin'] - round(0.10 / (0.10 * 60 + 0.10) * annualize, 2)) < 0.01
+    near = table[table['strike'] == 95].iloc[0]
+    assert abs(near['yield_on_margin'] - round(1.20 / (0.20 * 100 - 5 + 1.20) * annualize, 2)) < 0.01
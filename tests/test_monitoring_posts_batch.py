@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from calculation_layer.module14_monitoring_posts import (
+    MonitoringPostsBatchEvaluator,
+    MonitoringPostsCalculator,
+)
+
+
+def _watchlist():
+    today = datetime.now()
+    day = lambda n: (today + timedelta(days=n)).strftime('%Y-%m-%d')
+    return pd.DataFrame([
+        {'ticker': 'AAPL', 'stock_price': 180.0, 'option_premium': 2.5, 'iv': 28.0, 'delta': 0.25,
+         'open_interest': 800, 'volume': 150, 'bid_ask_spread': 0.05, 'atr': 3.0, 'vix': 16.0,
+         'expiration_date': day(45), 'earnings_date': day(60), 'iv_rank': 50.0},
+        {'ticker': 'TSLA', 'stock_price': 250.0, 'option_premium': 1.0, 'iv': 65.0, 'delta': 0.12,
+         'open_interest': 50, 'volume': 40, 'bid_ask_spread': 0.20, 'atr': 15.0, 'vix': 27.0,
+         'expiration_date': day(3), 'dividend_date': day(2), 'iv_rank': 85.0},
+        {'ticker': 'MSFT', 'stock_price': 400.0, 'option_premium': 4.0, 'iv': 22.0, 'delta': 0.40,
+         'open_interest': 300, 'volume': 5, 'bid_ask_spread': 0.30, 'atr': 5.0, 'vix': 16.0,
+         'expiration_date': day(120)},
+    ])
+
+
+def test_batch_matches_single_ticker_calculator():
+    watchlist = _watchlist()
+    table = MonitoringPostsBatchEvaluator().evaluate(watchlist)
+    calc = MonitoringPostsCalculator()
+
+    for row in watchlist.to_dict('records'):
+        single = calc.calculate(
+            stock_price=row['stock_price'], option_premium=row['option_premium'], iv=row['iv'],
+            delta=row['delta'], open_interest=row['open_interest'], volume=row['volume'],
+            bid_ask_spread=row['bid_ask_spread'], atr=row['atr'], vix=row['vix'],
+            dividend_date=row.get('dividend_date') if isinstance(row.get('dividend_date'), str) else '',
+            earnings_date=row.get('earnings_date') if isinstance(row.get('earnings_date'), str) else '',
+            expiration_date=row['expiration_date'],
+        ).to_dict()
+        iv_rank = row.get('iv_rank')
+        post13 = calc.check_iv_rank_post(None if pd.isna(iv_rank) else iv_rank)
+        alerts = single['total_alerts'] + int(not pd.isna(iv_rank) and (iv_rank > 70 or iv_rank < 30))
+
+        batch = table.loc[row['ticker']]
+        for column in MonitoringPostsBatchEvaluator.STATUS_COLUMNS.values():
+            expected = post13['status'] if column.startswith('post13') else single[column]
+            assert batch[column] == expected, (row['ticker'], column)
+        assert batch['total_alerts'] == alerts
+        assert batch['risk_level'] == MonitoringPostsCalculator.risk_level_from_alerts(alerts)
+
+
+def test_refresh_only_recomputes_changed_posts():
+    evaluator = MonitoringPostsBatchEvaluator()
+    watchlist = _watchlist()
+    as_of = datetime.now()
+    evaluator.evaluate(watchlist, as_of=as_of)
+    recomputed = evaluator.stats['posts_recomputed']
+    assert recomputed == 3 * 13
+
+    evaluator.evaluate(watchlist, as_of=as_of)
+    assert evaluator.stats['posts_recomputed'] == recomputed
+
+    watchlist.loc[watchlist['ticker'] == 'AAPL', 'vix'] = 30.0
+    table = evaluator.evaluate(watchlist, as_of=as_of)
+    # vix 影響崗位3與崗位12，只重算 AAPL
+    assert evaluator.stats['posts_recomputed'] == recomputed + 2
+    assert table.loc['AAPL', 'post12_vix_status'] == "! 警報"
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from calculation_layer.module25_volatility_smile import VolatilitySmileAnalyzer
+from data_layer.option_chain import OptionChain
+
+
+def _side(strikes, iv=0.3):
+    n = len(strikes)
+    return pd.DataFrame({
+        'strike': strikes,
+        'lastPrice': np.linspace(5.0, 0.35, n),
+        'bid': np.linspace(4.9, 0.3, n),
+        'ask': np.linspace(5.1, 0.4, n),
+        'volume': [np.nan] + [10.0] * (n - 1),
+        'openInterest': np.arange(n) * 100.0,
+        'impliedVolatility': [iv] * n,
+        'data_quality': pd.Categorical(['complete'] * n),
+    })
+
+
+def test_compact_sorted_readonly_columns_and_zero_copy_frames():
+    calls = _side([110.0, 100.0, 105.0])
+    chain = OptionChain.from_frames(calls, _side([100.0, 105.0]).to_dict('records'), 'SPY', '2026-03-20')
+
+    assert len(chain) == 5 and chain.count('C') == 3 and chain.expirations == ['2026-03-20']
+    assert chain.strikes.dtype == np.float64 and chain.columns['bid'].dtype == np.float32
+    assert chain.columns['volume'].dtype == np.int32 and chain.calls.column('volume')[2] == 0
+    assert chain.calls.strikes.tolist() == [100.0, 105.0, 110.0]
+    with pytest.raises(ValueError):
+        chain.columns['bid'][0] = 1.0
+
+    frame = chain.to_frame('P')
+    assert np.shares_memory(frame['bid'].to_numpy(), chain.columns['bid'])
+    frame['bid'] = 0.0                                  # 寫入先複製，不影響共用的列
+    assert chain.puts.column('bid')[0] > 0
+
+    row = chain.calls.row(2)
+    assert row['strike'] == 110.0 and row['lastPrice'] == 5.0 and row['data_quality'] == 'complete'
+    assert chain.puts.records(1)[0]['lastPrice'] == 0.35     # float32 還原為最短表示
+
+    iv = chain.column('impliedVolatility')
+    filled = chain.with_columns(impliedVolatility=np.where(iv > 0.2, 0.25, iv))
+    assert filled.column('impliedVolatility')[0] == np.float32(0.25) and iv[0] == np.float32(0.3)
+    assert filled.columns['bid'] is chain.columns['bid']
+
+
+def test_strike_lookups_and_expiry_views():
+    chain = OptionChain.from_frames(
+        pd.concat([_side([95.0, 100.0, 105.0]).assign(expiration='2026-04-17'),
+                   _side([90.0, 100.0]).assign(expiration='2026-03-20')]),
+        _side([100.0, 102.5]),
+        'SPY', '2026-03-20'
+    )
+
+    assert chain.expirations == ['2026-03-20', '2026-04-17']
+    near = chain.select('C', '2026-03-20')
+    assert near.strikes.tolist() == [90.0, 100.0] and np.shares_memory(near.strikes, chain.strikes)
+    assert chain.select(expiry='2026-03-20').count() == 4
+
+    assert chain.strikes[chain.index(100.004, 'call', '2026-04-17')] == 100.0
+    assert chain.expiries[chain.index(100.0, 'C')] == '2026-03-20'     # 未指定到期日取最近
+    assert chain.index(101.0, 'P') is None
+
+    puts = chain.puts
+    assert puts.strikes[puts.nearest(101.25)] == 100.0                 # 等距取較低行使價
+    assert puts.strikes[puts.nearest_many([0, 101.3, 500])].tolist() == [100.0, 102.5, 102.5]
+    assert chain.strikes[chain.nearest(96.0, 'C')] == 95.0             # 跨到期日
+    assert OptionChain.coerce({}).nearest(100.0, 'C') is None
+
+
+def test_smile_analyzer_accepts_chain_and_legacy_dict_equally():
+    strikes = np.arange(80.0, 121.0, 2.5)
+    calls, puts = _side(strikes, iv=32.0), _side(strikes, iv=35.0)
+    calls.loc[3, 'impliedVolatility'] = np.nan
+    legacy = {'calls': calls.to_dict('records'), 'puts': puts.to_dict('records')}
+
+    analyzer = VolatilitySmileAnalyzer()
+    from_chain = analyzer.analyze_smile(OptionChain.from_frames(calls, puts), 100.2, 0.1).to_dict()
+    from_dict = analyzer.analyze_smile(legacy, 100.2, 0.1).to_dict()
+
+    assert from_chain['atm_strike'] == 100.0 and from_chain['atm_iv'] == pytest.approx(32.0)
+    assert len(from_chain['moneyness_buckets']) == len(analyzer.MONEYNESS_GROUPS)
+    assert {k: v for k, v in from_chain.items() if k != 'calculation_date'} == \
+        {k: v for k, v in from_dict.items() if k != 'calculation_date'}
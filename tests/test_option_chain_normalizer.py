@@ -0,0 +1,100 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+import pytz
+
+from data_layer.option_chain_normalizer import OptionChainNormalizer, merge_quotes, normalize_iv_values
+from data_layer.session_utils import liquidity_check_mask, quote_passes_liquidity_check
+from utils.validation import BidAskEstimator
+
+PREMARKET = pytz.timezone('America/New_York').localize(datetime(2026, 3, 4, 8, 0))
+
+
+def _chain(n=2000, seed=3):
+    rng = np.random.default_rng(seed)
+    strikes = np.round(np.arange(n) * 0.5 + 300.0, 2)
+    last = np.round(rng.uniform(0.05, 40.0, n), 2)
+    bid = np.where(rng.random(n) < 0.3, np.nan, last - 0.05)
+    return pd.DataFrame({
+        'strike': strikes,
+        'lastPrice': last,
+        'bid': bid,
+        'ask': np.where(np.isnan(bid), 0.0, last + 0.05),
+        'volume': rng.integers(0, 3000, n).astype(float),
+        'openInterest': rng.integers(0, 20000, n).astype(float),
+        'impliedVolatility': rng.uniform(0.05, 0.95, n),
+    })
+
+
+def test_vectorized_bid_ask_matches_scalar_estimator():
+    prices = np.array([0.05, 0.5, 0.99, 1.0, 4.2, 9.99, 10.0, 37.5, 0.0, np.nan])
+    ois = np.array([0, 50, 100, 999, 1000, 9999, 10000, 20000, 10, 10])
+    vols = np.array([0, 9, 10, 99, 100, 999, 1000, 5000, 1, 1])
+    arrays = BidAskEstimator.estimate_bid_ask_arrays(prices, ois, vols)
+
+    for i, price in enumerate(prices):
+        scalar = BidAskEstimator.estimate_bid_ask(None if np.isnan(price) else price, int(ois[i]), int(vols[i]))
+        assert arrays['valid'][i] == (scalar is not None)
+        if scalar:
+            assert arrays['bid'][i] == pytest.approx(scalar['bid'], abs=0.011)
+            assert arrays['ask'][i] == pytest.approx(scalar['ask'], abs=0.011)
+            assert arrays['liquidity_level'][i] == scalar['liquidity_level']
+
+
+def test_liquidity_mask_matches_scalar_check():
+    bid = np.array([1.00, 1.00, 0.0, 2.0, 5.0, np.nan])
+    ask = np.array([1.005, 1.05, 1.0, 1.9, 5.02, 1.0])
+    sizes = np.array([10, 10, 10, 10, 2, 10])
+    for dt in (PREMARKET, pytz.utc.localize(datetime(2026, 3, 4, 16, 0))):
+        mask = liquidity_check_mask(bid, ask, sizes, sizes, dt=dt)
+        expected = [quote_passes_liquidity_check(np.nan_to_num(b), a, s, s, dt=dt)[0]
+                    for b, a, s in zip(bid, ask, sizes)]
+        assert list(mask) == expected
+
+
+def test_normalize_merges_quotes_fills_and_flags_in_one_pass():
+    df = pd.DataFrame({
+        'strike': [100.0, 105.0, 110.0],
+        'lastPrice': [6.0, 2.5, 0.8],
+        'bid': [5.9, np.nan, 0.0],
+        'ask': [6.1, np.nan, 0.0],
+        'volume': [10.0, 5.0, 0.0],
+        'openInterest': [500.0, 200.0, 50.0],
+        'impliedVolatility': [0.35, 42.0, -1.0],
+        'data_quality': pd.Categorical(['complete'] * 3),
+    })
+    quotes = pd.DataFrame([{'strike': 105.0, 'right': 'C', 'bid': 2.45, 'ask': 2.55, 'volume': 80, 'mid': 2.5},
+                           {'strike': 105.0, 'right': 'P', 'bid': 9.0, 'ask': 9.2, 'volume': 1, 'mid': 9.1}])
+
+    normalizer = OptionChainNormalizer(iv_format='auto', session='premarket')
+    out, report = normalizer.normalize(df, 'call', 'TEST', quotes=quotes)
+
+    assert list(out['impliedVolatility'].fillna(-1)) == pytest.approx([35.0, 42.0, -1])
+    assert report.iv_scaled == 1 and report.iv_invalid == 1
+    assert out.loc[1, ['bid', 'ask', 'volume']].tolist() == [2.45, 2.55, 80.0]
+    assert out['bid_ask_source'].tolist() == [None, 'ibkr_opra', None]
+    assert out['bid_ask_estimated'].tolist() == [False, False, True] and out.loc[2, 'bid'] > 0
+    # 盤前無 bid/ask 量：全部標記 low_liquidity（與逐行檢查一致）
+    assert report.low_liquidity == 3 and set(out['data_quality']) == {'low_liquidity'}
+    assert df.loc[1, 'bid'] != df.loc[1, 'bid']     # 原對象未修改
+
+
+def test_large_chain_normalizes_in_milliseconds():
+    calls, puts = _chain(), _chain(seed=4)
+    quotes = {'calls': pd.DataFrame({'strike': calls['strike'][:10], 'bid': 1.0, 'ask': 1.1})}
+    normalizer = OptionChainNormalizer(iv_format='auto', session='premarket')
+    normalizer.normalize_chain(calls, puts, 'SPY', quotes)     # 預熱
+
+    out_calls, out_puts, reports = normalizer.normalize_chain(calls, puts, 'SPY', quotes)
+    assert reports['calls'].quotes_merged == 10
+    assert reports['calls'].bid_ask_estimated == int(calls['bid'][10:].isna().sum())
+    assert reports['calls'].low_liquidity == len(calls)       # 盤前且無 bid/ask 量
+    assert out_calls['impliedVolatility'].min() >= 5.0
+    assert reports['calls'].elapsed_ms + reports['puts'].elapsed_ms < 250
+
+    iv, counts = normalize_iv_values(pd.Series([0.5, 50, None, -2, 150]))
+    assert np.allclose(iv, [50, 50, np.nan, np.nan, 150], equal_nan=True)
+    assert counts == {'scaled': 1, 'invalid': 1, 'abnormal': 1}
+    assert not merge_quotes(calls.copy(), None, 'C').any()
@@ -0,0 +1,77 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from data_layer.utils.rate_limiter import RateLimiterRegistry, TokenBucket
+
+
+def test_burst_then_rate_limited():
+    bucket = TokenBucket('demo', rate=20.0, burst=3)
+    assert all(bucket.try_acquire() for _ in range(3))
+    assert not bucket.try_acquire()
+
+    start = time.monotonic()
+    assert bucket.acquire()
+    assert time.monotonic() - start == pytest.approx(0.05, abs=0.04)
+
+
+def test_threads_wait_in_parallel_not_serially():
+    bucket = TokenBucket('demo', rate=10.0, burst=1)
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        list(pool.map(lambda _: bucket.acquire(), range(5)))
+    elapsed = time.monotonic() - start
+    # 5 個請求在 10/s 下需要約 0.4s（第一個立即發出）
+    assert 0.3 < elapsed < 0.7
+    assert bucket.stats()['acquired'] == 5
+
+
+def test_timeout_does_not_consume_token():
+    bucket = TokenBucket('demo', rate=1.0, burst=1)
+    assert bucket.acquire()
+    assert not bucket.acquire(timeout=0.1)
+    assert bucket.stats()['rejected'] == 1
+
+
+def test_async_acquire_does_not_block_loop():
+    bucket = TokenBucket('demo', rate=10.0, burst=1)
+
+    async def main():
+        ticks = []
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.02)
+
+        await asyncio.gather(ticker(), *(bucket.acquire_async() for _ in range(3)))
+        return ticks
+
+    assert len(asyncio.run(main())) == 5
+
+
+def test_429_backs_off_and_recovers():
+    registry = RateLimiterRegistry({'api': {'rate': 10.0, 'burst': 2,
+                                            'backoff': {'initial_delay': 0.2, 'max_delay': 1.0}}})
+    bucket = registry.get('api')
+    assert registry.get('api') is bucket
+
+    delay = bucket.on_response(429)
+    assert delay > 0
+    assert bucket.rate == pytest.approx(5.0)
+    assert not bucket.try_acquire()
+
+    # 非重試類錯誤不退避
+    assert bucket.on_response(404) == 0.0
+
+    for _ in range(10):
+        bucket.on_response(200)
+    assert bucket.rate == pytest.approx(10.0)
+    assert registry.stats()['api']['backoffs'] == 1
+
+
+def test_unconfigured_provider_uses_default_interval():
+    registry = RateLimiterRegistry({})
+    assert registry.get('custom', default_interval=4.0).rate == pytest.approx(0.25)
@@ -0,0 +1,100 @@
+import numpy as np
+
+from calculation_layer.sabr_calibrator import SABRCalibrator, hagan_implied_volatility
+from calculation_layer.module25_volatility_smile import VolatilitySmileAnalyzer
+
+
+F = 100.0
+T = 0.25
+TRUE_PARAMS = dict(alpha=2.0, beta=0.5, rho=-0.35, nu=0.8)
+
+
+def _synthetic_smile():
+    strikes = np.linspace(80, 120, 17)
+    ivs = hagan_implied_volatility(strikes, F, T, **TRUE_PARAMS)
+    return strikes, ivs
+
+
+def test_hagan_atm_is_finite_and_matches_neighbours():
+    ivs = hagan_implied_volatility([F - 1e-9, F, F + 1e-9], F, T, **TRUE_PARAMS)
+    assert np.all(np.isfinite(ivs))
+    assert abs(ivs[0] - ivs[1]) < 1e-6
+    assert abs(ivs[2] - ivs[1]) < 1e-6
+
+
+def test_calibration_recovers_parameters_and_persists(tmp_path):
+    db_path = str(tmp_path / "sabr.db")
+    strikes, ivs = _synthetic_smile()
+
+    calibrator = SABRCalibrator(db_path=db_path)
+    params = calibrator.calibrate("aapl", "2026-12-18", strikes, ivs, forward=F, time_to_expiration=T)
+
+    assert params is not None
+    assert not params.warm_started
+    assert params.rmse < 1e-4
+    assert abs(params.rho - TRUE_PARAMS['rho']) < 0.02
+    assert abs(params.nu - TRUE_PARAMS['nu']) < 0.05
+
+    # 任意行使價查詢
+    off_grid = calibrator.get_model_iv("AAPL", "2026-12-18", 93.3)
+    expected = float(hagan_implied_volatility(93.3, F, T, **TRUE_PARAMS))
+    assert abs(off_grid - expected) < 1e-3
+
+    # 新實例從磁盤載入並熱啟動
+    restarted = SABRCalibrator(db_path=db_path)
+    assert restarted.get_parameters("AAPL", "2026-12-18") is not None
+    again = restarted.calibrate("AAPL", "2026-12-18", strikes, ivs, forward=F, time_to_expiration=T)
+    assert again.warm_started
+
+
+def test_calibration_skips_insufficient_points():
+    calibrator = SABRCalibrator(db_path=None)
+    assert calibrator.calibrate("X", "2026-12-18", [100, 105], [0.2, 0.21], forward=F, time_to_expiration=T) is None
+    assert calibrator.get_model_iv("X", "2026-12-18", 100) is None
+
+
+def test_smile_analyzer_exposes_model_iv():
+    strikes, ivs = _synthetic_smile()
+    chain = {
+        'calls': [{'strike': k, 'impliedVolatility': iv, 'bid': 1, 'ask': 1.1} for k, iv in zip(strikes, ivs)],
+        'puts': [{'strike': k, 'impliedVolatility': iv, 'bid': 1, 'ask': 1.1} for k, iv in zip(strikes, ivs)],
+    }
+    analyzer = VolatilitySmileAnalyzer(sabr_calibrator=SABRCalibrator(db_path=None))
+    result = analyzer.analyze_smile(chain, F, T, risk_free_rate=0.0, ticker="SPY", expiration="2026-12-18")
+
+    assert result.sabr_params is not None
+    assert analyzer.get_model_iv("SPY", "2026-12-18", 97.0) is not None
+
+
+def test_calibrate_before_module22_then_smile_reuses_fit():
+    from calculation_layer.module22_optimal_strike import OptimalStrikeCalculator
+
+    strikes, ivs = _synthetic_smile()
+    chain = {
+        'calls': [{'strike': k, 'impliedVolatility': iv, 'bid': 1, 'ask': 1.1} for k, iv in zip(strikes, ivs)],
+        'puts': [{'strike': k, 'impliedVolatility': iv, 'bid': 1, 'ask': 1.1} for k, iv in zip(strikes, ivs)],
+    }
+    calibrator = SABRCalibrator(db_path=None)
+    analyzer = VolatilitySmileAnalyzer(sabr_calibrator=calibrator)
+    fitted = analyzer.calibrate_sabr(chain, F, T, 0.0, "SPY", "2026-12-18")
+    assert fitted is not None and fitted['forward'] == F
+
+    # Module 22 此時已能查詢當前到期日的模型 IV
+    module22 = OptimalStrikeCalculator()
+    module22.set_sabr_calibrator(calibrator)
+    module22._sabr_key = ("SPY", "2026-12-18")
+    expected = float(hagan_implied_volatility(93.3, F, T, **TRUE_PARAMS))
+    assert abs(module22._get_sabr_iv(93.3) - expected) < 1e-3
+
+    calls = []
+    original = calibrator.calibrate
+    calibrator.calibrate = lambda *a, **k: calls.append(a) or original(*a, **k)
+    result = analyzer.analyze_smile(chain, F, T, risk_free_rate=0.0, ticker="SPY", expiration="2026-12-18")
+    assert result.sabr_params == fitted and calls == []
+
+
+def test_default_store_lives_under_cache_dir(isolated_cache_dir):
+    calibrator = SABRCalibrator()
+    assert calibrator.store.db_path == str(isolated_cache_dir / 'sabr_params.db')
+    assert (isolated_cache_dir / 'sabr_params.db').exists()
+    assert SABRCalibrator(db_path=None).store is None
@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from data_layer.single_flight import SingleFlight, coalesced
+
+
+def test_concurrent_threads_share_one_execution():
+    flight = SingleFlight(freshness_seconds=0)
+    calls = []
+    release = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        release.wait(2)
+        return {'price': 100}
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        futures = [pool.submit(flight.do, ('quote', 'AAPL'), fetch) for _ in range(5)]
+        time.sleep(0.1)
+        release.set()
+        results = [f.result() for f in futures]
+
+    assert len(calls) == 1
+    assert all(r == {'price': 100} for r in results)
+    stats = flight.stats()
+    assert stats['executions'] == 1
+    assert stats['coalescing_ratio'] == pytest.approx(0.8)
+
+
+def test_freshness_window_and_error_propagation():
+    flight = SingleFlight(freshness_seconds=60)
+    assert flight.do('k', lambda: [1, 2]) == [1, 2]
+    assert flight.do('k', lambda: [3]) == [1, 2]
+    assert flight.stats()['fresh_hits'] == 1
+
+    def fail():
+        raise RuntimeError('down')
+
+    with pytest.raises(RuntimeError):
+        flight.do('bad', fail)
+    # 錯誤不進入新鮮窗口
+    assert flight.do('bad', lambda: 'ok') == 'ok'
+
+
+def test_async_caller_joins_thread_flight():
+    flight = SingleFlight(freshness_seconds=0)
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(2)
+        return 'chain'
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        leader = loop.run_in_executor(None, flight.do, 'chain', slow)
+        await loop.run_in_executor(None, started.wait, 2)
+
+        async def never():
+            raise AssertionError('should join the running flight')
+
+        joiner = asyncio.ensure_future(flight.do_async('chain', never))
+        await asyncio.sleep(0.05)
+        release.set()
+        return await leader, await joiner
+
+    assert asyncio.run(main()) == ('chain', 'chain')
+
+
+def test_decorator_coalesces_across_instances():
+    calls = []
+
+    class Fetcher:
+        @coalesced('demo_quote')
+        def get_quote(self, ticker, period='1d'):
+            """docstring"""
+            calls.append(ticker)
+            return {'ticker': ticker}
+
+    assert Fetcher().get_quote('ZZZT1', period='5d') == {'ticker': 'ZZZT1'}
+    assert Fetcher().get_quote('ZZZT1', period='5d') == {'ticker': 'ZZZT1'}
+    assert calls == ['ZZZT1']
+    assert Fetcher.get_quote.__doc__ == 'docstring'
+
+
+def test_every_caller_gets_its_own_copy():
+    flight = SingleFlight(freshness_seconds=5.0)
+    leader = flight.do('info', lambda: {'price': 1.0})
+    leader['supplemented'] = True                     # 例如 supplement_finviz 修改股票信息
+
+    fresh = flight.do('info', lambda: {'price': 2.0})
+    assert fresh == {'price': 1.0}
+    fresh['price'] = 99.0
+    assert flight.do('info', lambda: None) == {'price': 1.0}
+
+    frame = flight.do('bars', lambda: pd.DataFrame({'Close': [1.0, 2.0]}))
+    frame['Close'] = frame['Close'] * 10
+    frame['extra'] = 1
+    again = flight.do('bars', lambda: None)
+    assert list(again.columns) == ['Close'] and list(again['Close']) == [1.0, 2.0]
+
+
+def test_decorator_normalizes_ticker_and_binds_defaults():
+    calls = []
+
+    class Fetcher:
+        @coalesced('demo_info')
+        def get_info(self, ticker, period='1d', **kwargs):
+            calls.append(ticker)
+            return {'ticker': ticker.upper()}
+
+    assert Fetcher().get_info('zzzt2') == {'ticker': 'ZZZT2'}
+    assert Fetcher().get_info(' ZZZT2', period='1d') == {'ticker': 'ZZZT2'}
+    assert Fetcher().get_info(ticker='ZZZT2') == {'ticker': 'ZZZT2'}
+    assert calls == ['zzzt2']
+
+    Fetcher().get_info('ZZZT2', period='5d', source='x')
+    assert calls == ['zzzt2', 'ZZZT2']
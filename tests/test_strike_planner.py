@@ -0,0 +1,79 @@
+from data_layer.smart_option_chain_fetcher import SmartOptionChainFetcher, StrikeUsageHistory
+
+SPOT = 100.0
+STRIKES = [float(k) for k in range(50, 151)]            # 101 個候選行使價
+
+
+def _quotes(lo, hi):
+    """lo~hi 之間有未平倉量，其餘無流動性"""
+    return {k: {'volume': 0, 'openInterest': 500 if lo <= k <= hi else 0} for k in STRIKES}
+
+
+def test_cold_start_fetches_everything_then_history_narrows_the_plan(tmp_path):
+    history = StrikeUsageHistory(str(tmp_path / 'usage.json'))
+    planner = SmartOptionChainFetcher(history=history)
+
+    plan = planner.plan_strikes('AAPL', '2026-03-20', SPOT, STRIKES, days_to_expiration=30)
+    assert plan.source == 'cold_start' and plan.strikes == STRIKES
+
+    for _ in range(3):
+        history.record_liquidity('AAPL', 30, SPOT, _quotes(92, 108))
+    history.record_usage('AAPL', 30, SPOT, [80.0])     # 模塊用過的遠價外行使價
+
+    plan = planner.plan_strikes('AAPL', '2026-03-20', SPOT, STRIKES, days_to_expiration=30)
+    assert plan.source == 'history'
+    assert 80.0 in plan.strikes and all(k in plan.strikes for k in range(92, 109))
+    assert 55.0 not in plan.strikes and 120.0 not in plan.strikes
+    assert len(plan.strikes) < len(STRIKES) // 2
+    assert plan.to_dict()['reduction_percentage'] > 50
+
+    # 其他標的 / 到期分組沒有歷史
+    assert planner.plan_strikes('MSFT', '', SPOT, STRIKES, days_to_expiration=30).source == 'cold_start'
+    assert planner.plan_strikes('AAPL', '', SPOT, STRIKES, days_to_expiration=3).source == 'cold_start'
+
+    # 持久化後新實例得到相同計劃
+    reloaded = SmartOptionChainFetcher(history=StrikeUsageHistory(str(tmp_path / 'usage.json')))
+    assert reloaded.plan_strikes('AAPL', '', SPOT, STRIKES, days_to_expiration=30).strikes == plan.strikes
+
+
+def test_refine_extends_only_edges_that_are_still_liquid():
+    history = StrikeUsageHistory()
+    for _ in range(3):
+        history.record_liquidity('SPY', 30, SPOT, _quotes(95, 105))
+    planner = SmartOptionChainFetcher(history=history)
+    plan = planner.plan_strikes('SPY', '', SPOT, STRIKES, days_to_expiration=30)
+    low, high = plan.strikes[0], plan.strikes[-1]
+
+    assert planner.refine_strikes(plan, _quotes(95, 105)) == []
+    # 今天上方流動性延伸到計劃之外：只向上補取
+    extra = planner.refine_strikes(plan, _quotes(95, 130))
+    assert extra == [high + 1, high + 2, high + 3, high + 4]
+    assert low - 1 not in extra
+
+    # 冷啟動計劃已包含全部候選，不需要補取
+    cold = SmartOptionChainFetcher(history=StrikeUsageHistory()).plan_strikes('SPY', '', SPOT, STRIKES)
+    assert SmartOptionChainFetcher(history=StrikeUsageHistory()).refine_strikes(cold, _quotes(50, 150)) == []
+
+    config = planner.get_strikes_config(SPOT, STRIKES, strategy_type='adaptive', ticker='SPY')
+    assert config.strikes_to_fetch == plan.strikes and config.reduction_percentage > 0
+
+
+def test_stale_bins_decay_to_unknown_and_neighbours_are_rechecked():
+    history = StrikeUsageHistory()
+    wide = _quotes(70, 130)
+    for _ in range(3):
+        history.record_liquidity('QQQ', 30, SPOT, wide)
+    assert history.band('QQQ', 30)[1] > 0.25
+
+    # 之後每次只獲取 95~105：遠端分桶的舊觀察衰減為未知，不再撐大區間
+    narrow = {k: q for k, q in _quotes(95, 105).items() if 95 <= k <= 105}
+    for _ in range(20):
+        history.record_liquidity('QQQ', 30, SPOT, narrow)
+    low, high = history.band('QQQ', 30)
+    assert -0.1 < low < -0.075 and 0.075 < high < 0.1      # 已知區間 ±2 格 + 兩端各探測 1 格
+
+    # 探測結果無流動性：鄰近分桶重新成為已知的無流動性分桶，區間收回到 ±2 格
+    probe = {k: {'volume': 0, 'openInterest': 0} for k in (92.0, 108.0)}
+    history.record_liquidity('QQQ', 30, SPOT, {**narrow, **probe})
+    low, high = history.band('QQQ', 30)
+    assert -0.075 < low < -0.05 and 0.05 < high < 0.075
@@ -0,0 +1,173 @@
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from ib_insync import Stock, Ticker
+from ib_insync.objects import TickAttribLast, TickByTickAllLast, TickByTickBidAsk
+
+from calculation_layer.module35_large_orders import LargeOrderDetector
+from calculation_layer.module36_liquidity import LiquidityMonitor
+from calculation_layer.module38_dark_pool import DarkPoolDetector
+from calculation_layer.module_vwap_intraday import VWAPIntradayAnalyzer
+from data_layer.tick_ring_buffer import FLAG_DARK, FLAG_UNREPORTED, TickPipeline, TickRingBuffer
+
+
+def _trade(ts, price, size, exchange='NASDAQ', unreported=False):
+    return TickByTickAllLast(1, datetime.fromtimestamp(ts), price, size,
+                             TickAttribLast(unreported=unreported), exchange, '')
+
+
+def test_ring_wraps_and_windows_are_zero_copy_slices():
+    buf = TickRingBuffer('AAPL', capacity=4)
+    for i in range(6):
+        buf.add_trade(1000.0 + i, 100.0 + i, 10.0)
+
+    trades = buf.trades()
+    assert list(trades.ts) == [1002.0, 1003.0, 1004.0, 1005.0]
+    assert list(buf.trades(2).price) == [104.0, 105.0]
+    assert trades.price.base is not None            # 視圖，非拷貝
+    assert list(buf.last(2.5, now=1005.0).ts) == [1003.0, 1004.0, 1005.0]
+
+    stats = buf.stats()
+    assert stats['trades'] == 4 and stats['trades_total'] == 6
+    bytes_before = stats['bytes']
+    for i in range(100):
+        buf.add_trade(2000.0 + i, 1.0, 1.0)
+    assert buf.stats()['bytes'] == bytes_before     # 內存固定
+
+
+def test_ingest_routes_trades_quotes_and_flags():
+    buf = TickRingBuffer('NVDA', capacity=8)
+    ticks = [
+        _trade(1000.0, 500.0, 100),
+        _trade(1001.0, 501.0, 300, exchange='D'),
+        _trade(1002.0, 502.0, 50, unreported=True),
+        TickByTickBidAsk(datetime.fromtimestamp(1002.5), 501.9, 502.1, 200, 300, None),
+    ]
+    assert TickPipeline.ingest(buf, ticks) == 4
+
+    trades = buf.trades()
+    assert list(trades.flags) == [0, FLAG_DARK, FLAG_UNREPORTED]
+    assert trades.dark_volume() == 300.0
+    assert trades.vwap() == pytest.approx((500 * 100 + 501 * 300 + 502 * 50) / 450)
+    quotes = buf.quotes()
+    assert len(quotes) == 1 and quotes.spread()[0] == pytest.approx(0.2)
+
+
+def _session(n=600, start=10_000.0):
+    rng = np.random.default_rng(7)
+    buf = TickRingBuffer('NVDA', capacity=1024)
+    prices = 20.0 + np.cumsum(rng.normal(0, 0.01, n))
+    sizes = rng.integers(100, 2000, n).astype(float)
+    sizes[[100, 110, 420]] = 20_000
+    for i in range(n):
+        flags = FLAG_DARK if i % 5 == 0 else 0
+        buf.add_trade(start + i, prices[i], sizes[i], flags)
+    return buf, prices, sizes
+
+
+def test_vectorized_modules_match_scalar_apis():
+    buf, prices, sizes = _session()
+    trades = buf.trades()
+    vwap = trades.vwap()
+
+    signals = LargeOrderDetector().detect_from_trades('NVDA', trades)
+    assert [s.order_size for s in signals] == [20_000] * 3
+    assert [s.consecutive_count for s in signals] == [1, 2, 1]
+    assert signals[0].vwap_deviation == pytest.approx((prices[100] - vwap) / vwap * 100)
+
+    metrics = LiquidityMonitor().calculate_from_trades('NVDA', trades, avg_volume_baseline=100_000)
+    assert metrics.volume_3min == int(sizes[-180:].sum())
+    assert metrics.volume_5min == int(sizes[-300:].sum())
+    assert metrics.volume_10min == int(sizes.sum())
+
+    dark = DarkPoolDetector().detect_from_trades('NVDA', trades)
+    assert dark.dark_volume == int(sizes[::5].sum()) and dark.total_volume == int(sizes.sum())
+    assert dark.vwap == pytest.approx(vwap)
+
+    result = VWAPIntradayAnalyzer().calculate_from_trades('NVDA', trades)
+    running = np.cumsum(prices * sizes) / np.cumsum(sizes)
+    std = np.sqrt(np.sum(sizes * (prices - running) ** 2) / sizes.sum())
+    assert result.vwap == pytest.approx(vwap)
+    assert result.upper_band_1 - result.vwap == pytest.approx(std)
+    assert result.current_price == prices[-1] and result.data_points == 600
+
+
+class FakeIB:
+    """reqTickByTickData 返回 Ticker 的 IB 替身"""
+
+    def __init__(self):
+        self.tickers = {}
+        self.cancels = []
+
+    def reqTickByTickData(self, contract, tickType, numberOfTicks, ignoreSize):
+        return self.tickers.setdefault(contract.symbol, Ticker(contract=contract))
+
+    def cancelTickByTickData(self, contract, tickType):
+        self.cancels.append((contract.symbol, tickType))
+
+
+def test_pipeline_ingests_on_update_event():
+    ib = FakeIB()
+    pipeline = TickPipeline(ib, capacity=16)
+    stock = Stock('AAPL', 'SMART', 'USD')
+    buf = pipeline.follow(stock)
+    assert pipeline.follow(stock) is buf
+
+    ticker = ib.tickers['AAPL']
+    now = datetime.now()
+    ticker.tickByTicks = [_trade(now.timestamp(), 240.0, 100)]
+    ticker.updateEvent.emit(ticker)
+    ticker.tickByTicks = [_trade((now + timedelta(seconds=1)).timestamp(), 240.5, 50)]
+    ticker.updateEvent.emit(ticker)
+    assert list(buf.trades().size) == [100.0, 50.0]
+
+    pipeline.close()
+    assert ib.cancels == [('AAPL', 'AllLast'), ('AAPL', 'BidAsk')]
+    ticker.updateEvent.emit(ticker)
+    assert buf.stats()['trades_total'] == 2
+
+
+class StreamingIB(FakeIB):
+    """sleep 期間推送一批 AllLast 成交"""
+
+    def __init__(self, ticks):
+        super().__init__()
+        self.ticks = ticks
+        self.slept = []
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        ticker = self.tickers['NVDA']
+        ticker.tickByTicks = [_trade(time.time(), price, size, exchange) for price, size, exchange in self.ticks]
+        ticker.updateEvent.emit(ticker)
+
+
+def test_dark_pool_exchange_method_reads_the_ring_buffer():
+    from data_layer.ibkr_client import IBKRClient
+
+    rng = np.random.default_rng(3)
+    ticks = [(100.0 + rng.normal(0, 0.05), 200, 'NASDAQ') for _ in range(40)]
+    ticks += [(100.1, 12_000, 'D'), (100.0, 300, 'D'), (99.9, 25_000, 'NYSE')]
+    client = IBKRClient.__new__(IBKRClient)
+    client.ib = StreamingIB(ticks)
+    client._tick_pipeline = None
+    client.is_connected = lambda: True
+    client._qualify = lambda contract: None
+
+    result = client.get_dark_pool_ticks('NVDA', duration_seconds=5, min_block_size=10_000, method='exchange')
+
+    assert client.ib.slept and client.ib.slept[0] <= 5
+    total = 40 * 200 + 12_000 + 300 + 25_000
+    assert result['dp_volume_exchange'] == 12_300
+    assert result['dp_ratio_exchange'] == round(12_300 / total * 100, 2)
+    assert (result['dp_block_count'], result['dp_block_volume']) == (1, 12_000)
+    assert [t['size'] for t in result['dp_ticks']] == [12_000, 300]
+
+    flow = result['tick_flow']
+    assert flow['trades'] == 43
+    assert [s['order_size'] for s in flow['large_orders']] == [12_000, 25_000]
+    # 本次調用開始的跟蹤在結束時取消
+    assert client.get_tick_pipeline().symbols() == []
+    assert ('NVDA', 'AllLast') in client.ib.cancels
@@ -0,0 +1,115 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from datetime import date, datetime
+
+from data_layer.session_utils import ET_TZ
+from services.warmup_service import GLOBAL_STEPS, IBKR_STEPS, TICKER_STEPS, WarmupService, collect_watchlist, next_warmup_time
+
+
+class FakeFetcher:
+    """每次調用耗時 20ms，記錄最大同時在途數；BAD 的到期日拋錯，EPS 總是無數據"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = []
+        self.threads = {}   # 方法名 -> 執行線程名集合
+
+    def _call(self, name, ticker=None):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.calls.append((name, ticker))
+            self.threads.setdefault(name, set()).add(threading.current_thread().name)
+        time.sleep(0.02)
+        with self.lock:
+            self.in_flight -= 1
+        if name == 'get_option_expirations' and ticker == 'BAD':
+            raise RuntimeError('timeout')
+        return None if name == 'get_eps' else {'ticker': ticker}
+
+    def __getattr__(self, name):
+        if not name.startswith('get_'):
+            raise AttributeError(name)
+        return lambda ticker=None, **kwargs: self._call(name, ticker)
+
+
+def test_watchlist_merges_recent_hot_and_static_lists(tmp_path):
+    now = time.time()
+    for ticker, age_days in [('MSFT', 1), ('AAPL', 0.5), ('OLD', 30)]:
+        report = tmp_path / 'output' / ticker / 'json' / 'report.json'
+        report.parent.mkdir(parents=True)
+        report.write_text('{}')
+        os.utime(report, (now - age_days * 86400,) * 2)
+    (tmp_path / 'output' / 'json').mkdir()
+    hot = tmp_path / 'hot_options.json'
+    hot.write_text(json.dumps([{'ticker': 'zntl', 'score': 70}, {'ticker': 'PLTR', 'score': 90}, {'score': 1}]))
+
+    watchlist = collect_watchlist({'Titans': ['NVDA', 'AAPL'], 'Small': ['SOUN']}, str(hot),
+                                  str(tmp_path / 'output'), history_days=5, max_tickers=100, now=now)
+    assert watchlist == ['AAPL', 'MSFT', 'PLTR', 'ZNTL', 'NVDA', 'SOUN']
+    assert collect_watchlist({'Titans': ['NVDA']}, str(hot), str(tmp_path / 'output'),
+                             history_days=5, max_tickers=3, now=now) == ['AAPL', 'MSFT', 'PLTR']
+
+
+def test_warm_respects_concurrency_and_reports_coverage(tmp_path, isolated_cache_dir):
+    fetcher = FakeFetcher()
+    service = WarmupService(fetcher, max_concurrent=3, rate_per_second=200.0,
+                            report_path=str(tmp_path / 'warmup_report.json'))
+    report = service.run_once(['aapl', 'BAD'])
+
+    assert len(fetcher.calls) == 2 * len(TICKER_STEPS) + len(GLOBAL_STEPS)
+    assert fetcher.max_in_flight == 3
+    summary = report.to_dict()
+    assert summary['coverage']['stock_info'] == 100.0 and summary['coverage']['eps'] == 0.0
+    assert summary['coverage']['expirations'] == 50.0
+    assert report.steps['expirations']['failed'] == 1 and report.failures[0]['ticker'] == 'BAD'
+    assert set(summary['stores']) >= {'data_cache', 'contract_cache'}
+    # 存儲狀態探測只觸碰臨時 CACHE_DIR（conftest），不在倉庫 cache/ 下建庫
+    assert (isolated_cache_dir / 'data_cache.db').exists()
+    assert json.loads((tmp_path / 'warmup_report.json').read_text())['watchlist'] == ['AAPL', 'BAD']
+
+    # 速率上限：突發 1 個後每秒 20 個
+    slow = WarmupService(FakeFetcher(), max_concurrent=1, rate_per_second=20.0, report_path='')
+    started = time.perf_counter()
+    slow.run_once(['AAPL'])
+    assert time.perf_counter() - started >= (len(TICKER_STEPS) + len(GLOBAL_STEPS) - 1) / 20.0 * 0.9
+
+
+def test_ibkr_steps_run_on_the_thread_that_built_the_fetcher(monkeypatch, tmp_path):
+    built = {}
+
+    def build():
+        # 模擬 ib.connect()：需要線程自帶、未在運行的事件循環
+        loop = asyncio.get_event_loop()
+        built.update(thread=threading.current_thread().name, running=loop.is_running())
+        return FakeFetcher()
+
+    monkeypatch.setattr(WarmupService, '_build_fetcher', staticmethod(build))
+    service = WarmupService(max_concurrent=4, rate_per_second=500.0, report_path='')
+    try:
+        service.run_once(['AAPL', 'MSFT'])
+        fetcher = service.fetcher
+    finally:
+        service.close()
+
+    assert built['thread'].startswith('warmup-ibkr') and not built['running']
+    methods = dict((step, name) for step, name, _ in TICKER_STEPS)
+    for step in IBKR_STEPS:
+        assert fetcher.threads[methods[step]] == {built['thread']}
+    assert all(built['thread'] not in fetcher.threads[methods[step]] for step in methods if step not in IBKR_STEPS)
+
+
+def test_next_warmup_time_skips_weekends_and_holidays():
+    friday_after_open = ET_TZ.localize(datetime(2026, 3, 6, 10, 0))
+    start = next_warmup_time(friday_after_open, 45, is_trading_day=lambda d: d.weekday() < 5)
+    assert start == ET_TZ.localize(datetime(2026, 3, 9, 8, 45))
+
+    monday_holiday = lambda d: d.weekday() < 5 and d != date(2026, 3, 9)
+    assert next_warmup_time(friday_after_open, 45, monday_holiday).date() == date(2026, 3, 10)
+    assert next_warmup_time(ET_TZ.localize(datetime(2026, 3, 10, 7, 0)), 30, monday_holiday) == \
+        ET_TZ.localize(datetime(2026, 3, 10, 9, 0))
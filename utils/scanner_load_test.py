@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+掃描器負載測試工具
+
+以進程內模擬 Gateway（data_layer/ibkr_simulator.py）代替 TWS / Gateway，用大量合成股票
+跑一輪 ScannerService.run_loop(single_pass=True)，報告吞吐量與各共享組件的指標，
+用於比較並發 / 行情線 / pacing 參數的效果。
+
+按 IBKR 默認 pacing（每 10 分鐘 60 個歷史請求），數百隻股票的單輪掃描主要耗時在等待
+歷史數據窗口（見報告中 historical.wait_seconds）。
+
+用法:
+    python utils/scanner_load_test.py --tickers 500
+    python utils/scanner_load_test.py --tickers 500 --latency 0.1 --hist-concurrent 10 --lines 200
+    python utils/scanner_load_test.py --tickers 500 --hist-window 10      # 排除 pacing 等待，只看其餘開銷
+    python utils/scanner_load_test.py --data logs/session.ibkrlog   # 有錄製數據的股票使用錄製數據
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="模擬 Gateway 掃描器負載測試")
+    parser.add_argument('--tickers', type=int, default=500, help="合成股票數量")
+    parser.add_argument('--latency', type=float, default=0.05, help="模擬請求往返延遲（秒）")
+    parser.add_argument('--tick-interval', type=float, default=1.0, help="模擬行情推送間隔（秒）")
+    parser.add_argument('--lines', type=int, default=100, help="行情線配額（掃描器與模擬 Gateway 相同）")
+    parser.add_argument('--hist-concurrent', type=int, default=6, help="歷史數據同時在途請求數")
+    parser.add_argument('--hist-max-requests', type=int, default=60, help="歷史數據 pacing 窗口內最大請求數")
+    parser.add_argument('--hist-window', type=float, default=600.0,
+                        help="歷史數據 pacing 窗口（秒）；調小可測量 pacing 以外的瓶頸")
+    parser.add_argument('--snapshot-in-flight', type=int, default=80, help="期權鏈快照同時在途訂閱數")
+    parser.add_argument('--data', default='', help="優先使用的錄製日誌")
+    parser.add_argument('--verbose', action='store_true', help="輸出掃描器日誌")
+    return parser.parse_args()
+
+
+def configure(args):
+    """在導入任何單例之前通過環境變量配置（settings 在導入時讀取環境變量）"""
+    os.environ.update({
+        'IBKR_SIMULATOR': 'true',
+        'IBKR_SIM_LATENCY': str(args.latency),
+        'IBKR_SIM_TICK_INTERVAL': str(args.tick_interval),
+        'IBKR_SIM_MARKET_DATA_LINES': str(args.lines),
+        'IBKR_SIM_DATA_PATH': args.data,
+        'IBKR_MARKET_DATA_LINES': str(args.lines),
+        'IBKR_HIST_MAX_CONCURRENT': str(args.hist_concurrent),
+        'IBKR_HIST_MAX_REQUESTS': str(args.hist_max_requests),
+        'IBKR_HIST_WINDOW_SECONDS': str(args.hist_window),
+        'IBKR_SNAPSHOT_MAX_IN_FLIGHT': str(args.snapshot_in_flight),
+        # 不讀寫本地持久化緩存，每次測試從冷啟動開始
+        'IBKR_CONTRACT_CACHE_ENABLED': 'false',
+        'BAR_STORE_ENABLED': 'false',
+        'IBKR_RECORD_PATH': '',
+        'IBKR_REPLAY_PATH': '',
+    })
+
+
+def synthetic_tickers(count: int):
+    """SIM0000, SIM0001, ...（模擬 Gateway 按代碼確定性生成價格與波動率）"""
+    return [f"SIM{i:04d}" for i in range(count)]
+
+
+async def run(args):
+    import scanner_service
+    from data_layer.sqlite_manager import SQLiteManager
+
+    class LoadTestScanner(scanner_service.ScannerService):
+        """跳過暗池抓取與深度分析（外部數據源，不屬於 IBKR 吞吐量）"""
+
+        async def _fetch_dark_pool_top_candidates(self, opportunities):
+            return opportunities
+
+        async def run_deep_analysis(self, ticker, setup_info=None):
+            return None
+
+    workdir = tempfile.mkdtemp(prefix='scanner_load_test_')
+    tickers = synthetic_tickers(args.tickers)
+    scanner_service.MOCK_MODE = True
+    scanner_service.OUTPUT_FILE = os.path.join(workdir, 'hot_options.json')
+    for profile_name in list(scanner_service.STATIC_WATCHLISTS):
+        scanner_service.STATIC_WATCHLISTS[profile_name] = tickers
+
+    scanner = LoadTestScanner()
+    scanner.db = SQLiteManager(os.path.join(workdir, 'scanner_results.db'))
+    ib = scanner.ib
+
+    scanner.running = True
+    started = time.perf_counter()
+    await scanner.run_loop(single_pass=True)
+    elapsed = time.perf_counter() - started
+
+    return {
+        'tickers': args.tickers,
+        'elapsed_seconds': round(elapsed, 2),
+        'tickers_per_second': round(args.tickers / elapsed, 2) if elapsed > 0 else None,
+        'opportunities': len(scanner.latest_opportunities),
+        'simulator': ib.metrics(),
+        'market_data_lines': scanner.market_data_lines.metrics(),
+        'historical': scanner.historical.stats(),
+        'contract_cache': scanner.contract_cache.stats(),
+        'output_dir': workdir
+    }
+
+
+def main():
+    args = parse_args()
+    configure(args)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2, ensure_ascii=False, default=str))
+
+
+if __name__ == '__main__':
+    main()
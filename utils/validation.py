@@ -9,6 +9,8 @@ import logging
 import math
 from typing import Dict, Tuple, Any, Optional
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
 
@@ -202,6 +204,64 @@ class BidAskEstimator:
         
         return result
     
+    @classmethod
+    def estimate_bid_ask_arrays(
+        cls,
+        market_price,
+        open_interest=0,
+        volume=0
+    ) -> Dict[str, np.ndarray]:
+        """
+        向量化估算整列期權的 bid/ask（規則與 estimate_bid_ask 相同）
+        
+        參數:
+            market_price: 市場價格數組（≤0 或 NaN 的行不估算）
+            open_interest: 未平倉量數組（NaN 視為 0）
+            volume: 成交量數組（NaN 視為 0）
+        
+        返回:
+            dict: {'valid', 'bid', 'ask', 'mid', 'spread', 'spread_pct', 'liquidity_level'}，
+                  各為與輸入等長的數組；valid 為 False 的行其餘值無意義
+        """
+        price = np.asarray(market_price, dtype=np.float64)
+        oi = np.nan_to_num(np.broadcast_to(np.asarray(open_interest, dtype=np.float64), price.shape))
+        vol = np.nan_to_num(np.broadcast_to(np.asarray(volume, dtype=np.float64), price.shape))
+        valid = np.nan_to_num(price) > 0
+        
+        ratios = cls.BASE_SPREAD_RATIOS
+        base_spread_ratio = np.select(
+            [price < 1.0, price < 10.0],
+            [ratios['low_price'], ratios['medium_price']],
+            ratios['high_price']
+        )
+        oi_score = np.select([oi >= 10000, oi >= 1000, oi >= 100], [0.6, 0.4, 0.2], 0.1)
+        vol_score = np.select([vol >= 1000, vol >= 100, vol >= 10], [0.4, 0.3, 0.2], 0.1)
+        score = oi_score + vol_score
+        # 與 _get_liquidity_adjustment 相同的分檔
+        levels = [score >= 0.8, score >= 0.5, score >= 0.3]
+        adjustments = cls.LIQUIDITY_ADJUSTMENTS
+        adjustment = np.select(levels, [adjustments['high'], adjustments['medium'], adjustments['low']],
+                               adjustments['very_low'])
+        liquidity_level = np.select(levels, ['high', 'medium', 'low'], 'very_low')
+        
+        spread = np.maximum(0.01, price * base_spread_ratio * adjustment)
+        half_spread = spread / 2
+        bid = np.maximum(0.01, np.round(price - half_spread, 2))
+        ask = np.maximum(bid + 0.01, np.round(price + half_spread, 2))
+        actual_spread = ask - bid
+        with np.errstate(divide='ignore', invalid='ignore'):
+            spread_pct = np.where(valid, actual_spread / price * 100, 0.0)
+        
+        return {
+            'valid': valid,
+            'bid': bid,
+            'ask': ask,
+            'mid': np.round((bid + ask) / 2, 2),
+            'spread': np.round(actual_spread, 2),
+            'spread_pct': np.round(spread_pct, 2),
+            'liquidity_level': liquidity_level
+        }
+    
     @classmethod
     def _calculate_liquidity_score(cls, open_interest: int, volume: int) -> float:
         """
@@ -430,6 +430,12 @@ def system_status():
         
     return jsonify(status)
 
+@app.route('/api/market_data_lines', methods=['GET'])
+def market_data_lines():
+    """IBKR 行情線利用率（含每條線的使用方與空閒時間）"""
+    from data_layer.ibkr_market_data_lines import get_market_data_lines
+    return jsonify(get_market_data_lines().metrics(include_lines=True))
+
 if __name__ == '__main__':
     # 開發模式運行
     print("\n" + "="*70)